@@ -0,0 +1,149 @@
+# pylint: disable=missing-function-docstring
+"""
+Benchmark measuring the latency from a packet being queued by the MQTT thread to
+its write being acknowledged, for the old polling writer loop and the blocking loops
+Run from the base directory with: python -m benchmarks.bench_consumer_latency
+"""
+
+import math
+import random
+import statistics
+import threading
+import time
+from datetime import datetime
+from queue import Queue
+
+from src.classes.common_classes import QueuePackage
+from src.classes.influx_classes import BatchWriter
+from src.helpers.py_functions import get_many, wake_consumer
+
+BURSTS = 20
+DEVICES = ["fx-1", "mx-1", "dc-1"]
+WRITE_LATENCY = 0.002
+
+
+class FakeConnector:
+    """Records when each package is acknowledged by the simulated database"""
+
+    def __init__(self) -> None:
+        self.queued_at = {}
+        self.latencies = []
+
+    def _ack(self, queue_package: QueuePackage) -> None:
+        self.latencies.append(time.perf_counter() - self.queued_at[id(queue_package)])
+
+    def write_points(self, queue_package: QueuePackage) -> None:
+        time.sleep(WRITE_LATENCY)
+        self._ack(queue_package)
+
+    def serialize_batch(self, queue_packages: list[QueuePackage]) -> list:
+        return queue_packages
+
+    def write_lines(self, lines: list) -> None:
+        time.sleep(WRITE_LATENCY)
+        for queue_package in lines:
+            self._ack(queue_package)
+
+
+class Counter:
+    """Counts loop iterations of a consumer"""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, is_running) -> bool:
+        self.count += 1
+        return is_running()
+
+
+def polling_loop(source_queue: Queue, connector: FakeConnector, is_running) -> None:
+    # The writer loop before blocking reads, kept here for comparison
+    while is_running():
+        if not source_queue.empty():
+            queue_package = source_queue.get(timeout=1.0)
+            if queue_package is None:
+                continue
+            connector.write_points(queue_package=queue_package)
+        else:
+            time.sleep(0.5)
+
+
+def blocking_loop(source_queue: Queue, connector: FakeConnector, is_running) -> None:
+    while is_running():
+        for queue_package in get_many(
+            source_queue=source_queue, max_items=150, timeout=1.0
+        ):
+            connector.write_points(queue_package=queue_package)
+
+
+def batched_loop(source_queue: Queue, connector: FakeConnector, is_running) -> None:
+    batch_writer = BatchWriter(
+        influx_connector=connector, batch_size=500, flush_interval=1.0
+    )
+    batch_writer.drain(source_queue=source_queue, is_running=is_running)
+    batch_writer.finish(source_queue=source_queue, deadline=math.inf)
+
+
+def produce(source_queue: Queue, connector: FakeConnector) -> None:
+    rng = random.Random(0)
+    for _ in range(BURSTS):
+        time.sleep(rng.uniform(0.2, 1.2))
+        for device in DEVICES:
+            queue_package = QueuePackage(
+                measurement=device,
+                time_field=datetime.now(),
+                field={"battery_voltage": 27.4},
+            )
+            connector.queued_at[id(queue_package)] = time.perf_counter()
+            source_queue.put(queue_package)
+
+
+def run(consumer) -> tuple[list[float], float, float]:
+    source_queue = Queue(maxsize=150)
+    connector = FakeConnector()
+    running = threading.Event()
+    running.set()
+    counter = Counter()
+    consumer_thread = threading.Thread(
+        target=consumer,
+        args=(source_queue, connector, lambda: counter(running.is_set)),
+    )
+    start_time = time.perf_counter()
+    consumer_thread.start()
+    produce(source_queue=source_queue, connector=connector)
+    while len(connector.latencies) < BURSTS * len(DEVICES):
+        time.sleep(0.01)
+    duration = time.perf_counter() - start_time
+
+    stop_time = time.perf_counter()
+    running.clear()
+    wake_consumer(target_queue=source_queue)
+    consumer_thread.join()
+    return (
+        connector.latencies,
+        counter.count / duration,
+        time.perf_counter() - stop_time,
+    )
+
+
+def main() -> None:
+    print(
+        f"{BURSTS} bursts of {len(DEVICES)} packets, {WRITE_LATENCY * 1000:.0f}ms writes"
+    )
+    for name, consumer in [
+        ("polling, single writes", polling_loop),
+        ("blocking, single writes", blocking_loop),
+        ("blocking, batched writes", batched_loop),
+    ]:
+        latencies, wakeups, shutdown = run(consumer)
+        latencies = sorted(latency * 1000 for latency in latencies)
+        print(
+            f"{name:<25} p50 {statistics.median(latencies):7.1f}ms "
+            f"p95 {latencies[int(len(latencies) * 0.95)]:7.1f}ms "
+            f"max {latencies[-1]:7.1f}ms "
+            f"{wakeups:5.1f} wakeups/s shutdown {shutdown * 1000:6.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# pylint: disable=missing-function-docstring
+"""
+Benchmark measuring how many fields the deadband filter drops from a simulated day
+of FX packets, one a second, and what filtering costs per package. Modes and flags
+hold still, the battery voltage wanders in 0.1V steps and the currents are zero
+through the night
+Run from the base directory with: python -m benchmarks.bench_deadband
+"""
+
+import random
+import time
+
+from src.classes.common_classes import QueuePackage
+from src.classes.deadband_classes import DeadbandFilter, present_fields
+
+PACKETS = 86400
+FIELD_DEADBANDS = (
+    "fx-1.battery_voltage=0.2, fx-1.inverter_current=1, fx-1.chg_current=1"
+)
+
+
+def create_packages() -> list[QueuePackage]:
+    rng = random.Random(0)
+    battery_voltage = 26.0
+    queue_packages = []
+    for seconds in range(PACKETS):
+        daylight = 6 * 3600 <= seconds < 18 * 3600
+        battery_voltage = round(battery_voltage + rng.choice((-0.1, 0.0, 0.1)), 1)
+        current = float(rng.randint(10, 14)) if daylight else 0.0
+        queue_packages.append(
+            QueuePackage(
+                measurement="fx-1",
+                time_field=1640995200 + seconds,
+                field={
+                    "inverter_current": current,
+                    "chg_current": current,
+                    "buy_current": 0.0,
+                    "input_voltage": 0.0,
+                    "output_voltage": 230.0,
+                    "sell_current": 0.0,
+                    "operational_mode": 2.0,
+                    "error_mode": 0.0,
+                    "ac_mode": 0.0,
+                    "battery_voltage": battery_voltage,
+                    "misc": 1.0,
+                    "warnings": 0.0,
+                    "is_230v": 1.0,
+                    "aux_on": 0.0,
+                },
+            )
+        )
+    return queue_packages
+
+
+def main() -> None:
+    queue_packages = create_packages()
+    fields = sum(len(queue_package.field) for queue_package in queue_packages)
+    deadband_filter = DeadbandFilter(field_deadbands=FIELD_DEADBANDS)
+    start_time = time.perf_counter()
+    filtered = deadband_filter.filter_packages(queue_packages)
+    elapsed = time.perf_counter() - start_time
+    written = sum(
+        len(present_fields(queue_package.field)) for queue_package in filtered
+    )
+    print(f"{PACKETS} packets, {fields} fields, deadbands: {FIELD_DEADBANDS}")
+    print(
+        f"written {written} fields in {len(filtered)} packages "
+        f"({1 - written / fields:.1%} fewer fields, "
+        f"{1 - len(filtered) / PACKETS:.1%} fewer packages)"
+    )
+    print(f"filter {elapsed / PACKETS * 1e6:.2f}us per package")
+
+
+if __name__ == "__main__":
+    main()
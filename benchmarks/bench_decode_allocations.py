@@ -0,0 +1,87 @@
+# pylint: disable=missing-function-docstring
+"""
+Benchmark measuring the memory allocated to decode each device's data packet, for
+the old path which sliced copies of the time and frame out of the packet and built
+a datetime against decoding from views and offsets into the packet with integer
+epoch seconds. Peak is the most memory held while one packet is decoded, kept is
+what each decoded packet holds on to until it's queued
+Run from the base directory with: python -m benchmarks.bench_decode_allocations
+"""
+
+import struct
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.bench_decode_pool import DC_PAYLOAD, FX_PAYLOAD, MX_PAYLOAD
+
+from src.classes.mqtt_classes import DEVICE_TOPICS, DeviceTopic, MqttTopics
+from src.helpers.consts import TIME_PACKET_SIZE
+
+PACKETS = 10000
+
+
+def legacy_decode(
+    device_topic: DeviceTopic, payload: bytes, native_decoders: bool
+) -> tuple[datetime, dict]:
+    raw_time = payload[:TIME_PACKET_SIZE]
+    msg_time = struct.unpack("i", raw_time)
+    msg_payload = payload[TIME_PACKET_SIZE : -device_topic.padding_at_end]
+    decoder = device_topic.native_decoder if native_decoders else device_topic.decoder
+    return datetime.fromtimestamp(msg_time[0]), decoder(msg_payload)
+
+
+def view_decode(
+    device_topic: DeviceTopic, payload: bytes, native_decoders: bool
+) -> tuple[int, dict]:
+    return device_topic.decode(payload=payload, native_decoders=native_decoders)
+
+
+def measure(decode, device_topic: DeviceTopic, payload: bytes, native: bool):
+    # Warm up so caches filled on the first call aren't counted
+    decode(device_topic, payload, native)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    decoded = decode(device_topic, payload, native)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    del decoded
+    decoded_packets = [None] * PACKETS
+    baseline = tracemalloc.get_traced_memory()[0]
+    for index in range(PACKETS):
+        decoded_packets[index] = decode(device_topic, payload, native)
+    kept = (tracemalloc.get_traced_memory()[0] - baseline) / PACKETS
+    tracemalloc.stop()
+    return peak, kept
+
+
+def main() -> None:
+    devices = [
+        ("dc", MqttTopics.dc_data, DC_PAYLOAD),
+        ("fx", MqttTopics.fx_data, FX_PAYLOAD),
+        ("mx", MqttTopics.mx_data, MX_PAYLOAD),
+    ]
+    print(f"bytes per packet, kept averaged over {PACKETS} packets")
+    for native in (True, False):
+        for name, topic, frame in devices:
+            device_topic = DEVICE_TOPICS[topic]
+            payload = (
+                struct.pack("i", 1640995200)
+                + frame
+                + bytes(device_topic.padding_at_end)
+            )
+            legacy_time, legacy_fields = legacy_decode(device_topic, payload, native)
+            view_time, view_fields = view_decode(device_topic, payload, native)
+            assert legacy_time.timestamp() == view_time
+            assert legacy_fields == view_fields
+            legacy_peak, legacy_kept = measure(
+                legacy_decode, device_topic, payload, native
+            )
+            view_peak, view_kept = measure(view_decode, device_topic, payload, native)
+            print(
+                f"{name} {'native' if native else 'pymate'}  peak {legacy_peak:5d} -> {view_peak:5d}  "
+                f"kept {legacy_kept:6.1f} -> {view_kept:6.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
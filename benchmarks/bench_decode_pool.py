@@ -0,0 +1,92 @@
+# pylint: disable=missing-function-docstring
+"""
+Benchmark measuring how decode throughput scales with the number of decoder
+processes, against decoding every packet inline on one thread as the MQTT thread
+does without a decode pool. Packets mix the three device topics like a busy site
+Run from the base directory with: python -m benchmarks.bench_decode_pool
+"""
+
+import os
+import struct
+import time
+from queue import Queue
+
+from src.classes.decode_classes import DecodePool
+from src.classes.mqtt_classes import MqttTopics, decode_packets
+from src.classes.queue_classes import IngestQueue
+
+PACKETS = 60000
+BATCH_SIZE = 64
+DC_PAYLOAD = (
+    b"\xff\xe8\x00l\x00\x00\x01\x11d\xff\xf9\x00\x1d\x00\x00\x00!\x00l"
+    b"\x00\x18\x00T\x00\x1d\x00\x07\x00\x16\x00\x1b\x00\x0e\x00\r\x00J\x00\x1f\x00+"
+    b"\x00\x0b\x00\x03\x00\t\x00\x0c\x00\x00\x00\x04\x00\x04\xff\xf7\x00\x0c\x00\x00"
+    b"\xff\xfc\x00\x04\x00\x00c\x00\x00\x00\x02\x15\x00\x00\x00\x00\x00"
+)
+FX_PAYLOAD = b"\x00\x00\x00\x04t\x00\x04\x00\x02\x01\x12\t\x00"
+MX_PAYLOAD = b"\x87\x85\x8b\x00t\x08\x02\x00 \x01\x0f\x02\xa4"
+
+
+def create_packets() -> list[tuple[str, bytes, float, str, int]]:
+    devices = [
+        (MqttTopics.dc_data, DC_PAYLOAD, 2),
+        (MqttTopics.fx_data, FX_PAYLOAD, 3),
+        (MqttTopics.mx_data, MX_PAYLOAD, 3),
+    ]
+    packets = []
+    for index in range(PACKETS):
+        topic, payload, padding_at_end = devices[index % len(devices)]
+        raw_time = struct.pack("i", 1640995200 + index)
+        packets.append(
+            (topic, raw_time + payload + bytes(padding_at_end), None, None, None)
+        )
+    return packets
+
+
+def run_inline(packets: list[tuple[str, bytes, float, str, int]]) -> float:
+    start_time = time.perf_counter()
+    for packet in packets:
+        decode_packets(packets=[packet], queue_mode="packet")
+    return len(packets) / (time.perf_counter() - start_time)
+
+
+def run_pool(
+    packets: list[tuple[str, bytes, float, str, int]], decode_workers: int
+) -> float:
+    target_queue = Queue()
+    decode_pool = DecodePool(
+        decode_packets=decode_packets,
+        ingest_queue=IngestQueue(target_queue=target_queue),
+        decode_workers=decode_workers,
+        raw_queue_length=len(packets),
+        decode_batch_size=BATCH_SIZE,
+    )
+    decode_pool.start()
+    # Warm the processes up so spawn time isn't counted
+    for topic, payload, *_ in packets[: decode_workers * BATCH_SIZE]:
+        decode_pool.submit(topic=topic, payload=payload)
+    while target_queue.qsize() < decode_workers * BATCH_SIZE:
+        time.sleep(0.01)
+    start_time = time.perf_counter()
+    for topic, payload, *_ in packets:
+        decode_pool.submit(topic=topic, payload=payload)
+    decode_pool.stop()
+    return len(packets) / (time.perf_counter() - start_time)
+
+
+def main() -> None:
+    packets = create_packets()
+    cpu_count = os.cpu_count() or 1
+    print(f"{PACKETS} packets, {cpu_count} cores, batches of {BATCH_SIZE}")
+    inline = run_inline(packets)
+    print(f"inline      {inline:8.0f} packets/s")
+    for decode_workers in sorted({1, 2, 4, cpu_count}):
+        throughput = run_pool(packets, decode_workers)
+        print(
+            f"{decode_workers:2d} workers  {throughput:8.0f} packets/s "
+            f"{throughput / inline:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
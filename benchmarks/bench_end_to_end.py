@@ -0,0 +1,178 @@
+# pylint: disable=missing-function-docstring
+"""
+Benchmark running the threaded runtime end to end against the local stand-ins.
+Simulated Outback devices publish through a local broker over TLS, ThreadedRunner
+reads them with the settings of the config and writes to a fake InfluxDB with the
+given latency, error rate and throughput cap. Reports the sustained packets and
+points per second and the end to end latency of the written points
+Run from the base directory with: python -m benchmarks.bench_end_to_end
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from src.app.solar_main import ThreadedRunner
+from src.classes.metrics_classes import MetricsRegistry
+from src.classes.spool_classes import WriteSpool
+from tests.simulator import (
+    FakeInfluxServer,
+    LocalBroker,
+    OutbackSimulator,
+    SimulatorStats,
+    create_certificate,
+)
+
+# Longest wait for the written points to catch up once publishing stops
+CATCH_UP_TIME = 30.0
+
+
+def create_runner(
+    broker: LocalBroker, influx_server: FakeInfluxServer, spool_location: str
+) -> ThreadedRunner:
+    os.environ.update(
+        {
+            "MQTT_HOST": broker.host,
+            "MQTT_PORT": str(broker.port),
+            "MQTT_USER": "bench",
+            "MQTT_TOKEN": "bench",
+            "MQTT_TOPIC": "mate/#",
+            "INFLUX_URL": influx_server.url,
+            "INFLUX_ORG": "bench",
+            "INFLUX_BUCKET": "bench",
+            "INFLUX_TOKEN": "bench",
+        }
+    )
+    os.environ.pop("MQTT_SOURCES", None)
+    thread_runner = ThreadedRunner()
+    if thread_runner.write_spool is not None:
+        thread_runner.write_spool = WriteSpool(
+            spool_location=spool_location,
+            max_spool_bytes=thread_runner.spool_settings.max_spool_bytes,
+            segment_bytes=thread_runner.spool_settings.segment_bytes,
+        )
+    return thread_runner
+
+
+def run_pipeline(
+    thread_runner: ThreadedRunner,
+    broker: LocalBroker,
+    influx_server: FakeInfluxServer,
+    simulator: OutbackSimulator,
+    duration: float,
+) -> tuple[SimulatorStats | None, float]:
+    """
+    Publishes for the duration then stops the runner once the points caught up,
+    field mode writes a point per field so the rest is left to the drain
+    :return: What the simulator published and the seconds until the runner exited
+    """
+    packet_mode = thread_runner.reader_settings.queue_mode == "packet"
+    results = {}
+
+    def publish_packets() -> None:
+        try:
+            if not broker.wait_for_subscribers(timeout=10):
+                print("logger never subscribed to the local broker")
+                return
+            results["simulator"] = simulator.run(
+                publish=broker.publish, duration=duration
+            )
+            if packet_mode:
+                influx_server.wait_for_points(
+                    results["simulator"].packets, timeout=CATCH_UP_TIME
+                )
+        finally:
+            thread_runner.stop_event.set()
+
+    publisher = threading.Thread(target=publish_packets)
+    start_time = time.perf_counter()
+    publisher.start()
+    thread_runner.start()
+    publisher.join()
+    return results.get("simulator"), time.perf_counter() - start_time
+
+
+def print_latencies(metrics: MetricsRegistry | None) -> None:
+    if metrics is None:
+        print("metrics are disabled in the config, no latencies recorded")
+        return
+    histograms = metrics.snapshot().histograms
+    for name in ["queue_wait_seconds", "write_seconds", "end_to_end_seconds"]:
+        summary = histograms.get(name)
+        if summary is not None:
+            print(
+                f"{name:<20} p50 {summary.p50 * 1000:8.2f}ms "
+                f"p99 {summary.p99 * 1000:8.2f}ms max {summary.max * 1000:8.2f}ms"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--devices", type=int, default=3, help="Simulated devices, at most 3"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=10.0,
+        help="Packets per second from each device, 0 publishes as fast as possible",
+    )
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds")
+    parser.add_argument("--write-latency", type=float, default=0.005)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--max-points", type=float, default=0.0, help="Points per second cap"
+    )
+    parser.add_argument("--ingest-topics", default="data", choices=["data", "raw"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cert_location:
+        certfile, keyfile = create_certificate(directory=cert_location)
+        broker = LocalBroker(certfile=certfile, keyfile=keyfile)
+    influx_server = FakeInfluxServer(
+        write_latency=args.write_latency,
+        error_rate=args.error_rate,
+        max_points_per_second=args.max_points,
+    )
+    simulator = OutbackSimulator(
+        device_count=args.devices,
+        publish_rate=args.rate,
+        ingest_topics=args.ingest_topics,
+    )
+    broker.start()
+    influx_server.start()
+    for topic, payload in simulator.status_messages():
+        broker.publish(topic, payload, retain=True)
+
+    with tempfile.TemporaryDirectory() as spool_location:
+        thread_runner = create_runner(broker, influx_server, spool_location)
+        simulator_stats, elapsed = run_pipeline(
+            thread_runner, broker, influx_server, simulator, args.duration
+        )
+    broker.stop()
+    influx_server.stop()
+
+    if simulator_stats is None:
+        return
+    influx_stats = influx_server.stats
+    print(
+        f"{args.devices} devices at {args.rate:g} packets/s for {args.duration:g}s, "
+        f"{args.write_latency * 1000:.0f}ms writes, {args.error_rate:.0%} errors"
+    )
+    print(
+        f"{simulator_stats.packets / simulator_stats.seconds:10.0f} packets/s "
+        f"published ({simulator_stats.packets} packets, "
+        f"{simulator_stats.payload_bytes} bytes)"
+    )
+    print(
+        f"{influx_stats.points / elapsed:10.0f} points/s written "
+        f"({influx_stats.points} points in {influx_stats.requests} requests, "
+        f"{influx_stats.failed_requests} failed) in {elapsed:.2f}s"
+    )
+    print_latencies(thread_runner.metrics)
+
+
+if __name__ == "__main__":
+    main()
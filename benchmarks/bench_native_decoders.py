@@ -0,0 +1,47 @@
+# pylint: disable=missing-function-docstring
+"""
+Benchmark measuring the time to decode each device's packet into float fields, for
+the pymate decoders followed by the float conversion done when queueing against the
+native struct decoders
+Run from the base directory with: python -m benchmarks.bench_native_decoders
+"""
+
+import functools
+import timeit
+
+from benchmarks.bench_decode_pool import DC_PAYLOAD, FX_PAYLOAD, MX_PAYLOAD
+
+from src.classes.mqtt_classes import PyMateDecoder
+from src.classes.native_classes import NativeDecoder
+
+NUMBER = 20000
+REPEAT = 5
+
+
+def pymate_floats(decoder, packet: bytes) -> dict:
+    return {key: float(value) for key, value in decoder(bytearray(packet)).items()}
+
+
+def time_per_packet(statement) -> float:
+    return min(timeit.repeat(statement, number=NUMBER, repeat=REPEAT)) / NUMBER * 1e6
+
+
+def main() -> None:
+    devices = [
+        ("dc", PyMateDecoder.dc_decoder, NativeDecoder.dc_decoder, DC_PAYLOAD),
+        ("fx", PyMateDecoder.fx_decoder, NativeDecoder.fx_decoder, FX_PAYLOAD),
+        ("mx", PyMateDecoder.mx_decoder, NativeDecoder.mx_decoder, MX_PAYLOAD),
+    ]
+    print(f"best of {REPEAT} rounds of {NUMBER} packets")
+    for name, decoder, native_decoder, packet in devices:
+        assert native_decoder(packet) == pymate_floats(decoder, packet)
+        pymate = time_per_packet(functools.partial(pymate_floats, decoder, packet))
+        native = time_per_packet(functools.partial(native_decoder, packet))
+        print(
+            f"{name}  pymate {pymate:6.2f}us  native {native:6.2f}us  "
+            f"({pymate / native:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# pylint: disable=missing-function-docstring
+"""
+Benchmark replaying an MQTT capture through the whole pipeline without a broker
+or InfluxDB. Messages go through MqttConnector._on_message with the reader,
+dedup, deadband, rollup and decode pool settings of the config, onto the ingest
+queue and through a BatchWriter whose batches are serialized to line protocol and
+discarded. Reports the sustained messages and points per second
+Run from the base directory with: python -m benchmarks.bench_replay <capture file>
+"""
+
+import argparse
+import functools
+import threading
+import time
+from queue import Queue
+
+from src.classes.capture_classes import CaptureReplayer
+from src.classes.common_classes import QueuePackage
+from src.classes.deadband_classes import DeadbandFilter, DeadbandSettings
+from src.classes.decode_classes import DecodePool, DecodeSettings
+from src.classes.dedup_classes import DedupIndex, DedupSettings
+from src.classes.influx_classes import BatchWriter, WriterSettings
+from src.classes.mqtt_classes import MqttConnector, ReaderSettings, decode_packets
+from src.classes.queue_classes import IngestQueue
+from src.classes.rollup_classes import RollupAggregator, RollupSettings
+from src.classes.serializer_classes import LineProtocolSerializer
+from src.helpers.consts import (
+    DECODE_POOL_CONFIG_TITLE,
+    FIELD_DEADBAND_CONFIG_TITLE,
+    INFLUX_WRITER_CONFIG_TITLE,
+    MQTT_READER_CONFIG_TITLE,
+    PACKET_DEDUP_CONFIG_TITLE,
+    ROLLUPS_CONFIG_TITLE,
+)
+from src.helpers.py_functions import read_settings, wake_consumer
+
+# Replay waits for queue space rather than dropping, so nothing is lost at speed 0
+QUEUE_LENGTH = 50000
+BLOCK_DEADLINE = 60.0
+
+
+class DiscardConnector:
+    """Serializes batches to line protocol then discards them"""
+
+    def __init__(self, write_precision: str) -> None:
+        self.write_precision = write_precision
+        self._serializer = LineProtocolSerializer(precision=write_precision)
+        self.bytes_written = 0
+
+    def serialize_batch(self, queue_packages: list[QueuePackage]) -> bytes:
+        for queue_package in queue_packages:
+            self._serializer.append_package(queue_package=queue_package)
+        return self._serializer.getvalue()
+
+    def write_lines(self, lines: bytes, precision: str = None) -> None:
+        del precision
+        self.bytes_written += len(lines)
+
+    def health_check(self) -> None:
+        pass
+
+
+def create_connector(ingest_queue: IngestQueue) -> tuple[MqttConnector, DecodePool]:
+    reader_settings = read_settings(MQTT_READER_CONFIG_TITLE, ReaderSettings)
+    dedup_settings = read_settings(PACKET_DEDUP_CONFIG_TITLE, DedupSettings)
+    deadband_settings = read_settings(FIELD_DEADBAND_CONFIG_TITLE, DeadbandSettings)
+    rollup_settings = read_settings(ROLLUPS_CONFIG_TITLE, RollupSettings)
+    decode_settings = read_settings(DECODE_POOL_CONFIG_TITLE, DecodeSettings)
+    deadband_filter, rollup_aggregator, decode_pool = None, None, None
+    if deadband_settings.deadband_enabled:
+        deadband_filter = DeadbandFilter(
+            absolute_deadband=deadband_settings.absolute_deadband,
+            relative_deadband=deadband_settings.relative_deadband,
+            heartbeat_interval=deadband_settings.heartbeat_interval,
+            field_deadbands=deadband_settings.field_deadbands,
+        )
+    if rollup_settings.rollup_enabled:
+        rollup_aggregator = RollupAggregator(
+            rollup_windows=rollup_settings.rollup_windows
+        )
+    if decode_settings.decode_workers > 0:
+        decode_pool = DecodePool(
+            decode_packets=functools.partial(
+                decode_packets, native_decoders=reader_settings.native_decoders
+            ),
+            ingest_queue=ingest_queue,
+            decode_workers=decode_settings.decode_workers,
+            raw_queue_length=decode_settings.raw_queue_length,
+            decode_batch_size=decode_settings.decode_batch_size,
+            queue_mode=reader_settings.queue_mode,
+            deadband_filter=deadband_filter,
+            rollup_aggregator=rollup_aggregator,
+        )
+        decode_pool.start()
+    dedup_index = None
+    if dedup_settings.dedup_enabled:
+        dedup_index = DedupIndex(
+            dedup_window=dedup_settings.dedup_window,
+            max_entries=dedup_settings.max_entries,
+        )
+    mqtt_connector = MqttConnector(
+        secret_store=None,
+        reader_settings=reader_settings,
+        dedup_index=dedup_index,
+        ingest_queue=ingest_queue,
+        decode_pool=decode_pool,
+        deadband_filter=deadband_filter,
+        rollup_aggregator=rollup_aggregator,
+    )
+    return mqtt_connector, decode_pool
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("capture_file", help="Capture written by the MQTT capture")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=0.0,
+        help="Multiple of the captured rate to replay at, 0 replays at full speed",
+    )
+    args = parser.parse_args()
+
+    writer_settings = read_settings(INFLUX_WRITER_CONFIG_TITLE, WriterSettings)
+    source_queue = Queue(maxsize=QUEUE_LENGTH)
+    ingest_queue = IngestQueue(
+        target_queue=source_queue,
+        overflow_policy="block",
+        block_deadline=BLOCK_DEADLINE,
+    )
+    mqtt_connector, decode_pool = create_connector(ingest_queue)
+    connector = DiscardConnector(write_precision=writer_settings.write_precision)
+    batch_writer = BatchWriter(
+        influx_connector=connector,
+        batch_size=writer_settings.batch_size,
+        flush_interval=writer_settings.flush_interval,
+    )
+    running = threading.Event()
+    running.set()
+    writer_thread = threading.Thread(
+        target=batch_writer.drain, args=(source_queue, running.is_set)
+    )
+    writer_thread.start()
+
+    start_time = time.perf_counter()
+    replay_stats = CaptureReplayer(
+        on_message=mqtt_connector._on_message,  # pylint: disable=protected-access
+        speed=args.speed,
+    ).replay(capture_file=args.capture_file)
+    if decode_pool is not None:
+        decode_pool.stop()
+    running.clear()
+    wake_consumer(target_queue=source_queue)
+    writer_thread.join()
+    batch_writer.finish(source_queue=source_queue, deadline=time.monotonic() + 60)
+    elapsed = time.perf_counter() - start_time
+
+    print(
+        f"replayed {replay_stats.messages} messages ({replay_stats.payload_bytes} "
+        f"bytes) spanning {replay_stats.capture_seconds:.1f}s in {elapsed:.2f}s"
+    )
+    print(f"{replay_stats.messages / elapsed:10.0f} msgs/s")
+    print(
+        f"{batch_writer.points_written / elapsed:10.0f} points/s "
+        f"({batch_writer.points_written} points, {connector.bytes_written} bytes)"
+    )
+    if ingest_queue.stats.timed_out:
+        print(f"{ingest_queue.stats.timed_out} packages timed out waiting for space")
+    if decode_pool is not None:
+        print(f"decode pool: {decode_pool.stats}")
+
+
+if __name__ == "__main__":
+    main()
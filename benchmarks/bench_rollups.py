@@ -0,0 +1,36 @@
+# pylint: disable=missing-function-docstring
+"""
+Benchmark measuring the cost of rolling a day of FX packets, one a second, into
+1m, 15m and 1h windows and how many points the closed windows add compared to
+the raw points they summarise
+Run from the base directory with: python -m benchmarks.bench_rollups
+"""
+
+import time
+
+from benchmarks.bench_deadband import PACKETS, create_packages
+
+from src.classes.rollup_classes import RollupAggregator
+
+ROLLUP_WINDOWS = "1m, 15m, 1h"
+
+
+def main() -> None:
+    queue_packages = create_packages()
+    rollup_aggregator = RollupAggregator(rollup_windows=ROLLUP_WINDOWS)
+    start_time = time.perf_counter()
+    rollup_aggregator.add_packages(queue_packages)
+    elapsed = time.perf_counter() - start_time
+    rollup_aggregator.close_all()
+    closed = rollup_aggregator.pop_closed()
+    print(f"{PACKETS} packets rolled up into {ROLLUP_WINDOWS} windows")
+    print(f"rollup {elapsed / PACKETS * 1e6:.2f}us per package")
+    for label in ROLLUP_WINDOWS.split(", "):
+        windows = sum(
+            queue_package.measurement.endswith(f"_{label}") for queue_package in closed
+        )
+        print(f"{label:>3}  {windows:5d} points ({PACKETS / windows:.0f}x fewer)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+# pylint: disable=missing-function-docstring
+"""
+Benchmark comparing the threaded runtime against the asyncio runtime, measuring
+the throughput of packets from a local MQTT broker to acknowledged writes and the
+CPU used while idle. The broker speaks just enough MQTT 3.1.1 for paho
+Run from the base directory with: python -m benchmarks.bench_runners
+"""
+
+import asyncio
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from queue import Queue
+
+from paho.mqtt.client import Client
+
+from src.classes.async_classes import AsyncMqttLoop, AsyncWriter
+from src.classes.common_classes import QueuePackage
+from src.classes.influx_classes import BatchWriter
+from src.classes.queue_classes import IngestQueue
+
+TOPIC = "mate/fx-1/fx-status"
+MESSAGES = 20000
+IDLE_SECONDS = 10.0
+WRITE_LATENCY = 0.005
+WRITER_WORKERS = 2
+
+
+class FakeBroker:
+    """Accepts one client, acknowledges it and publishes on request"""
+
+    def __init__(self) -> None:
+        self._server = socket.create_server(("127.0.0.1", 0))
+        self.port = self._server.getsockname()[1]
+        self._conn = None
+        self.subscribed = threading.Event()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _read_exact(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self._conn.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError
+            data += chunk
+        return data
+
+    def _read_packet(self) -> tuple[int, bytes]:
+        packet_type = self._read_exact(1)[0]
+        length, shift = 0, 0
+        while True:
+            byte = self._read_exact(1)[0]
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        return packet_type, self._read_exact(length)
+
+    def _serve(self) -> None:
+        self._conn, _ = self._server.accept()
+        try:
+            while True:
+                packet_type, body = self._read_packet()
+                if packet_type >> 4 == 1:
+                    self._conn.sendall(b"\x20\x02\x00\x00")
+                elif packet_type >> 4 == 8:
+                    self._conn.sendall(b"\x90\x03" + body[:2] + b"\x00")
+                    self.subscribed.set()
+                elif packet_type >> 4 == 12:
+                    self._conn.sendall(b"\xd0\x00")
+                elif packet_type >> 4 == 14:
+                    return
+        except (ConnectionError, OSError):
+            return
+
+    @staticmethod
+    def publish_packet(topic: str, payload: bytes) -> bytes:
+        body = struct.pack("!H", len(topic)) + topic.encode() + payload
+        length, remaining = b"", len(body)
+        while True:
+            byte, remaining = remaining & 0x7F, remaining >> 7
+            length += bytes([byte | (0x80 if remaining else 0)])
+            if not remaining:
+                return b"\x30" + length + body
+
+    def publish(self, count: int) -> None:
+        payload = struct.pack("i", 1640995200) + bytes(16)
+        packet = self.publish_packet(TOPIC, payload)
+        self._conn.sendall(packet * count)
+
+
+class FakeConnector:
+    """Acknowledges batches after a fixed latency"""
+
+    write_precision = "ns"
+
+    def __init__(self) -> None:
+        self.points = 0
+        self.done = threading.Event()
+
+    def serialize_batch(self, queue_packages: list[QueuePackage]) -> list:
+        return queue_packages
+
+    def write_lines(self, lines: list) -> None:
+        time.sleep(WRITE_LATENCY)
+        self.points += len(lines)
+        if self.points >= MESSAGES:
+            self.done.set()
+
+    def health_check(self) -> None:
+        pass
+
+
+def create_client(broker: FakeBroker, ingest_queue: IngestQueue) -> Client:
+    mqtt_client = Client()
+
+    def on_connect(client, _userdata, _flags, _return_code) -> None:
+        client.subscribe(TOPIC)
+
+    def on_message(_client, _userdata, msg) -> None:
+        ingest_queue.put(
+            QueuePackage(
+                measurement="fx-1",
+                time_field=datetime.fromtimestamp(
+                    struct.unpack_from("i", msg.payload)[0]
+                ),
+                field={"battery_voltage": float(len(msg.payload))},
+            )
+        )
+
+    mqtt_client.on_connect = on_connect
+    mqtt_client.on_message = on_message
+    mqtt_client.connect("127.0.0.1", broker.port)
+    return mqtt_client
+
+
+def create_writers(connector: FakeConnector) -> list[BatchWriter]:
+    return [
+        BatchWriter(influx_connector=connector, batch_size=500, flush_interval=1.0)
+        for _ in range(WRITER_WORKERS)
+    ]
+
+
+def measure(broker: FakeBroker, connector: FakeConnector) -> tuple[float, float]:
+    broker.subscribed.wait(timeout=5)
+    time.sleep(1.0)
+    cpu_start = time.process_time()
+    time.sleep(IDLE_SECONDS)
+    idle_cpu = (time.process_time() - cpu_start) / IDLE_SECONDS
+    start_time = time.perf_counter()
+    broker.publish(MESSAGES)
+    connector.done.wait(timeout=60)
+    return MESSAGES / (time.perf_counter() - start_time), idle_cpu
+
+
+def run_threaded() -> tuple[float, float]:
+    broker, connector = FakeBroker(), FakeConnector()
+    source_queue = Queue(maxsize=MESSAGES)
+    running = threading.Event()
+    running.set()
+    mqtt_client = create_client(broker, IngestQueue(target_queue=source_queue))
+    mqtt_client.loop_start()
+    batch_writer = create_writers(connector)[0]
+
+    def mqtt_thread() -> None:
+        # Thread-MQTT and the main thread both sleep in one second loops
+        while running.is_set():
+            time.sleep(1)
+
+    threads = [
+        threading.Thread(
+            target=batch_writer.drain, args=(source_queue, running.is_set)
+        ),
+        threading.Thread(target=mqtt_thread),
+    ]
+    for thread in threads:
+        thread.start()
+    result = measure(broker, connector)
+    running.clear()
+    source_queue.put(None)
+    for thread in threads:
+        thread.join()
+    mqtt_client.disconnect()
+    mqtt_client.loop_stop()
+    return result
+
+
+async def run_asyncio_loop(
+    broker: FakeBroker, connector: FakeConnector
+) -> tuple[float, float]:
+    loop = asyncio.get_running_loop()
+    source_queue = Queue(maxsize=MESSAGES)
+    stopping = asyncio.Event()
+    with ThreadPoolExecutor(max_workers=WRITER_WORKERS) as executor:
+        async_writer = AsyncWriter(
+            batch_writers=create_writers(connector),
+            source_queue=source_queue,
+            executor=executor,
+        )
+        mqtt_client = create_client(broker, IngestQueue(target_queue=source_queue))
+        mqtt_loop = AsyncMqttLoop(
+            mqtt_client=mqtt_client, loop=loop, on_read=async_writer.notify
+        )
+        writer_task = asyncio.create_task(
+            async_writer.run(is_running=lambda: not stopping.is_set())
+        )
+        mqtt_task = asyncio.create_task(mqtt_loop.run(stopping=stopping))
+        result = await loop.run_in_executor(None, measure, broker, connector)
+        stopping.set()
+        async_writer.notify()
+        await asyncio.gather(mqtt_task, writer_task)
+    return result
+
+
+def run_asyncio() -> tuple[float, float]:
+    return asyncio.run(run_asyncio_loop(FakeBroker(), FakeConnector()))
+
+
+def main() -> None:
+    print(
+        f"{MESSAGES} packets, {WRITE_LATENCY * 1000:.0f}ms writes, "
+        f"{IDLE_SECONDS:.0f}s idle"
+    )
+    for name, runner in [("threaded", run_threaded), ("asyncio", run_asyncio)]:
+        throughput, idle_cpu = runner()
+        print(
+            f"{name:<9} {throughput:8.0f} packets/s "
+            f"idle CPU {idle_cpu * 1000:6.2f}ms/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
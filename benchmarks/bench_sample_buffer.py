@@ -0,0 +1,103 @@
+# pylint: disable=missing-function-docstring
+"""
+Benchmark comparing the memory held by 100k queued samples in a plain Queue of
+QueuePackages against the compact SampleBuffer, plus the put and get throughput
+Run from the base directory with: python -m benchmarks.bench_sample_buffer
+"""
+
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from queue import Queue
+
+from src.classes.buffer_classes import SampleBuffer
+from src.classes.common_classes import QueuePackage
+
+SAMPLES = 100000
+START_TIME = datetime(2022, 1, 1)
+FX_FIELDS = [
+    "inverter_current",
+    "charger_current",
+    "buy_current",
+    "sell_current",
+    "ac_input_voltage",
+    "ac_output_voltage",
+    "operational_mode",
+    "error_mode",
+    "ac_mode",
+    "battery_voltage",
+    "misc",
+    "warnings",
+    "chg_mode",
+    "aux_on",
+]
+
+
+def create_packages(field_names: list[str]) -> list[QueuePackage]:
+    return [
+        QueuePackage(
+            measurement=f"fx-{index % 3 + 1}",
+            time_field=START_TIME + timedelta(seconds=index),
+            field={
+                name: float(index % 100 + offset)
+                for offset, name in enumerate(field_names)
+            },
+        )
+        for index in range(SAMPLES)
+    ]
+
+
+def measure_memory(source_queue: Queue, field_names: list[str]) -> int:
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    queue_packages = create_packages(field_names)
+    for queue_package in queue_packages:
+        source_queue.put_nowait(queue_package)
+    # The packages are dropped so only what the queue keeps alive is counted
+    del queue_packages
+    held = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    while not source_queue.empty():
+        source_queue.get_nowait()
+    return held
+
+
+def measure_speed(source_queue: Queue, field_names: list[str]) -> tuple[float, float]:
+    # Timed separately since tracemalloc slows down every allocation
+    queue_packages = create_packages(field_names)
+    start_time = time.perf_counter()
+    for queue_package in queue_packages:
+        source_queue.put_nowait(queue_package)
+    put_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    while not source_queue.empty():
+        source_queue.get_nowait()
+    return put_time, time.perf_counter() - start_time
+
+
+def main() -> None:
+    print(f"{SAMPLES} queued samples, memory held by the queue")
+    for label, field_names in [
+        ("1 field", FX_FIELDS[:1]),
+        (f"{len(FX_FIELDS)} fields", FX_FIELDS),
+    ]:
+        results = {}
+        for name, source_queue in [
+            ("Queue", Queue(maxsize=SAMPLES)),
+            ("SampleBuffer", SampleBuffer(maxsize=SAMPLES)),
+        ]:
+            held = measure_memory(source_queue, field_names)
+            put_time, get_time = measure_speed(source_queue, field_names)
+            results[name] = held
+            print(
+                f"{label:<10} {name:<13} {held / 1e6:7.2f} MB "
+                f"{held / SAMPLES:7.1f} B/sample "
+                f"put {SAMPLES / put_time / 1000:6.0f}k/s "
+                f"get {SAMPLES / get_time / 1000:6.0f}k/s"
+            )
+        ratio = results["SampleBuffer"] / results["Queue"]
+        print(f"{label:<10} SampleBuffer holds {ratio:.0%} of the memory")
+
+
+if __name__ == "__main__":
+    main()
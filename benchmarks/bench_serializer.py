@@ -0,0 +1,88 @@
+# pylint: disable=missing-function-docstring
+"""
+Microbenchmark comparing the dict record path used by influxdb_client
+against the LineProtocolSerializer for a batch of FX packets
+Run from the base directory with: python -m benchmarks.bench_serializer
+"""
+
+import timeit
+from datetime import datetime, timedelta
+
+from influxdb_client import Point
+
+from src.classes.serializer_classes import LineProtocolSerializer
+
+FX_FIELDS = {
+    "ac_mode": 2.0,
+    "aux_on": 0.0,
+    "battery_voltage": 27.4,
+    "buy_current": 0.0,
+    "chg_current": 0.0,
+    "error_mode": 0.0,
+    "input_voltage": 8.0,
+    "inverter_current": 0.0,
+    "is_230v": 1.0,
+    "misc": 9.0,
+    "operational_mode": 4.0,
+    "output_voltage": 232.0,
+    "sell_current": 0.0,
+    "warnings": 0.0,
+}
+BATCH_SIZE = 500
+REPEATS = 20
+
+
+def create_records() -> list[dict]:
+    start_time = datetime(2022, 1, 1)
+    return [
+        {
+            "measurement": "fx-1",
+            "fields": FX_FIELDS,
+            "time": start_time + timedelta(seconds=index),
+        }
+        for index in range(BATCH_SIZE)
+    ]
+
+
+def dict_path(records: list[dict]) -> bytes:
+    return b"\n".join(
+        Point.from_dict(record).to_line_protocol().encode("utf-8") for record in records
+    )
+
+
+def serializer_path(serializer: LineProtocolSerializer, records: list[dict]) -> bytes:
+    for record in records:
+        serializer.append(
+            measurement=record["measurement"],
+            fields=record["fields"],
+            time_field=record["time"],
+        )
+    return serializer.getvalue()
+
+
+def main() -> None:
+    records = create_records()
+    serializer = LineProtocolSerializer()
+    assert dict_path(records) + b"\n" == serializer_path(serializer, records)
+
+    results = {
+        "dict record path": min(
+            timeit.repeat(lambda: dict_path(records), number=1, repeat=REPEATS)
+        ),
+        "LineProtocolSerializer": min(
+            timeit.repeat(
+                lambda: serializer_path(serializer, records), number=1, repeat=REPEATS
+            )
+        ),
+    }
+    for name, seconds in results.items():
+        print(
+            f"{name:<24} {seconds * 1000:8.2f}ms per {BATCH_SIZE} points, "
+            f"{seconds / BATCH_SIZE * 1e6:6.2f}us per point"
+        )
+    speedup = results["dict record path"] / results["LineProtocolSerializer"]
+    print(f"Speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# pylint: disable=missing-function-docstring, protected-access
+"""
+Benchmark measuring the per message overhead of MqttConnector._on_message, for the
+old status loop and chain of topic checks against the device topic table. Decoding
+and queueing are stubbed out so only the dispatch is timed
+Run from the base directory with: python -m benchmarks.bench_topic_dispatch
+"""
+
+import dataclasses
+import logging
+import time
+from datetime import datetime
+
+from paho.mqtt.client import MQTTMessage
+
+from src.classes.mqtt_classes import (
+    DEVICE_TOPICS,
+    MqttConnector,
+    MqttTopics,
+    PyMateDecoder,
+)
+
+MESSAGES = 300000
+ROUNDS = 5
+DECODED = {"battery_voltage": 27.4}
+
+
+class FakeSecretStore:
+    """Holds the broker details the connector reads on creation"""
+
+    mqtt_brokers = {None: {}}
+
+
+def stub_decoder(_msg: bytearray) -> dict:
+    return DECODED
+
+
+class TableConnector(MqttConnector):
+    """Connector dispatching through the device topic table"""
+
+    def _load_queue(self, measurement, time_field, payload, received_at=None) -> None:
+        pass
+
+
+class LegacyConnector(TableConnector):
+    """Connector reproducing the dispatch before the device topic table"""
+
+    legacy_devices = (
+        (MqttTopics.dc_data, MqttTopics.dc_status, MqttTopics.dc_name, 2),
+        (MqttTopics.fx_data, MqttTopics.fx_status, MqttTopics.fx_name, 3),
+        (MqttTopics.mx_data, MqttTopics.mx_status, MqttTopics.mx_name, 3),
+    )
+
+    def _check_status(self, msg: MQTTMessage) -> None:
+        for topic, _ in self._status.items():
+            if msg.topic == topic and msg.payload.decode("ascii") == "offline":
+                self._status[topic] = "offline"
+                logging.warning(f"{msg.topic} has gone offline")
+            elif msg.topic == topic and msg.payload.decode("ascii") == "online":
+                self._status[topic] = "online"
+                logging.info(f"{msg.topic} is now online")
+
+    def _is_duplicate(self, msg: MQTTMessage) -> bool:
+        return False
+
+    # The frozen "before" baseline, it's meant to match the old connector code
+    # pylint: disable=duplicate-code
+    def _decode_message(self, msg: MQTTMessage, received_at: float = None) -> None:
+        statuses = [self._status[device[1]] for device in self.legacy_devices]
+        for (data_topic, _, measurement, padding_at_end), status in zip(
+            self.legacy_devices, statuses
+        ):
+            if msg.topic == data_topic and status == "online":
+                logging.info(f"Received {measurement} data packet")
+                logging.debug(f"{measurement} payload: {msg.payload}")
+                msg_time, msg_payload = PyMateDecoder.detach_time(
+                    msg=msg.payload, padding_at_end=padding_at_end
+                )
+                time_field = datetime.fromtimestamp(msg_time)
+                payload = stub_decoder(msg_payload)
+                logging.debug(
+                    f"Decoded and split {measurement} payload: {payload} at {time_field}"
+                )
+                self._load_queue(
+                    measurement=measurement,
+                    time_field=time_field,
+                    payload=payload,
+                    received_at=received_at,
+                )
+
+    # pylint: enable=duplicate-code
+
+
+def create_message(topic: str, payload: bytes) -> MQTTMessage:
+    msg = MQTTMessage(topic=topic.encode("utf-8"))
+    msg.payload = payload
+    return msg
+
+
+def create_messages() -> list[MQTTMessage]:
+    # Packets mix the three devices, with a status message every 50 packets
+    data_topics = list(DEVICE_TOPICS)
+    messages = []
+    for index in range(MESSAGES):
+        if index % 50 == 0:
+            messages.append(create_message(MqttTopics.mate_status, b"online"))
+        else:
+            topic = data_topics[index % len(data_topics)]
+            messages.append(create_message(topic, bytes(20)))
+    return messages
+
+
+def run(connector: MqttConnector, messages: list[MQTTMessage]) -> float:
+    for status_topic in connector._status:
+        connector._status[status_topic] = "online"
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start_time = time.perf_counter()
+        for msg in messages:
+            connector._on_message(None, None, msg)
+        best = min(best, time.perf_counter() - start_time)
+    return best / len(messages) * 1e9
+
+
+def main() -> None:
+    logging.disable(logging.CRITICAL)
+    for topic, device_topic in DEVICE_TOPICS.items():
+        DEVICE_TOPICS[topic] = dataclasses.replace(device_topic, decoder=stub_decoder)
+    messages = create_messages()
+    print(f"{MESSAGES} messages, best of {ROUNDS} rounds")
+    legacy = run(LegacyConnector(secret_store=FakeSecretStore()), messages)
+    print(f"legacy dispatch {legacy:8.0f} ns/message")
+    table = run(TableConnector(secret_store=FakeSecretStore()), messages)
+    print(f"table dispatch  {table:8.0f} ns/message ({legacy / table:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
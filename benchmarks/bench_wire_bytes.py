@@ -0,0 +1,76 @@
+# pylint: disable=missing-function-docstring
+"""
+Report of the request body size written to InfluxDB for a batch of FX, MX and DC
+packets at nanosecond and second precision, with and without gzip
+Run from the base directory with: python -m benchmarks.bench_wire_bytes
+"""
+
+import gzip
+import random
+import re
+from datetime import datetime, timedelta
+
+from src.classes.serializer_classes import LineProtocolSerializer
+from tests.config.consts import TestDC, TestFX, TestMX
+
+BATCH_SIZE = 500
+SECONDS_PER_DAY = 86400
+
+
+def to_fields(array: dict) -> dict:
+    return {
+        field: (
+            float(re.match(r"-?[\d.]+", str(value)).group())
+            if not isinstance(value, bool)
+            else float(value)
+        )
+        for field, value in array.items()
+    }
+
+
+def create_packets() -> list[tuple[str, dict, datetime]]:
+    rng = random.Random(0)
+    devices = {
+        "fx-1": to_fields(TestFX.array),
+        "mx-1": to_fields(TestMX.array),
+        "dc-1": to_fields(TestDC.array),
+    }
+    start_time = datetime(2022, 1, 1)
+    packets = []
+    for index in range(BATCH_SIZE // len(devices)):
+        for measurement, fields in devices.items():
+            fields = {
+                field: round(value * rng.uniform(0.95, 1.05), 2)
+                for field, value in fields.items()
+            }
+            packets.append((measurement, fields, start_time + timedelta(seconds=index)))
+    return packets
+
+
+def serialize(packets: list[tuple[str, dict, datetime]], precision: str) -> bytes:
+    serializer = LineProtocolSerializer(precision=precision)
+    for measurement, fields, time_field in packets:
+        serializer.append(measurement=measurement, fields=fields, time_field=time_field)
+    return serializer.getvalue()
+
+
+def main() -> None:
+    packets = create_packets()
+    results = {}
+    for precision in ["ns", "s"]:
+        body = serialize(packets, precision)
+        results[f"{precision} precision"] = len(body)
+        results[f"{precision} precision, gzip"] = len(gzip.compress(body))
+
+    baseline = results["ns precision"]
+    print(f"Request body for {len(packets)} points, one packet per device per second")
+    for name, size in results.items():
+        per_day = size / (len(packets) / 3) * SECONDS_PER_DAY / 1024 / 1024
+        print(
+            f"{name:<20} {size:8d} bytes {size / len(packets):7.1f} bytes/point "
+            f"{per_day:7.1f}MiB/day ({size / baseline:.0%})"
+        )
+
+
+if __name__ == "__main__":
+    main()
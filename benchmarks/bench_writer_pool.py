@@ -0,0 +1,115 @@
+# pylint: disable=missing-function-docstring
+"""
+Benchmark comparing write throughput of the WriterPool with different numbers
+of workers against a local endpoint which adds a fixed round trip latency
+Run from the base directory with: python -m benchmarks.bench_writer_pool
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Queue
+
+from src.classes.common_classes import QueuePackage
+from src.classes.influx_classes import BatchWriter, InfluxConnector, WriterPool
+
+LATENCY = 0.1
+DEVICES = 8
+POINTS_PER_DEVICE = 500
+BATCH_SIZE = 50
+WORKER_COUNTS = [1, 2, 4, 8]
+
+
+class SlowWriteHandler(BaseHTTPRequestHandler):
+    """Accepts every write after sleeping for the simulated round trip"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(LATENCY)
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *_args) -> None:
+        pass
+
+
+class BenchSecretStore:
+    """Secrets pointing the connector at the local endpoint"""
+
+    def __init__(self, url: str) -> None:
+        self.influx_secrets = {
+            "influx_url": url,
+            "influx_org": "bench",
+            "influx_bucket": "bench",
+            "influx_token": "bench",
+        }
+
+
+def create_queue(start_time: datetime) -> Queue:
+    source_queue = Queue()
+    for index in range(POINTS_PER_DEVICE):
+        for device in range(DEVICES):
+            source_queue.put(
+                QueuePackage(
+                    measurement=f"fx-{device + 1}",
+                    time_field=start_time + timedelta(seconds=index),
+                    field={"battery_voltage": 27.4, "output_voltage": 232.0},
+                )
+            )
+    return source_queue
+
+
+def run_pool(influx_connector: InfluxConnector, workers: int) -> float:
+    batch_writers = [
+        BatchWriter(
+            influx_connector=influx_connector,
+            batch_size=BATCH_SIZE,
+            flush_interval=0.05,
+        )
+        for _ in range(workers)
+    ]
+    writer_pool = WriterPool(batch_writers=batch_writers, queue_length=1000)
+    total_points = DEVICES * POINTS_PER_DEVICE
+    source_queue = create_queue(datetime(2022, 1, 1))
+
+    def is_running() -> bool:
+        written = sum(batch_writer.points_written for batch_writer in batch_writers)
+        return written < total_points
+
+    start_time = time.perf_counter()
+    writer_pool.run(source_queue=source_queue, is_running=is_running, wait_time=0.05)
+    return time.perf_counter() - start_time
+
+
+def main() -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowWriteHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    influx_connector = InfluxConnector(
+        secret_store=BenchSecretStore(f"http://127.0.0.1:{server.server_port}"),
+        connection_pool_maxsize=max(WORKER_COUNTS),
+    )
+
+    total_points = DEVICES * POINTS_PER_DEVICE
+    print(
+        f"{total_points} points from {DEVICES} devices in batches of {BATCH_SIZE}, "
+        f"{LATENCY * 1000:.0f}ms simulated latency"
+    )
+    baseline = None
+    for workers in WORKER_COUNTS:
+        seconds = run_pool(influx_connector=influx_connector, workers=workers)
+        baseline = baseline or seconds
+        print(
+            f"{workers} writer workers {seconds:6.2f}s "
+            f"{total_points / seconds:8.0f} points/s "
+            f"({baseline / seconds:.1f}x)"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
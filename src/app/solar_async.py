@@ -0,0 +1,150 @@
+"""
+asyncio program which runs both the MQTT and InfluxDB controllers on one event loop
+"""
+
+import asyncio
+import functools
+import logging
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.app.solar_main import ThreadedRunner
+from src.classes.async_classes import AsyncMqttLoop, AsyncWriter
+
+
+class AsyncRunner(ThreadedRunner):
+    """
+    Class which runs the MQTT client and the InfluxDB writer cooperatively on one
+    event loop. Paho is driven from its socket callbacks, so packets are decoded and
+    batched on the loop, while writes run in an executor with one thread per writer
+    worker since influxdb_client has no async write API
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._stopping = asyncio.Event()
+
+    def _resolve_overflow_policy(self) -> str:
+        overflow_policy = super()._resolve_overflow_policy()
+        if overflow_policy == "block":
+            logging.warning(
+                "Block overflow policy would stall the event loop, "
+                "dropping the oldest packages when the queue is full instead"
+            )
+            overflow_policy = "drop_oldest"
+        return overflow_policy
+
+    def stop(self, signal_name: str) -> None:
+        """
+        Handling SIGTERM and SIGINT signals on the event loop
+        """
+        logging.critical(f"Received {signal_name}, shutting down")
+        self.thread_events.clear()
+        self._stopping.set()
+        self.stop_retrying()
+
+    def start(self) -> None:
+        """
+        Runs the MQTT client and InfluxDB writer until a signal stops them
+        """
+        asyncio.run(self.run())
+        if self.metrics is not None:
+            logging.info(f"Pipeline metrics: {self.metrics.summary()}")
+        logging.info("Exited application with exit code 0")
+
+    async def report_metrics(self) -> None:
+        """
+        Logs a summary of the pipeline metrics every summary interval until stopped
+        """
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(),
+                    timeout=self.metrics_settings.summary_interval,
+                )
+            except asyncio.TimeoutError:
+                logging.info(f"Pipeline metrics: {self.metrics.summary()}")
+
+    async def run(self) -> None:
+        """
+        Connects to InfluxDB and the MQTT broker then reads, decodes and writes
+        packets until stopped, the last batches are written before returning
+        """
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, self.stop, "SIGTERM")
+        loop.add_signal_handler(signal.SIGINT, self.stop, "SIGINT/CTRL+C quit code")
+        self.thread_events.set()
+        if self.writer_settings.write_mode != "batched":
+            logging.warning("The asyncio runner always writes to InfluxDB in batches")
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, self.writer_settings.writer_workers),
+            thread_name_prefix="Thread-Influx",
+        ) as executor:
+            influx_connector = await loop.run_in_executor(
+                executor, self._create_influx_connector
+            )
+            if influx_connector is None:
+                return
+            retry_policies, batch_writers = self._create_batch_writers(
+                influx_connector=influx_connector
+            )
+            async_writer = AsyncWriter(
+                batch_writers=batch_writers,
+                source_queue=self.sample_queue,
+                executor=executor,
+            )
+            # Decoded packages are loaded from the decode pool's thread
+            self.on_decoded = functools.partial(
+                loop.call_soon_threadsafe, async_writer.notify
+            )
+            # Connecting blocks on the DNS lookup, TCP connect and TLS handshake
+            mqtt_clients = await loop.run_in_executor(None, self._create_mqtt_clients)
+            if mqtt_clients is None:
+                return
+            mqtt_loops = [
+                AsyncMqttLoop(
+                    mqtt_client=mqtt_client, loop=loop, on_read=async_writer.notify
+                )
+                for mqtt_client in mqtt_clients
+            ]
+            logging.info(
+                f"Running {len(mqtt_loops)} MQTT client(s) and InfluxDB on the event "
+                f"loop with {len(batch_writers)} writes in flight"
+            )
+            if self.metrics is not None:
+                reporter_task = asyncio.create_task(self.report_metrics())
+            # The writer outlives the MQTT loop so it writes every package loaded
+            writing = threading.Event()
+            writing.set()
+            writer_task = asyncio.create_task(
+                async_writer.run(
+                    is_running=writing.is_set,
+                    drain_deadline=self.writer_settings.drain_deadline,
+                )
+            )
+            await asyncio.gather(
+                *(mqtt_loop.run(stopping=self._stopping) for mqtt_loop in mqtt_loops)
+            )
+            if self.metrics is not None:
+                await reporter_task
+            # The decode pool loads its last packages before the writer's last batch
+            await loop.run_in_executor(None, self._finish_ingest)
+            writing.clear()
+            async_writer.notify()
+            drain_stats = await writer_task
+            logging.info(f"Drained queue to InfluxDB on shutdown: {drain_stats}")
+
+        for index, retry_policy in enumerate(retry_policies):
+            logging.info(
+                f"Influx write retry stats for writer {index}: {retry_policy.stats}"
+            )
+
+
+def main():
+    """
+    asyncio runtime for solar logger, called from start_logger.py
+    """
+    async_runner = AsyncRunner()
+    async_runner.start()
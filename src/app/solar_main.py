@@ -2,15 +2,63 @@
 classes program which initializes and runs both the MQTT and InfluxDB controllers
 """
 
+import functools
 import logging
+import os
 import signal
 import threading
 import time
+from typing import Callable
 
+from paho.mqtt.client import Client
+
+from src.classes.buffer_classes import SampleBuffer
+from src.classes.capture_classes import (
+    CaptureSettings,
+    CaptureWriter,
+    create_capture_file,
+)
 from src.classes.common_classes import QueuePackage, SecretStore
-from src.classes.influx_classes import InfluxConnector
-from src.classes.mqtt_classes import MqttConnector
-from src.helpers.consts import SOLAR_DEBUG_CONFIG_TITLE, THREADED_QUEUE
+from src.classes.deadband_classes import DeadbandFilter, DeadbandSettings
+from src.classes.decode_classes import DecodePool, DecodeSettings
+from src.classes.dedup_classes import DedupIndex, DedupSettings
+from src.classes.influx_classes import (
+    BatchWriter,
+    DrainStats,
+    InfluxConnector,
+    WriterPool,
+    WriterSettings,
+)
+from src.classes.metrics_classes import MetricsRegistry, MetricsSettings
+from src.classes.mqtt_classes import MqttConnector, ReaderSettings, decode_packets
+from src.classes.queue_classes import IngestQueue, QueueSettings
+from src.classes.retry_classes import RetryPolicy, RetrySettings
+from src.classes.rollup_classes import RollupAggregator, RollupSettings
+from src.classes.spool_classes import SpoolSettings, WriteSpool
+from src.classes.supervisor_classes import (
+    SupervisedStage,
+    Supervisor,
+    SupervisorSettings,
+)
+from src.helpers.consts import (
+    DECODE_POOL_CONFIG_TITLE,
+    FIELD_DEADBAND_CONFIG_TITLE,
+    INFLUX_WRITER_CONFIG_TITLE,
+    INGEST_QUEUE_CONFIG_TITLE,
+    METRICS_CONFIG_TITLE,
+    MQTT_CAPTURE_CONFIG_TITLE,
+    MQTT_LISTENER_JOIN_TIME,
+    MQTT_READER_CONFIG_TITLE,
+    PACKET_DEDUP_CONFIG_TITLE,
+    QUEUE_WAIT_TIME,
+    ROLLUPS_CONFIG_TITLE,
+    SOLAR_DEBUG_CONFIG_TITLE,
+    SUPERVISOR_CONFIG_TITLE,
+    THREADED_QUEUE,
+    WRITE_RETRY_CONFIG_TITLE,
+    WRITE_SPOOL_CONFIG_TITLE,
+)
+from src.helpers.py_functions import get_many, read_settings, wake_consumer
 from src.helpers.py_logger import create_logger
 
 
@@ -21,155 +69,693 @@ class ThreadedRunner:
 
     def __init__(self) -> None:
         self.log = create_logger(SOLAR_DEBUG_CONFIG_TITLE)
+        self.reader_settings = read_settings(
+            config_name=MQTT_READER_CONFIG_TITLE, settings_class=ReaderSettings
+        )
+        self.capture_settings = read_settings(
+            config_name=MQTT_CAPTURE_CONFIG_TITLE, settings_class=CaptureSettings
+        )
+        self.dedup_settings = read_settings(
+            config_name=PACKET_DEDUP_CONFIG_TITLE, settings_class=DedupSettings
+        )
+        self.deadband_settings = read_settings(
+            config_name=FIELD_DEADBAND_CONFIG_TITLE, settings_class=DeadbandSettings
+        )
+        self.rollup_settings = read_settings(
+            config_name=ROLLUPS_CONFIG_TITLE, settings_class=RollupSettings
+        )
+        self.decode_settings = read_settings(
+            config_name=DECODE_POOL_CONFIG_TITLE, settings_class=DecodeSettings
+        )
+        self.writer_settings = read_settings(
+            config_name=INFLUX_WRITER_CONFIG_TITLE, settings_class=WriterSettings
+        )
+        self.spool_settings = read_settings(
+            config_name=WRITE_SPOOL_CONFIG_TITLE, settings_class=SpoolSettings
+        )
+        self.retry_settings = read_settings(
+            config_name=WRITE_RETRY_CONFIG_TITLE, settings_class=RetrySettings
+        )
+        self.queue_settings = read_settings(
+            config_name=INGEST_QUEUE_CONFIG_TITLE, settings_class=QueueSettings
+        )
+        self.metrics_settings = read_settings(
+            config_name=METRICS_CONFIG_TITLE, settings_class=MetricsSettings
+        )
+        self.supervisor_settings = read_settings(
+            config_name=SUPERVISOR_CONFIG_TITLE, settings_class=SupervisorSettings
+        )
+        # The compact buffer packs queued samples into typed arrays so a long
+        # backlog fits in a few MB, otherwise the queue shared through consts is resized
+        if self.queue_settings.compact_buffer:
+            self.sample_queue = SampleBuffer(
+                maxsize=self.queue_settings.max_queue_length
+            )
+        else:
+            self.sample_queue = THREADED_QUEUE
+            with THREADED_QUEUE.mutex:
+                THREADED_QUEUE.maxsize = self.queue_settings.max_queue_length
+        # Only the batched writer replays the spool, it's shared with the MQTT
+        # thread so packages can be spilled to it when the queue is full
+        self.write_spool = None
+        if (
+            self.spool_settings.spool_enabled
+            and self.writer_settings.write_mode == "batched"
+        ):
+            self.write_spool = WriteSpool(
+                spool_location=self.spool_settings.spool_location,
+                max_spool_bytes=self.spool_settings.max_spool_bytes,
+                segment_bytes=self.spool_settings.segment_bytes,
+                fsync_mode=self.spool_settings.fsync_mode,
+            )
+        # The registry is shared by every thread, snapshot() can be called at any time
+        self.metrics = None
+        if self.metrics_settings.metrics_enabled:
+            self.metrics = MetricsRegistry()
+            self.metrics.register_gauge("queue_depth", self.sample_queue.qsize)
+            if self.write_spool is not None:
+                self.metrics.register_gauge(
+                    "spool_bytes", lambda: self.write_spool.size_bytes
+                )
+        # Dedup index of each MQTT broker keyed by source
+        self.dedup_indexes: dict[str | None, DedupIndex] = {}
+        # Capture writers of the running MQTT stage, a restart starts new captures
+        self.capture_writers: list[CaptureWriter] = []
+        self.deadband_filter = None
+        # Rollups outlive stage restarts so a restart doesn't split open windows
+        self.rollup_aggregator = None
+        self.rollup_spool = None
+        self._create_rollup_aggregator()
+        self.ingest_queue = None
+        self.decode_pool = None
+        # Called from the decode pool's thread after it loads decoded packages
+        self.on_decoded = None
+        # Set to stop MQTT intake, thread_events stays set until the writer should stop
+        self.stop_event = threading.Event()
         self.thread_events = threading.Event()
+        # Retry policies of the current batch writers, told to stop retrying on shutdown
+        self.retry_policies: list[RetryPolicy] = []
+        self.rollup_retry_policy = None
+        self.supervisor = Supervisor(
+            stop_event=self.stop_event,
+            supervisor_enabled=self.supervisor_settings.supervisor_enabled,
+            min_restart_delay=self.supervisor_settings.min_restart_delay,
+            max_restart_delay=self.supervisor_settings.max_restart_delay,
+            stall_timeout=self.supervisor_settings.stall_timeout,
+            check_interval=self.supervisor_settings.check_interval,
+        )
         logging.logThreads = True
 
+    def _create_rollup_aggregator(self) -> None:
+        """
+        Creates the rollup aggregator, carrying on with the windows left open by
+        the last run. Closed windows which fail to write go to their own spool as
+        they're written to another bucket
+        """
+        if not self.rollup_settings.rollup_enabled:
+            return
+        self.rollup_aggregator = RollupAggregator(
+            rollup_windows=self.rollup_settings.rollup_windows
+        )
+        try:
+            self.rollup_aggregator.load_open(state_file=self.rollup_settings.state_file)
+        except (OSError, ValueError):
+            logging.exception("Failed to load the open rollup windows")
+        if self.metrics is not None:
+            self.metrics.register_stats("rollups", self.rollup_aggregator.stats)
+        if self.spool_settings.spool_enabled:
+            self.rollup_spool = WriteSpool(
+                spool_location=os.path.join(
+                    self.spool_settings.spool_location, "rollups"
+                ),
+                max_spool_bytes=self.spool_settings.max_spool_bytes,
+                segment_bytes=self.spool_settings.segment_bytes,
+                fsync_mode=self.spool_settings.fsync_mode,
+            )
+
     def sigterm_handler(self, _signo, _stack_frame) -> None:
         """
         Handling SIGTERM signals
         """
         logging.critical("Received SIGTERM, shutting down")
-        time.sleep(1)
-        self.thread_events.clear()
+        self.stop_event.set()
 
     def sigint_handler(self, _signo, _stack_frame) -> None:
         """
         Handling SIGINT or CTRL + C signals
         """
         logging.critical("Received SIGINT/CTRL+C quit code, shutting down")
-        time.sleep(1)
-        self.thread_events.clear()
+        self.stop_event.set()
 
     def start(self) -> None:
         """
         Calls both the Influx database connector and the MQTT connector
-        and runs them in separate threads
-        NOTE: This program actually uses four threads not three due to the behavior
-            of the MQTT loop_start() function
+        and runs them in separate threads under the supervisor
+        NOTE: This program actually uses an extra thread per MQTT broker to run
+            each client's network loop
         """
         self.thread_events.set()
         logging.info("Created thread list")
-        thread_list = [
-            threading.Thread(
-                name="Thread-Influx",
-                target=self.run_threaded_influx_writer,
-            ),
-            threading.Thread(
-                name="Thread-MQTT", target=self.run_threaded_mqtt_client, daemon=True
-            ),
-        ]
+        influx_stage = self.supervisor.add_stage(
+            name="Thread-Influx", target=self.run_threaded_influx_writer
+        )
+        mqtt_stage = self.supervisor.add_stage(
+            name="Thread-MQTT", target=self.run_threaded_mqtt_client
+        )
+        if self.metrics is not None:
+            self.metrics.register_stats("influx_stage", influx_stage.stats)
+            self.metrics.register_stats("mqtt_stage", mqtt_stage.stats)
 
         signal.signal(signal.SIGTERM, self.sigterm_handler)
         signal.signal(signal.SIGINT, self.sigint_handler)
 
-        # Starting threads
+        if self.metrics is not None:
+            threading.Thread(
+                name="Thread-Metrics", target=self.run_metrics_reporter, daemon=True
+            ).start()
+
+        # Main thread supervises the stages until a signal or a failed stage
+        # with restarts disabled sets the stop event
         logging.info("Starting threads")
-        for thread in thread_list:
-            thread.start()
-            logging.info(f"Started thread: {thread.name}")
-
-        # Put main thread to sleep
-        logging.info("Main thread entering blocking loop")
-        while self.thread_events.is_set():
-            time.sleep(1)
-        logging.info("Main thread exited blocking loop")
-
-        # Gracefull terminate all threads
-        logging.info("Clearing thread events, gracefully terminating all threads")
-        self.thread_events.clear()
+        self.supervisor.run()
+        logging.info("Main thread woke from stop event")
+        self.stop_retrying()
 
-        # Closing threads
-        for thread in thread_list:
-            thread.join()
-            logging.info(f"Joined thread: {thread.name}")
+        # MQTT intake stops first so the writer drains a queue which isn't growing
+        logging.info("Stopping MQTT intake, then draining the queue to InfluxDB")
+        mqtt_stage.join()
+        logging.info(f"Joined thread: {mqtt_stage.name}")
+        self.thread_events.clear()
+        wake_consumer(target_queue=self.sample_queue)
+        influx_stage.join()
+        logging.info(f"Joined thread: {influx_stage.name}")
         logging.info("All threads have closed")
+        if self.metrics is not None:
+            logging.info(f"Pipeline metrics: {self.metrics.summary()}")
         logging.info("Exited application with exit code 0")
 
-    def run_threaded_influx_writer(self) -> None:
+    def stop_retrying(self) -> None:
         """
-        Secondary thread which runs the InfluxDB connector
-        Writes point data received from the MQTT._on_message in a threaded process
-        NOTE: Since this program needs to indefinitely run all
-        exceptions will just be logged instead of exiting the program.
+        Stops the batch writers retrying failed writes past the drain deadline,
+        a batch which is still failing is spooled instead of holding up shutdown
+        """
+        deadline = time.monotonic() + self.writer_settings.drain_deadline
+        for retry_policy in self.retry_policies:
+            retry_policy.set_deadline(deadline)
+        if self.rollup_retry_policy is not None:
+            self.rollup_retry_policy.set_deadline(deadline)
+
+    def run_metrics_reporter(self) -> None:
+        """
+        Logs a summary of the pipeline metrics every summary interval until stopped
+        """
+        while not self.stop_event.wait(timeout=self.metrics_settings.summary_interval):
+            logging.info(f"Pipeline metrics: {self.metrics.summary()}")
+
+    def _create_influx_connector(self) -> InfluxConnector | None:
+        """
+        Creates the InfluxDB connector and checks InfluxDB is healthy
+        :return: The connector, or None when either step fails
         """
         try:
             secret_store = SecretStore(has_influx_access=True)
-            influx_connector = InfluxConnector(secret_store=secret_store)
+            influx_connector = InfluxConnector(
+                secret_store=secret_store,
+                connection_pool_maxsize=max(1, self.writer_settings.writer_workers),
+                write_precision=self.writer_settings.write_precision,
+                enable_gzip=self.writer_settings.enable_gzip,
+            )
             logging.info("Attempting health check for InfluxDB")
         except Exception:
             logging.exception("Failed to setup environment")
-            self.thread_events.clear()
-            return
+            return None
         try:
             influx_connector.health_check()
             logging.info("InfluxDB health check succeeded")
         except Exception:
             logging.exception("Failed to complete InfluxDB health check")
-            self.thread_events.clear()
+            return None
+        return influx_connector
+
+    def run_threaded_influx_writer(self, stage: SupervisedStage) -> None:
+        """
+        Secondary thread which runs the InfluxDB connector
+        Writes point data received from the MQTT._on_message in a threaded process
+        NOTE: Since this program needs to indefinitely run all
+        exceptions will just be logged instead of exiting the program, a failed
+        setup returns so the supervisor restarts the stage
+        """
+        influx_connector = self._create_influx_connector()
+        if influx_connector is None:
             return
 
-        while self.thread_events.is_set():
-            if not THREADED_QUEUE.empty():
-                queue_package: QueuePackage = THREADED_QUEUE.get(timeout=1.0)
-                logging.debug(
-                    f"Popped packet off queue, queue now has {THREADED_QUEUE.qsize()} items"
+        is_running = stage.beating(self.thread_events.is_set)
+        rollups_running = threading.Event()
+        rollup_thread = self._start_rollup_writer(
+            influx_connector=influx_connector, is_running=rollups_running
+        )
+        try:
+            if self.writer_settings.write_mode == "batched":
+                drain_stats = self._run_batched_writer(
+                    influx_connector=influx_connector, is_running=is_running
+                )
+            else:
+                drain_stats = self._run_single_writer(
+                    influx_connector=influx_connector, is_running=is_running
+                )
+        finally:
+            rollups_running.clear()
+            if rollup_thread is not None:
+                wake_consumer(target_queue=self.rollup_aggregator.closed_queue)
+                rollup_thread.join()
+        logging.info(f"Drained queue to InfluxDB on shutdown: {drain_stats}")
+
+    def _start_rollup_writer(
+        self, influx_connector: InfluxConnector, is_running: threading.Event
+    ) -> threading.Thread | None:
+        """
+        Starts a thread which writes closed rollup windows until is_running is
+        cleared. Open windows are only closed and written on shutdown, a restarted
+        stage carries on with them
+        :param influx_connector: Connector the windows are written through
+        :param is_running: Event which is set here and cleared once the writer stops
+        :return: The thread, or None when rollups are disabled
+        """
+        if self.rollup_aggregator is None:
+            return None
+        self.rollup_retry_policy = RetryPolicy(
+            max_retries=self.retry_settings.max_retries,
+            base_delay=self.retry_settings.base_delay,
+            max_delay=self.retry_settings.max_delay,
+            split_batches=self.retry_settings.split_batches,
+        )
+        if self.metrics is not None:
+            self.metrics.register_stats(
+                "rollup_write_retry", self.rollup_retry_policy.stats
+            )
+        rollup_writer = BatchWriter(
+            influx_connector=influx_connector,
+            batch_size=self.writer_settings.batch_size,
+            flush_interval=self.rollup_settings.flush_interval,
+            write_spool=self.rollup_spool,
+            replay_interval=self.spool_settings.replay_interval,
+            retry_policy=self.rollup_retry_policy,
+            bucket=self.rollup_settings.rollup_bucket,
+        )
+        is_running.set()
+        rollup_thread = threading.Thread(
+            name="Thread-Rollup",
+            target=self._run_rollup_writer,
+            kwargs={"rollup_writer": rollup_writer, "is_running": is_running.is_set},
+        )
+        rollup_thread.start()
+        logging.info(f"Started thread: {rollup_thread.name}")
+        return rollup_thread
+
+    def _run_rollup_writer(
+        self, rollup_writer: BatchWriter, is_running: Callable[[], bool]
+    ) -> None:
+        """
+        Writes closed rollup windows as they're queued until stopped, then writes
+        those left until the drain deadline. On shutdown MQTT intake has already
+        stopped so the open windows are saved to be carried on with by the next
+        start, writing them as they are would be overwritten by the rest of the
+        window
+        """
+        closed_queue = self.rollup_aggregator.closed_queue
+        rollup_writer.drain(source_queue=closed_queue, is_running=is_running)
+        if not self.thread_events.is_set():
+            try:
+                self.rollup_aggregator.save_open(
+                    state_file=self.rollup_settings.state_file
                 )
+            except OSError:
+                logging.exception("Failed to save the open rollup windows")
+        drain_stats = rollup_writer.finish(
+            source_queue=closed_queue,
+            deadline=time.monotonic() + self.writer_settings.drain_deadline,
+        )
+        logging.info(f"Drained rollup windows to InfluxDB: {drain_stats}")
+        logging.info(f"Rollup stats: {self.rollup_aggregator.stats}")
+
+    def _run_single_writer(
+        self, influx_connector: InfluxConnector, is_running: Callable[[], bool]
+    ) -> DrainStats:
+        """
+        Writes each package to InfluxDB as soon as it's popped off the queue,
+        blocks until packages arrive then pops up to batch_size packages at once.
+        Once stopped the rest of the queue is written until the drain deadline
+        :return: Counts of the points flushed and dropped once stopped
+        """
+        while is_running():
+            queue_packages: list[QueuePackage] = get_many(
+                source_queue=self.sample_queue,
+                max_items=self.writer_settings.batch_size,
+                timeout=QUEUE_WAIT_TIME,
+            )
+            if not queue_packages:
+                continue
+            logging.debug(
+                f"Popped {len(queue_packages)} packets off queue, "
+                f"queue now has {self.sample_queue.qsize()} items"
+            )
+            for queue_package in queue_packages:
                 try:
-                    influx_connector.write_points(queue_package=queue_package)
+                    self._write_point(
+                        influx_connector=influx_connector, queue_package=queue_package
+                    )
                 except Exception:
                     logging.exception(
                         "Failed to run write to Influx server, returned error"
                     )
                     time.sleep(1)
-                if THREADED_QUEUE.empty():
-                    logging.info("Popped all packets off queue and wrote to InfluxDB")
-            else:
-                time.sleep(0.5)
-        self.thread_events.clear()
+            if self.sample_queue.empty():
+                logging.info("Popped all packets off queue and wrote to InfluxDB")
 
-    def run_threaded_mqtt_client(self):
+        # Single writes have no spool, whatever's left after the deadline is dropped
+        drain_stats = DrainStats()
+        deadline = time.monotonic() + self.writer_settings.drain_deadline
+        while not self.sample_queue.empty():
+            queue_packages = get_many(
+                source_queue=self.sample_queue,
+                max_items=self.writer_settings.batch_size,
+                timeout=0,
+            )
+            for queue_package in queue_packages:
+                if time.monotonic() >= deadline:
+                    drain_stats.dropped += 1
+                    continue
+                try:
+                    self._write_point(
+                        influx_connector=influx_connector, queue_package=queue_package
+                    )
+                    drain_stats.flushed += 1
+                except Exception:
+                    logging.exception("Failed to write package to Influx at shutdown")
+                    drain_stats.dropped += 1
+        return drain_stats
+
+    def _write_point(
+        self, influx_connector: InfluxConnector, queue_package: QueuePackage
+    ) -> None:
         """
-        Main process which runs the MQTT connector
-        Listens to a MQTT broken then decodes received packets
-        NOTE: Since this program needs to indefinitely run all
-        exceptions will just be logged instead of exiting the program.
+        Writes a single package, recording its queue wait and write latency
+        """
+        start_time = time.monotonic()
+        influx_connector.write_points(queue_package=queue_package)
+        if self.metrics is None or queue_package.received_at is None:
+            return
+        written_at = time.monotonic()
+        self.metrics.observe(
+            "queue_wait_seconds", start_time - queue_package.received_at
+        )
+        self.metrics.observe("write_seconds", written_at - start_time)
+        self.metrics.observe(
+            "end_to_end_seconds", written_at - queue_package.received_at
+        )
+        self.metrics.increment("points_written")
+
+    def _create_batch_writers(
+        self, influx_connector: InfluxConnector
+    ) -> tuple[list[RetryPolicy], list[BatchWriter]]:
+        """
+        Creates one batch writer, each with its own retry policy, per writer worker
+        :return: Retry policies and the batch writers using them
+        """
+        retry_policies = [
+            RetryPolicy(
+                max_retries=self.retry_settings.max_retries,
+                base_delay=self.retry_settings.base_delay,
+                max_delay=self.retry_settings.max_delay,
+                split_batches=self.retry_settings.split_batches,
+            )
+            for _ in range(max(1, self.writer_settings.writer_workers))
+        ]
+        batch_writers = [
+            BatchWriter(
+                influx_connector=influx_connector,
+                batch_size=self.writer_settings.batch_size,
+                flush_interval=self.writer_settings.flush_interval,
+                write_spool=self.write_spool,
+                replay_interval=self.spool_settings.replay_interval,
+                retry_policy=retry_policy,
+                metrics=self.metrics,
+            )
+            for retry_policy in retry_policies
+        ]
+        if self.metrics is not None:
+            for index, retry_policy in enumerate(retry_policies):
+                self.metrics.register_stats(f"write_retry_{index}", retry_policy.stats)
+        self.retry_policies = retry_policies
+        return retry_policies, batch_writers
+
+    def _run_batched_writer(
+        self, influx_connector: InfluxConnector, is_running: Callable[[], bool]
+    ) -> DrainStats:
+        """
+        Collects packages off the queue and writes them to InfluxDB in batches,
+        a batch is flushed once it reaches the configured size or age. With more
+        than one writer worker packages are sharded by measurement across a pool.
+        Once stopped the rest of the queue is written until the drain deadline and
+        anything left after it is spooled
+        :return: Counts of the points flushed, spooled and dropped once stopped
+        """
+        retry_policies, batch_writers = self._create_batch_writers(
+            influx_connector=influx_connector
+        )
+        if len(batch_writers) == 1:
+            batch_writers[0].drain(
+                source_queue=self.sample_queue, is_running=is_running
+            )
+            drain_stats = batch_writers[0].finish(
+                source_queue=self.sample_queue,
+                deadline=time.monotonic() + self.writer_settings.drain_deadline,
+            )
+        else:
+            writer_pool = WriterPool(
+                batch_writers=batch_writers,
+                queue_length=self.writer_settings.batch_size,
+            )
+            logging.info(f"Writing to InfluxDB with {len(writer_pool)} writer workers")
+            drain_stats = writer_pool.run(
+                source_queue=self.sample_queue,
+                is_running=is_running,
+                wait_time=QUEUE_WAIT_TIME,
+                drain_deadline=self.writer_settings.drain_deadline,
+            )
+        for index, retry_policy in enumerate(retry_policies):
+            logging.info(
+                f"Influx write retry stats for writer {index}: {retry_policy.stats}"
+            )
+        return drain_stats
+
+    def _resolve_overflow_policy(self) -> str:
+        """
+        :return: Configured overflow policy, or drop_oldest when it can't be used
+        """
+        overflow_policy = self.queue_settings.overflow_policy
+        if overflow_policy == "spill" and self.write_spool is None:
+            logging.warning(
+                "Spill overflow policy needs the batched writer and write spool, "
+                "dropping the oldest packages when the queue is full instead"
+            )
+            overflow_policy = "drop_oldest"
+        return overflow_policy
+
+    def _create_dedup_index(self, source: str | None) -> DedupIndex | None:
+        """
+        Creates the dedup index of one broker, each broker's client calls back from
+        its own thread so they don't share an index
+        :return: The index, or None when dedup is disabled
+        """
+        if not self.dedup_settings.dedup_enabled:
+            return None
+        dedup_index = DedupIndex(
+            dedup_window=self.dedup_settings.dedup_window,
+            max_entries=self.dedup_settings.max_entries,
+        )
+        self.dedup_indexes[source] = dedup_index
+        if self.metrics is not None:
+            stats_name = "packet_dedup" if source is None else f"packet_dedup_{source}"
+            self.metrics.register_stats(stats_name, dedup_index.stats)
+        return dedup_index
+
+    def _create_capture_writer(self, source: str | None) -> CaptureWriter | None:
+        """
+        Creates the writer which captures every message received from one broker
+        to a new file, each broker's client calls back from its own thread
+        :return: The writer, or None when capture is disabled
+        """
+        if not self.capture_settings.capture_enabled:
+            return None
+        capture_writer = CaptureWriter(
+            capture_file=create_capture_file(
+                capture_location=self.capture_settings.capture_location,
+                source=source,
+            ),
+            max_capture_bytes=self.capture_settings.max_capture_bytes,
+        )
+        self.capture_writers.append(capture_writer)
+        if self.metrics is not None:
+            stats_name = "mqtt_capture" if source is None else f"mqtt_capture_{source}"
+            self.metrics.register_stats(stats_name, capture_writer.stats)
+        return capture_writer
+
+    def _close_capture_writers(self) -> None:
+        """
+        Closes the captures of the MQTT stage once its listeners have stopped
+        """
+        for capture_writer in self.capture_writers:
+            capture_writer.close()
+        self.capture_writers = []
+
+    def _create_deadband_filter(self) -> None:
+        """
+        Creates the deadband filter shared by every broker and the decode pool, a
+        restarted stage starts with a new filter so every field is written again
+        """
+        self.deadband_filter = None
+        if not self.deadband_settings.deadband_enabled:
+            return
+        self.deadband_filter = DeadbandFilter(
+            absolute_deadband=self.deadband_settings.absolute_deadband,
+            relative_deadband=self.deadband_settings.relative_deadband,
+            heartbeat_interval=self.deadband_settings.heartbeat_interval,
+            field_deadbands=self.deadband_settings.field_deadbands,
+        )
+        if self.metrics is not None:
+            self.metrics.register_stats("field_deadband", self.deadband_filter.stats)
+
+    def _create_mqtt_clients(self) -> list[Client] | None:
+        """
+        Creates the ingest queue and one MQTT connector per broker then connects
+        them, every broker feeds the same decode pool and ingest queue
+        :return: The connected clients, or None when any of them fails
         """
         secret_store = SecretStore(has_mqtt_access=True)
-        mqtt_connector = MqttConnector(
-            secret_store=secret_store,
+        logging.info(
+            f"Creating MQTT listening service for {len(secret_store.mqtt_brokers)} "
+            f"broker(s)"
         )
-        mqtt_client = None
-        logging.info("Creating MQTT listening service")
         try:
-            mqtt_client = mqtt_connector.get_mqtt_client()
+            self.ingest_queue = IngestQueue(
+                target_queue=self.sample_queue,
+                overflow_policy=self._resolve_overflow_policy(),
+                block_deadline=self.queue_settings.block_deadline,
+                write_spool=self.write_spool,
+                write_precision=self.writer_settings.write_precision,
+            )
+            if self.metrics is not None:
+                self.metrics.register_stats("ingest_overflow", self.ingest_queue.stats)
+            self._create_deadband_filter()
+            if self.decode_settings.decode_workers > 0:
+                self.decode_pool = DecodePool(
+                    decode_packets=functools.partial(
+                        decode_packets,
+                        native_decoders=self.reader_settings.native_decoders,
+                    ),
+                    ingest_queue=self.ingest_queue,
+                    decode_workers=self.decode_settings.decode_workers,
+                    raw_queue_length=self.decode_settings.raw_queue_length,
+                    decode_batch_size=self.decode_settings.decode_batch_size,
+                    queue_mode=self.reader_settings.queue_mode,
+                    on_loaded=self.on_decoded,
+                    metrics=self.metrics,
+                    deadband_filter=self.deadband_filter,
+                    rollup_aggregator=self.rollup_aggregator,
+                )
+                if self.metrics is not None:
+                    self.metrics.register_stats("decode_pool", self.decode_pool.stats)
+                self.decode_pool.start()
+            mqtt_clients = []
+            for source in secret_store.mqtt_brokers:
+                mqtt_connector = MqttConnector(
+                    secret_store=secret_store,
+                    reader_settings=self.reader_settings,
+                    dedup_index=self._create_dedup_index(source=source),
+                    ingest_queue=self.ingest_queue,
+                    decode_pool=self.decode_pool,
+                    metrics=self.metrics,
+                    source=source,
+                    deadband_filter=self.deadband_filter,
+                    rollup_aggregator=self.rollup_aggregator,
+                    capture_writer=self._create_capture_writer(source=source),
+                )
+                mqtt_clients.append(mqtt_connector.get_mqtt_client())
+            return mqtt_clients
         except Exception:
             logging.exception("Failed to create MQTT listening service")
-            self.thread_events.clear()
-            return
+            if self.decode_pool is not None:
+                self.decode_pool.stop()
+            self._close_capture_writers()
+            return None
 
-        # Start MQTT-Listener thread to indefinitely listen to the broker
-        # NOTE: This actually runs another thread as a Daemon due to the behavior of loop_start
-        logging.info("Started thread: MQTT-Listener")
-        # Running loop_start() will enter into a confection state and
-        # enter on_message() every time a new message comes in. Because
-        # of this all error/exception handing must be done in the on_message()
-        # command, in our case we don't want the program to exit so we just log the error.
-        try:
-            mqtt_client.loop_start()
-        except Exception:
-            logging.exception("MQTT listener exited with a fatal error")
-            self.thread_events.clear()
+    def _finish_ingest(self) -> None:
+        """
+        Stops the decode pool once it's loaded every packet it was given, closes the
+        captures, then logs what the dedup indexes and ingest queue dropped while
+        MQTT was running
+        """
+        if self.decode_pool is not None:
+            self.decode_pool.stop()
+        self._close_capture_writers()
+        for source, dedup_index in self.dedup_indexes.items():
+            source_name = "" if source is None else f" from {source}"
+            logging.info(f"MQTT packet dedup stats{source_name}: {dedup_index.stats}")
+        if self.deadband_filter is not None:
+            logging.info(f"Field deadband stats: {self.deadband_filter.stats}")
+        if self.ingest_queue is not None:
+            logging.info(f"Ingest queue overflow stats: {self.ingest_queue.stats}")
+
+    def run_threaded_mqtt_client(self, stage: SupervisedStage) -> None:
+        """
+        Main process which runs the MQTT connectors
+        Listens to each MQTT broker then decodes received packets
+        NOTE: Since this program needs to indefinitely run all
+        exceptions will just be logged instead of exiting the program, a failed
+        setup or listener returns so the supervisor restarts the stage
+        """
+        mqtt_clients = self._create_mqtt_clients()
+        if mqtt_clients is None:
             return
 
-        # Sleep Thread-MQTT
-        while self.thread_events.is_set():
-            time.sleep(1)
+        # Start an MQTT-Listener thread per broker to indefinitely listen to it,
+        # loop_forever() reconnects by itself and enters on_message() every time a
+        # new message comes in. Because of this all error/exception handing must be
+        # done in the on_message() command, in our case we don't want the program
+        # to exit so we just log the error.
+        listeners = [
+            threading.Thread(
+                name="MQTT-Listener",
+                target=mqtt_client.loop_forever,
+                kwargs={"retry_first_connection": True},
+                daemon=True,
+            )
+            for mqtt_client in mqtt_clients
+        ]
+        for listener in listeners:
+            listener.start()
+            logging.info(f"Started thread: {listener.name}")
 
-        # Stops the extra MQTT-Listener thread gracefully
-        if mqtt_client:
-            mqtt_client.loop_stop()
-        logging.info("Joined thread: MQTT-Listener")
-        self.thread_events.clear()
+        # Thread-MQTT heartbeats until shutdown or it's retired, or until a
+        # listener dies
+        while not (
+            self.stop_event.wait(timeout=self.supervisor_settings.check_interval)
+            or stage.is_retiring()
+        ):
+            stage.beat()
+            if not all(listener.is_alive() for listener in listeners):
+                logging.error("MQTT-Listener thread exited, restarting MQTT clients")
+                break
+
+        # Disconnecting wakes each MQTT-Listener thread out of its select so it
+        # exits straight away instead of at its next one second timeout
+        for mqtt_client in mqtt_clients:
+            mqtt_client.disconnect()
+        for listener in listeners:
+            listener.join(timeout=MQTT_LISTENER_JOIN_TIME)
+        logging.info(f"Joined {len(listeners)} MQTT-Listener thread(s)")
+        self._finish_ingest()
 
 
 def main():
@@ -0,0 +1,337 @@
+"""
+Classes file, contains the pieces of the asyncio runtime which drive the paho MQTT
+client from socket callbacks and write batches to InfluxDB from one event loop
+"""
+
+import asyncio
+import functools
+import logging
+import math
+import time
+from collections import deque
+from concurrent.futures import Executor
+from queue import Empty, Queue
+from typing import Callable
+
+from paho.mqtt.client import MQTT_ERR_NO_CONN, MQTT_ERR_SUCCESS, Client
+
+from src.classes.common_classes import QueuePackage
+from src.classes.influx_classes import BatchWriter, DrainStats, ShardMap
+
+# Seconds between paho housekeeping calls which send keep alive pings, well
+# inside the 60 second keep alive paho connects with by default
+MISC_INTERVAL = 5.0
+# Most packets read from the socket each time it becomes readable
+READ_BURST = 32
+# Bounds of the delay between attempts to reconnect to the broker
+MIN_RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 120.0
+
+
+class AsyncMqttLoop:
+    """
+    Class which runs a paho client on an asyncio event loop instead of its own
+    network thread, the socket is watched with add_reader and add_writer so reads,
+    callbacks and decoding all run on the event loop
+    """
+
+    def __init__(
+        self,
+        mqtt_client: Client,
+        loop: asyncio.AbstractEventLoop,
+        on_read: Callable[[], None] = None,
+    ) -> None:
+        """
+        :param mqtt_client: Connected paho client, not started with loop_start
+        :param loop: Event loop which watches the client's socket
+        :param on_read: Optional callable run after each read from the socket
+        """
+        self._mqtt_client = mqtt_client
+        self._loop = loop
+        self._on_read = on_read
+        self._watch_socket()
+
+    def _watch_socket(self) -> None:
+        """
+        Sets the socket callbacks, the client connects before they're set, so its
+        socket is watched here along with the rest of its connect packet if it
+        wasn't sent
+        """
+        self._mqtt_client.on_socket_open = self._on_socket_open
+        self._mqtt_client.on_socket_close = self._on_socket_close
+        self._mqtt_client.on_socket_register_write = self._on_socket_register_write
+        self._mqtt_client.on_socket_unregister_write = self._on_socket_unregister_write
+        sock = self._mqtt_client.socket()
+        if sock is not None:
+            self._on_socket_open(self._mqtt_client, None, sock)
+            if self._mqtt_client.want_write():
+                self._on_socket_register_write(self._mqtt_client, None, sock)
+
+    def _unwatch_socket(self) -> None:
+        """
+        Clears the socket callbacks, so a reconnect running in an executor doesn't
+        touch the event loop from another thread
+        """
+        sock = self._mqtt_client.socket()
+        if sock is not None:
+            self._on_socket_close(self._mqtt_client, None, sock)
+        self._mqtt_client.on_socket_open = None
+        self._mqtt_client.on_socket_close = None
+        self._mqtt_client.on_socket_register_write = None
+        self._mqtt_client.on_socket_unregister_write = None
+
+    def _read(self) -> None:
+        # Paho reads one packet per call, reading a burst saves a trip through the
+        # event loop per packet, once the socket is empty the reads return at once
+        for _ in range(READ_BURST):
+            if self._mqtt_client.loop_read() != MQTT_ERR_SUCCESS:
+                break
+        # TLS sockets can hold decrypted bytes without the socket becoming readable
+        sock = self._mqtt_client.socket()
+        while sock is not None and hasattr(sock, "pending") and sock.pending():
+            self._mqtt_client.loop_read()
+            sock = self._mqtt_client.socket()
+        if self._on_read is not None:
+            self._on_read()
+
+    def _on_socket_open(self, _client, userdata, sock) -> None:
+        logging.debug(f"Socket open debug args, {userdata}, {sock}")
+        self._loop.add_reader(sock, self._read)
+
+    def _on_socket_close(self, _client, userdata, sock) -> None:
+        logging.debug(f"Socket close debug args, {userdata}, {sock}")
+        self._loop.remove_reader(sock)
+        self._loop.remove_writer(sock)
+
+    def _on_socket_register_write(self, _client, _userdata, sock) -> None:
+        self._loop.add_writer(sock, self._mqtt_client.loop_write)
+
+    def _on_socket_unregister_write(self, _client, _userdata, sock) -> None:
+        self._loop.remove_writer(sock)
+
+    async def _reconnect(self) -> None:
+        """
+        Reconnects to the broker in the default executor, since the DNS lookup, TCP
+        connect and TLS handshake block, then watches the new socket
+        """
+        self._unwatch_socket()
+        try:
+            await self._loop.run_in_executor(None, self._mqtt_client.reconnect)
+        finally:
+            self._watch_socket()
+
+    async def run(self, stopping: asyncio.Event) -> None:
+        """
+        Keeps the connection alive and reconnects with a growing delay when it's
+        lost, disconnects from the broker once stopping is set
+        :param stopping: Event which is set once the loop should stop
+        """
+        reconnect_delay = MIN_RECONNECT_DELAY
+        wait_time = MISC_INTERVAL
+        while not stopping.is_set():
+            if self._mqtt_client.loop_misc() == MQTT_ERR_NO_CONN:
+                try:
+                    logging.warning("MQTT connection lost, reconnecting to broker")
+                    await self._reconnect()
+                    reconnect_delay = MIN_RECONNECT_DELAY
+                    wait_time = MISC_INTERVAL
+                except OSError:
+                    logging.exception("Failed to reconnect to MQTT broker")
+                    wait_time = reconnect_delay
+                    reconnect_delay = min(reconnect_delay * 2, MAX_RECONNECT_DELAY)
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=wait_time)
+            except asyncio.TimeoutError:
+                pass
+        if self._mqtt_client.disconnect() != MQTT_ERR_SUCCESS:
+            logging.warning("MQTT client was already disconnected")
+
+
+class AsyncWriter:
+    """
+    Class which collects packages off the queue on the event loop and hands full
+    or due batches to an executor. Packages are sharded by measurement across the
+    batch writers like the writer pool and each batch writer has one write in flight
+    at most, so a device's batches are still written in timestamp order. While a
+    batch writer is busy its packages are held in a backlog of up to one batch,
+    once a backlog is full packages wait on the queue until the write finishes
+    """
+
+    def __init__(
+        self, batch_writers: list[BatchWriter], source_queue: Queue, executor: Executor
+    ) -> None:
+        """
+        :param batch_writers: One batch writer per write allowed in flight
+        :param source_queue: Queue of packages to write, only read without blocking
+        :param executor: Executor the blocking InfluxDB writes run in
+        """
+        self._batch_writers = batch_writers
+        self._source_queue = source_queue
+        self._executor = executor
+        self._shard_map = ShardMap(shard_count=len(batch_writers))
+        self._backlogs = [deque() for _ in batch_writers]
+        self._in_flight: dict[int, asyncio.Future] = {}
+        self._queued = asyncio.Event()
+
+    def notify(self) -> None:
+        """
+        Wakes the writer after packages are put on the queue, or to stop it
+        """
+        self._queued.set()
+
+    @staticmethod
+    def _flush(batch_writer: BatchWriter) -> None:
+        batch_writer.replay_spool()
+        try:
+            batch_writer.flush()
+        except Exception:
+            logging.exception("Failed to run batch write to Influx server")
+
+    def _collect(self) -> None:
+        """
+        Moves packages off the queue into the batch writer which owns them, or its
+        backlog while it's busy, stops once a backlog holds a full batch
+        """
+        while True:
+            try:
+                queue_package: QueuePackage = self._source_queue.get_nowait()
+            except Empty:
+                return
+            if queue_package is None:
+                continue
+            index = self._shard_map.shard(
+                measurement=queue_package.measurement, source=queue_package.source
+            )
+            batch_writer = self._batch_writers[index]
+            backlog = self._backlogs[index]
+            if (
+                index in self._in_flight
+                or backlog
+                or len(batch_writer) >= batch_writer.batch_size
+            ):
+                backlog.append(queue_package)
+                if len(backlog) >= batch_writer.batch_size:
+                    return
+            else:
+                batch_writer.add(queue_package)
+
+    def _top_up(self, index: int) -> None:
+        batch_writer = self._batch_writers[index]
+        backlog = self._backlogs[index]
+        while backlog and len(batch_writer) < batch_writer.batch_size:
+            batch_writer.add(backlog.popleft())
+
+    def _submit(self, index: int) -> None:
+        future = asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(self._flush, self._batch_writers[index])
+        )
+        future.add_done_callback(lambda _: self._queued.set())
+        self._in_flight[index] = future
+
+    def _reap(self) -> None:
+        for index in [
+            index for index, future in self._in_flight.items() if future.done()
+        ]:
+            del self._in_flight[index]
+
+    def _idle_writers(self) -> list[tuple[int, BatchWriter]]:
+        return [
+            (index, batch_writer)
+            for index, batch_writer in enumerate(self._batch_writers)
+            if index not in self._in_flight
+        ]
+
+    def _replay_due(self, batch_writer: BatchWriter) -> bool:
+        return not self._in_flight and batch_writer.time_until_replay() == 0.0
+
+    def _timeout(self) -> float | None:
+        timeouts = []
+        for _, batch_writer in self._idle_writers():
+            if len(batch_writer):
+                timeouts.append(batch_writer.time_until_due())
+            if not self._in_flight and batch_writer.time_until_replay() is not None:
+                timeouts.append(batch_writer.time_until_replay())
+        # With nothing to flush or replay the loop sleeps until it's notified
+        return min(timeouts, default=None)
+
+    def _submit_due(self) -> bool:
+        """
+        Tops up the idle batch writers from their backlogs and submits those due
+        :return: True when a write was submitted
+        """
+        submitted = False
+        for index, batch_writer in self._idle_writers():
+            self._top_up(index)
+            if batch_writer.is_due() or self._replay_due(batch_writer):
+                self._submit(index)
+                submitted = True
+        return submitted
+
+    def _shard_remaining(self) -> list[Queue]:
+        """
+        Moves the backlogs then the rest of the queue onto a queue per batch writer,
+        so each writer finishes only the measurements it owns
+        """
+        writer_queues = [Queue() for _ in self._batch_writers]
+        for writer_queue, backlog in zip(writer_queues, self._backlogs):
+            while backlog:
+                writer_queue.put(backlog.popleft())
+        while True:
+            try:
+                queue_package: QueuePackage = self._source_queue.get_nowait()
+            except Empty:
+                return writer_queues
+            if queue_package is not None:
+                writer_queues[
+                    self._shard_map.shard(
+                        measurement=queue_package.measurement,
+                        source=queue_package.source,
+                    )
+                ].put(queue_package)
+
+    async def run(
+        self, is_running: Callable[[], bool], *, drain_deadline: float = math.inf
+    ) -> DrainStats:
+        """
+        Collects and writes batches until told to stop, then waits for the writes
+        in flight and writes what's left on the queue across every batch writer
+        until drain_deadline seconds have passed, anything left after is persisted
+        :param is_running: Callable which returns False once the writer should stop
+        :param drain_deadline: Seconds allowed to write what's left once stopped
+        :return: Counts of the points flushed, spooled and dropped once stopped
+        """
+        while is_running():
+            self._reap()
+            self._collect()
+            if self._submit_due():
+                continue
+            try:
+                await asyncio.wait_for(self._queued.wait(), timeout=self._timeout())
+            except asyncio.TimeoutError:
+                pass
+            self._queued.clear()
+
+        if self._in_flight:
+            await asyncio.wait(self._in_flight.values())
+        self._reap()
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + drain_deadline
+        finished = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self._executor,
+                    functools.partial(
+                        batch_writer.finish,
+                        source_queue=writer_queue,
+                        deadline=deadline,
+                    ),
+                )
+                for batch_writer, writer_queue in zip(
+                    self._batch_writers, self._shard_remaining()
+                )
+            )
+        )
+        drain_stats = DrainStats()
+        for writer_stats in finished:
+            drain_stats.add(writer_stats)
+        return drain_stats
@@ -0,0 +1,215 @@
+"""
+Classes file, contains the compact sample buffer which hands packages from the
+MQTT thread to the Influx writer thread without keeping a Python object per sample
+"""
+
+import math
+from array import array
+from collections import deque
+from datetime import datetime, timedelta
+from queue import Queue
+
+from src.classes.common_classes import QueuePackage
+from src.classes.serializer_classes import LineProtocolSerializer
+
+# Number of samples a ring holds before it first grows
+RING_START_CAPACITY = 64
+# Layout ids reserved for wake up sentinels and packages which can't be packed
+_WAKE_ID = -1
+_OBJECT_ID = -2
+_EPOCH = datetime(1970, 1, 1)
+_FLOAT_TYPE = {float}
+
+
+class SampleRing:
+    """
+    Class which holds samples sharing one layout in typed arrays, the time as epoch
+    microseconds and each field as a float. The ring doubles in size when it's full
+    and drops back to its starting size once it's been emptied
+    """
+
+    def __init__(self, width: int, capacity: int = RING_START_CAPACITY) -> None:
+        """
+        :param width: Number of float fields in each sample
+        :param capacity: Number of samples the ring starts with space for
+        """
+        self._width = width
+        self._start_capacity = capacity
+        self._allocate(capacity)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Number of bytes allocated for the ring's arrays
+        """
+        times_bytes = self._times.itemsize * len(self._times)
+        return times_bytes + self._values.itemsize * len(self._values)
+
+    def _allocate(self, capacity: int) -> None:
+        self._capacity = capacity
+        self._times = array("q", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity * self._width))
+        self._head = 0
+        self._count = 0
+
+    def _grow(self) -> None:
+        # Unrolls the ring so the oldest sample is first then doubles its size
+        head, width, capacity = self._head, self._width, self._capacity
+        self._times = self._times[head:] + self._times[:head]
+        self._times.frombytes(bytes(8 * capacity))
+        self._values = self._values[head * width :] + self._values[: head * width]
+        self._values.frombytes(bytes(8 * capacity * width))
+        self._head = 0
+        self._capacity = capacity * 2
+
+    def append(self, time_us: int, values: array) -> None:
+        """
+        Adds a sample to the end of the ring
+        :param time_us: Epoch microseconds of the sample
+        :param values: Float field values, in layout order
+        """
+        if self._count == self._capacity:
+            self._grow()
+        index = (self._head + self._count) % self._capacity
+        self._times[index] = time_us
+        self._values[index * self._width : (index + 1) * self._width] = values
+        self._count += 1
+
+    def popleft(self) -> tuple[int, array]:
+        """
+        Removes the oldest sample from the ring
+        :return: Epoch microseconds and float field values of the sample
+        """
+        index = self._head
+        sample = (
+            self._times[index],
+            self._values[index * self._width : (index + 1) * self._width],
+        )
+        self._head = (index + 1) % self._capacity
+        self._count -= 1
+        if self._count == 0 and self._capacity > self._start_capacity:
+            self._allocate(self._start_capacity)
+        return sample
+
+
+class SampleBuffer(Queue):
+    """
+    Queue which packs packages into one sample ring per layout, a layout being the
+    measurement, source and field names of a package and whether its time is in
+    epoch seconds. Names are interned as small integer ids so each queued sample
+    costs its time and float values rather than a dataclass, datetime and
+    dictionary. Packages come back out in the order they were put, datetimes as
+    naive UTC datetimes and epoch seconds as they were. Packages with non float
+    fields and None wake up sentinels are passed through as they are. Receive
+    times are kept in an array alongside the order
+    """
+
+    def _init(self, maxsize: int) -> None:
+        self._layout_ids: dict[tuple[str, str, tuple[str, ...], bool], int] = {}
+        self._layouts: list[tuple[str, str, tuple[str, ...], bool]] = []
+        self._rings: list[SampleRing] = []
+        self._objects = deque()
+        self._order = array("i")
+        self._received = array("d")
+        self._order_head = 0
+
+    def _qsize(self) -> int:
+        return len(self._order) - self._order_head
+
+    @staticmethod
+    def _can_pack(queue_package: QueuePackage) -> bool:
+        return (
+            (
+                queue_package.time_field.__class__ is int
+                or isinstance(queue_package.time_field, datetime)
+            )
+            and isinstance(queue_package.field, dict)
+            and set(map(type, queue_package.field.values())) <= _FLOAT_TYPE
+        )
+
+    def _layout_id(
+        self,
+        measurement: str,
+        source: str,
+        field_names: tuple[str, ...],
+        epoch_seconds: bool,
+    ) -> int:
+        layout = (measurement, source, field_names, epoch_seconds)
+        layout_id = self._layout_ids.get(layout)
+        if layout_id is None:
+            layout_id = len(self._layouts)
+            self._layout_ids[layout] = layout_id
+            self._layouts.append(layout)
+            self._rings.append(SampleRing(width=len(field_names)))
+        return layout_id
+
+    def _put(self, item: QueuePackage | None) -> None:
+        if item is None:
+            layout_id = _WAKE_ID
+        elif self._can_pack(item):
+            epoch_seconds = item.time_field.__class__ is int
+            layout_id = self._layout_id(
+                measurement=item.measurement,
+                source=item.source,
+                field_names=tuple(item.field),
+                epoch_seconds=epoch_seconds,
+            )
+            if epoch_seconds:
+                time_us = item.time_field * 1000000
+            else:
+                time_us = LineProtocolSerializer.to_nanoseconds(item.time_field) // 1000
+            self._rings[layout_id].append(
+                time_us=time_us, values=array("d", item.field.values())
+            )
+        else:
+            layout_id = _OBJECT_ID
+            self._objects.append(item)
+        self._order.append(layout_id)
+        received_at = None if item is None else item.received_at
+        self._received.append(math.nan if received_at is None else received_at)
+
+    def _pop_order(self) -> tuple[int, float | None]:
+        layout_id = self._order[self._order_head]
+        received_at = self._received[self._order_head]
+        self._order_head += 1
+        # Compacts the order arrays once the popped half outweighs the waiting half
+        if self._order_head * 2 >= len(self._order):
+            del self._order[: self._order_head]
+            del self._received[: self._order_head]
+            self._order_head = 0
+        return layout_id, None if math.isnan(received_at) else received_at
+
+    def _get(self) -> QueuePackage | None:
+        layout_id, received_at = self._pop_order()
+        if layout_id == _WAKE_ID:
+            return None
+        if layout_id == _OBJECT_ID:
+            return self._objects.popleft()
+        measurement, source, field_names, epoch_seconds = self._layouts[layout_id]
+        time_us, values = self._rings[layout_id].popleft()
+        if epoch_seconds:
+            time_field = time_us // 1000000
+        else:
+            time_field = _EPOCH + timedelta(microseconds=time_us)
+        return QueuePackage(
+            measurement=measurement,
+            time_field=time_field,
+            field=dict(zip(field_names, values)),
+            received_at=received_at,
+            source=source,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Number of bytes allocated for the buffer's arrays
+        """
+        with self.mutex:
+            order_bytes = self._order.itemsize * len(self._order)
+            received_bytes = self._received.itemsize * len(self._received)
+            return (
+                order_bytes + received_bytes + sum(ring.nbytes for ring in self._rings)
+            )
@@ -0,0 +1,214 @@
+"""
+Classes file, contains the writer which captures every message received from an
+MQTT broker to a compact binary file and the replayer which feeds a capture back
+through a connector's on_message callback, so production traffic can be replayed
+at any speed without a broker
+"""
+
+import logging
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator
+
+from paho.mqtt.client import MQTTMessage
+
+# Start of every capture file, the last byte is the format version
+CAPTURE_MAGIC = b"SLCAP\x01"
+# Receive time in epoch seconds, topic index and payload length of each record
+_RECORD_STRUCT = struct.Struct("<dHI")
+# Topic index of a record whose payload is a topic, it takes the next index
+_NEW_TOPIC = 0xFFFF
+
+
+@dataclass
+class CaptureSettings:
+    """
+    Data class which defines where received MQTT messages are captured
+    """
+
+    capture_enabled: bool = False
+    capture_location: str = "output/captures/"
+    max_capture_bytes: int = 104857600
+
+
+@dataclass
+class CaptureStats:
+    """
+    Data class which counts the messages captured or left out once the file was full
+    """
+
+    captured: int = 0
+    skipped: int = 0
+    bytes_written: int = 0
+
+
+@dataclass
+class ReplayStats:
+    """
+    Data class which counts the messages replayed and how long replaying took
+    """
+
+    messages: int = 0
+    payload_bytes: int = 0
+    capture_seconds: float = 0.0
+    replay_seconds: float = 0.0
+
+
+def create_capture_file(capture_location: str, source: str = None) -> str:
+    """
+    :param capture_location: Directory the capture is written to
+    :param source: Name of the broker captured, None is the only broker
+    :return: Path of a new capture named after the broker and the time it started
+    """
+    started = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return os.path.join(capture_location, f"{source or 'mqtt'}-{started}.capture")
+
+
+def read_capture(capture_file: str) -> Iterator[tuple[float, str, bytes]]:
+    """
+    Reads the messages of a capture in the order they were received, a record cut
+    short by a crash ends the capture
+    :param capture_file: Path of the capture
+    :return: Iterator of (receive time, topic, payload) of each message
+    """
+    with open(capture_file, "rb") as file_instance:
+        if file_instance.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError(f'Capture file: "{capture_file}" is not a capture.')
+        topics = []
+        while True:
+            header = file_instance.read(_RECORD_STRUCT.size)
+            if not header:
+                return
+            if len(header) < _RECORD_STRUCT.size:
+                break
+            received_at, topic_index, payload_length = _RECORD_STRUCT.unpack(header)
+            payload = file_instance.read(payload_length)
+            if len(payload) < payload_length:
+                break
+            if topic_index == _NEW_TOPIC:
+                topics.append(payload.decode("utf-8"))
+            else:
+                yield received_at, topics[topic_index], payload
+    logging.warning(f"Capture {capture_file} ends with a truncated record")
+
+
+class CaptureWriter:
+    """
+    Class which appends every message received from a broker to a capture file.
+    Each record holds the receive time, an index into the topics seen so far and
+    the payload, a topic is written once the first time it's received. Messages
+    are left out once the file reaches max_capture_bytes
+    """
+
+    def __init__(self, capture_file: str, max_capture_bytes: int = 104857600) -> None:
+        """
+        :param capture_file: Path of the capture, a file already there is replaced
+        :param max_capture_bytes: Most bytes written to the capture
+        """
+        directory = os.path.dirname(capture_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.capture_file = capture_file
+        self._max_capture_bytes = max_capture_bytes
+        self._file = open(capture_file, "wb")  # pylint: disable=consider-using-with
+        self._file.write(CAPTURE_MAGIC)
+        self._topics = {}
+        # Written from the MQTT network thread and closed from Thread-MQTT
+        self._lock = threading.Lock()
+        self.stats = CaptureStats(bytes_written=len(CAPTURE_MAGIC))
+        logging.info(f"Capturing MQTT messages to {capture_file}")
+
+    def _write_record(self, received_at: float, topic_index: int, data: bytes) -> None:
+        self._file.write(_RECORD_STRUCT.pack(received_at, topic_index, len(data)))
+        self._file.write(data)
+        self.stats.bytes_written += _RECORD_STRUCT.size + len(data)
+
+    def write(self, topic: str, payload: bytes, received_at: float = None) -> None:
+        """
+        Appends a message to the capture
+        :param topic: Topic the message was received on
+        :param payload: Payload of the message
+        :param received_at: time.time() the message was received, defaults to now
+        """
+        if received_at is None:
+            received_at = time.time()
+        with self._lock:
+            if self._file is None:
+                return
+            topic_index = self._topics.get(topic)
+            size = _RECORD_STRUCT.size + len(payload)
+            if topic_index is None:
+                size += _RECORD_STRUCT.size + len(topic.encode("utf-8"))
+            full = self.stats.bytes_written + size > self._max_capture_bytes
+            if full or (topic_index is None and len(self._topics) == _NEW_TOPIC):
+                self.stats.skipped += 1
+                return
+            if topic_index is None:
+                topic_index = self._topics[topic] = len(self._topics)
+                self._write_record(received_at, _NEW_TOPIC, topic.encode("utf-8"))
+            self._write_record(received_at, topic_index, payload)
+            self.stats.captured += 1
+
+    def close(self) -> None:
+        """
+        Flushes and closes the capture, later messages are ignored
+        """
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+        logging.info(f"Closed capture {self.capture_file}: {self.stats}")
+
+
+class CaptureReplayer:
+    """
+    Class which feeds the messages of a capture to an MQTT on_message callback as
+    if they came from a broker. A speed of 1 keeps the gaps between messages as
+    they were captured, N replays N times faster and 0 replays as fast as possible
+    """
+
+    def __init__(
+        self,
+        on_message: Callable[[object, object, MQTTMessage], None],
+        speed: float = 1.0,
+    ) -> None:
+        """
+        :param on_message: Callback taking (client, userdata, message), such as
+            MqttConnector._on_message
+        :param speed: Multiple of the captured rate to replay at, 0 doesn't wait
+        """
+        if speed < 0:
+            raise ValueError(f'Replay speed: "{speed}" is not supported.')
+        self._on_message = on_message
+        self._speed = speed
+
+    def replay(self, capture_file: str) -> ReplayStats:
+        """
+        Replays every message of a capture
+        :param capture_file: Path of the capture
+        :return: Counts of the messages replayed and the time taken
+        """
+        stats = ReplayStats()
+        first_received = None
+        start_time = time.monotonic()
+        for received_at, topic, payload in read_capture(capture_file):
+            if first_received is None:
+                first_received = received_at
+            stats.capture_seconds = received_at - first_received
+            if self._speed:
+                delay = start_time + stats.capture_seconds / self._speed
+                delay -= time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            msg = MQTTMessage(topic=topic.encode("utf-8"))
+            msg.payload = payload
+            self._on_message(None, None, msg)
+            stats.messages += 1
+            stats.payload_bytes += len(payload)
+        stats.replay_seconds = time.monotonic() - start_time
+        return stats
@@ -29,6 +29,7 @@ class SecretStore:
         self._has_influx_access = has_influx_access
 
         self._mqtt_secrets = None
+        self._mqtt_brokers = None
         self._influx_secrets = None
 
         if self._has_mqtt_access:
@@ -55,13 +56,49 @@ class SecretStore:
         assert self._influx_secrets is not None, "Influx secrets missing"
         return self._influx_secrets
 
+    @property
+    def mqtt_brokers(self) -> dict:
+        """
+        Dictionary of MQTT secrets for each broker keyed by source name, a single
+        broker read from the MQTT_ variables has the source None
+        """
+        assert self._mqtt_brokers is not None, "MQTT secrets missing"
+        return self._mqtt_brokers
+
     def _read_env_mqtt(self) -> dict:
         """
-        Gets secret details from the environment file.
+        Gets secret details from the environment file. When MQTT_SOURCES holds a
+        comma separated list of source names each broker is read from its own
+        variables, MQTT_<SOURCE>_HOST and so on, otherwise one broker is read.
+        :return mqtt_store: Dictionary of secrets
+        """
+        mqtt_sources = os.environ.get("MQTT_SOURCES")
+        if not mqtt_sources:
+            self._mqtt_brokers = {None: self._read_env_mqtt_broker(prefix="MQTT_")}
+        else:
+            sources = [source.strip() for source in mqtt_sources.split(",")]
+            if "" in sources or len(set(sources)) != len(sources):
+                logging.critical("MQTT sources must be unique and not empty")
+                raise MissingCredentialsError(
+                    "MQTT sources must be unique and not empty"
+                )
+            self._mqtt_brokers = {
+                source: self._read_env_mqtt_broker(
+                    prefix=f"MQTT_{source.upper().replace('-', '_')}_"
+                )
+                for source in sources
+            }
+        self._mqtt_secrets = next(iter(self._mqtt_brokers.values()))
+
+    @staticmethod
+    def _read_env_mqtt_broker(prefix: str) -> dict:
+        """
+        Gets the secret details of one broker from the environment file.
+        :param prefix: Prefix of the broker's environment variables
         :return mqtt_store: Dictionary of secrets
         """
         try:
-            mqtt_port = int(os.environ.get("MQTT_PORT"))
+            mqtt_port = int(os.environ.get(f"{prefix}PORT"))
             if mqtt_port not in range(0, MAX_PORT_RANGE):
                 logging.critical(
                     f"MQTT port outside maximum port range, 0-{MAX_PORT_RANGE}"
@@ -69,15 +106,16 @@ class SecretStore:
                 raise MissingCredentialsError(
                     f"MQTT port outside maximum port range, 0-{MAX_PORT_RANGE}"
                 )
-            self._mqtt_secrets = {
-                "mqtt_host": os.environ.get("MQTT_HOST"),
-                "mqtt_user": os.environ.get("MQTT_USER"),
+            mqtt_secrets = {
+                "mqtt_host": os.environ.get(f"{prefix}HOST"),
+                "mqtt_user": os.environ.get(f"{prefix}USER"),
                 "mqtt_port": mqtt_port,
-                "mqtt_token": os.environ.get("MQTT_TOKEN"),
-                "mqtt_topic": os.environ.get("MQTT_TOPIC"),
+                "mqtt_token": os.environ.get(f"{prefix}TOKEN"),
+                "mqtt_topic": os.environ.get(f"{prefix}TOPIC"),
             }
-            assert None not in self._mqtt_secrets.values()
-            assert "" not in self._mqtt_secrets.values()
+            assert None not in mqtt_secrets.values()
+            assert "" not in mqtt_secrets.values()
+            return mqtt_secrets
         except (AssertionError, TypeError) as err:
             logging.critical("Ran into error when reading environment variables")
             raise MissingCredentialsError(
@@ -108,9 +146,15 @@ class SecretStore:
 @dataclass
 class QueuePackage:
     """
-    Data class which defines values that are pushed and popped off the global stack
+    Data class which defines values that are pushed and popped off the global stack,
+    field holds every field of a decoded packet so each package is written as one point.
+    time_field is a datetime or the integer epoch seconds of a decoded packet.
+    received_at is the time.monotonic() its packet was received, used for metrics.
+    source names the MQTT broker the packet came from and is written as a tag
     """
 
     measurement: str = None
-    time_field: datetime = None
+    time_field: datetime | int = None
     field: str = None
+    received_at: float = None
+    source: str = None
@@ -19,3 +19,14 @@ class MqttServerOfflineError(Exception):
     """
     Defines an exception class for an offline MQTT server
     """
+
+
+class PartialWriteError(Exception):
+    """
+    Defines an exception class for a split batch which failed after some of its
+    points were written, it holds the lines left unwritten
+    """
+
+    def __init__(self, lines: bytes) -> None:
+        super().__init__(f"{len(lines.splitlines())} points were left unwritten")
+        self.lines = lines
@@ -0,0 +1,174 @@
+"""
+Classes file, contains the filter which drops decoded fields that haven't changed
+by more than their deadband since they were last written, so slow moving fields
+like modes, flags and night time voltages aren't written with every packet
+"""
+
+import logging
+import math
+import threading
+from dataclasses import dataclass
+
+from src.classes.common_classes import QueuePackage
+from src.classes.serializer_classes import LineProtocolSerializer
+
+
+@dataclass
+class DeadbandSettings:
+    """
+    Data class which defines how far a field has to move before it's written again
+    """
+
+    deadband_enabled: bool = False
+    absolute_deadband: float = 0.0
+    relative_deadband: float = 0.0
+    heartbeat_interval: float = 300.0
+    field_deadbands: str = ""
+
+
+@dataclass
+class DeadbandStats:
+    """
+    Data class which counts the fields written or dropped by the filter
+    """
+
+    emitted: int = 0
+    suppressed: int = 0
+
+
+def parse_field_deadbands(field_deadbands: str) -> dict[tuple[str, str], tuple]:
+    """
+    Reads the deadbands of single fields from a comma separated list of
+    measurement.field=deadband entries, a deadband ending in % is relative to the
+    field's last written value and * matches any measurement or field
+    :param field_deadbands: List such as "fx-1.battery_voltage=0.2, *.warnings=0"
+    :return: (measurement, field) mapped to its (absolute, relative) deadband
+    """
+    deadbands = {}
+    for entry in field_deadbands.split(","):
+        if not entry.strip():
+            continue
+        name, separator, deadband = entry.partition("=")
+        measurement, dot, field = name.strip().rpartition(".")
+        if not (separator and dot and measurement and field):
+            raise ValueError(f'Field deadband: "{entry.strip()}" is not supported.')
+        deadband = deadband.strip()
+        if deadband.endswith("%"):
+            deadbands[measurement, field] = (0.0, float(deadband[:-1]) / 100)
+        else:
+            deadbands[measurement, field] = (float(deadband), 0.0)
+    return deadbands
+
+
+def present_fields(fields: dict) -> dict:
+    """
+    :param fields: Fields of a filtered package
+    :return: Fields which are written, without those marked as not present
+    """
+    return {
+        field: value
+        for field, value in fields.items()
+        if not (isinstance(value, float) and math.isnan(value))
+    }
+
+
+class DeadbandFilter:
+    """
+    Class which remembers the last written value and time of every field of every
+    measurement and source. A field is only written when it moves by more than
+    its absolute or relative deadband, whichever is wider, or when heartbeat
+    interval seconds of packet time have passed since it was last written, so
+    unchanged fields still show up in every query window. Dropped fields are kept
+    as NaN, which isn't serialized, so a device's packages keep one layout in the
+    sample buffer and serializer caches. Packages without a field left to write
+    are dropped
+    """
+
+    def __init__(
+        self,
+        absolute_deadband: float = 0.0,
+        relative_deadband: float = 0.0,
+        heartbeat_interval: float = 300.0,
+        field_deadbands: str = "",
+    ) -> None:
+        """
+        :param absolute_deadband: Change a field needs to be written again
+        :param relative_deadband: Change as a fraction of the field's last written
+            value a field needs to be written again
+        :param heartbeat_interval: Most seconds of packet time between writes of
+            the same field
+        :param field_deadbands: Deadbands of single fields which replace the
+            defaults, see parse_field_deadbands()
+        """
+        self._default_deadband = (absolute_deadband, relative_deadband)
+        self._heartbeat_interval = heartbeat_interval
+        self._field_deadbands = parse_field_deadbands(field_deadbands)
+        # (measurement, field) mapped to its resolved deadband
+        self._deadbands = {}
+        # (source, measurement, field) mapped to (value, seconds) last written
+        self._last_written = {}
+        # Packages are filtered from each MQTT thread and the decode pool's thread
+        self._lock = threading.Lock()
+        self.stats = DeadbandStats()
+
+    def _deadband(self, measurement: str, field: str) -> tuple[float, float]:
+        key = (measurement, field)
+        deadband = self._deadbands.get(key)
+        if deadband is None:
+            for lookup in (key, (measurement, "*"), ("*", field)):
+                if lookup in self._field_deadbands:
+                    deadband = self._field_deadbands[lookup]
+                    break
+            else:
+                deadband = self._default_deadband
+            self._deadbands[key] = deadband
+        return deadband
+
+    def filter(self, queue_package: QueuePackage) -> QueuePackage | None:
+        """
+        Marks the fields of a package which haven't moved past their deadband as
+        not present by setting them to NaN
+        :param queue_package: Package to filter, its fields are replaced
+        :return: The package, or None when none of its fields are written
+        """
+        seconds = LineProtocolSerializer.to_seconds(queue_package.time_field)
+        measurement = queue_package.measurement
+        fields = {}
+        emitted = 0
+        with self._lock:
+            for field, value in queue_package.field.items():
+                key = (queue_package.source, measurement, field)
+                last_written = self._last_written.get(key)
+                if last_written is not None:
+                    last_value, last_seconds = last_written
+                    absolute, relative = self._deadband(measurement, field)
+                    elapsed = seconds - last_seconds
+                    # NaN comparisons are False so a NaN is always written
+                    if (
+                        abs(value - last_value)
+                        <= max(absolute, relative * abs(last_value))
+                        and 0 <= elapsed < self._heartbeat_interval
+                    ):
+                        fields[field] = math.nan
+                        continue
+                self._last_written[key] = (value, seconds)
+                fields[field] = value
+                emitted += 1
+            self.stats.emitted += emitted
+            self.stats.suppressed += len(fields) - emitted
+        if not emitted:
+            logging.debug(f"Dropped unchanged {measurement} package")
+            return None
+        queue_package.field = fields
+        return queue_package
+
+    def filter_packages(self, queue_packages: list[QueuePackage]) -> list[QueuePackage]:
+        """
+        :param queue_packages: Packages to filter in the order they were decoded
+        :return: Packages which still hold fields to write
+        """
+        filtered = []
+        for queue_package in queue_packages:
+            if self.filter(queue_package) is not None:
+                filtered.append(queue_package)
+        return filtered
@@ -0,0 +1,220 @@
+"""
+Classes file, contains the decode pool which moves packet decoding off the MQTT
+network thread and into a pool of decoder processes
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from queue import Full, Queue
+from typing import Callable
+
+from src.classes.common_classes import QueuePackage
+from src.classes.deadband_classes import DeadbandFilter
+from src.classes.metrics_classes import MetricsRegistry
+from src.classes.queue_classes import IngestQueue
+from src.classes.rollup_classes import RollupAggregator
+from src.helpers.consts import QUEUE_WAIT_TIME
+from src.helpers.py_functions import get_many, wake_consumer
+
+
+@dataclass
+class DecodeSettings:
+    """
+    Data class which defines the size of each stage of the decode pool
+    """
+
+    decode_workers: int = 0
+    raw_queue_length: int = 1000
+    decode_batch_size: int = 64
+
+
+@dataclass
+class DecodeStats:
+    """
+    Data class which counts the packets passing through the decode pool
+    """
+
+    submitted: int = 0
+    dropped: int = 0
+    decoded: int = 0
+    failed: int = 0
+
+
+class DecodePool:
+    """
+    Class which collects raw data packets from the MQTT thread and decodes them in
+    batches across a pool of processes, so decoding isn't limited to one core by the
+    GIL. Decoded packages are loaded onto the ingest queue in the order the packets
+    were received. The MQTT thread only copies the payload, a full raw queue drops
+    the new packet rather than blocking the network loop
+    """
+
+    def __init__(
+        self,
+        decode_packets: Callable[[list, str], tuple[list[QueuePackage], int]],
+        ingest_queue: IngestQueue,
+        *,
+        decode_workers: int,
+        raw_queue_length: int = 1000,
+        decode_batch_size: int = 64,
+        queue_mode: str = "packet",
+        on_loaded: Callable[[], None] = None,
+        metrics: MetricsRegistry = None,
+        deadband_filter: DeadbandFilter = None,
+        rollup_aggregator: RollupAggregator = None,
+    ) -> None:
+        """
+        :param decode_packets: Picklable function which decodes a list of
+            (topic, payload, received_at, source, msg_time) packets into packages
+            and a count of failed packets
+        :param ingest_queue: Queue the decoded packages are loaded onto
+        :param decode_workers: Number of decoder processes
+        :param raw_queue_length: Maximum number of raw packets waiting to be decoded
+        :param decode_batch_size: Most packets sent to a decoder process at once
+        :param queue_mode: Queue mode the packages are created with
+        :param on_loaded: Optional callable run after packages are loaded
+        :param metrics: Optional registry which records the decode times
+        :param deadband_filter: Optional filter which drops fields that haven't
+            changed since they were last written before packages are loaded
+        :param rollup_aggregator: Optional aggregator which rolls up every decoded
+            field before the deadband filter
+        """
+        self._decode_packets = decode_packets
+        self._ingest_queue = ingest_queue
+        self._decode_workers = decode_workers
+        self._decode_batch_size = decode_batch_size
+        self._queue_mode = queue_mode
+        self._on_loaded = on_loaded
+        self._metrics = metrics
+        self._deadband_filter = deadband_filter
+        self._rollup_aggregator = rollup_aggregator
+        self._raw_queue = Queue(maxsize=raw_queue_length)
+        self._executor = None
+        self._dispatch_thread = None
+        self._running = threading.Event()
+        self.stats = DecodeStats()
+
+    def start(self) -> None:
+        """
+        Starts the decoder processes and the thread which dispatches batches to them
+        """
+        # Spawned rather than forked since the MQTT network thread is already running
+        self._executor = ProcessPoolExecutor(
+            max_workers=self._decode_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self._running.set()
+        self._dispatch_thread = threading.Thread(
+            name="Thread-Decode", target=self._dispatch
+        )
+        self._dispatch_thread.start()
+        logging.info(f"Started decode pool with {self._decode_workers} processes")
+
+    def stop(self) -> None:
+        """
+        Decodes and loads every packet already submitted then stops the pool
+        """
+        if self._dispatch_thread is None:
+            return
+        self._running.clear()
+        wake_consumer(target_queue=self._raw_queue)
+        self._dispatch_thread.join()
+        self._executor.shutdown()
+        self._dispatch_thread = None
+        logging.info(f"Stopped decode pool: {self.stats}")
+
+    def submit(
+        self,
+        topic: str,
+        payload: bytes,
+        received_at: float = None,
+        source: str = None,
+        *,
+        msg_time: int = None,
+    ) -> None:
+        """
+        Queues a raw data packet to be decoded, called from the MQTT threads
+        :param topic: Topic the packet was received on
+        :param payload: Raw packet, copied so the message can be released
+        :param received_at: time.monotonic() the packet was received
+        :param source: MQTT broker the packet was received from
+        :param msg_time: Time of a raw frame joined from its timestamp topic
+        """
+        try:
+            self._raw_queue.put_nowait(
+                (topic, bytes(payload), received_at, source, msg_time)
+            )
+            self.stats.submitted += 1
+        except Full:
+            self.stats.dropped += 1
+            logging.warning(f"Raw packet queue is full, dropped packet on {topic}")
+
+    def _send(self, packets: list, pending: deque) -> None:
+        future = self._executor.submit(self._decode_packets, packets, self._queue_mode)
+        future.add_done_callback(lambda _: wake_consumer(target_queue=self._raw_queue))
+        pending.append((future, len(packets)))
+
+    def _load(self, future: Future, packet_count: int) -> None:
+        try:
+            queue_packages, failed = future.result()
+        except Exception:
+            logging.exception(f"Decoder process failed on {packet_count} packets")
+            self.stats.failed += packet_count
+            return
+        if failed:
+            logging.warning(f"Failed to decode {failed} of {packet_count} packets")
+        self.stats.failed += failed
+        self.stats.decoded += packet_count - failed
+        if self._rollup_aggregator is not None:
+            self._rollup_aggregator.add_packages(queue_packages)
+        if self._deadband_filter is not None:
+            queue_packages = self._deadband_filter.filter_packages(queue_packages)
+        if self._metrics is not None:
+            self._record(queue_packages=queue_packages)
+        for queue_package in queue_packages:
+            self._ingest_queue.put(queue_package)
+        if queue_packages and self._on_loaded is not None:
+            self._on_loaded()
+
+    def _record(self, queue_packages: list[QueuePackage]) -> None:
+        # Decode time runs from receipt to loading, so it includes the raw queue
+        # wait, packages split per field share their packet's receive time
+        loaded_at = time.monotonic()
+        received_at = None
+        for queue_package in queue_packages:
+            if queue_package.received_at not in (None, received_at):
+                received_at = queue_package.received_at
+                self._metrics.observe("decode_seconds", loaded_at - received_at)
+        self._metrics.increment("points_queued", len(queue_packages))
+
+    def _dispatch(self) -> None:
+        # Batches are loaded in the order they were sent, at most two per process
+        # are in flight so the raw queue absorbs any backlog
+        pending = deque()
+        max_pending = 2 * self._decode_workers
+        while self._running.is_set():
+            packets = get_many(
+                source_queue=self._raw_queue,
+                max_items=self._decode_batch_size,
+                timeout=QUEUE_WAIT_TIME,
+            )
+            if packets:
+                self._send(packets=packets, pending=pending)
+            while pending and (pending[0][0].done() or len(pending) >= max_pending):
+                self._load(*pending.popleft())
+
+        while not self._raw_queue.empty():
+            packets = get_many(
+                source_queue=self._raw_queue,
+                max_items=self._decode_batch_size,
+                timeout=0,
+            )
+            if packets:
+                self._send(packets=packets, pending=pending)
+        while pending:
+            self._load(*pending.popleft())
@@ -0,0 +1,97 @@
+"""
+Classes file, contains the index used to drop data packets which have already
+been received, such as redelivered QoS messages or retained messages after a reconnect
+"""
+
+import logging
+import struct
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from src.helpers.consts import TIME_PACKET_SIZE
+
+
+@dataclass
+class DedupSettings:
+    """
+    Data class which defines how long received packets are remembered for
+    """
+
+    dedup_enabled: bool = True
+    dedup_window: float = 600.0
+    max_entries: int = 4096
+
+
+@dataclass
+class DedupStats:
+    """
+    Data class which counts the outcome of duplicate checks
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class DedupIndex:
+    """
+    Class which remembers packets by (topic, packet timestamp, payload hash)
+    for a sliding window of time, the index is bounded by a maximum number of entries.
+    Joined raw frames are remembered by the time published on their timestamp topic
+    """
+
+    def __init__(self, dedup_window: float, max_entries: int) -> None:
+        """
+        :param dedup_window: Seconds a packet is remembered for after it's first seen
+        :param max_entries: Maximum number of packets remembered, the oldest are
+            evicted first once it's reached
+        """
+        self._dedup_window = dedup_window
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self.stats = DedupStats()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def packet_key(topic: str, payload: bytes, msg_time: int = None) -> tuple:
+        """
+        :param msg_time: Time of a joined frame, read from the front of the payload
+            when not given
+        :return: Key identifying a packet by topic, timestamp and payload hash
+        """
+        packet_time = msg_time
+        if packet_time is None and len(payload) >= TIME_PACKET_SIZE:
+            packet_time = struct.unpack_from("i", payload)[0]
+        return topic, packet_time, hash(payload)
+
+    def _evict(self, now: float) -> None:
+        entries = self._entries
+        expiry = now - self._dedup_window
+        while entries and (
+            len(entries) > self._max_entries or next(iter(entries.values())) < expiry
+        ):
+            entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def seen(self, topic: str, payload: bytes, msg_time: int = None) -> bool:
+        """
+        Checks a packet against the index and remembers it if it's new
+        :param topic: Topic the packet was received on
+        :param payload: Raw packet received from the broker
+        :param msg_time: Time of a joined frame, which carries no time of its own
+        :return: True when the same packet was already received within the window
+        """
+        now = time.monotonic()
+        self._evict(now)
+        key = self.packet_key(topic=topic, payload=payload, msg_time=msg_time)
+        if key in self._entries:
+            self.stats.hits += 1
+            logging.debug(f"Dropped duplicate packet on {topic}")
+            return True
+        self._entries[key] = now
+        self.stats.misses += 1
+        self._evict(now)
+        return False
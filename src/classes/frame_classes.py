@@ -0,0 +1,108 @@
+"""
+Classes file, contains the joiner which pairs the raw frames published on each
+device's stat/raw topic with the time published on its stat/ts topic
+"""
+
+import logging
+import struct
+import time
+from dataclasses import dataclass
+
+from src.helpers.consts import TIME_PACKET_SIZE
+
+
+@dataclass
+class FrameStats:
+    """
+    Data class which counts the frames and timestamps joined or left unpaired
+    """
+
+    joined: int = 0
+    unpaired: int = 0
+
+
+def parse_timestamp(payload: bytes) -> int:
+    """
+    Reads the unix time published on a timestamp topic, either as ASCII digits or
+    packed the same way as the time at the start of a data packet
+    :param payload: Payload of the timestamp message
+    :return: Whole seconds since the epoch, like the time of a data packet
+    """
+    try:
+        return int(float(payload))
+    except ValueError:
+        if len(payload) != TIME_PACKET_SIZE:
+            raise
+        return struct.unpack("i", payload)[0]
+
+
+class FrameJoiner:
+    """
+    Class which holds the first half of each device's raw frame and timestamp
+    pair until the other half arrives, in whichever order the broker delivers
+    them. A half which isn't paired within the pair window, or is followed by
+    another of the same kind, is dropped and counted
+    """
+
+    def __init__(self, pair_window: float = 5.0) -> None:
+        """
+        :param pair_window: Most seconds between a frame and its timestamp
+        """
+        self._pair_window = pair_window
+        # Device mapped to (frame, msg_time, received_at, added_at), one of the
+        # frame or msg_time is None
+        self._pending = {}
+        self.stats = FrameStats()
+
+    def _join(
+        self,
+        device: str,
+        frame: bytes | None,
+        msg_time: int | None,
+        received_at: float | None,
+    ) -> tuple[int, bytes, float | None] | None:
+        now = time.monotonic()
+        pending = self._pending.pop(device, None)
+        if pending is not None:
+            pending_frame, pending_time, pending_received_at, added_at = pending
+            if (pending_frame is None) != (frame is None) and (
+                now - added_at <= self._pair_window
+            ):
+                self.stats.joined += 1
+                return (
+                    msg_time if pending_time is None else pending_time,
+                    frame if pending_frame is None else pending_frame,
+                    pending_received_at,
+                )
+            self.stats.unpaired += 1
+            logging.debug(f"Dropped unpaired {device} frame half")
+        self._pending[device] = (frame, msg_time, received_at, now)
+        return None
+
+    def add_frame(
+        self, device: str, frame: bytes, received_at: float = None
+    ) -> tuple[int, bytes, float | None] | None:
+        """
+        :param device: Device the frame was published for
+        :param frame: Raw frame, kept as it is without copying
+        :param received_at: time.monotonic() the frame was received
+        :return: (msg_time, frame, received_at) once the frame's timestamp has
+            arrived, received_at is when the first half of the pair was received
+        """
+        return self._join(
+            device=device, frame=frame, msg_time=None, received_at=received_at
+        )
+
+    def add_timestamp(
+        self, device: str, msg_time: int, received_at: float = None
+    ) -> tuple[int, bytes, float | None] | None:
+        """
+        :param device: Device the timestamp was published for
+        :param msg_time: Epoch seconds of the device's frame
+        :param received_at: time.monotonic() the timestamp was received
+        :return: (msg_time, frame, received_at) once the timestamp's frame has
+            arrived, received_at is when the first half of the pair was received
+        """
+        return self._join(
+            device=device, frame=None, msg_time=msg_time, received_at=received_at
+        )
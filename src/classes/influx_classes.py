@@ -3,13 +3,71 @@ Classes file, contains methods for the Influx database controller
 to do writes and queries to the database
 """
 
+import functools
 import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime
+from queue import Full, Queue
+from typing import Callable
 
 from influxdb_client import InfluxDBClient
 from influxdb_client.client.write_api import SYNCHRONOUS
 
 from src.classes.common_classes import QueuePackage, SecretStore
+from src.classes.custom_exceptions import PartialWriteError
+from src.classes.metrics_classes import MetricsRegistry
+from src.classes.retry_classes import RetryPolicy
+from src.classes.serializer_classes import NEWLINE, LineProtocolSerializer
+from src.classes.spool_classes import WriteSpool
+from src.helpers.consts import SOURCE_TAG_KEY
+from src.helpers.py_functions import get_many, wake_consumer
+
+
+@dataclass
+class WriterSettings:
+    """
+    Data class which defines how queued points are written to InfluxDB
+    """
+
+    write_mode: str = "batched"
+    batch_size: int = 500
+    flush_interval: float = 1.0
+    writer_workers: int = 1
+    write_precision: str = "s"
+    enable_gzip: bool = True
+    drain_deadline: float = 5.0
+
+
+@dataclass
+class DrainStats:
+    """
+    Data class which counts what happened to the points left to write at shutdown
+    """
+
+    flushed: int = 0
+    spooled: int = 0
+    dropped: int = 0
+
+    def add(self, drain_stats: "DrainStats") -> None:
+        """
+        Adds the counts of another writer's drain onto these counts
+        """
+        self.flushed += drain_stats.flushed
+        self.spooled += drain_stats.spooled
+        self.dropped += drain_stats.dropped
+
+    def since(self, drain_stats: "DrainStats") -> "DrainStats":
+        """
+        :return: Counts added since an earlier snapshot of a writer's totals
+        """
+        return DrainStats(
+            flushed=self.flushed - drain_stats.flushed,
+            spooled=self.spooled - drain_stats.spooled,
+            dropped=self.dropped - drain_stats.dropped,
+        )
 
 
 class InfluxConnector:
@@ -17,28 +75,65 @@ class InfluxConnector:
     Class which creates a client to access and modify a connected database
     """
 
-    def __init__(self, secret_store: SecretStore) -> None:
+    def __init__(
+        self,
+        secret_store: SecretStore,
+        connection_pool_maxsize: int = None,
+        *,
+        write_precision: str = "ns",
+        enable_gzip: bool = False,
+    ) -> None:
         """
         :param token: Secret password to login to database with
         :param org: Organization of the bucket to login to
         :param bucket: Database source
         :param url: Web address to connect to database
+        :param connection_pool_maxsize: Number of HTTP connections kept open for
+            reuse, shared by every thread writing through this connector
+        :param write_precision: Precision batches are serialized and written at
+        :param enable_gzip: Compress request bodies sent to the database
         """
         _influx_secrets = secret_store.influx_secrets
 
         self._influx_org = _influx_secrets["influx_org"]
         self._influx_bucket = _influx_secrets["influx_bucket"]
+        self._write_precision = write_precision
+
+        client_options = {}
+        if connection_pool_maxsize is not None:
+            client_options["connection_pool_maxsize"] = connection_pool_maxsize
 
         logging.info("Initializing InfluxDB client")
         self._influx_client = InfluxDBClient(
             url=_influx_secrets["influx_url"],
             org=_influx_secrets["influx_org"],
             token=_influx_secrets["influx_token"],
+            enable_gzip=enable_gzip,
+            **client_options,
         )
         logging.info("Initializing Influx write api")
         self._write_client = self._influx_client.write_api(write_options=SYNCHRONOUS)
         logging.info("Initializing Influx query api")
         self._query_client = self._influx_client.query_api(query_options=SYNCHRONOUS)
+        self._thread_local = threading.local()
+
+    @property
+    def write_precision(self) -> str:
+        """
+        Precision of the timestamps in serialized batches
+        """
+        return self._write_precision
+
+    @property
+    def _serializer(self) -> LineProtocolSerializer:
+        """
+        Serializer owned by the calling thread, so writer threads never share a buffer
+        """
+        serializer = getattr(self._thread_local, "serializer", None)
+        if serializer is None:
+            serializer = LineProtocolSerializer(precision=self._write_precision)
+            self._thread_local.serializer = serializer
+        return serializer
 
     def health_check(self) -> None:
         """
@@ -57,8 +152,8 @@ class InfluxConnector:
         assert isinstance(queue_package.field, dict | str), (
             assertion_message + "type of field not, dict | str"
         )
-        assert isinstance(queue_package.time_field, datetime), (
-            assertion_message + "type of time_field not, datetime"
+        assert isinstance(queue_package.time_field, datetime | int), (
+            assertion_message + "type of time_field not, datetime | int"
         )
 
     def write_points(self, queue_package: QueuePackage) -> None:
@@ -70,17 +165,58 @@ class InfluxConnector:
             Influx Database in dictionary
         """
         self._verify_queue_package(queue_package=queue_package)
+        record = {
+            "measurement": queue_package.measurement,
+            "fields": queue_package.field,
+        }
+        if queue_package.source:
+            record["tags"] = {SOURCE_TAG_KEY: queue_package.source}
         self._write_client.write(
             bucket=self._influx_bucket,
             org=self._influx_org,
-            record={
-                "measurement": queue_package.measurement,
-                "fields": queue_package.field,
-            },
+            record=record,
             time=queue_package.time_field,
         )  # External request
         logging.debug(f"Wrote point: {queue_package} at {queue_package.time_field}")
 
+    def serialize_batch(self, queue_packages: list[QueuePackage]) -> bytes:
+        """
+        Converts a list of packages into line protocol, each point keeps
+        its own timestamp within the line
+        :param queue_packages: List of packages popped off the queue
+        :return: Newline terminated line protocol
+        """
+        for queue_package in queue_packages:
+            self._verify_queue_package(queue_package=queue_package)
+            self._serializer.append_package(queue_package=queue_package)
+        return self._serializer.getvalue()
+
+    def write_lines(
+        self, lines: bytes, precision: str = None, bucket: str = None
+    ) -> None:
+        """
+        Writes a batch of line protocol to InfluxDB in a single request
+        :param lines: Newline terminated line protocol
+        :param precision: Precision of the timestamps, defaults to the write precision
+        :param bucket: Bucket to write to, defaults to the bucket in the secrets
+        """
+        self._write_client.write(
+            bucket=bucket or self._influx_bucket,
+            org=self._influx_org,
+            record=lines,
+            write_precision=precision or self._write_precision,
+        )  # External request
+        logging.debug(
+            f"Wrote batch of {lines.count(NEWLINE)} points ({len(lines)} bytes)"
+        )
+
+    def write_batch(self, queue_packages: list[QueuePackage]) -> None:
+        """
+        Writes a list of points to InfluxDB in a single request
+        :param queue_packages: List of packages popped off the queue
+        """
+        self.write_lines(lines=self.serialize_batch(queue_packages=queue_packages))
+
     def query_database(self, query_mode: str, query: str) -> None:
         """
         Runs given query on Influx database and returns results
@@ -103,3 +239,464 @@ class InfluxConnector:
             )  # External request
         logging.debug("Query to Influx server was successful")
         return query_result
+
+
+class BatchWriter:
+    """
+    Class which collects queue packages and writes them to InfluxDB in one request
+    once the batch is either full or has been held for longer than the flush interval.
+    When given a spool, batches that can't be delivered are spooled to disk and
+    replayed in order once InfluxDB passes a health check again. When given a retry
+    policy, transient failures are retried and rejected batches are split. Batches
+    are written to the connector's bucket unless given another bucket.
+    """
+
+    def __init__(
+        self,
+        influx_connector: InfluxConnector,
+        batch_size: int,
+        flush_interval: float,
+        *,
+        write_spool: WriteSpool = None,
+        replay_interval: float = 30.0,
+        retry_policy: RetryPolicy = None,
+        metrics: MetricsRegistry = None,
+        bucket: str = None,
+    ) -> None:
+        """
+        :param influx_connector: Connector used to write the batches
+        :param batch_size: Number of points which triggers a flush
+        :param flush_interval: Age in seconds of the oldest point which triggers a flush
+        :param write_spool: Optional spool for batches which fail to write
+        :param replay_interval: Seconds between health checks while the spool holds data
+        :param retry_policy: Optional policy for retrying failed writes
+        :param metrics: Optional registry which records queue and write latencies
+        :param bucket: Bucket to write to, defaults to the connector's bucket
+        """
+        self._influx_connector = influx_connector
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._write_spool = write_spool
+        self._replay_interval = replay_interval
+        self._retry_policy = retry_policy
+        self._metrics = metrics
+        self._bucket = bucket
+        self._next_replay = 0.0
+        self._batch = []
+        self._batch_started = None
+        self.batches_written = 0
+        self.points_written = 0
+        self.points_spooled = 0
+        self.points_dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._batch)
+
+    @property
+    def batch_size(self) -> int:
+        """
+        Number of points which triggers a flush
+        """
+        return self._batch_size
+
+    def add(self, queue_package: QueuePackage) -> None:
+        """
+        Adds a package to the current batch
+        """
+        now = time.monotonic()
+        if not self._batch:
+            self._batch_started = now
+        self._batch.append(queue_package)
+        if self._metrics is not None and queue_package.received_at is not None:
+            self._metrics.observe("queue_wait_seconds", now - queue_package.received_at)
+
+    def time_until_due(self) -> float:
+        """
+        :return: Seconds until the current batch must be flushed
+        """
+        if not self._batch:
+            return self._flush_interval
+        elapsed = time.monotonic() - self._batch_started
+        return max(0.0, self._flush_interval - elapsed)
+
+    def is_due(self) -> bool:
+        """
+        :return: True when the batch has reached its size or age limit
+        """
+        if not self._batch:
+            return False
+        return len(self._batch) >= self._batch_size or self.time_until_due() == 0.0
+
+    def _write_lines(self, lines: bytes, precision: str = None) -> None:
+        write_lines = self._influx_connector.write_lines
+        if precision is not None:
+            write_lines = functools.partial(write_lines, precision=precision)
+        if self._bucket is not None:
+            write_lines = functools.partial(write_lines, bucket=self._bucket)
+        if self._retry_policy is None:
+            write_lines(lines=lines)
+        else:
+            self._retry_policy.write(write_lines=write_lines, lines=lines)
+
+    def flush(self) -> None:
+        """
+        Writes the current batch to InfluxDB and logs the batch latency and throughput,
+        the batch is cleared even if the write fails. While the spool holds data
+        new batches are appended to it so points are replayed in order.
+        """
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        lines = self._influx_connector.serialize_batch(queue_packages=batch)
+        if self._write_spool is not None and not self._write_spool.is_empty:
+            self._write_spool.append(
+                lines=lines, precision=self._influx_connector.write_precision
+            )
+            self._count_spooled(len(batch))
+            return
+
+        start_time = time.perf_counter()
+        try:
+            self._write_lines(lines=lines)
+        except Exception as err:
+            if self._write_spool is None:
+                raise
+            # A split batch which failed part way only spools what wasn't written
+            spooled_points = len(batch)
+            if isinstance(err, PartialWriteError):
+                lines = err.lines
+                spooled_points = lines.count(NEWLINE)
+            logging.exception(
+                f"Failed to write batch to Influx server, spooling {spooled_points} "
+                f"points"
+            )
+            self._write_spool.append(
+                lines=lines, precision=self._influx_connector.write_precision
+            )
+            self._count_spooled(spooled_points)
+            self._next_replay = time.monotonic() + self._replay_interval
+            return
+        latency = time.perf_counter() - start_time
+        self.batches_written += 1
+        self.points_written += len(batch)
+        if self._metrics is not None:
+            self._record_write(batch=batch, latency=latency)
+        points_per_second = len(batch) / latency if latency > 0 else float("inf")
+        logging.info(
+            f"Wrote batch of {len(batch)} points in {latency * 1000:.1f}ms "
+            f"({points_per_second:.0f} points/s)"
+        )
+
+    def _record_write(self, batch: list[QueuePackage], latency: float) -> None:
+        self._metrics.observe("write_seconds", latency)
+        self._metrics.increment("points_written", len(batch))
+        written_at = time.monotonic()
+        for queue_package in batch:
+            if queue_package.received_at is not None:
+                self._metrics.observe(
+                    "end_to_end_seconds", written_at - queue_package.received_at
+                )
+
+    def _count_spooled(self, points: int) -> None:
+        self.points_spooled += points
+        if self._metrics is not None:
+            self._metrics.increment("points_spooled", points)
+
+    def _count_dropped(self, points: int) -> None:
+        self.points_dropped += points
+        if self._metrics is not None:
+            self._metrics.increment("points_dropped", points)
+
+    def time_until_replay(self) -> float | None:
+        """
+        :return: Seconds until the spool is next replayed, None when it's empty
+        """
+        if self._write_spool is None or self._write_spool.is_empty:
+            return None
+        return max(0.0, self._next_replay - time.monotonic())
+
+    def replay_spool(self) -> None:
+        """
+        Replays one spooled segment once InfluxDB passes a health check,
+        health checks are limited to one per replay interval while InfluxDB is down.
+        Writers sharing the spool leave it to whichever of them is replaying
+        """
+        if self._write_spool is None or self._write_spool.is_empty:
+            return
+        if time.monotonic() < self._next_replay or self._write_spool.is_replaying:
+            return
+        try:
+            self._influx_connector.health_check()
+        except Exception:
+            logging.warning(
+                f"InfluxDB still unavailable, {self._write_spool.size_bytes} bytes spooled"
+            )
+            self._next_replay = time.monotonic() + self._replay_interval
+            return
+        try:
+            self._write_spool.replay(
+                write_lines=self._write_lines,
+                batch_size=self._batch_size,
+            )
+        except Exception:
+            logging.exception("Failed to replay spooled points to Influx server")
+            self._next_replay = time.monotonic() + self._replay_interval
+
+    def drain(self, source_queue: Queue, is_running: Callable[[], bool]) -> None:
+        """
+        Blocks until packages are put on the queue then pops every waiting package
+        into the batch until told to stop, the last batch is left for finish
+        :param source_queue: Queue of packages to write
+        :param is_running: Callable which returns False once the writer should stop
+        """
+        while is_running():
+            self.replay_spool()
+            queue_packages: list[QueuePackage] = get_many(
+                source_queue=source_queue,
+                max_items=max(1, self._batch_size - len(self._batch)),
+                timeout=self.time_until_due(),
+            )
+            for queue_package in queue_packages:
+                self.add(queue_package)
+            if self.is_due():
+                self._try_flush()
+
+    def _try_flush(self) -> None:
+        batch_length = len(self._batch)
+        try:
+            self.flush()
+        except Exception:
+            logging.exception(
+                "Failed to run batch write to Influx server, returned error"
+            )
+            self._count_dropped(batch_length)
+
+    def totals(self) -> DrainStats:
+        """
+        :return: Running totals of the points written, spooled and dropped
+        """
+        return DrainStats(
+            flushed=self.points_written,
+            spooled=self.points_spooled,
+            dropped=self.points_dropped,
+        )
+
+    def persist(self, queue_packages: list[QueuePackage]) -> None:
+        """
+        Appends packages which there's no time left to write to the spool,
+        without a spool they're dropped
+        """
+        if not queue_packages:
+            return
+        if self._write_spool is None:
+            logging.warning(f"No write spool, dropped {len(queue_packages)} points")
+            self._count_dropped(len(queue_packages))
+            return
+        lines = self._influx_connector.serialize_batch(queue_packages=queue_packages)
+        self._write_spool.append(
+            lines=lines, precision=self._influx_connector.write_precision
+        )
+        self._count_spooled(len(queue_packages))
+
+    def finish(self, source_queue: Queue, deadline: float) -> DrainStats:
+        """
+        Writes the current batch then every package left on the queue in batches
+        until the deadline passes, anything still queued after it is persisted.
+        No retry is started past the deadline, a batch which is still failing is
+        spooled, so only a single slow request can overrun it
+        :param source_queue: Queue of packages to write, no longer being loaded
+        :param deadline: time.monotonic() value after which packages are persisted
+        :return: Counts of the points flushed, spooled and dropped
+        """
+        totals = self.totals()
+        if self._retry_policy is not None:
+            self._retry_policy.set_deadline(deadline)
+        self._try_flush()
+        while not source_queue.empty() and time.monotonic() < deadline:
+            for queue_package in get_many(
+                source_queue=source_queue, max_items=self._batch_size, timeout=0
+            ):
+                self.add(queue_package)
+            self._try_flush()
+        if not source_queue.empty():
+            logging.warning("Drain deadline passed with points still queued")
+        while not source_queue.empty():
+            self.persist(
+                queue_packages=get_many(
+                    source_queue=source_queue, max_items=self._batch_size, timeout=0
+                )
+            )
+        return self.totals().since(totals)
+
+
+class ShardMap:
+    """
+    Class which maps each measurement of a source onto one of a fixed number of
+    shards, new measurements are handed out round robin so devices are spread
+    evenly and a measurement never changes shard
+    """
+
+    def __init__(self, shard_count: int) -> None:
+        """
+        :param shard_count: Number of shards to spread measurements across
+        """
+        self._shard_count = shard_count
+        self._shards = {}
+
+    def shard(self, measurement: str, source: str = None) -> int:
+        """
+        :return: Index of the shard which owns the measurement
+        """
+        shard_key = (source, measurement)
+        shard = self._shards.get(shard_key)
+        if shard is None:
+            shard = len(self._shards) % self._shard_count
+            self._shards[shard_key] = shard
+        return shard
+
+
+class WriterPool:
+    """
+    Class which shards queue packages by measurement across a pool of batch writers,
+    each running in its own thread. Every point of a measurement goes through the
+    same writer so each device's points are still written in timestamp order.
+    """
+
+    def __init__(self, batch_writers: list[BatchWriter], queue_length: int) -> None:
+        """
+        :param batch_writers: One batch writer per worker thread
+        :param queue_length: Maximum number of packages held for each worker,
+            also the most packages taken off the source queue at once
+        """
+        self._batch_writers = batch_writers
+        self._queue_length = queue_length
+        self._worker_queues = [Queue(maxsize=queue_length) for _ in batch_writers]
+        self._shard_map = ShardMap(shard_count=len(batch_writers))
+        self._deadline = 0.0
+
+    def __len__(self) -> int:
+        return len(self._batch_writers)
+
+    def shard(self, measurement: str, source: str = None) -> int:
+        """
+        Maps a measurement of a source onto a worker, new measurements are handed out
+        round robin so devices are spread evenly and a measurement never changes worker
+        :return: Index of the worker which writes the measurement
+        """
+        return self._shard_map.shard(measurement=measurement, source=source)
+
+    def put(self, queue_package: QueuePackage, timeout: float) -> None:
+        """
+        Hands a package to the worker which owns its measurement
+        :raises Full: When the worker's queue stays full for the whole timeout
+        """
+        worker_queue = self._worker_queues[
+            self.shard(queue_package.measurement, queue_package.source)
+        ]
+        worker_queue.put(queue_package, timeout=timeout)
+
+    def _dispatch(
+        self,
+        queue_packages: list[QueuePackage],
+        keep_trying: Callable[[], bool],
+        wait_time: float,
+    ) -> list[QueuePackage]:
+        """
+        Hands packages to their workers in order, waiting on full worker queues
+        :return: Packages not handed over before keep_trying returned False
+        """
+        for index, queue_package in enumerate(queue_packages):
+            while True:
+                try:
+                    self.put(queue_package=queue_package, timeout=wait_time)
+                    break
+                except Full:
+                    logging.debug(
+                        f"Writer queue for {queue_package.measurement} is full"
+                    )
+                    if not keep_trying():
+                        return queue_packages[index:]
+        return []
+
+    def _before_deadline(self) -> bool:
+        return time.monotonic() < self._deadline
+
+    def _drain_worker(self, index: int, is_running: Callable[[], bool]) -> None:
+        batch_writer = self._batch_writers[index]
+        worker_queue = self._worker_queues[index]
+        batch_writer.drain(source_queue=worker_queue, is_running=is_running)
+        batch_writer.finish(source_queue=worker_queue, deadline=self._deadline)
+
+    def run(
+        self,
+        source_queue: Queue,
+        is_running: Callable[[], bool],
+        wait_time: float,
+        *,
+        drain_deadline: float = math.inf,
+    ) -> DrainStats:
+        """
+        Starts the worker threads then dispatches packages from the source queue
+        until told to stop. Packages left on the source queue are then dispatched
+        and written until drain_deadline seconds have passed, anything left after
+        that is persisted. Returns once every worker has finished
+        :param source_queue: Queue of packages to write
+        :param is_running: Callable which returns False once the pool should stop
+        :param wait_time: Seconds to block on a queue before checking is_running
+        :param drain_deadline: Seconds allowed to write what's left once stopped
+        :return: Counts of the points flushed, spooled and dropped once stopped
+        """
+        workers_running = threading.Event()
+        workers_running.set()
+        worker_threads = [
+            threading.Thread(
+                name=f"Thread-Influx-{index}",
+                target=self._drain_worker,
+                kwargs={"index": index, "is_running": workers_running.is_set},
+            )
+            for index in range(len(self._batch_writers))
+        ]
+        for worker_thread in worker_threads:
+            worker_thread.start()
+            logging.info(f"Started thread: {worker_thread.name}")
+
+        unsent = []
+        while is_running() and not unsent:
+            unsent = self._dispatch(
+                queue_packages=get_many(
+                    source_queue=source_queue,
+                    max_items=self._queue_length,
+                    timeout=wait_time,
+                ),
+                keep_trying=is_running,
+                wait_time=wait_time,
+            )
+
+        # The workers keep writing while the rest of the queue is handed to them
+        self._deadline = time.monotonic() + drain_deadline
+        totals = [batch_writer.totals() for batch_writer in self._batch_writers]
+        while not unsent and not source_queue.empty() and self._before_deadline():
+            unsent = self._dispatch(
+                queue_packages=get_many(
+                    source_queue=source_queue, max_items=self._queue_length, timeout=0
+                ),
+                keep_trying=self._before_deadline,
+                wait_time=min(wait_time, drain_deadline),
+            )
+
+        workers_running.clear()
+        for worker_queue in self._worker_queues:
+            wake_consumer(target_queue=worker_queue)
+        for worker_thread in worker_threads:
+            worker_thread.join()
+            logging.info(f"Joined thread: {worker_thread.name}")
+
+        # Every worker has finished, so the first one persists what wasn't handed over
+        self._batch_writers[0].persist(queue_packages=unsent)
+        self._batch_writers[0].finish(
+            source_queue=source_queue, deadline=self._deadline
+        )
+        drain_stats = DrainStats()
+        for batch_writer, writer_totals in zip(self._batch_writers, totals):
+            drain_stats.add(batch_writer.totals().since(writer_totals))
+        return drain_stats
@@ -0,0 +1,213 @@
+"""
+Classes file, contains the metrics registry which counts messages, points and
+drops and keeps latency histograms for each stage of the pipeline
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import asdict, dataclass, field
+from typing import Callable
+
+# Upper bounds in seconds of the histogram buckets, doubling from 1us to ~134s
+BUCKET_BOUNDS = tuple(0.000001 * 2**index for index in range(28))
+
+
+@dataclass
+class MetricsSettings:
+    """
+    Data class which defines whether metrics are kept and how often they're logged
+    """
+
+    metrics_enabled: bool = True
+    summary_interval: float = 60.0
+
+
+@dataclass
+class HistogramSummary:
+    """
+    Data class which summarises a latency histogram in seconds, quantiles are the
+    upper bound of the bucket they fall in so they're accurate to within 2x
+    """
+
+    count: int = 0
+    mean: float = 0.0
+    p50: float = 0.0
+    p90: float = 0.0
+    p99: float = 0.0
+    max: float = 0.0
+
+
+@dataclass
+class MetricsSnapshot:
+    """
+    Data class which holds a point in time copy of every metric in a registry
+    """
+
+    uptime: float = 0.0
+    counters: dict[str, int] = field(default_factory=dict)
+    gauges: dict[str, float] = field(default_factory=dict)
+    histograms: dict[str, HistogramSummary] = field(default_factory=dict)
+    stats: dict[str, dict] = field(default_factory=dict)
+
+
+class Histogram:
+    """
+    Class which counts observations into fixed log scale buckets
+    """
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Adds one observation to the bucket it falls in
+        """
+        self.buckets[bisect_left(BUCKET_BOUNDS, value)] += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def merge(self, histogram: "Histogram") -> None:
+        """
+        Adds the observations of another histogram onto this one
+        """
+        for index, count in enumerate(list(histogram.buckets)):
+            self.buckets[index] += count
+        self.total += histogram.total
+        self.max = max(self.max, histogram.max)
+
+    def _quantile(self, count: int, quantile: float) -> float:
+        rank = quantile * count
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def summary(self) -> HistogramSummary:
+        """
+        :return: Count, mean, quantiles and max of the observations
+        """
+        count = sum(self.buckets)
+        if count == 0:
+            return HistogramSummary()
+        return HistogramSummary(
+            count=count,
+            mean=self.total / count,
+            p50=min(self._quantile(count, 0.5), self.max),
+            p90=min(self._quantile(count, 0.9), self.max),
+            p99=min(self._quantile(count, 0.99), self.max),
+            max=self.max,
+        )
+
+
+class _MetricsShard:
+    """
+    Counters and histograms written by a single thread
+    """
+
+    def __init__(self) -> None:
+        self.counters: dict[str, int] = {}
+        self.histograms: dict[str, Histogram] = {}
+
+
+class MetricsRegistry:
+    """
+    Class which keeps counters and latency histograms for the pipeline. Each thread
+    records into its own shard so the hot path never takes a lock, shards are
+    only merged when a snapshot is taken. Stats data classes kept by other
+    classes and gauges such as the queue depth are read when a snapshot is taken
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards: list[_MetricsShard] = []
+        self._shards_lock = threading.Lock()
+        self._stats: dict[str, object] = {}
+        self._gauges: dict[str, Callable[[], float]] = {}
+        self._started = time.monotonic()
+
+    def _shard(self) -> _MetricsShard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = _MetricsShard()
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """
+        Adds to a counter, counters start at 0
+        """
+        counters = self._shard().counters
+        counters[name] = counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        Adds an observation in seconds to a histogram
+        """
+        histograms = self._shard().histograms
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def register_stats(self, name: str, stats: object) -> None:
+        """
+        Includes a stats data class in every snapshot, read as it is at the time
+        """
+        self._stats[name] = stats
+
+    def register_gauge(self, name: str, gauge: Callable[[], float]) -> None:
+        """
+        Includes the value returned by a callable in every snapshot
+        """
+        self._gauges[name] = gauge
+
+    def snapshot(self) -> MetricsSnapshot:
+        """
+        Merges every thread's counters and histograms, can be called from any thread
+        :return: Copy of every metric as it is now
+        """
+        with self._shards_lock:
+            shards = list(self._shards)
+        counters: dict[str, int] = {}
+        histograms: dict[str, Histogram] = {}
+        for shard in shards:
+            for name, count in dict(shard.counters).items():
+                counters[name] = counters.get(name, 0) + count
+            for name, histogram in dict(shard.histograms).items():
+                histograms.setdefault(name, Histogram()).merge(histogram)
+        return MetricsSnapshot(
+            uptime=time.monotonic() - self._started,
+            counters=dict(sorted(counters.items())),
+            gauges={name: gauge() for name, gauge in self._gauges.items()},
+            histograms={
+                name: histogram.summary()
+                for name, histogram in sorted(histograms.items())
+            },
+            stats={name: asdict(stats) for name, stats in self._stats.items()},
+        )
+
+    def summary(self) -> str:
+        """
+        :return: One line summary of a snapshot, latencies in milliseconds
+        """
+        snapshot = self.snapshot()
+        parts = [f"uptime={snapshot.uptime:.0f}s"]
+        parts += [f"{name}={count}" for name, count in snapshot.counters.items()]
+        parts += [f"{name}={value:g}" for name, value in snapshot.gauges.items()]
+        for name, summary in snapshot.histograms.items():
+            parts.append(
+                f"{name}(n={summary.count} p50={summary.p50 * 1000:.2f}ms "
+                f"p99={summary.p99 * 1000:.2f}ms max={summary.max * 1000:.2f}ms)"
+            )
+        for name, stats in snapshot.stats.items():
+            counts = ",".join(f"{key}={value}" for key, value in stats.items() if value)
+            parts.append(f"{name}({counts})")
+        return " ".join(parts)
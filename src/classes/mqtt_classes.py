@@ -11,13 +11,25 @@ import struct
 import time
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Tuple
+from typing import Callable, Tuple
 
 from paho.mqtt.client import Client, MQTTMessage
 from pymate.matenet import DCStatusPacket, FXStatusPacket, MXStatusPacket
 
+from src.classes.capture_classes import CaptureWriter
 from src.classes.common_classes import QueuePackage, SecretStore
-from src.helpers.consts import QUEUE_WAIT_TIME, THREADED_QUEUE, TIME_PACKET_SIZE
+from src.classes.deadband_classes import DeadbandFilter
+from src.classes.decode_classes import DecodePool
+from src.classes.dedup_classes import DedupIndex
+from src.classes.frame_classes import FrameJoiner, parse_timestamp
+from src.classes.metrics_classes import MetricsRegistry
+from src.classes.native_classes import NativeDecoder
+from src.classes.queue_classes import IngestQueue
+from src.classes.rollup_classes import RollupAggregator
+from src.helpers.consts import THREADED_QUEUE, TIME_PACKET_SIZE
+
+# Packed time at the start of each data packet
+_TIME_STRUCT = struct.Struct("i")
 
 
 class PyMateDecoder:
@@ -26,16 +38,15 @@ class PyMateDecoder:
     """
 
     @staticmethod
-    def detach_time(
-        msg: bytearray, padding_at_end: int = 0
-    ) -> Tuple[bytearray, bytearray]:
+    def detach_time(msg: bytes, padding_at_end: int = 0) -> Tuple[int, memoryview]:
         """
-        Splits the bytearray into two objects, time and payload
+        Splits the packet into its time and payload without copying it, the time is
+        read in place and the payload is a view into the packet
+        :return: Epoch seconds of the packet and its payload
         """
-        raw_time = msg[:TIME_PACKET_SIZE]
-        msg_time = struct.unpack("i", raw_time)
-        msg_payload = msg[TIME_PACKET_SIZE:-padding_at_end]
-        return msg_time[0], msg_payload
+        msg_time = _TIME_STRUCT.unpack_from(msg)[0]
+        msg_payload = memoryview(msg)[TIME_PACKET_SIZE : len(msg) - padding_at_end]
+        return msg_time, msg_payload
 
     @staticmethod
     def dc_decoder(msg: bytearray) -> dict:
@@ -67,6 +78,50 @@ class PyMateDecoder:
         mx_packet = MXStatusPacket.from_buffer(msg).__dict__
         return {key: value for (key, value) in mx_packet.items() if key != "raw"}
 
+    @staticmethod
+    def decode_packet(
+        topic: str,
+        payload: bytes,
+        native_decoders: bool = False,
+        msg_time: int = None,
+    ) -> tuple[str, int, dict]:
+        """
+        Decodes a packet received on one of the device data topics, or a raw frame
+        received on one of the stat/raw topics
+        :param topic: Data or stat/raw topic the packet was received on
+        :param payload: Raw packet received from the broker
+        :param native_decoders: Decode with the struct decoders instead of pymate
+        :param msg_time: Time of a raw frame from its stat/ts topic, data packets
+            carry their own time
+        :return: Measurement name, packet epoch seconds and decoded fields
+        """
+        if msg_time is None:
+            device_topic = DEVICE_TOPICS[topic]
+            time_field, fields = device_topic.decode(
+                payload=payload, native_decoders=native_decoders
+            )
+        else:
+            device_topic = FRAME_TOPICS[topic]
+            time_field, fields = device_topic.decode_frame(
+                frame=payload, msg_time=msg_time, native_decoders=native_decoders
+            )
+        return device_topic.measurement, time_field, fields
+
+
+INGEST_TOPICS = ("data", "raw")
+
+
+@dataclass
+class ReaderSettings:
+    """
+    Data class which defines how decoded packets are loaded onto the queue
+    """
+
+    queue_mode: str = "packet"
+    native_decoders: bool = False
+    ingest_topics: str = "data"
+    pair_window: float = 5.0
+
 
 @dataclass
 class MqttTopics:
@@ -95,6 +150,95 @@ class MqttTopics:
     mx_ts = "mate/mx-1/stat/ts"
 
 
+@dataclass(frozen=True)
+class DeviceTopic:
+    """
+    Data class which defines how packets received on a device's data topic are
+    decoded, the measurement they're written to and the topic of its status.
+    The same frame is also published on its own with its time on the raw and
+    timestamp topics
+    """
+
+    measurement: str
+    status_topic: str
+    padding_at_end: int
+    decoder: Callable[[bytearray], dict]
+    native_decoder: Callable[[bytes, int], dict[str, float]]
+    raw_topic: str
+    ts_topic: str
+
+    def decode_frame(
+        self, frame: bytes, msg_time: int, native_decoders: bool = False
+    ) -> tuple[int, dict]:
+        """
+        :param frame: Raw frame without its time or padding
+        :param msg_time: Epoch seconds of the frame
+        :param native_decoders: Decode with the struct decoder instead of pymate,
+            its fields are already floats
+        :return: Packet epoch seconds and decoded fields
+        """
+        decoder = self.native_decoder if native_decoders else self.decoder
+        return msg_time, decoder(frame)
+
+    def decode(self, payload: bytes, native_decoders: bool = False) -> tuple[int, dict]:
+        """
+        :param payload: Raw packet received from the broker
+        :param native_decoders: Decode with the struct decoder instead of pymate,
+            its fields are already floats
+        :return: Packet epoch seconds and decoded fields
+        """
+        if native_decoders:
+            # The struct decoder reads the frame in place, the padding is left unread
+            msg_time = _TIME_STRUCT.unpack_from(payload)[0]
+            return msg_time, self.native_decoder(payload, TIME_PACKET_SIZE)
+        msg_time, msg_payload = PyMateDecoder.detach_time(
+            msg=payload, padding_at_end=self.padding_at_end
+        )
+        return msg_time, self.decoder(msg_payload)
+
+
+# Each device's data topic mapped to how its packets are decoded, a new device type
+# only needs its topics in MqttTopics and an entry here
+# NOTE: Due to errors in our packet packing, it introduces a random buffer at the end
+DEVICE_TOPICS = {
+    MqttTopics.dc_data: DeviceTopic(
+        measurement=MqttTopics.dc_name,
+        status_topic=MqttTopics.dc_status,
+        padding_at_end=2,
+        decoder=PyMateDecoder.dc_decoder,
+        native_decoder=NativeDecoder.dc_decoder,
+        raw_topic=MqttTopics.dc_raw,
+        ts_topic=MqttTopics.dc_ts,
+    ),
+    MqttTopics.fx_data: DeviceTopic(
+        measurement=MqttTopics.fx_name,
+        status_topic=MqttTopics.fx_status,
+        padding_at_end=3,
+        decoder=PyMateDecoder.fx_decoder,
+        native_decoder=NativeDecoder.fx_decoder,
+        raw_topic=MqttTopics.fx_raw,
+        ts_topic=MqttTopics.fx_ts,
+    ),
+    MqttTopics.mx_data: DeviceTopic(
+        measurement=MqttTopics.mx_name,
+        status_topic=MqttTopics.mx_status,
+        padding_at_end=3,
+        decoder=PyMateDecoder.mx_decoder,
+        native_decoder=NativeDecoder.mx_decoder,
+        raw_topic=MqttTopics.mx_raw,
+        ts_topic=MqttTopics.mx_ts,
+    ),
+}
+
+# Each device's raw and timestamp topics mapped to the device, the raw frames
+# have no time or padding attached so they're decoded without slicing
+FRAME_TOPICS = {
+    topic: device_topic
+    for device_topic in DEVICE_TOPICS.values()
+    for topic in (device_topic.raw_topic, device_topic.ts_topic)
+}
+
+
 class MqttConnector:
     """
     Class which creates a client to connect to MQTT subscriber and decode the messages
@@ -102,23 +246,70 @@ class MqttConnector:
 
     def __init__(
         self,
-        secret_store: SecretStore,
+        secret_store: SecretStore | None,
+        reader_settings: ReaderSettings = None,
+        dedup_index: DedupIndex = None,
+        ingest_queue: IngestQueue = None,
+        decode_pool: DecodePool = None,
+        *,
+        metrics: MetricsRegistry = None,
+        source: str = None,
+        deadband_filter: DeadbandFilter = None,
+        rollup_aggregator: RollupAggregator = None,
+        capture_writer: CaptureWriter = None,
     ) -> None:
         """
+        :param secret_store: Store holding the broker's secrets, None for a
+            connector which is only fed replayed messages and never connects
         :param host: Web url for the subscriber to listen on
         :param port: Port which the web server uses for MQTT
         :param user: Username to access MQTT server
         :param token: Token to access MQTT server
-        :param influx_connector: Database for the MQTTDecoder to write results to
-        """
-        self._status = {
-            MqttTopics.mate_status: "offline",
-            MqttTopics.dc_status: "offline",
-            MqttTopics.fx_status: "offline",
-            MqttTopics.mx_status: "offline",
-        }
+        :param reader_settings: Settings for loading decoded packets onto the queue
+        :param dedup_index: Optional index used to drop duplicate data packets
+        :param ingest_queue: Queue decoded packets are loaded onto, defaults to the
+            global queue dropping the oldest packages when full
+        :param decode_pool: Optional pool which decodes data packets in other
+            processes, the packets are decoded on the MQTT thread without one
+        :param metrics: Optional registry which counts messages and decode times
+        :param source: Name of the broker in the secret store's MQTT brokers, every
+            package decoded from it is tagged with the name. None is the only
+            broker when MQTT_SOURCES isn't set
+        :param deadband_filter: Optional filter which drops fields that haven't
+            changed since they were last written, shared by every broker
+        :param rollup_aggregator: Optional aggregator which rolls up every decoded
+            field before the deadband filter, shared by every broker
+        :param capture_writer: Optional writer which captures every message
+            received from the broker before it's handled
+        """
+        self._reader_settings = reader_settings or ReaderSettings()
+        ingest_topics = self._reader_settings.ingest_topics
+        if ingest_topics not in INGEST_TOPICS:
+            raise ValueError(f'Ingest topics: "{ingest_topics}" is not supported.')
+        # Only one topic set is decoded, otherwise every frame would be written twice
+        if ingest_topics == "raw":
+            self._data_topics, self._frame_topics = {}, FRAME_TOPICS
+        else:
+            self._data_topics, self._frame_topics = DEVICE_TOPICS, {}
+        self._frame_joiner = FrameJoiner(pair_window=self._reader_settings.pair_window)
+        if metrics is not None and ingest_topics == "raw":
+            stats_name = "frame_join" if source is None else f"frame_join_{source}"
+            metrics.register_stats(stats_name, self._frame_joiner.stats)
+        self._dedup_index = dedup_index
+        self._ingest_queue = ingest_queue or IngestQueue(target_queue=THREADED_QUEUE)
+        self._decode_pool = decode_pool
+        self._deadband_filter = deadband_filter
+        self._rollup_aggregator = rollup_aggregator
+        self._capture_writer = capture_writer
+        self._metrics = metrics
+        self._status = {MqttTopics.mate_status: "offline"}
+        for device_topic in DEVICE_TOPICS.values():
+            self._status[device_topic.status_topic] = "offline"
         self._dec_msg = None
-        self._mqtt_secrets = secret_store.mqtt_secrets
+        self._source = source
+        self._mqtt_secrets = (
+            None if secret_store is None else secret_store.mqtt_brokers[source]
+        )
         self._mqtt_client = Client()
 
     @staticmethod
@@ -189,107 +380,180 @@ class MqttConnector:
         Called everytime a status message is received and checks the status of the server
         :param msg: Received message from MQTT broker
         """
-        for topic, _ in self._status.items():
-            if msg.topic == topic and msg.payload.decode("ascii") == "offline":
-                self._status[topic] = "offline"
-                logging.warning(f"{msg.topic} has gone offline")
-            elif msg.topic == topic and msg.payload.decode("ascii") == "online":
-                self._status[topic] = "online"
-                logging.info(f"{msg.topic} is now online")
+        if msg.topic not in self._status:
+            return
+        status = msg.payload.decode("ascii")
+        if status == "offline":
+            self._status[msg.topic] = "offline"
+            logging.warning(f"{msg.topic} has gone offline")
+        elif status == "online":
+            self._status[msg.topic] = "online"
+            logging.info(f"{msg.topic} is now online")
 
-    @staticmethod
-    def _load_queue(measurement: str, time_field: datetime, payload: dict) -> None:
+    def _is_duplicate(self, msg: MQTTMessage) -> bool:
         """
-        Unpacks the payload and assigns a new message with each item in the payload,
-        this sets all messages in the packet with the same time and measurement field
-        Then loads each packet into a globally accessible queue.
+        Checks data packets against the dedup index before they're decoded,
+        raw frames are checked once they've been joined with their timestamp
+        :param msg: Received message from MQTT broker
+        :return: True when the packet has already been received
         """
-        for key, value in payload.items():
-            # We don't like a queue building up since it means our program isn't
-            # handling the volume of data or a service is offline
-            while THREADED_QUEUE.full():
-                logging.error(f"Queue is full, sleeping for {QUEUE_WAIT_TIME} seconds")
-                time.sleep(QUEUE_WAIT_TIME)
-            THREADED_QUEUE.put(
-                QueuePackage(
-                    measurement=measurement,
-                    time_field=time_field,
-                    field={key: float(value)},
-                )
+        if self._dedup_index is None or msg.topic not in self._data_topics:
+            return False
+        return self._dedup_index.seen(topic=msg.topic, payload=msg.payload)
+
+    def _submit_packet(self, msg: MQTTMessage, received_at: float) -> None:
+        """
+        Hands a data packet to the decode pool when its device is online
+        :param msg: Received message from MQTT broker
+        :param received_at: time.monotonic() the message was received
+        """
+        if self._status[self._data_topics[msg.topic].status_topic] == "online":
+            logging.debug(f"Submitted {msg.topic} packet to decode pool")
+            self._decode_pool.submit(
+                topic=msg.topic,
+                payload=msg.payload,
+                received_at=received_at,
+                source=self._source,
             )
+
+    def _load_queue(
+        self,
+        measurement: str,
+        time_field: datetime | int,
+        payload: dict,
+        received_at: float = None,
+    ) -> None:
+        """
+        Converts the payload into a package holding all fields of the packet and
+        loads it into a globally accessible queue. When queue_mode is 'field' each
+        field is loaded as its own package with the same time and measurement field.
+        Packages are rolled up, then fields which haven't changed are dropped when
+        there's a deadband filter.
+        """
+        queue_packages = create_queue_packages(
+            measurement=measurement,
+            time_field=time_field,
+            payload=payload,
+            queue_mode=self._reader_settings.queue_mode,
+            received_at=received_at,
+            source=self._source,
+            float_fields=self._reader_settings.native_decoders,
+        )
+        if self._rollup_aggregator is not None:
+            self._rollup_aggregator.add_packages(queue_packages)
+        if self._deadband_filter is not None:
+            queue_packages = self._deadband_filter.filter_packages(queue_packages)
+        if self._metrics is not None and received_at is not None:
+            self._metrics.observe("decode_seconds", time.monotonic() - received_at)
+            self._metrics.increment("points_queued", len(queue_packages))
+        for queue_package in queue_packages:
+            # We don't like a queue building up since it means our program isn't
+            # handling the volume of data or a service is offline, but this runs in
+            # the MQTT network thread so the overflow policy never blocks for long
+            self._ingest_queue.put(queue_package)
         logging.info(
-            f"Pushed items onto queue, queue now has {THREADED_QUEUE.qsize()} items"
+            f"Pushed items onto queue, queue now has {self._ingest_queue.qsize()} items"
         )
 
-    def _decode_message(self, msg: MQTTMessage) -> None:
+    def _decode_message(self, msg: MQTTMessage, received_at: float = None) -> None:
         """
         Handles all code around decoding raw bytestrings and loading the packets into a global queue
         :param msg: Takes in a raw bytestring from MQTT
-        """
-        dc_online = self._status[MqttTopics.dc_status]
-        fx_online = self._status[MqttTopics.fx_status]
-        mx_online = self._status[MqttTopics.mx_status]
-
-        if msg.topic == MqttTopics.dc_data and dc_online == "online":
-            logging.info(f"Received {MqttTopics.dc_name} data packet")
-            logging.debug(f"{MqttTopics.dc_name} payload: {msg.payload}")
-            # NOTE: Due to errors in our packet packing, it introduces a random buffer at the end
-            padding_at_end = 2
-            msg_time, msg_payload = PyMateDecoder.detach_time(
-                msg=msg.payload, padding_at_end=padding_at_end
-            )
-            dc_time = datetime.fromtimestamp(msg_time)
-            dc_payload = PyMateDecoder.dc_decoder(msg_payload)
-            logging.debug(
-                f"Decoded and split {MqttTopics.dc_name} payload: {dc_payload} at {dc_time}"
-            )
-            self._load_queue(
-                measurement=MqttTopics.dc_name, time_field=dc_time, payload=dc_payload
-            )
-
-        if msg.topic == MqttTopics.fx_data and fx_online == "online":
-            logging.info(f"Received {MqttTopics.fx_name} data packet")
-            logging.debug(f"{MqttTopics.fx_name} payload: {msg.payload}")
-            # NOTE: Due to errors in our packet packing, it introduces a random buffer at the end
-            padding_at_end = 3
-            msg_time, msg_payload = PyMateDecoder.detach_time(
-                msg=msg.payload, padding_at_end=padding_at_end
-            )
-            fx_time = datetime.fromtimestamp(msg_time)
-            fx_payload = PyMateDecoder.fx_decoder(msg_payload)
-            logging.debug(
-                f"Decoded and split {MqttTopics.fx_name} payload: {fx_payload} at {fx_time}"
-            )
-            self._load_queue(
-                measurement=MqttTopics.fx_name, time_field=fx_time, payload=fx_payload
-            )
+        :param received_at: time.monotonic() the message was received
+        """
+        device_topic = self._data_topics.get(msg.topic)
+        if device_topic is None or self._status[device_topic.status_topic] != "online":
+            return
+        measurement = device_topic.measurement
+        logging.info(f"Received {measurement} data packet")
+        logging.debug(f"{measurement} payload: {msg.payload}")
+        msg_time, msg_payload = device_topic.decode(
+            payload=msg.payload,
+            native_decoders=self._reader_settings.native_decoders,
+        )
+        logging.debug(
+            f"Decoded and split {measurement} payload: {msg_payload} at {msg_time}"
+        )
+        self._load_queue(
+            measurement=measurement,
+            time_field=msg_time,
+            payload=msg_payload,
+            received_at=received_at,
+        )
 
-        if msg.topic == MqttTopics.mx_data and mx_online == "online":
-            logging.info(f"Received {MqttTopics.mx_name} data packet")
-            logging.debug(f"{MqttTopics.mx_name} payload: {msg.payload}")
-            # NOTE: Due to errors in our packet packing, it introduces a random buffer at the end
-            padding_at_end = 3
-            msg_time, msg_payload = PyMateDecoder.detach_time(
-                msg=msg.payload, padding_at_end=padding_at_end
+    def _join_frame(self, msg: MQTTMessage, received_at: float = None) -> None:
+        """
+        Pairs the raw frames and timestamps of online devices, each joined frame is
+        decoded straight from its payload or handed to the decode pool
+        :param msg: Message received on a raw or timestamp topic
+        :param received_at: time.monotonic() the message was received
+        """
+        device_topic = self._frame_topics[msg.topic]
+        if self._status[device_topic.status_topic] != "online":
+            return
+        measurement = device_topic.measurement
+        if msg.topic == device_topic.raw_topic:
+            joined = self._frame_joiner.add_frame(
+                device=measurement, frame=msg.payload, received_at=received_at
             )
-            mx_time = datetime.fromtimestamp(msg_time)
-            mx_payload = PyMateDecoder.mx_decoder(msg_payload)
-            logging.debug(
-                f"Decoded and split {MqttTopics.mx_name} payload: {mx_payload} at {mx_time}"
+        else:
+            joined = self._frame_joiner.add_timestamp(
+                device=measurement,
+                msg_time=parse_timestamp(msg.payload),
+                received_at=received_at,
             )
-            self._load_queue(
-                measurement=MqttTopics.mx_name, time_field=mx_time, payload=mx_payload
+        if joined is None:
+            return
+        msg_time, frame, received_at = joined
+        if self._dedup_index is not None and self._dedup_index.seen(
+            topic=device_topic.raw_topic, payload=frame, msg_time=msg_time
+        ):
+            return
+        if self._decode_pool is not None:
+            logging.debug(f"Submitted {device_topic.raw_topic} frame to decode pool")
+            self._decode_pool.submit(
+                topic=device_topic.raw_topic,
+                payload=frame,
+                received_at=received_at,
+                source=self._source,
+                msg_time=msg_time,
             )
+            return
+        logging.info(f"Received {measurement} raw frame")
+        time_field, payload = device_topic.decode_frame(
+            frame=frame,
+            msg_time=msg_time,
+            native_decoders=self._reader_settings.native_decoders,
+        )
+        logging.debug(f"Decoded {measurement} frame: {payload} at {time_field}")
+        self._load_queue(
+            measurement=measurement,
+            time_field=time_field,
+            payload=payload,
+            received_at=received_at,
+        )
 
     def _on_message(self, _client, _userdata, msg: MQTTMessage) -> None:
         """
         Called everytime a message is received which it then decodes
         :param msg: Message to partition into categories and decode
         """
+        received_at = time.monotonic()
         try:
+            if self._metrics is not None:
+                self._metrics.increment("messages_received")
+            if self._capture_writer is not None:
+                self._capture_writer.write(topic=msg.topic, payload=msg.payload)
             self._check_status(msg=msg)
             if self._status[MqttTopics.mate_status] == "online":
-                self._decode_message(msg=msg)
+                if self._is_duplicate(msg=msg):
+                    pass
+                elif msg.topic in self._frame_topics:
+                    self._join_frame(msg=msg, received_at=received_at)
+                elif self._decode_pool is not None and msg.topic in self._data_topics:
+                    self._submit_packet(msg=msg, received_at=received_at)
+                else:
+                    self._decode_message(msg=msg, received_at=received_at)
             else:
                 logging.warning(f"{MqttTopics.mate_status} is offline")
         except Exception:
@@ -322,3 +586,83 @@ class MqttConnector:
         )
 
         return self._mqtt_client
+
+
+def create_queue_packages(
+    measurement: str,
+    time_field: datetime | int,
+    payload: dict,
+    queue_mode: str,
+    *,
+    received_at: float = None,
+    source: str = None,
+    float_fields: bool = False,
+) -> list[QueuePackage]:
+    """
+    Converts a decoded payload into one package holding all fields of the packet,
+    or a package per field when queue_mode is 'field'. Payloads from the native
+    decoders are already floats and are used as they are with float_fields
+    """
+    if float_fields:
+        fields = payload
+    else:
+        fields = {key: float(value) for key, value in payload.items()}
+    if queue_mode == "field":
+        return [
+            QueuePackage(
+                measurement=measurement,
+                time_field=time_field,
+                field={key: value},
+                received_at=received_at,
+                source=source,
+            )
+            for key, value in fields.items()
+        ]
+    return [
+        QueuePackage(
+            measurement=measurement,
+            time_field=time_field,
+            field=fields,
+            received_at=received_at,
+            source=source,
+        )
+    ]
+
+
+def decode_packets(
+    packets: list[tuple[str, bytes, float, str, int]],
+    queue_mode: str,
+    native_decoders: bool = False,
+) -> tuple[list[QueuePackage], int]:
+    """
+    Decodes a batch of raw data packets, run in the decode pool's processes
+    :param packets: List of (topic, payload, received_at, source, msg_time) in the
+        order they were received, msg_time is only set for raw frames
+    :param queue_mode: Either 'packet' or 'field'
+    :param native_decoders: Decode with the struct decoders instead of pymate
+    :return: Packages ready for the ingest queue and the number of packets which
+        failed to decode
+    """
+    queue_packages = []
+    failed = 0
+    for topic, payload, received_at, source, msg_time in packets:
+        try:
+            measurement, time_field, fields = PyMateDecoder.decode_packet(
+                topic=topic,
+                payload=payload,
+                native_decoders=native_decoders,
+                msg_time=msg_time,
+            )
+        except Exception:
+            failed += 1
+            continue
+        queue_packages += create_queue_packages(
+            measurement=measurement,
+            time_field=time_field,
+            payload=fields,
+            queue_mode=queue_mode,
+            received_at=received_at,
+            source=source,
+            float_fields=native_decoders,
+        )
+    return queue_packages, failed
@@ -0,0 +1,183 @@
+"""
+Classes file, contains decoders which unpack the Mate device packets with
+precompiled struct layouts straight into float fields, without building the
+pymate packet objects. Every field matches float() of the pymate decoder's value
+"""
+
+import struct
+from operator import truediv
+
+
+class StructDecoder:
+    """
+    Class which decodes a fixed size packet with a precompiled struct layout, each
+    unpacked value is divided by its field's scale into a float
+    """
+
+    def __init__(self, layout: str, fields: tuple[tuple[str, float], ...]) -> None:
+        """
+        :param layout: Struct format of the packet, bytes which aren't fields are
+            skipped with pad bytes
+        :param fields: (name, scale) of each unpacked value in order, values are
+            divided by the scale to match how pymate scales them
+        """
+        self._struct = struct.Struct(layout)
+        self._names = tuple(name for name, _ in fields)
+        self._scales = tuple(scale for _, scale in fields)
+        if len(self._struct.unpack(bytes(self._struct.size))) != len(fields):
+            raise ValueError(f"Layout {layout} doesn't unpack {len(fields)} fields")
+
+    @property
+    def size(self) -> int:
+        """
+        :return: Size in bytes of the packets decoded
+        """
+        return self._struct.size
+
+    def __call__(self, msg: bytes, offset: int = 0) -> dict[str, float]:
+        """
+        :param msg: Packet holding the fields, bytes after them are ignored
+        :param offset: Position of the fields in the packet, they're read in place
+        :return: Field names mapped to their scaled values
+        """
+        return dict(
+            zip(
+                self._names,
+                map(truediv, self._struct.unpack_from(msg, offset), self._scales),
+            )
+        )
+
+
+# Six 13 byte pages of the FLEXnet DC status, bytes pymate doesn't keep are skipped
+_DC_DECODER = StructDecoder(
+    layout=">hhhhBhhhhhhhhhhhhhhhhh12xhhhhhhBhh6x",
+    fields=(
+        ("shunta_current", 10),
+        ("shuntb_current", 10),
+        ("shuntc_current", 10),
+        ("bat_voltage", 10),
+        ("state_of_charge", 1),
+        ("shunta_power", 100),
+        ("shuntb_power", 100),
+        ("shuntc_power", 100),
+        ("flags", 1),
+        ("in_current", 10),
+        ("out_current", 10),
+        ("bat_current", 10),
+        ("in_power", 100),
+        ("out_power", 100),
+        ("bat_power", 100),
+        ("in_ah_today", 1),
+        ("out_ah_today", 1),
+        ("bat_ah_today", 1),
+        ("in_kwh_today", 100),
+        ("out_kwh_today", 100),
+        ("bat_kwh_today", 100),
+        ("days_since_full", 10),
+        ("shunta_kwh_today", 100),
+        ("shuntb_kwh_today", 100),
+        ("shuntc_kwh_today", 100),
+        ("shunta_ah_today", 1),
+        ("shuntb_ah_today", 1),
+        ("shuntc_ah_today", 1),
+        ("min_soc_today", 1),
+        ("bat_net_ah", 1),
+        ("bat_net_kwh", 100),
+    ),
+)
+_FX_STRUCT = struct.Struct(">BBBBBBBBBhBB")
+_MX_STRUCT = struct.Struct(">BbbbBBBBBHH")
+
+
+class NativeDecoder:
+    """
+    Class which decodes bytestreams received from the MQTT broker into float fields,
+    a drop in replacement for the PyMateDecoder device decoders. The fields are read
+    in place at an offset so packets don't have to be sliced first
+    """
+
+    @staticmethod
+    def dc_decoder(msg: bytes, offset: int = 0) -> dict[str, float]:
+        """
+        Decoder for DC objects
+        :param msg: Input message to decode
+        :param offset: Position of the frame in the message
+        :return: Decoded fields
+        """
+        return _DC_DECODER(msg, offset)
+
+    @staticmethod
+    def fx_decoder(msg: bytes, offset: int = 0) -> dict[str, float]:
+        """
+        Decoder for FX objects, 230V inverters report doubled currents and halved voltages
+        :param msg: Input message to decode
+        :param offset: Position of the frame in the message
+        :return: Decoded fields
+        """
+        (
+            inverter_current,
+            chg_current,
+            buy_current,
+            input_voltage,
+            output_voltage,
+            sell_current,
+            operational_mode,
+            error_mode,
+            ac_mode,
+            battery_voltage,
+            misc,
+            warnings,
+        ) = _FX_STRUCT.unpack_from(msg, offset)
+        # Currents are divided and voltages multiplied by the same factor
+        scale = 2 if misc & 0x01 else 1
+        return {
+            "inverter_current": inverter_current / scale,
+            "chg_current": chg_current / scale,
+            "buy_current": buy_current / scale,
+            "input_voltage": float(input_voltage * scale),
+            "output_voltage": float(output_voltage * scale),
+            "sell_current": sell_current / scale,
+            "operational_mode": float(operational_mode),
+            "error_mode": float(error_mode),
+            "ac_mode": float(ac_mode),
+            "battery_voltage": battery_voltage / 10,
+            "misc": float(misc),
+            "warnings": float(warnings),
+            "is_230v": float(misc & 0x01),
+            "aux_on": 1.0 if misc & 0x80 else 0.0,
+        }
+
+    @staticmethod
+    def mx_decoder(msg: bytes, offset: int = 0) -> dict[str, float]:
+        """
+        Decoder for MX objects, the tenths of the battery current and the high
+        bits of the amp hours are packed into the first byte
+        :param msg: Input message to decode
+        :param offset: Position of the frame in the message
+        :return: Decoded fields
+        """
+        (
+            packed,
+            pv_current,
+            bat_current,
+            kwh_high,
+            amp_hours_low,
+            aux,
+            status,
+            errors,
+            kwh_low,
+            bat_voltage,
+            pv_voltage,
+        ) = _MX_STRUCT.unpack_from(msg, offset)
+        return {
+            "pv_current": float(pv_current + 128),
+            "bat_current": (bat_current + 128) + (packed & 0x0F) / 10,
+            "amp_hours": float(((packed & 0x70) << 4) | amp_hours_low),
+            "kilowatt_hours": ((kwh_high << 8) | kwh_low) / 10,
+            "aux_mode": float(aux & 0x3F),
+            "aux_state": 1.0 if aux & 0x40 else 0.0,
+            "status": float(status),
+            "errors": float(errors),
+            "bat_voltage": bat_voltage / 10,
+            "pv_voltage": pv_voltage / 10,
+        }
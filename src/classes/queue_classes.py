@@ -0,0 +1,145 @@
+"""
+Classes file, contains the ingest queue used by the MQTT thread which applies
+an overflow policy when the queue is full so the MQTT network loop never stalls
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from queue import Empty, Full, Queue
+
+from src.classes.common_classes import QueuePackage
+from src.classes.serializer_classes import LineProtocolSerializer
+from src.classes.spool_classes import WriteSpool
+from src.helpers.consts import MAX_QUEUE_LENGTH
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block", "spill")
+# Seconds between warnings while the queue keeps overflowing
+OVERFLOW_WARNING_INTERVAL = 10.0
+
+
+@dataclass
+class QueueSettings:
+    """
+    Data class which defines the size of the ingest queue and what happens when it's full
+    """
+
+    max_queue_length: int = MAX_QUEUE_LENGTH
+    overflow_policy: str = "drop_oldest"
+    block_deadline: float = 0.5
+    compact_buffer: bool = True
+
+
+@dataclass
+class OverflowStats:
+    """
+    Data class which counts the packages each overflow policy has dropped or spilled
+    """
+
+    dropped_oldest: int = 0
+    dropped_newest: int = 0
+    timed_out: int = 0
+    spilled: int = 0
+
+
+class IngestQueue:
+    """
+    Class which loads packages onto the queue without blocking for longer than
+    the block deadline, when the queue is full the overflow policy either drops the
+    oldest package, drops the new package, waits up to the deadline before dropping
+    the new package or spills the new package to the write spool. Every broker's
+    network thread loads the same queue, so spills share one serializer under a lock
+    """
+
+    def __init__(
+        self,
+        target_queue: Queue,
+        overflow_policy: str = "drop_oldest",
+        block_deadline: float = 0.5,
+        *,
+        write_spool: WriteSpool = None,
+        write_precision: str = "ns",
+    ) -> None:
+        """
+        :param target_queue: Queue read by the Influx writer thread
+        :param overflow_policy: Either 'drop_oldest', 'drop_newest', 'block' or 'spill'
+        :param block_deadline: Seconds the block policy waits for space
+        :param write_spool: Spool which the spill policy appends packages to
+        :param write_precision: Precision spilled packages are serialized at
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f'Overflow policy: "{overflow_policy}" is not supported.')
+        if overflow_policy == "spill" and write_spool is None:
+            raise ValueError("Overflow policy: spill needs a write spool")
+        self._target_queue = target_queue
+        self._overflow_policy = overflow_policy
+        self._block_deadline = block_deadline
+        self._write_spool = write_spool
+        self._write_precision = write_precision
+        self._serializer = LineProtocolSerializer(precision=write_precision)
+        self._spill_lock = threading.Lock()
+        self._next_warning = 0.0
+        self.stats = OverflowStats()
+
+    def qsize(self) -> int:
+        """
+        :return: Number of packages waiting on the queue
+        """
+        return self._target_queue.qsize()
+
+    def _warn_overflow(self) -> None:
+        now = time.monotonic()
+        if now < self._next_warning:
+            return
+        self._next_warning = now + OVERFLOW_WARNING_INTERVAL
+        logging.error(
+            f"Queue is full, applying {self._overflow_policy} overflow policy: "
+            f"{self.stats}"
+        )
+
+    def _drop_oldest(self, queue_package: QueuePackage) -> None:
+        while True:
+            try:
+                self._target_queue.put_nowait(queue_package)
+                return
+            except Full:
+                pass
+            try:
+                if self._target_queue.get_nowait() is not None:
+                    self.stats.dropped_oldest += 1
+            except Empty:
+                pass
+
+    def _spill(self, queue_package: QueuePackage) -> None:
+        with self._spill_lock:
+            self._serializer.append_package(queue_package=queue_package)
+            self._write_spool.append(
+                lines=self._serializer.getvalue(), precision=self._write_precision
+            )
+            self.stats.spilled += 1
+
+    def put(self, queue_package: QueuePackage) -> None:
+        """
+        Loads a package onto the queue, applying the overflow policy when it's full
+        :param queue_package: Package to load onto the queue
+        """
+        try:
+            self._target_queue.put_nowait(queue_package)
+            return
+        except Full:
+            pass
+
+        if self._overflow_policy == "drop_oldest":
+            self._drop_oldest(queue_package=queue_package)
+        elif self._overflow_policy == "drop_newest":
+            self.stats.dropped_newest += 1
+        elif self._overflow_policy == "block":
+            try:
+                self._target_queue.put(queue_package, timeout=self._block_deadline)
+                return
+            except Full:
+                self.stats.timed_out += 1
+        else:
+            self._spill(queue_package=queue_package)
+        self._warn_overflow()
@@ -0,0 +1,231 @@
+"""
+Classes file, contains the retry policy used when writing batches to InfluxDB,
+which separates transient failures from permanent ones and splits batches
+that contain points InfluxDB refuses to accept
+"""
+
+import logging
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Callable
+
+from influxdb_client.rest import ApiException
+from urllib3.exceptions import HTTPError
+
+from src.classes.custom_exceptions import PartialWriteError
+
+# Status codes where the request may succeed if it's sent again later
+RETRYABLE_STATUS_CODES = {408, 429}
+# Status codes caused by the points themselves, the batch is split to find them
+REJECTED_STATUS_CODES = {400, 413, 422}
+
+
+@dataclass
+class RetrySettings:
+    """
+    Data class which defines how failed writes to InfluxDB are retried
+    """
+
+    max_retries: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    split_batches: bool = True
+
+
+@dataclass
+class RetryStats:
+    """
+    Data class which counts the outcome of write attempts
+    """
+
+    retries: int = 0
+    retryable_errors: int = 0
+    permanent_errors: int = 0
+    exhausted_batches: int = 0
+    abandoned_batches: int = 0
+    split_batches: int = 0
+    rejected_points: int = 0
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Timeouts, connection errors, 429 and 5xx responses are retryable
+    """
+    if isinstance(error, ApiException):
+        return error.status in RETRYABLE_STATUS_CODES or (error.status or 0) >= 500
+    return isinstance(error, (HTTPError, OSError))
+
+
+def is_rejected(error: Exception) -> bool:
+    """
+    Malformed points, field type conflicts and oversized bodies are rejected
+    """
+    return isinstance(error, ApiException) and error.status in REJECTED_STATUS_CODES
+
+
+def get_retry_after(error: Exception) -> float | None:
+    """
+    Reads the Retry-After header from a response, either as seconds or a HTTP date
+    :return: Seconds to wait or None when the header is missing
+    """
+    headers = getattr(error, "headers", None)
+    if not headers:
+        return None
+    retry_after = headers.get("Retry-After")
+    if retry_after is None:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Class which writes batches of line protocol with jittered exponential backoff,
+    batches InfluxDB rejects are split in half until the bad points are isolated.
+    Once a deadline is set no retry is started which would run past it
+    """
+
+    def __init__(
+        self,
+        max_retries: int,
+        base_delay: float,
+        max_delay: float,
+        split_batches: bool = True,
+        sleep: Callable[[float], None] = None,
+    ) -> None:
+        """
+        :param max_retries: Number of retries before a batch is given up on
+        :param base_delay: Backoff delay in seconds before the first retry
+        :param max_delay: Upper limit in seconds for any single backoff delay
+        :param split_batches: Split rejected batches to isolate the bad points
+        :param sleep: Function used to wait between retries, by default the wait
+            is cut short when a deadline is set
+        """
+        self._max_retries = max_retries
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._split_batches = split_batches
+        self._deadline = math.inf
+        self._deadline_set = threading.Event()
+        self._sleep = sleep or self._sleep_until_deadline
+        self.stats = RetryStats()
+
+    def set_deadline(self, deadline: float) -> None:
+        """
+        Gives up on retries which would start after the deadline, used on shutdown
+        so a failing batch is spooled instead of holding up the drain
+        :param deadline: time.monotonic() value after which no retry is started
+        """
+        self._deadline = min(self._deadline, deadline)
+        self._deadline_set.set()
+
+    def _sleep_until_deadline(self, delay: float) -> None:
+        """
+        Sleeps for the delay, waking early if a deadline set meanwhile falls within it
+        """
+        retry_at = time.monotonic() + delay
+        if self._deadline_set.wait(timeout=delay) and retry_at < self._deadline:
+            time.sleep(max(0.0, retry_at - time.monotonic()))
+
+    def _wait(self, delay: float) -> bool:
+        """
+        Waits out a backoff delay unless the retry would start after the deadline
+        :return: False when the retry should be given up on
+        """
+        retry_at = time.monotonic() + delay
+        if retry_at >= self._deadline:
+            return False
+        self._sleep(delay)
+        return retry_at < self._deadline
+
+    def backoff_delay(self, attempt: int, error: Exception = None) -> float:
+        """
+        Full jitter exponential backoff, a Retry-After header takes priority
+        :param attempt: Number of the retry starting from zero
+        :param error: Exception raised by the failed attempt
+        :return: Seconds to wait before the next attempt
+        """
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self._max_delay)
+        return random.uniform(0, min(self._max_delay, self._base_delay * 2**attempt))
+
+    def write(self, write_lines: Callable[[bytes], None], lines: bytes) -> None:
+        """
+        Writes a batch, retrying transient failures and splitting rejected batches.
+        Rejected points are dropped since sending them again can never succeed.
+        :param write_lines: Callable which writes a batch of line protocol
+        :param lines: Newline terminated line protocol
+        :raises: The last exception once retries are exhausted or the deadline
+            is reached, or any error which is neither retryable nor caused by the points.
+            A PartialWriteError holding the unwritten lines when part of a split
+            batch was written first
+        """
+        for attempt in range(self._max_retries + 1):
+            try:
+                write_lines(lines)
+                return
+            except Exception as err:
+                if is_rejected(err):
+                    self.stats.permanent_errors += 1
+                    self._split_write(write_lines=write_lines, lines=lines, error=err)
+                    return
+                if not is_retryable(err):
+                    self.stats.permanent_errors += 1
+                    raise
+                self.stats.retryable_errors += 1
+                if attempt == self._max_retries:
+                    self.stats.exhausted_batches += 1
+                    raise
+                delay = self.backoff_delay(attempt=attempt, error=err)
+                logging.warning(
+                    f"Retryable error writing to Influx server, retry {attempt + 1} "
+                    f"of {self._max_retries} in {delay:.2f}s: {err}"
+                )
+                if not self._wait(delay):
+                    self.stats.abandoned_batches += 1
+                    logging.warning("Retry would run past the deadline, giving up")
+                    raise
+                self.stats.retries += 1
+
+    def _split_write(
+        self, write_lines: Callable[[bytes], None], lines: bytes, error: Exception
+    ) -> None:
+        split_lines = lines.splitlines(keepends=True)
+        if len(split_lines) == 1 or not self._split_batches:
+            self.stats.rejected_points += len(split_lines)
+            logging.error(
+                f"Influx server rejected {len(split_lines)} points, dropping them: "
+                f"{error}"
+            )
+            logging.debug(f"Rejected points: {lines}")
+            return
+        self.stats.split_batches += 1
+        middle = len(split_lines) // 2
+        logging.warning(
+            f"Influx server rejected a batch of {len(split_lines)} points, "
+            "splitting it to isolate the bad points"
+        )
+        halves = [b"".join(split_lines[:middle]), b"".join(split_lines[middle:])]
+        for index, half in enumerate(halves):
+            try:
+                self.write(write_lines=write_lines, lines=half)
+            except PartialWriteError as err:
+                raise PartialWriteError(
+                    lines=err.lines + b"".join(halves[index + 1 :])
+                ) from err
+            except Exception as err:
+                # Only the lines which weren't written are handed back to be spooled
+                if index == 0:
+                    raise
+                raise PartialWriteError(lines=b"".join(halves[index:])) from err
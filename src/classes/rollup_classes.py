@@ -0,0 +1,230 @@
+"""
+Classes file, contains the aggregator which keeps running rollups of every field
+over fixed windows as packets arrive and queues the closed windows to be written
+to a downsample bucket, so long range queries don't have to aggregate the raw
+points
+"""
+
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from queue import Empty, Queue
+
+from src.classes.common_classes import QueuePackage
+from src.classes.serializer_classes import LineProtocolSerializer
+
+# Seconds in each unit a rollup window can be given in
+WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+@dataclass
+class RollupSettings:
+    """
+    Data class which defines the rollup windows and where closed windows are written
+    """
+
+    rollup_enabled: bool = False
+    rollup_bucket: str = "solar_rollups"
+    rollup_windows: str = "1m, 15m, 1h"
+    flush_interval: float = 10.0
+    state_file: str = "output/rollups/open_windows.json"
+
+
+@dataclass
+class RollupStats:
+    """
+    Data class which counts the samples rolled up and the windows they closed
+    """
+
+    samples: int = 0
+    late_samples: int = 0
+    windows_closed: int = 0
+    windows_saved: int = 0
+    windows_loaded: int = 0
+
+
+def parse_rollup_windows(rollup_windows: str) -> dict[str, int]:
+    """
+    Reads a comma separated list of window lengths such as "1m, 15m, 1h"
+    :return: Label of each window mapped to its length in seconds
+    """
+    windows = {}
+    for label in rollup_windows.split(","):
+        label = label.strip()
+        if not label:
+            continue
+        unit = WINDOW_UNITS.get(label[-1])
+        if unit is None or not label[:-1].isdigit() or int(label[:-1]) == 0:
+            raise ValueError(f'Rollup window: "{label}" is not supported.')
+        windows[label] = int(label[:-1]) * unit
+    return windows
+
+
+class RollupAggregator:
+    """
+    Class which keeps the count, sum, min, max and last value of every field of
+    every measurement and source over each window, windows are aligned to the
+    epoch in packet time. A window closes once a packet of the same measurement
+    and source arrives after it ends, it's then turned into one package on the
+    <measurement>_<window> measurement timed at the start of the window holding
+    <field>_count, _sum, _min, _max, _mean and _last fields, which is put on the
+    closed queue for a batch writer to write. A window is only written once it's
+    complete, open windows are saved on shutdown and loaded again on start.
+    Samples older than the open window are counted and left out, NaN values are
+    skipped
+    """
+
+    def __init__(self, rollup_windows: str = "1m, 15m, 1h") -> None:
+        """
+        :param rollup_windows: Comma separated window lengths in s, m, h or d
+        """
+        self._windows = tuple(parse_rollup_windows(rollup_windows).items())
+        if not self._windows:
+            raise ValueError("Rollup windows: no windows given")
+        # (source, measurement, label) mapped to [window start, fields] where
+        # fields maps each field to [count, sum, min, max, last]
+        self._open = {}
+        self.closed_queue = Queue()
+        # Packages are added from each MQTT thread and the decode pool's thread
+        self._lock = threading.Lock()
+        self.stats = RollupStats()
+
+    def _close(self, source: str, measurement: str, label: str, window: list) -> None:
+        window_start, fields = window
+        if not fields:
+            return
+        rollup = {}
+        for field, (count, total, minimum, maximum, last) in fields.items():
+            rollup[f"{field}_count"] = float(count)
+            rollup[f"{field}_sum"] = total
+            rollup[f"{field}_min"] = minimum
+            rollup[f"{field}_max"] = maximum
+            rollup[f"{field}_mean"] = total / count
+            rollup[f"{field}_last"] = last
+        self.closed_queue.put(
+            QueuePackage(
+                measurement=f"{measurement}_{label}",
+                time_field=window_start,
+                field=rollup,
+                source=source,
+            )
+        )
+        self.stats.windows_closed += 1
+
+    @staticmethod
+    def _update(fields: dict, queue_fields: dict) -> None:
+        for field, value in queue_fields.items():
+            # NaN isn't equal to itself and would poison the min, max and sum
+            if value != value:  # pylint: disable=comparison-with-itself
+                continue
+            aggregate = fields.get(field)
+            if aggregate is None:
+                fields[field] = [1, value, value, value, value]
+                continue
+            aggregate[0] += 1
+            aggregate[1] += value
+            if value < aggregate[2]:
+                aggregate[2] = value
+            elif value > aggregate[3]:
+                aggregate[3] = value
+            aggregate[4] = value
+
+    def add(self, queue_package: QueuePackage) -> None:
+        """
+        Rolls the fields of a package into the open window of every window length,
+        closing the open windows it has moved past
+        :param queue_package: Decoded package, its float fields are rolled up
+        """
+        seconds = int(LineProtocolSerializer.to_seconds(queue_package.time_field))
+        source = queue_package.source
+        measurement = queue_package.measurement
+        with self._lock:
+            self.stats.samples += 1
+            for label, length in self._windows:
+                window_start = seconds - seconds % length
+                key = (source, measurement, label)
+                window = self._open.get(key)
+                if window is None or window[0] < window_start:
+                    if window is not None:
+                        self._close(source, measurement, label, window)
+                    window = self._open[key] = [window_start, {}]
+                elif window[0] > window_start:
+                    self.stats.late_samples += 1
+                    continue
+                self._update(window[1], queue_package.field)
+
+    def add_packages(self, queue_packages: list[QueuePackage]) -> None:
+        """
+        :param queue_packages: Decoded packages in the order they were received
+        """
+        for queue_package in queue_packages:
+            self.add(queue_package)
+
+    def close_all(self) -> None:
+        """
+        Closes every open window as it is, called once no more packets will arrive
+        """
+        with self._lock:
+            for (source, measurement, label), window in self._open.items():
+                self._close(source, measurement, label, window)
+            self._open.clear()
+
+    def save_open(self, state_file: str) -> None:
+        """
+        Writes the open windows to a file instead of closing them, so a restart
+        carries on with them rather than writing a second partial point over the
+        first. Called once no more packets will arrive
+        :param state_file: File the open windows are written to, replaced whole
+        """
+        windows = []
+        with self._lock:
+            for (source, measurement, label), window in self._open.items():
+                window_start, fields = window
+                if fields:
+                    windows.append([source, measurement, label, window_start, fields])
+            self._open.clear()
+        state_location = os.path.dirname(state_file)
+        if state_location and not os.path.exists(state_location):
+            os.makedirs(state_location)
+        with open(f"{state_file}.tmp", "w", encoding="utf-8") as open_file:
+            json.dump(windows, open_file)
+        os.replace(f"{state_file}.tmp", state_file)
+        self.stats.windows_saved += len(windows)
+        logging.info(f"Saved {len(windows)} open rollup windows to {state_file}")
+
+    def load_open(self, state_file: str) -> None:
+        """
+        Reopens the windows saved by save_open() and deletes the file, so they're
+        only ever loaded once. Windows of a length which is no longer configured
+        are closed as they are
+        :param state_file: File the open windows were written to
+        """
+        if not os.path.exists(state_file):
+            return
+        with open(state_file, "r", encoding="utf-8") as open_file:
+            windows = json.load(open_file)
+        os.remove(state_file)
+        labels = dict(self._windows)
+        with self._lock:
+            for source, measurement, label, window_start, fields in windows:
+                window = [window_start, fields]
+                if label in labels:
+                    self._open[source, measurement, label] = window
+                else:
+                    self._close(source, measurement, label, window)
+            self.stats.windows_loaded += len(windows)
+        logging.info(f"Loaded {len(windows)} open rollup windows from {state_file}")
+
+    def pop_closed(self) -> list[QueuePackage]:
+        """
+        Takes every window waiting on the closed queue without blocking
+        :return: Packages of the windows closed since the last call, oldest first
+        """
+        closed = []
+        while True:
+            try:
+                closed.append(self.closed_queue.get_nowait())
+            except Empty:
+                return closed
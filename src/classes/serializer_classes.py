@@ -0,0 +1,168 @@
+"""
+Classes file, contains a line protocol serializer for the write path which caches
+the escaped measurement names and field keys of the fixed pymate packet layouts
+Check the Influx line protocol documentation for syntax:
+https://docs.influxdata.com/influxdb/v2.0/reference/syntax/line-protocol/
+"""
+
+import math
+from datetime import datetime, timezone
+
+from src.classes.common_classes import QueuePackage
+from src.helpers.consts import SOURCE_TAG_KEY
+
+_ESCAPE_MEASUREMENT = str.maketrans(
+    {",": r"\,", " ": r"\ ", "\n": r"\n", "\t": r"\t", "\r": r"\r"}
+)
+_ESCAPE_KEY = str.maketrans(
+    {",": r"\,", "=": r"\=", " ": r"\ ", "\n": r"\n", "\t": r"\t", "\r": r"\r"}
+)
+_ESCAPE_STRING = str.maketrans({'"': r"\"", "\\": r"\\"})
+
+NEWLINE = b"\n"
+# Nanoseconds in one unit of each InfluxDB write precision
+PRECISION_DIVISORS = {"ns": 1, "us": 1000, "ms": 1000000, "s": 1000000000}
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class LineProtocolSerializer:
+    """
+    Class which serializes packets into line protocol bytes within a reusable buffer,
+    the output matches influxdb_client's Point.to_line_protocol()
+    """
+
+    def __init__(self, precision: str = "ns") -> None:
+        """
+        :param precision: Precision of the timestamps, either 's', 'ms', 'us' or 'ns',
+            timestamps finer than the precision are truncated
+        """
+        if precision not in PRECISION_DIVISORS:
+            raise ValueError(f'Write precision: "{precision}" is not supported.')
+        self._divisor = PRECISION_DIVISORS[precision]
+        self._buffer = bytearray()
+        self._layouts = {}
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def _get_layout(self, measurement: str, fields: dict, source: str) -> tuple:
+        """
+        Escapes the measurement name, source tag and field keys once per packet layout
+        :return: Measurement prefix and sorted list of (field, escaped key) pairs
+        """
+        layout_key = (measurement, source, tuple(fields))
+        layout = self._layouts.get(layout_key)
+        if layout is None:
+            prefix = measurement.translate(_ESCAPE_MEASUREMENT)
+            if source:
+                prefix += f",{SOURCE_TAG_KEY}={source.translate(_ESCAPE_KEY)}"
+            prefix = prefix.encode("utf-8") + b" "
+            keys = [
+                (field, field.translate(_ESCAPE_KEY).encode("utf-8") + b"=")
+                for field in sorted(fields)
+            ]
+            layout = self._layouts[layout_key] = (prefix, keys)
+        return layout
+
+    @staticmethod
+    def _format_value(value: any) -> bytes | None:
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return None
+            value_string = repr(value)
+            if value_string.endswith(".0"):
+                value_string = value_string[:-2]
+            return value_string.encode("ascii")
+        if isinstance(value, bool):
+            return b"true" if value else b"false"
+        if isinstance(value, int):
+            return b"%di" % value
+        if isinstance(value, str):
+            return b'"' + value.translate(_ESCAPE_STRING).encode("utf-8") + b'"'
+        if value is None:
+            return None
+        raise ValueError(f'Type: "{type(value)}" of field is not supported.')
+
+    @staticmethod
+    def to_nanoseconds(time_field: datetime | int) -> int:
+        """
+        Converts a datetime or integer epoch seconds into epoch nanoseconds, naive
+        datetimes are taken as UTC
+        """
+        if time_field.__class__ is int:
+            return time_field * 1000000000
+        if time_field.tzinfo is None:
+            delta = time_field - _EPOCH
+        else:
+            delta = time_field - _EPOCH_UTC
+        return (
+            delta.days * 86400 + delta.seconds
+        ) * 1000000000 + delta.microseconds * 1000
+
+    @staticmethod
+    def to_seconds(time_field: datetime | int) -> float:
+        """
+        Converts a datetime or integer epoch seconds into epoch seconds, integers
+        are returned as they are
+        """
+        if time_field.__class__ is int:
+            return time_field
+        return LineProtocolSerializer.to_nanoseconds(time_field) / 1e9
+
+    def append(
+        self,
+        measurement: str,
+        fields: dict,
+        time_field: datetime | int,
+        source: str = None,
+    ) -> None:
+        """
+        Serializes a single point onto the end of the buffer,
+        fields which can't be written (None, NaN or inf) are skipped
+        :param measurement: Measurement name of the point
+        :param fields: Dictionary of field keys and values
+        :param time_field: Timestamp of the point, a datetime or epoch seconds
+        :param source: Optional MQTT broker the point came from, written as a tag
+        """
+        prefix, keys = self._get_layout(measurement, fields, source)
+        field_set = []
+        for field, escaped_key in keys:
+            value = fields[field]
+            # Decoded packet fields are always floats so skip the type dispatch
+            if value.__class__ is float and value - value == 0.0:
+                value = repr(value).encode("ascii")
+                if value.endswith(b".0"):
+                    value = value[:-2]
+            else:
+                value = self._format_value(value)
+                if value is None:
+                    continue
+            field_set.append(escaped_key + value)
+        if not field_set:
+            return
+        buffer = self._buffer
+        buffer += prefix
+        buffer += b",".join(field_set)
+        buffer += b" %d\n" % (self.to_nanoseconds(time_field) // self._divisor)
+
+    def append_package(self, queue_package: QueuePackage) -> None:
+        """
+        Serializes a queue package onto the end of the buffer, tagged with its source
+        """
+        self.append(
+            measurement=queue_package.measurement,
+            fields=queue_package.field,
+            time_field=queue_package.time_field,
+            source=queue_package.source,
+        )
+
+    def getvalue(self) -> bytes:
+        """
+        Takes the serialized lines out of the buffer and clears it for reuse
+        :return: Newline terminated line protocol
+        """
+        body = bytes(self._buffer)
+        self._buffer.clear()
+        return body
@@ -0,0 +1,272 @@
+"""
+Classes file, contains the on disk spool which holds batches of line protocol
+that couldn't be written to InfluxDB until they can be replayed
+"""
+
+import bisect
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable
+
+from src.classes.custom_exceptions import PartialWriteError
+from src.classes.serializer_classes import NEWLINE
+
+
+@dataclass
+class SpoolSettings:
+    """
+    Data class which defines where and how undelivered batches are spooled to disk
+    """
+
+    spool_enabled: bool = True
+    spool_location: str = "output/spool/"
+    max_spool_bytes: int = 104857600
+    segment_bytes: int = 1048576
+    fsync_mode: str = "segment"
+    replay_interval: float = 30.0
+
+
+class WriteSpool:
+    """
+    Class which appends batches of line protocol to segment files on disk and
+    replays them oldest first, segments are deleted once they've been replayed.
+    A spool can be shared by several writer threads, a segment being replayed is
+    claimed so appends aren't held up by the writes. Only one thread replays at a
+    time so segments are written in the order they were spooled.
+    """
+
+    _segment_prefix = "spool-"
+    _segment_suffix = ".lp"
+
+    def __init__(
+        self,
+        spool_location: str,
+        max_spool_bytes: int,
+        segment_bytes: int,
+        fsync_mode: str = "segment",
+    ) -> None:
+        """
+        :param spool_location: Folder which holds the segment files
+        :param max_spool_bytes: Maximum size of the spool, the oldest segments
+            are dropped once exceeded
+        :param segment_bytes: Size at which a new segment file is started
+        :param fsync_mode: Either 'always' to fsync every append, 'segment' to
+            fsync when a segment is closed or 'never'
+        """
+        self._spool_location = spool_location
+        self._max_spool_bytes = max_spool_bytes
+        self._segment_bytes = segment_bytes
+        self._fsync_mode = fsync_mode
+        self._active_segment = None
+        self._active_segment_bytes = 0
+        self._replaying = []
+        self._lock = threading.RLock()
+        self._replay_lock = threading.Lock()
+        self.spooled_lines = 0
+        self.replayed_lines = 0
+        self.dropped_lines = 0
+
+        if not os.path.exists(self._spool_location):
+            os.makedirs(self._spool_location)
+        self._segments = sorted(
+            file_name
+            for file_name in os.listdir(self._spool_location)
+            if file_name.startswith(self._segment_prefix)
+            and file_name.endswith(self._segment_suffix)
+        )
+        self._last_sequence = (
+            self._parse_segment(self._segments[-1])[0] if self._segments else 0
+        )
+        self._spool_bytes = sum(
+            os.path.getsize(self._segment_path(segment)) for segment in self._segments
+        )
+        if self._segments:
+            logging.warning(
+                f"Found {len(self._segments)} spooled segments in {self._spool_location}"
+            )
+
+    @property
+    def is_empty(self) -> bool:
+        """
+        True when there is nothing left to replay
+        """
+        return not self._segments and not self._replaying
+
+    @property
+    def is_replaying(self) -> bool:
+        """
+        True while a thread is replaying a segment
+        """
+        return self._replay_lock.locked()
+
+    @property
+    def size_bytes(self) -> int:
+        """
+        Total size of all segment files in bytes, kept as a running total
+        """
+        return self._spool_bytes
+
+    def _segment_path(self, segment: str) -> str:
+        return os.path.join(self._spool_location, segment)
+
+    def _parse_segment(self, segment: str) -> tuple[int, str]:
+        """
+        Segments are named spool-<sequence>.<precision>.lp, segments spooled before
+        the precision was recorded hold nanosecond timestamps
+        :return: Sequence number and timestamp precision of the segment
+        """
+        sequence, _, precision = (
+            segment.removeprefix(self._segment_prefix)
+            .removesuffix(self._segment_suffix)
+            .partition(".")
+        )
+        return int(sequence), precision or "ns"
+
+    def _new_segment(self, precision: str) -> str:
+        self._last_sequence += 1
+        segment = (
+            f"{self._segment_prefix}{self._last_sequence:012d}.{precision}"
+            f"{self._segment_suffix}"
+        )
+        self._segments.append(segment)
+        self._active_segment_bytes = 0
+        return segment
+
+    def _close_active_segment(self) -> None:
+        if self._active_segment is None:
+            return
+        if self._fsync_mode == "segment":
+            with open(self._segment_path(self._active_segment), "ab") as segment_file:
+                os.fsync(segment_file.fileno())
+        self._active_segment = None
+
+    def _enforce_max_size(self) -> None:
+        while len(self._segments) > 1 and self._spool_bytes > self._max_spool_bytes:
+            segment = self._segments.pop(0)
+            segment_path = self._segment_path(segment)
+            with open(segment_path, "rb") as segment_file:
+                lines = segment_file.read()
+            os.remove(segment_path)
+            dropped_lines = lines.count(NEWLINE)
+            self._spool_bytes -= len(lines)
+            self.dropped_lines += dropped_lines
+            logging.error(
+                f"Spool exceeded {self._max_spool_bytes} bytes, "
+                f"dropped {dropped_lines} points from {segment}"
+            )
+
+    def append(self, lines: bytes, precision: str = "ns") -> None:
+        """
+        Appends a batch of line protocol to the active segment,
+        a new segment is started when the timestamp precision changes
+        :param lines: Newline terminated line protocol
+        :param precision: Precision of the timestamps within the lines
+        """
+        if not lines:
+            return
+        with self._lock:
+            if (
+                self._active_segment is not None
+                and self._parse_segment(self._active_segment)[1] != precision
+            ):
+                self._close_active_segment()
+            if self._active_segment is None:
+                self._active_segment = self._new_segment(precision=precision)
+            segment_path = self._segment_path(self._active_segment)
+            with open(segment_path, "ab") as segment_file:
+                segment_file.write(lines)
+                segment_file.flush()
+                if self._fsync_mode == "always":
+                    os.fsync(segment_file.fileno())
+            self._active_segment_bytes += len(lines)
+            self._spool_bytes += len(lines)
+            line_count = lines.count(NEWLINE)
+            self.spooled_lines += line_count
+            logging.debug(f"Spooled {line_count} points to {segment_path}")
+
+            if self._active_segment_bytes >= self._segment_bytes:
+                self._close_active_segment()
+            self._enforce_max_size()
+
+    def replay(self, write_lines: Callable[[bytes, str], None], batch_size: int) -> int:
+        """
+        Replays the oldest segment in batches, the segment is removed once every
+        batch has been written. If a write fails the unwritten lines are kept
+        in the segment and the exception is raised. The segment is claimed under
+        the lock and written without it, so appends carry on during the writes.
+        While another thread is replaying nothing is replayed, so a newer segment
+        is never written ahead of an older one.
+        :param write_lines: Callable which writes a batch of line protocol
+            at the given timestamp precision
+        :param batch_size: Number of lines to write per request
+        :return: Number of lines replayed
+        """
+        # pylint: disable-next=consider-using-with
+        if not self._replay_lock.acquire(blocking=False):
+            return 0
+        try:
+            return self._replay_oldest(write_lines=write_lines, batch_size=batch_size)
+        finally:
+            self._replay_lock.release()
+
+    def _replay_oldest(
+        self, write_lines: Callable[[bytes, str], None], batch_size: int
+    ) -> int:
+        with self._lock:
+            if not self._segments:
+                return 0
+            if self._segments[0] == self._active_segment:
+                self._close_active_segment()
+            segment = self._segments.pop(0)
+            self._replaying.append(segment)
+            _, precision = self._parse_segment(segment)
+            segment_path = self._segment_path(segment)
+            with open(segment_path, "rb") as segment_file:
+                lines = segment_file.read()
+            self._spool_bytes -= len(lines)
+        lines = lines.splitlines(keepends=True)
+
+        replayed_lines = 0
+        try:
+            for index in range(0, len(lines), batch_size):
+                batch = lines[index : index + batch_size]
+                write_lines(b"".join(batch), precision)
+                replayed_lines += len(batch)
+        except Exception as err:
+            unwritten = b"".join(lines[replayed_lines:])
+            if isinstance(err, PartialWriteError):
+                # The written part of the failed batch isn't replayed again
+                unwritten = err.lines + b"".join(lines[replayed_lines + batch_size :])
+                replayed_lines = len(lines) - unwritten.count(NEWLINE)
+            self._release_segment(segment, unwritten)
+            raise
+        finally:
+            with self._lock:
+                self.replayed_lines += replayed_lines
+
+        with self._lock:
+            os.remove(segment_path)
+            self._replaying.remove(segment)
+        logging.info(f"Replayed {replayed_lines} spooled points from {segment}")
+        return replayed_lines
+
+    def _release_segment(self, segment: str, lines: bytes) -> None:
+        """
+        Puts a claimed segment back in order holding only the lines left to replay
+        """
+        with self._lock:
+            self._rewrite_segment(self._segment_path(segment), lines)
+            self._replaying.remove(segment)
+            bisect.insort(self._segments, segment)
+            self._spool_bytes += len(lines)
+
+    def _rewrite_segment(self, segment_path: str, lines: bytes) -> None:
+        temp_path = segment_path + ".tmp"
+        with open(temp_path, "wb") as segment_file:
+            segment_file.write(lines)
+            segment_file.flush()
+            if self._fsync_mode != "never":
+                os.fsync(segment_file.fileno())
+        os.replace(temp_path, segment_path)
@@ -0,0 +1,234 @@
+"""
+Classes file, contains the supervisor which runs each pipeline stage in its own
+thread and restarts stages which crash or stop heartbeating
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+
+@dataclass
+class SupervisorSettings:
+    """
+    Data class which defines how failed pipeline stages are restarted
+    """
+
+    supervisor_enabled: bool = True
+    min_restart_delay: float = 1.0
+    max_restart_delay: float = 60.0
+    stall_timeout: float = 300.0
+    check_interval: float = 1.0
+
+
+@dataclass
+class StageStats:
+    """
+    Data class which counts the runs of a pipeline stage
+    """
+
+    restarts: int = 0
+    crashes: int = 0
+    stalls: int = 0
+
+
+class SupervisedStage:
+    """
+    Class which runs a pipeline stage in a thread, the stage beats a heartbeat
+    while it's healthy. A target returning or raising before the supervisor
+    stops counts as a crash, a stalled stage is retired so its thread stops at its
+    next running check
+    """
+
+    def __init__(self, name: str, target: Callable[["SupervisedStage"], None]) -> None:
+        """
+        :param name: Name of the stage's thread
+        :param target: Callable which runs the stage, it's passed the stage so
+            it can beat the heartbeat
+        """
+        self.name = name
+        self._target = target
+        self._thread = None
+        self._retiring = threading.Event()
+        self._last_beat = 0.0
+        self.started_at = 0.0
+        self.restart_at = None
+        self.failures = 0
+        self.stats = StageStats()
+
+    def beat(self) -> None:
+        """
+        Marks the stage as healthy, called from the stage's thread
+        """
+        self._last_beat = time.monotonic()
+
+    def beating(self, is_running: Callable[[], bool]) -> Callable[[], bool]:
+        """
+        Wraps a loop's running check so every check beats the heartbeat
+        :return: Callable which beats then returns is_running(), or False once
+            the stage is retired
+        """
+
+        def check() -> bool:
+            self.beat()
+            return is_running() and not self._retiring.is_set()
+
+        return check
+
+    def _run(self) -> None:
+        try:
+            self._target(self)
+        except Exception:
+            logging.exception(f"{self.name} raised an exception")
+
+    def start(self) -> None:
+        """
+        Runs the stage in a new thread
+        """
+        if self._thread is not None:
+            self.stats.restarts += 1
+        self.started_at = self._last_beat = time.monotonic()
+        self.restart_at = None
+        self._retiring.clear()
+        self._thread = threading.Thread(name=self.name, target=self._run, daemon=True)
+        self._thread.start()
+
+    def retire(self) -> None:
+        """
+        Tells the stage's current thread to stop, threads can't be killed so a
+        stalled thread only stops once it wakes up
+        """
+        self._retiring.set()
+
+    def is_retiring(self) -> bool:
+        """
+        :return: True once the stage's current thread has been told to stop
+        """
+        return self._retiring.is_set()
+
+    def is_alive(self) -> bool:
+        """
+        :return: True while the stage's current thread is running
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def is_stalled(self, now: float, stall_timeout: float) -> bool:
+        """
+        :return: True when the stage hasn't beaten for stall_timeout seconds
+        """
+        return now - self._last_beat > stall_timeout
+
+    def join(self, timeout: float = None) -> None:
+        """
+        Waits for the stage's current thread to exit
+        """
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+
+class Supervisor:
+    """
+    Class which starts each pipeline stage and checks on them until stopped.
+    Crashed stages are restarted with exponential backoff, stalled stages are
+    retired and restarted with the same backoff once their thread has exited, so
+    two threads of a stage never write or reconnect at the same time. The queue
+    and spool live outside the stages so nothing queued is lost
+    """
+
+    def __init__(
+        self,
+        stop_event: threading.Event,
+        *,
+        supervisor_enabled: bool = True,
+        min_restart_delay: float = 1.0,
+        max_restart_delay: float = 60.0,
+        stall_timeout: float = 300.0,
+        check_interval: float = 1.0,
+    ) -> None:
+        """
+        :param stop_event: Event set once the program is stopping, also set
+            when a stage fails while restarts are disabled
+        :param supervisor_enabled: Restart failed stages, otherwise a failed stage
+            stops the program
+        :param min_restart_delay: Seconds before the first restart of a stage
+        :param max_restart_delay: Most seconds between restarts, the delay doubles
+            after each failure in a row and resets once a run outlasts it
+        :param stall_timeout: Seconds without a heartbeat before a stage is replaced
+        :param check_interval: Seconds between checks of every stage
+        """
+        self._stop_event = stop_event
+        self._supervisor_enabled = supervisor_enabled
+        self._min_restart_delay = min_restart_delay
+        self._max_restart_delay = max_restart_delay
+        self._stall_timeout = stall_timeout
+        self._check_interval = check_interval
+        self.stages: list[SupervisedStage] = []
+
+    def add_stage(
+        self, name: str, target: Callable[[SupervisedStage], None]
+    ) -> SupervisedStage:
+        """
+        Adds a stage to be started by run()
+        :return: The supervised stage
+        """
+        stage = SupervisedStage(name=name, target=target)
+        self.stages.append(stage)
+        return stage
+
+    def restart_delay(self, failures: int) -> float:
+        """
+        :return: Seconds to wait before restarting a stage after its failures in a row
+        """
+        return min(
+            self._min_restart_delay * 2 ** (failures - 1), self._max_restart_delay
+        )
+
+    def _fail(self, stage: SupervisedStage, now: float) -> None:
+        if now - stage.started_at > self._max_restart_delay:
+            stage.failures = 0
+        stage.failures += 1
+        if not self._supervisor_enabled:
+            logging.critical(f"{stage.name} failed, stopping since restarts are off")
+            self._stop_event.set()
+            return
+        delay = self.restart_delay(failures=stage.failures)
+        stage.restart_at = now + delay
+        logging.error(f"{stage.name} failed, restarting in {delay:g}s: {stage.stats}")
+
+    def check(self, now: float) -> None:
+        """
+        Restarts stages which are due and schedules restarts of failed stages
+        :param now: time.monotonic() of the check
+        """
+        if self._stop_event.is_set():
+            return
+        for stage in self.stages:
+            if stage.restart_at is not None:
+                if now >= stage.restart_at and not stage.is_alive():
+                    logging.info(f"Restarting {stage.name}")
+                    stage.start()
+            elif not stage.is_alive():
+                stage.stats.crashes += 1
+                self._fail(stage=stage, now=now)
+            elif stage.is_stalled(now=now, stall_timeout=self._stall_timeout):
+                stage.stats.stalls += 1
+                logging.error(
+                    f"{stage.name} hasn't beaten in {self._stall_timeout:g}s, "
+                    f"replacing it once its thread exits"
+                )
+                stage.retire()
+                self._fail(stage=stage, now=now)
+
+    def run(self) -> None:
+        """
+        Starts every stage then checks on them until the stop event is set
+        """
+        for stage in self.stages:
+            stage.start()
+            logging.info(f"Started thread: {stage.name}")
+        while not self._stop_event.wait(timeout=self._check_interval):
+            self.check(now=time.monotonic())
+        for stage in self.stages:
+            logging.info(f"{stage.name} supervisor stats: {stage.stats}")
@@ -9,14 +9,30 @@ CONFIG_FILENAME = "src/config/config.ini"  # Py Functions
 INFLUX_QUERY_CONFIG_TITLE = "query_settings"  # Influx Query
 INFLUX_DEBUG_CONFIG_TITLE = "influx_debugger"  # Influx Query
 SOLAR_DEBUG_CONFIG_TITLE = "solar_debugger"  # Solar Runtime
+MQTT_READER_CONFIG_TITLE = "mqtt_reader"  # Solar Runtime
+MQTT_CAPTURE_CONFIG_TITLE = "mqtt_capture"  # Solar Runtime
+PACKET_DEDUP_CONFIG_TITLE = "packet_dedup"  # Solar Runtime
+FIELD_DEADBAND_CONFIG_TITLE = "field_deadband"  # Solar Runtime
+ROLLUPS_CONFIG_TITLE = "rollups"  # Solar Runtime
+INFLUX_WRITER_CONFIG_TITLE = "influx_writer"  # Solar Runtime
+WRITE_SPOOL_CONFIG_TITLE = "write_spool"  # Solar Runtime
+WRITE_RETRY_CONFIG_TITLE = "write_retry"  # Solar Runtime
+INGEST_QUEUE_CONFIG_TITLE = "ingest_queue"  # Solar Runtime
+DECODE_POOL_CONFIG_TITLE = "decode_pool"  # Solar Runtime
+METRICS_CONFIG_TITLE = "metrics"  # Solar Runtime
+SUPERVISOR_CONFIG_TITLE = "supervisor"  # Solar Runtime
 
 # Additional Consts
 MAX_PORT_RANGE = 65535
 TIME_PACKET_SIZE = 4  # Measured in bytes
+SOURCE_TAG_KEY = "source"  # Tag naming the MQTT broker a point came from
 
 # Multi-Threading Processing
-# Size of queue, needs to be quite large for the volume of data
+# Default size of queue, needs to be quite large for the volume of data
+# Set max_queue_length under ingest_queue in the config to change it
 MAX_QUEUE_LENGTH = 150
-# Time to wait when queue is full
+# Time to wait on the queue before checking if threads should stop
 QUEUE_WAIT_TIME = 1
+# Longest wait for an MQTT network thread to exit after disconnecting
+MQTT_LISTENER_JOIN_TIME = 5
 THREADED_QUEUE = Queue(maxsize=MAX_QUEUE_LENGTH)
@@ -6,7 +6,10 @@ import csv
 import logging
 import os
 from configparser import ConfigParser
+from dataclasses import fields
+from queue import Empty, Full, Queue
 
+from src.classes.custom_exceptions import MissingConfigurationError
 from src.helpers.consts import CONFIG_FILENAME
 
 
@@ -43,3 +46,73 @@ def read_query_settings(config_name: str) -> any:
     config_parser = ConfigParser()
     config_parser.read(CONFIG_FILENAME)
     return config_parser.get(section=config_name, option="query_mode")
+
+
+def read_settings(
+    config_name: str, settings_class: type, config_dir: str = CONFIG_FILENAME
+) -> any:
+    """
+    Reads a config section into a settings dataclass, any options missing from
+    the config keep the default defined on the dataclass
+    :param config_name: Section under the config for the configuration to pull data from
+    :param settings_class: Dataclass which defines the option names, types and defaults
+    :param config_dir: Location of the config file
+    :return: Instance of settings_class populated from the config
+    """
+    config_parser = ConfigParser()
+    config_parser.read(config_dir)
+    if not config_parser.has_section(config_name):
+        logging.warning(f"Missing config section {config_name}, using defaults")
+        return settings_class()
+
+    settings = {}
+    try:
+        for field in fields(settings_class):
+            if not config_parser.has_option(config_name, field.name):
+                continue
+            if field.type is bool:
+                settings[field.name] = config_parser.getboolean(config_name, field.name)
+            else:
+                settings[field.name] = field.type(
+                    config_parser.get(config_name, field.name)
+                )
+    except ValueError as err:
+        logging.critical(f"Failed to read {config_name} settings in configs")
+        raise MissingConfigurationError(
+            f"Failed to read {config_name} settings in configs"
+        ) from err
+    return settings_class(**settings)
+
+
+def get_many(source_queue: Queue, max_items: int, timeout: float) -> list:
+    """
+    Blocks until an item is put on the queue, then takes up to max_items which are
+    already waiting without blocking again. None items are wake up calls from
+    wake_consumer and are never returned.
+    :param source_queue: Queue to take items from
+    :param max_items: Maximum number of items to take
+    :param timeout: Seconds to wait for the first item
+    :return: List of items taken off the queue, empty if the timeout passed
+    """
+    try:
+        items = [source_queue.get(timeout=timeout)]
+    except Empty:
+        return []
+    while len(items) < max_items:
+        try:
+            items.append(source_queue.get_nowait())
+        except Empty:
+            break
+    return [item for item in items if item is not None]
+
+
+def wake_consumer(target_queue: Queue) -> None:
+    """
+    Puts a wake up call on a queue so a consumer blocked in get_many returns
+    straight away, a full queue is left alone since its consumer isn't blocked
+    :param target_queue: Queue the consumer is waiting on
+    """
+    try:
+        target_queue.put_nowait(None)
+    except Full:
+        pass
@@ -2,7 +2,20 @@
 """
 Main run file for Solar Logger
 """
-from src.app.solar_main import main
+
+import argparse
+
+from src.app import solar_async, solar_main
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--runner",
+        choices=["threaded", "asyncio"],
+        default="threaded",
+        help="Run MQTT and InfluxDB in separate threads or on one asyncio event loop",
+    )
+    if parser.parse_args().runner == "asyncio":
+        solar_async.main()
+    else:
+        solar_main.main()
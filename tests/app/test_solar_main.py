@@ -1,5 +1,92 @@
-# pylint: disable=missing-function-docstring, missing-module-docstring
+# pylint: disable=missing-function-docstring, missing-module-docstring, redefined-outer-name
+import os
+import shutil
+import threading
+
 import pytest
+from pytest_mock import MockerFixture
+
+from src.app.solar_main import ThreadedRunner
+from src.classes.spool_classes import SpoolSettings
+from src.helpers.py_functions import read_settings
+from tests.config.consts import FAKE
+from tests.simulator import (
+    FakeInfluxServer,
+    LocalBroker,
+    OutbackSimulator,
+    create_certificate,
+)
+
+PACKET_COUNT = 60
+
+
+@pytest.fixture
+def broker_fixture(tmp_path):
+    if shutil.which("openssl") is None:
+        pytest.skip("Openssl is needed to create the broker certificate")
+    certfile, keyfile = create_certificate(directory=str(tmp_path))
+    broker = LocalBroker(certfile=certfile, keyfile=keyfile)
+    broker.start()
+    yield broker
+    broker.stop()
+
+
+def create_runner(
+    mocker: MockerFixture,
+    broker: LocalBroker,
+    influx_server: FakeInfluxServer,
+    tmp_path,
+) -> ThreadedRunner:
+    mocker.patch.dict(
+        os.environ,
+        {
+            "MQTT_HOST": broker.host,
+            "MQTT_PORT": str(broker.port),
+            "MQTT_USER": FAKE.pystr(),
+            "MQTT_TOKEN": FAKE.pystr(),
+            "MQTT_TOPIC": "mate/#",
+            "INFLUX_URL": influx_server.url,
+            "INFLUX_ORG": FAKE.pystr(),
+            "INFLUX_BUCKET": FAKE.pystr(),
+            "INFLUX_TOKEN": FAKE.pystr(),
+        },
+    )
+    # The runner's signal and log file handlers would outlive the test
+    mocker.patch("src.app.solar_main.signal.signal")
+    mocker.patch("src.app.solar_main.create_logger")
+
+    def read_test_settings(config_name: str, settings_class: type):
+        settings = read_settings(config_name=config_name, settings_class=settings_class)
+        if settings_class is SpoolSettings:
+            # Segments left in the configured spool would be replayed into the server
+            settings.spool_location = str(tmp_path / "spool")
+        return settings
+
+    mocker.patch("src.app.solar_main.read_settings", side_effect=read_test_settings)
+    return ThreadedRunner()
+
+
+def run_simulation(
+    thread_runner: ThreadedRunner,
+    broker: LocalBroker,
+    influx_server: FakeInfluxServer,
+    simulator: OutbackSimulator,
+) -> None:
+    for topic, payload in simulator.status_messages():
+        broker.publish(topic, payload, retain=True)
+
+    def publish_packets() -> None:
+        try:
+            if broker.wait_for_subscribers(timeout=10):
+                simulator.run(publish=broker.publish, packet_count=PACKET_COUNT)
+                influx_server.wait_for_points(PACKET_COUNT, timeout=30)
+        finally:
+            thread_runner.stop_event.set()
+
+    publisher = threading.Thread(target=publish_packets)
+    publisher.start()
+    thread_runner.start()
+    publisher.join()
 
 
 class TestThreadRunner:
@@ -8,3 +95,48 @@ class TestThreadRunner:
     @pytest.mark.skip("Solar Logger testing not implemented yet")
     def test_todo(self):
         raise NotImplementedError
+
+    def test_writes_simulated_packets(
+        self, mocker: MockerFixture, broker_fixture: LocalBroker, tmp_path
+    ):
+        influx_server = FakeInfluxServer(write_latency=0.01, keep_lines=True)
+        influx_server.start()
+        thread_runner = create_runner(mocker, broker_fixture, influx_server, tmp_path)
+        simulator = OutbackSimulator(device_count=3, publish_rate=0, seed=1)
+
+        run_simulation(
+            thread_runner=thread_runner,
+            broker=broker_fixture,
+            influx_server=influx_server,
+            simulator=simulator,
+        )
+        influx_server.stop()
+
+        assert influx_server.stats.points == PACKET_COUNT
+        # Every device is written as its own measurement
+        for device in simulator.devices:
+            assert (
+                sum(
+                    line.startswith(f"{device.measurement} ".encode())
+                    for line in influx_server.lines
+                )
+                == PACKET_COUNT // 3
+            )
+
+    def test_retries_failed_writes(
+        self, mocker: MockerFixture, broker_fixture: LocalBroker, tmp_path
+    ):
+        influx_server = FakeInfluxServer(error_rate=0.5, seed=1)
+        influx_server.start()
+        thread_runner = create_runner(mocker, broker_fixture, influx_server, tmp_path)
+
+        run_simulation(
+            thread_runner=thread_runner,
+            broker=broker_fixture,
+            influx_server=influx_server,
+            simulator=OutbackSimulator(device_count=3, publish_rate=200, seed=1),
+        )
+        influx_server.stop()
+
+        assert influx_server.stats.failed_requests > 0
+        assert influx_server.stats.points == PACKET_COUNT
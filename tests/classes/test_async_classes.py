@@ -0,0 +1,281 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring
+import asyncio
+import itertools
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from queue import Queue
+
+from paho.mqtt.client import MQTT_ERR_NO_CONN, MQTT_ERR_SUCCESS, Client
+from pytest_mock import MockerFixture
+
+from src.classes.async_classes import AsyncMqttLoop, AsyncWriter
+from src.classes.common_classes import QueuePackage
+from src.classes.influx_classes import BatchWriter, DrainStats, InfluxConnector
+
+
+def create_queue_package(index: int, measurement: str = "fx-1") -> QueuePackage:
+    return QueuePackage(
+        measurement=measurement,
+        time_field=datetime(2022, 1, 1, second=index % 60),
+        field={"battery_voltage": 27.4},
+    )
+
+
+def running_for(iterations: int):
+    states = itertools.chain(
+        itertools.repeat(True, iterations), itertools.repeat(False)
+    )
+    return lambda: next(states)
+
+
+class TestAsyncMqttLoop:
+    """Test class for Async MQTT Loop"""
+
+    def test_watches_connected_socket(self, mocker: MockerFixture):
+        mqtt_client = mocker.MagicMock(Client)
+        sock = object()
+        mqtt_client.socket.return_value = sock
+        mqtt_client.want_write.return_value = True
+        loop = mocker.MagicMock(asyncio.AbstractEventLoop)
+
+        _ = AsyncMqttLoop(mqtt_client=mqtt_client, loop=loop)
+
+        loop.add_reader.assert_called_once()
+        assert loop.add_reader.call_args.args[0] is sock
+        loop.add_writer.assert_called_once_with(sock, mqtt_client.loop_write)
+
+    def test_reads_burst_then_notifies(self, mocker: MockerFixture):
+        mqtt_client = mocker.MagicMock(Client)
+        mqtt_client.socket.return_value = None
+        mqtt_client.loop_read.side_effect = [
+            MQTT_ERR_SUCCESS,
+            MQTT_ERR_SUCCESS,
+            MQTT_ERR_NO_CONN,
+        ]
+        on_read = mocker.MagicMock()
+        mqtt_loop = AsyncMqttLoop(
+            mqtt_client=mqtt_client,
+            loop=mocker.MagicMock(asyncio.AbstractEventLoop),
+            on_read=on_read,
+        )
+
+        mqtt_loop._read()  # pylint: disable=protected-access
+
+        assert mqtt_client.loop_read.call_count == 3
+        on_read.assert_called_once()
+
+    def test_reconnects_then_disconnects(self, mocker: MockerFixture):
+        mqtt_client = mocker.MagicMock(Client)
+        mqtt_client.socket.return_value = None
+
+        async def run_loop() -> None:
+            stopping = asyncio.Event()
+
+            def loop_misc() -> int:
+                stopping.set()
+                return MQTT_ERR_NO_CONN
+
+            mqtt_client.loop_misc.side_effect = loop_misc
+            mqtt_loop = AsyncMqttLoop(
+                mqtt_client=mqtt_client, loop=asyncio.get_running_loop()
+            )
+            await mqtt_loop.run(stopping=stopping)
+
+        asyncio.run(run_loop())
+
+        mqtt_client.reconnect.assert_called_once()
+        mqtt_client.disconnect.assert_called_once()
+
+    def test_reconnects_off_loop_then_watches_socket(self, mocker: MockerFixture):
+        mqtt_client = mocker.MagicMock(Client)
+        mqtt_client.socket.return_value = None
+        mqtt_client.want_write.return_value = False
+        sock = object()
+        loop_thread = threading.current_thread()
+        reconnect_threads = []
+
+        def reconnect() -> None:
+            reconnect_threads.append(threading.current_thread())
+            # Paho opens the new socket inside reconnect
+            assert mqtt_client.on_socket_open is None
+            mqtt_client.socket.return_value = sock
+
+        mqtt_client.reconnect.side_effect = reconnect
+        loop = mocker.MagicMock(asyncio.AbstractEventLoop)
+
+        async def run_loop() -> None:
+            stopping = asyncio.Event()
+            loop.run_in_executor.side_effect = (
+                asyncio.get_running_loop().run_in_executor
+            )
+
+            def loop_misc() -> int:
+                stopping.set()
+                return MQTT_ERR_NO_CONN
+
+            mqtt_client.loop_misc.side_effect = loop_misc
+            mqtt_loop = AsyncMqttLoop(mqtt_client=mqtt_client, loop=loop)
+            await mqtt_loop.run(stopping=stopping)
+
+        asyncio.run(run_loop())
+
+        assert reconnect_threads and reconnect_threads[0] is not loop_thread
+        loop.add_reader.assert_called_once()
+        assert loop.add_reader.call_args.args[0] is sock
+        assert mqtt_client.on_socket_open is not None
+
+
+class TestAsyncWriter:
+    """Test class for Async Writer"""
+
+    def test_writes_every_package(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        influx_connector.serialize_batch.side_effect = (
+            lambda queue_packages: queue_packages[:]
+        )
+        batch_writers = [
+            BatchWriter(
+                influx_connector=influx_connector, batch_size=10, flush_interval=0.01
+            )
+            for _ in range(2)
+        ]
+        source_queue = Queue()
+        for index in range(25):
+            source_queue.put(create_queue_package(index))
+
+        async def run_writer() -> None:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                async_writer = AsyncWriter(
+                    batch_writers=batch_writers,
+                    source_queue=source_queue,
+                    executor=executor,
+                )
+                await async_writer.run(is_running=running_for(3))
+
+        asyncio.run(run_writer())
+
+        written = [
+            queue_package
+            for call in influx_connector.write_lines.call_args_list
+            for queue_package in call.kwargs["lines"]
+        ]
+        assert sorted(written, key=lambda package: package.time_field) == [
+            create_queue_package(index) for index in range(25)
+        ]
+        assert max(len(batch_writer) for batch_writer in batch_writers) == 0
+
+    def test_writes_measurements_in_order(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        influx_connector.serialize_batch.side_effect = (
+            lambda queue_packages: queue_packages[:]
+        )
+        writing = Counter()
+        writing_lock = threading.Lock()
+        overlaps = []
+
+        def write_lines(lines: list[QueuePackage]) -> None:
+            measurements = {queue_package.measurement for queue_package in lines}
+            with writing_lock:
+                overlaps.extend(
+                    measurement for measurement in measurements if writing[measurement]
+                )
+                writing.update(measurements)
+            time.sleep(0.005)
+            with writing_lock:
+                writing.subtract(measurements)
+
+        influx_connector.write_lines.side_effect = write_lines
+        batch_writers = [
+            BatchWriter(
+                influx_connector=influx_connector, batch_size=3, flush_interval=0.01
+            )
+            for _ in range(2)
+        ]
+        source_queue = Queue()
+        measurements = ["dc-1", "fx-1", "mx-1"]
+        for index in range(60):
+            source_queue.put(create_queue_package(index, measurements[index % 3]))
+
+        async def run_writer() -> None:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                async_writer = AsyncWriter(
+                    batch_writers=batch_writers,
+                    source_queue=source_queue,
+                    executor=executor,
+                )
+                await async_writer.run(is_running=running_for(10))
+
+        asyncio.run(run_writer())
+
+        written = [
+            queue_package
+            for call in influx_connector.write_lines.call_args_list
+            for queue_package in call.kwargs["lines"]
+        ]
+        assert len(written) == 60
+        assert not overlaps
+        for measurement in measurements:
+            assert [
+                queue_package
+                for queue_package in written
+                if queue_package.measurement == measurement
+            ] == [
+                create_queue_package(index, measurement)
+                for index in range(60)
+                if measurements[index % 3] == measurement
+            ]
+
+    def test_drops_what_misses_deadline(self, mocker: MockerFixture):
+        batch_writers = [
+            BatchWriter(
+                influx_connector=mocker.MagicMock(InfluxConnector),
+                batch_size=10,
+                flush_interval=60,
+            )
+        ]
+        source_queue = Queue()
+        drain_stats = None
+
+        async def run_writer() -> None:
+            nonlocal drain_stats
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                async_writer = AsyncWriter(
+                    batch_writers=batch_writers,
+                    source_queue=source_queue,
+                    executor=executor,
+                )
+                for index in range(25):
+                    source_queue.put(create_queue_package(index))
+                drain_stats = await async_writer.run(
+                    is_running=lambda: False, drain_deadline=0.0
+                )
+
+        asyncio.run(run_writer())
+
+        assert drain_stats == DrainStats(dropped=25)
+        assert source_queue.empty()
+
+    def test_replays_spool_when_idle(self, mocker: MockerFixture):
+        batch_writer = mocker.MagicMock(BatchWriter)
+        batch_writer.__len__.return_value = 0
+        batch_writer.batch_size = 10
+        batch_writer.is_due.return_value = False
+        batch_writer.time_until_replay.side_effect = itertools.chain(
+            [0.0], itertools.repeat(None)
+        )
+
+        async def run_writer() -> None:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                async_writer = AsyncWriter(
+                    batch_writers=[batch_writer],
+                    source_queue=Queue(),
+                    executor=executor,
+                )
+                await async_writer.run(is_running=running_for(2))
+
+        asyncio.run(run_writer())
+
+        batch_writer.replay_spool.assert_called_once()
@@ -0,0 +1,166 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring
+from array import array
+from datetime import datetime, timedelta, timezone
+from queue import Full
+
+from pytest import raises
+
+from src.classes.buffer_classes import SampleBuffer, SampleRing
+from src.classes.common_classes import QueuePackage
+from src.classes.queue_classes import IngestQueue
+from src.helpers.py_functions import get_many
+
+
+def create_queue_package(index: int, measurement: str = "fx-1") -> QueuePackage:
+    return QueuePackage(
+        measurement=measurement,
+        time_field=datetime(2022, 1, 1) + timedelta(seconds=index),
+        field={"battery_voltage": 27.4 + index, "ac_mode": 2.0},
+    )
+
+
+class TestSampleRing:
+    """Test class for Sample Ring"""
+
+    def test_keeps_order_while_growing(self):
+        sample_ring = SampleRing(width=2, capacity=4)
+
+        popped = []
+        for index in range(3):
+            sample_ring.append(time_us=index, values=array("d", [index, -index]))
+        popped.append(sample_ring.popleft())
+        for index in range(3, 10):
+            sample_ring.append(time_us=index, values=array("d", [index, -index]))
+        while sample_ring:
+            popped.append(sample_ring.popleft())
+
+        assert [time_us for time_us, _ in popped] == list(range(10))
+        assert [list(values) for _, values in popped] == [
+            [index, -index] for index in range(10)
+        ]
+
+    def test_shrinks_once_emptied(self):
+        sample_ring = SampleRing(width=2, capacity=4)
+        start_bytes = sample_ring.nbytes
+
+        for index in range(20):
+            sample_ring.append(time_us=index, values=array("d", [0.0, 1.0]))
+        assert sample_ring.nbytes == start_bytes * 8
+        for _ in range(20):
+            sample_ring.popleft()
+
+        assert sample_ring.nbytes == start_bytes
+        assert len(sample_ring) == 0
+
+
+class TestSampleBuffer:
+    """Test class for Sample Buffer"""
+
+    def test_returns_packages_in_order(self):
+        sample_buffer = SampleBuffer(maxsize=100)
+        queue_packages = [
+            create_queue_package(index, measurement=f"fx-{index % 3}")
+            for index in range(50)
+        ]
+
+        for queue_package in queue_packages:
+            sample_buffer.put_nowait(queue_package)
+
+        assert sample_buffer.qsize() == 50
+        assert [sample_buffer.get_nowait() for _ in range(50)] == queue_packages
+        assert sample_buffer.empty()
+
+    def test_converts_aware_times_to_utc(self):
+        sample_buffer = SampleBuffer(maxsize=1)
+        time_field = datetime(2022, 1, 1, 10, tzinfo=timezone(timedelta(hours=10)))
+
+        sample_buffer.put_nowait(
+            QueuePackage(measurement="mx-1", time_field=time_field, field={"a": 1.0})
+        )
+
+        assert sample_buffer.get_nowait().time_field == datetime(2022, 1, 1)
+
+    def test_keeps_epoch_seconds(self):
+        sample_buffer = SampleBuffer(maxsize=10)
+        seconds_package = QueuePackage(
+            measurement="mx-1", time_field=1640995200, field={"a": 1.0}
+        )
+
+        sample_buffer.put_nowait(seconds_package)
+        sample_buffer.put_nowait(create_queue_package(0))
+
+        assert sample_buffer.get_nowait() == seconds_package
+        assert sample_buffer.get_nowait() == create_queue_package(0)
+
+    def test_passes_through_other_items(self):
+        sample_buffer = SampleBuffer(maxsize=10)
+        int_package = QueuePackage(
+            measurement="dc-1", time_field=datetime(2022, 1, 1), field={"a": 1}
+        )
+
+        sample_buffer.put_nowait(create_queue_package(0))
+        sample_buffer.put_nowait(int_package)
+        sample_buffer.put_nowait(None)
+        sample_buffer.put_nowait(create_queue_package(1))
+
+        assert [sample_buffer.get_nowait() for _ in range(4)] == [
+            create_queue_package(0),
+            int_package,
+            None,
+            create_queue_package(1),
+        ]
+
+    def test_keeps_received_time(self):
+        sample_buffer = SampleBuffer(maxsize=10)
+        received_package = create_queue_package(0)
+        received_package.received_at = 12.5
+
+        sample_buffer.put_nowait(received_package)
+        sample_buffer.put_nowait(create_queue_package(1))
+
+        assert sample_buffer.get_nowait().received_at == 12.5
+        assert sample_buffer.get_nowait().received_at is None
+
+    def test_keeps_sources_apart(self):
+        sample_buffer = SampleBuffer(maxsize=10)
+        source_packages = []
+        for source in ["north", "south", None]:
+            queue_package = create_queue_package(0)
+            queue_package.source = source
+            source_packages.append(queue_package)
+            sample_buffer.put_nowait(queue_package)
+
+        assert [sample_buffer.get_nowait() for _ in range(3)] == source_packages
+
+    def test_raises_full(self):
+        sample_buffer = SampleBuffer(maxsize=2)
+        sample_buffer.put_nowait(create_queue_package(0))
+        sample_buffer.put_nowait(create_queue_package(1))
+
+        with raises(Full):
+            sample_buffer.put_nowait(create_queue_package(2))
+
+    def test_drops_oldest_through_ingest_queue(self):
+        sample_buffer = SampleBuffer(maxsize=3)
+        ingest_queue = IngestQueue(target_queue=sample_buffer)
+
+        for index in range(5):
+            ingest_queue.put(create_queue_package(index))
+
+        assert get_many(source_queue=sample_buffer, max_items=10, timeout=0.01) == [
+            create_queue_package(index) for index in range(2, 5)
+        ]
+        assert ingest_queue.stats.dropped_oldest == 2
+
+    def test_releases_memory_once_drained(self):
+        sample_buffer = SampleBuffer(maxsize=1000)
+        sample_buffer.put_nowait(create_queue_package(0))
+        start_bytes = sample_buffer.nbytes
+
+        for index in range(1, 1000):
+            sample_buffer.put_nowait(create_queue_package(index))
+        assert sample_buffer.nbytes > start_bytes * 10
+        while not sample_buffer.empty():
+            sample_buffer.get_nowait()
+
+        assert sample_buffer.nbytes <= start_bytes
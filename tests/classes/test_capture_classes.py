@@ -0,0 +1,128 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring
+import os
+
+from paho.mqtt.client import MQTTMessage
+from pytest import raises
+from pytest_mock import MockerFixture
+
+from src.classes.capture_classes import (
+    CAPTURE_MAGIC,
+    CaptureReplayer,
+    CaptureWriter,
+    create_capture_file,
+    read_capture,
+)
+
+MESSAGES = [
+    (1640995200.25, "mate/status", b"online"),
+    (1640995200.5, "mate/fx-1/fx-status", b"\x01\x02\x03"),
+    (1640995201.0, "mate/fx-1/fx-status", b"\x04\x05\x06"),
+    (1640995203.0, "mate/mx-1/mx-status", b""),
+]
+
+
+def write_capture(capture_file: str, **kwargs) -> CaptureWriter:
+    capture_writer = CaptureWriter(capture_file=capture_file, **kwargs)
+    for received_at, topic, payload in MESSAGES:
+        capture_writer.write(topic=topic, payload=payload, received_at=received_at)
+    capture_writer.close()
+    return capture_writer
+
+
+def test_create_capture_file():
+    capture_file = create_capture_file(capture_location="output/captures/")
+    assert capture_file.startswith("output/captures/mqtt-")
+    assert capture_file.endswith(".capture")
+    assert "/north-" in create_capture_file("output/captures/", source="north")
+
+
+def test_read_capture_rejects_other_files(tmp_path):
+    capture_file = tmp_path / "other.capture"
+    capture_file.write_bytes(b"not a capture")
+    with raises(ValueError):
+        list(read_capture(str(capture_file)))
+
+
+class TestCaptureWriter:
+    """Test class for Capture Writer"""
+
+    def test_round_trips_messages(self, tmp_path):
+        capture_file = str(tmp_path / "captures" / "mqtt.capture")
+        capture_writer = write_capture(capture_file)
+
+        assert list(read_capture(capture_file)) == MESSAGES
+        assert capture_writer.stats.captured == 4
+        assert capture_writer.stats.bytes_written == os.path.getsize(capture_file)
+
+    def test_writes_each_topic_once(self, tmp_path):
+        capture_file = str(tmp_path / "mqtt.capture")
+        write_capture(capture_file)
+
+        with open(capture_file, "rb") as file_instance:
+            assert file_instance.read().count(b"mate/fx-1/fx-status") == 1
+
+    def test_skips_messages_once_full(self, tmp_path):
+        capture_file = str(tmp_path / "mqtt.capture")
+        capture_writer = write_capture(capture_file, max_capture_bytes=101)
+
+        assert list(read_capture(capture_file)) == MESSAGES[:2]
+        assert capture_writer.stats.skipped == 2
+        assert os.path.getsize(capture_file) == 101
+
+    def test_ignores_messages_once_closed(self, tmp_path):
+        capture_writer = write_capture(str(tmp_path / "mqtt.capture"))
+        capture_writer.write(topic="mate/status", payload=b"offline")
+        assert capture_writer.stats.captured == 4
+
+    def test_stops_at_truncated_record(self, tmp_path):
+        capture_file = tmp_path / "mqtt.capture"
+        write_capture(str(capture_file))
+        capture_file.write_bytes(capture_file.read_bytes()[:-1])
+
+        assert list(read_capture(str(capture_file))) == MESSAGES[:3]
+        capture_file.write_bytes(CAPTURE_MAGIC)
+        assert not list(read_capture(str(capture_file)))
+
+
+class TestCaptureReplayer:
+    """Test class for Capture Replayer"""
+
+    def test_replays_messages(self, mocker: MockerFixture, tmp_path):
+        capture_file = str(tmp_path / "mqtt.capture")
+        write_capture(capture_file)
+        sleep = mocker.patch("src.classes.capture_classes.time.sleep")
+        replayed = []
+
+        replay_stats = CaptureReplayer(
+            on_message=lambda _client, _userdata, msg: replayed.append(msg),
+            speed=0,
+        ).replay(capture_file=capture_file)
+
+        sleep.assert_not_called()
+        assert all(isinstance(msg, MQTTMessage) for msg in replayed)
+        assert [(msg.topic, msg.payload) for msg in replayed] == [
+            (topic, payload) for _, topic, payload in MESSAGES
+        ]
+        assert replay_stats.messages == 4
+        assert replay_stats.payload_bytes == 12
+        assert replay_stats.capture_seconds == 2.75
+
+    def test_keeps_captured_gaps(self, mocker: MockerFixture, tmp_path):
+        capture_file = str(tmp_path / "mqtt.capture")
+        write_capture(capture_file)
+        mocker.patch("src.classes.capture_classes.time.monotonic", return_value=10.0)
+        sleep = mocker.patch("src.classes.capture_classes.time.sleep")
+
+        CaptureReplayer(on_message=mocker.MagicMock(), speed=2.0).replay(
+            capture_file=capture_file
+        )
+
+        assert [call.args[0] for call in sleep.call_args_list] == [
+            0.125,
+            0.375,
+            1.375,
+        ]
+
+    def test_rejects_negative_speed(self):
+        with raises(ValueError):
+            CaptureReplayer(on_message=print, speed=-1.0)
@@ -52,6 +52,45 @@ class TestSecretStore:
         assert "Reading Influx environment variables" not in caplog.text
         assert secret_store.mqtt_secrets == mqtt_env_copy
 
+    def test_passes_secret_store_reads_mqtt_sources(self, mocker: MockerFixture):
+        sources_env = {"MQTT_SOURCES": "north, south-2"}
+        for prefix in ["MQTT_NORTH_", "MQTT_SOUTH_2_"]:
+            sources_env.update(
+                {
+                    key.replace("MQTT_", prefix): value
+                    for key, value in TEST_MQTT_ENV.items()
+                }
+            )
+        sources_env["MQTT_SOUTH_2_HOST"] = "south-host"
+        mocker.patch.dict(os.environ, sources_env)
+
+        secret_store = SecretStore(has_mqtt_access=True)
+
+        assert list(secret_store.mqtt_brokers) == ["north", "south-2"]
+        assert secret_store.mqtt_brokers["north"]["mqtt_host"] == (
+            TEST_MQTT_ENV["MQTT_HOST"]
+        )
+        assert secret_store.mqtt_brokers["south-2"]["mqtt_host"] == "south-host"
+        assert secret_store.mqtt_secrets == secret_store.mqtt_brokers["north"]
+
+    def test_passes_single_broker_has_no_source(self, mocker: MockerFixture):
+        mocker.patch.dict(os.environ, TEST_MQTT_ENV)
+
+        secret_store = SecretStore(has_mqtt_access=True)
+
+        assert secret_store.mqtt_brokers == {None: secret_store.mqtt_secrets}
+
+    def test_fails_duplicate_mqtt_sources(
+        self, mocker: MockerFixture, caplog: LogCaptureFixture
+    ):
+        caplog.set_level(logging.CRITICAL)
+        mocker.patch.dict(os.environ, {"MQTT_SOURCES": "north,north"})
+
+        with raises(MissingCredentialsError):
+            _ = SecretStore(has_mqtt_access=True)
+
+        assert "MQTT sources must be unique and not empty" in caplog.text
+
     def test_passes_secret_store_reads_influx_env(
         self, mocker: MockerFixture, caplog: LogCaptureFixture
     ):
@@ -0,0 +1,174 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring, protected-access
+from datetime import datetime, timedelta
+
+from pytest import raises
+
+from src.classes.buffer_classes import SampleBuffer
+from src.classes.common_classes import QueuePackage
+from src.classes.deadband_classes import (
+    DeadbandFilter,
+    parse_field_deadbands,
+    present_fields,
+)
+from src.classes.serializer_classes import LineProtocolSerializer
+
+
+def create_queue_package(
+    seconds: int, field: dict, measurement: str = "fx-1", source: str = None
+) -> QueuePackage:
+    return QueuePackage(
+        measurement=measurement,
+        time_field=1640995200 + seconds,
+        field=field,
+        source=source,
+    )
+
+
+def test_parse_field_deadbands():
+    assert parse_field_deadbands(
+        " fx-1.battery_voltage=0.2, mx-1.pv_voltage = 1.5%, *.warnings=0,"
+    ) == {
+        ("fx-1", "battery_voltage"): (0.2, 0.0),
+        ("mx-1", "pv_voltage"): (0.0, 0.015),
+        ("*", "warnings"): (0.0, 0.0),
+    }
+    assert not parse_field_deadbands("")
+    with raises(ValueError):
+        parse_field_deadbands("battery_voltage=0.2")
+    with raises(ValueError):
+        parse_field_deadbands("fx-1.battery_voltage=high")
+
+
+class TestDeadbandFilter:
+    """Test class for Deadband Filter"""
+
+    def test_drops_unchanged_fields(self):
+        deadband_filter = DeadbandFilter()
+
+        first = deadband_filter.filter(
+            create_queue_package(0, {"aux_on": 0.0, "battery_voltage": 27.4})
+        )
+        second = deadband_filter.filter(
+            create_queue_package(1, {"aux_on": 0.0, "battery_voltage": 27.5})
+        )
+        third = deadband_filter.filter(
+            create_queue_package(2, {"aux_on": 0.0, "battery_voltage": 27.5})
+        )
+
+        assert first.field == {"aux_on": 0.0, "battery_voltage": 27.4}
+        assert present_fields(second.field) == {"battery_voltage": 27.5}
+        assert list(second.field) == ["aux_on", "battery_voltage"]
+        assert third is None
+        assert deadband_filter.stats.emitted == 3
+        assert deadband_filter.stats.suppressed == 3
+
+    def test_keeps_package_layout(self):
+        deadband_filter = DeadbandFilter()
+        sample_buffer = SampleBuffer()
+        serializer = LineProtocolSerializer(precision="s")
+
+        for seconds, voltage in enumerate([27.4, 27.5, 27.5, 27.4]):
+            sample_buffer.put(
+                deadband_filter.filter(
+                    create_queue_package(
+                        seconds,
+                        {"aux_on": float(seconds > 1), "battery_voltage": voltage},
+                    )
+                )
+            )
+        while not sample_buffer.empty():
+            serializer.append_package(sample_buffer.get())
+
+        # Every package shares one ring however many of its fields were dropped
+        assert len(sample_buffer._rings) == 1
+        assert len(serializer._layouts) == 1
+        assert serializer.getvalue() == (
+            b"fx-1 aux_on=0,battery_voltage=27.4 1640995200\n"
+            b"fx-1 battery_voltage=27.5 1640995201\n"
+            b"fx-1 aux_on=1 1640995202\n"
+            b"fx-1 battery_voltage=27.4 1640995203\n"
+        )
+
+    def test_uses_wider_deadband(self):
+        deadband_filter = DeadbandFilter(absolute_deadband=0.5, relative_deadband=0.1)
+        voltages = [100.0, 109.0, 111.0, 111.4, 112.0]
+
+        written = [
+            deadband_filter.filter(create_queue_package(seconds, {"voltage": voltage}))
+            is not None
+            for seconds, voltage in enumerate(voltages)
+        ]
+
+        assert written == [True, False, True, False, False]
+
+    def test_resolves_field_deadbands(self):
+        deadband_filter = DeadbandFilter(
+            absolute_deadband=10.0,
+            field_deadbands="fx-1.battery_voltage=0.05, fx-1.*=1, *.battery_voltage=2",
+        )
+
+        for field, deadband in [
+            ("battery_voltage", (0.05, 0.0)),
+            ("aux_on", (1.0, 0.0)),
+            ("warnings", (1.0, 0.0)),
+        ]:
+            assert deadband_filter._deadband("fx-1", field) == deadband
+        assert deadband_filter._deadband("mx-1", "battery_voltage") == (2.0, 0.0)
+        assert deadband_filter._deadband("mx-1", "pv_voltage") == (10.0, 0.0)
+
+    def test_writes_heartbeat(self):
+        deadband_filter = DeadbandFilter(heartbeat_interval=60.0)
+
+        written = [
+            deadband_filter.filter(create_queue_package(seconds, {"aux_on": 0.0}))
+            is not None
+            for seconds in [0, 30, 59, 60, 90, 119, 120]
+        ]
+
+        assert written == [True, False, False, True, False, False, True]
+
+    def test_writes_when_time_goes_back(self):
+        deadband_filter = DeadbandFilter()
+
+        deadband_filter.filter(create_queue_package(100, {"aux_on": 0.0}))
+
+        assert deadband_filter.filter(create_queue_package(0, {"aux_on": 0.0}))
+
+    def test_reads_datetimes(self):
+        deadband_filter = DeadbandFilter(heartbeat_interval=60.0)
+        written = []
+
+        for seconds in [0, 30, 60]:
+            queue_package = QueuePackage(
+                measurement="fx-1",
+                time_field=datetime(2022, 1, 1) + timedelta(seconds=seconds),
+                field={"aux_on": 0.0},
+            )
+            written.append(deadband_filter.filter(queue_package) is not None)
+
+        assert written == [True, False, True]
+
+    def test_writes_nan(self):
+        deadband_filter = DeadbandFilter(absolute_deadband=1.0)
+
+        for seconds, voltage in enumerate([27.4, float("nan"), 27.4]):
+            assert deadband_filter.filter(
+                create_queue_package(seconds, {"battery_voltage": voltage})
+            )
+
+    def test_keeps_sources_apart(self):
+        deadband_filter = DeadbandFilter()
+
+        filtered = deadband_filter.filter_packages(
+            [
+                create_queue_package(0, {"aux_on": 0.0}, source="north"),
+                create_queue_package(0, {"aux_on": 0.0}, source="south"),
+                create_queue_package(1, {"aux_on": 0.0}, source="north"),
+                create_queue_package(1, {"aux_on": 0.0}, measurement="mx-1"),
+            ]
+        )
+
+        assert [
+            (queue_package.measurement, queue_package.source)
+            for queue_package in filtered
+        ] == [("fx-1", "north"), ("fx-1", "south"), ("mx-1", None)]
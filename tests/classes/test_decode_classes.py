@@ -0,0 +1,150 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring, protected-access
+from concurrent.futures import Future
+from datetime import datetime
+from queue import Queue
+
+from pytest_mock import MockerFixture
+
+from src.classes.common_classes import QueuePackage
+from src.classes.deadband_classes import DeadbandFilter
+from src.classes.decode_classes import DecodePool
+from src.classes.queue_classes import IngestQueue
+from src.classes.rollup_classes import RollupAggregator
+from src.helpers.py_functions import get_many
+
+
+def fake_decode_packets(
+    packets: list[tuple[str, bytes, float, str, int]], queue_mode: str
+) -> tuple[list[QueuePackage], int]:
+    # Module level so the spawned decoder processes can import it
+    queue_packages = []
+    failed = 0
+    for topic, payload, received_at, source, _ in packets:
+        if payload == b"bad":
+            failed += 1
+            continue
+        queue_packages.append(
+            QueuePackage(
+                measurement=topic,
+                time_field=datetime(2022, 1, 1),
+                field={queue_mode: float(payload[0])},
+                received_at=received_at,
+                source=source,
+            )
+        )
+    return queue_packages, failed
+
+
+def create_decode_pool(target_queue: Queue, **kwargs) -> DecodePool:
+    return DecodePool(
+        decode_packets=fake_decode_packets,
+        ingest_queue=IngestQueue(target_queue=target_queue),
+        **kwargs,
+    )
+
+
+class TestDecodePool:
+    """Test class for Decode Pool"""
+
+    def test_loads_packages_in_order(self, mocker: MockerFixture):
+        target_queue = Queue()
+        on_loaded = mocker.MagicMock()
+        decode_pool = create_decode_pool(
+            target_queue, decode_workers=2, decode_batch_size=3, on_loaded=on_loaded
+        )
+        decode_pool.start()
+        for index in range(10):
+            decode_pool.submit(
+                topic="fx-1", payload=bytearray([index]), source=f"site-{index % 2}"
+            )
+        decode_pool.stop()
+
+        queue_packages = get_many(source_queue=target_queue, max_items=20, timeout=0)
+        assert [queue_package.field["packet"] for queue_package in queue_packages] == [
+            float(index) for index in range(10)
+        ]
+        assert [queue_package.source for queue_package in queue_packages] == [
+            f"site-{index % 2}" for index in range(10)
+        ]
+        assert decode_pool.stats.submitted == 10
+        assert decode_pool.stats.decoded == 10
+        on_loaded.assert_called()
+
+    def test_drops_packets_when_full(self):
+        decode_pool = create_decode_pool(Queue(), decode_workers=1, raw_queue_length=2)
+
+        for _ in range(3):
+            decode_pool.submit(topic="fx-1", payload=b"\x01")
+
+        assert decode_pool.stats.submitted == 2
+        assert decode_pool.stats.dropped == 1
+
+    def test_counts_failed_packets(self):
+        target_queue = Queue()
+        decode_pool = create_decode_pool(target_queue, decode_workers=1)
+        future = Future()
+        future.set_result(
+            fake_decode_packets(
+                [
+                    ("fx-1", b"bad", None, None, None),
+                    ("fx-1", b"\x01", None, None, None),
+                ],
+                "field",
+            )
+        )
+
+        decode_pool._load(future=future, packet_count=2)
+
+        assert target_queue.qsize() == 1
+        assert decode_pool.stats.decoded == 1
+        assert decode_pool.stats.failed == 1
+
+    def test_rolls_up_then_filters_unchanged_fields(self):
+        target_queue = Queue()
+        rollup_aggregator = RollupAggregator(rollup_windows="1m")
+        decode_pool = create_decode_pool(
+            target_queue,
+            decode_workers=1,
+            deadband_filter=DeadbandFilter(),
+            rollup_aggregator=rollup_aggregator,
+        )
+        future = Future()
+        future.set_result(
+            fake_decode_packets(
+                [
+                    ("fx-1", b"\x01", None, None, None),
+                    ("fx-1", b"\x01", None, None, None),
+                    ("fx-1", b"\x02", None, None, None),
+                ],
+                "packet",
+            )
+        )
+
+        decode_pool._load(future=future, packet_count=3)
+
+        queue_packages = get_many(source_queue=target_queue, max_items=5, timeout=0)
+        assert [queue_package.field for queue_package in queue_packages] == [
+            {"packet": 1.0},
+            {"packet": 2.0},
+        ]
+        assert decode_pool.stats.decoded == 3
+        # Rollups see every packet, not only those left by the deadband filter
+        assert rollup_aggregator.stats.samples == 3
+
+    def test_counts_crashed_batch_as_failed(self, mocker: MockerFixture):
+        on_loaded = mocker.MagicMock()
+        decode_pool = create_decode_pool(Queue(), decode_workers=1, on_loaded=on_loaded)
+        future = Future()
+        future.set_exception(RuntimeError("decoder process died"))
+
+        decode_pool._load(future=future, packet_count=5)
+
+        assert decode_pool.stats.failed == 5
+        on_loaded.assert_not_called()
+
+    def test_stop_without_start(self):
+        decode_pool = create_decode_pool(Queue(), decode_workers=1)
+
+        decode_pool.stop()
+
+        assert decode_pool.stats.decoded == 0
@@ -0,0 +1,91 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring, redefined-outer-name
+import struct
+
+from pytest import fixture
+from pytest_mock import MockerFixture
+
+from src.classes.dedup_classes import DedupIndex
+
+FX_TOPIC = "mate/fx-1/fx-status"
+MX_TOPIC = "mate/mx-1/mx-status"
+FX_PACKET = b"\x00\x00\x00\x04t\x00\x04\x00\x02\x01\x12\t\x00"
+
+
+def create_payload(packet_time: int) -> bytes:
+    return struct.pack("i", packet_time) + FX_PACKET + b"\x00\x00\x00"
+
+
+@fixture
+def monotonic_fixture(mocker: MockerFixture):
+    monotonic = mocker.patch("src.classes.dedup_classes.time.monotonic")
+    monotonic.return_value = 100.0
+    return monotonic
+
+
+@fixture
+def dedup_fixture(monotonic_fixture) -> DedupIndex:
+    _ = monotonic_fixture
+    return DedupIndex(dedup_window=60.0, max_entries=10)
+
+
+class TestDedupIndex:
+    """Test class for Dedup Index"""
+
+    def test_drops_repeated_packet(self, dedup_fixture: DedupIndex):
+        payload = create_payload(1640995200)
+
+        assert not dedup_fixture.seen(topic=FX_TOPIC, payload=payload)
+        assert dedup_fixture.seen(topic=FX_TOPIC, payload=payload)
+
+        assert dedup_fixture.stats.hits == 1
+        assert dedup_fixture.stats.misses == 1
+
+    def test_keeps_distinct_packets(self, dedup_fixture: DedupIndex):
+        payload = create_payload(1640995200)
+
+        assert not dedup_fixture.seen(topic=FX_TOPIC, payload=payload)
+        assert not dedup_fixture.seen(topic=MX_TOPIC, payload=payload)
+        assert not dedup_fixture.seen(
+            topic=FX_TOPIC, payload=create_payload(1640995201)
+        )
+
+        assert dedup_fixture.stats.hits == 0
+        assert len(dedup_fixture) == 3
+
+    def test_forgets_packets_after_window(
+        self, dedup_fixture: DedupIndex, monotonic_fixture
+    ):
+        payload = create_payload(1640995200)
+        dedup_fixture.seen(topic=FX_TOPIC, payload=payload)
+        monotonic_fixture.return_value = 161.0
+
+        assert not dedup_fixture.seen(topic=FX_TOPIC, payload=payload)
+        assert dedup_fixture.stats.evictions == 1
+
+    def test_caps_entries(self, dedup_fixture: DedupIndex):
+        for packet_time in range(25):
+            dedup_fixture.seen(topic=FX_TOPIC, payload=create_payload(packet_time))
+
+        assert len(dedup_fixture) == 10
+        assert dedup_fixture.stats.evictions == 15
+        assert not dedup_fixture.seen(topic=FX_TOPIC, payload=create_payload(0))
+
+    def test_handles_short_payload(self, dedup_fixture: DedupIndex):
+        assert DedupIndex.packet_key(topic="a", payload=b"\x01") == (
+            "a",
+            None,
+            hash(b"\x01"),
+        )
+        assert not dedup_fixture.seen(topic="a", payload=b"")
+        assert dedup_fixture.seen(topic="a", payload=b"")
+
+    def test_keys_frames_by_their_time(self, dedup_fixture: DedupIndex):
+        assert not dedup_fixture.seen(
+            topic=FX_TOPIC, payload=FX_PACKET, msg_time=1640995200
+        )
+        assert not dedup_fixture.seen(
+            topic=FX_TOPIC, payload=FX_PACKET, msg_time=1640995201
+        )
+        assert dedup_fixture.seen(
+            topic=FX_TOPIC, payload=FX_PACKET, msg_time=1640995200
+        )
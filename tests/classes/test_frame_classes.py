@@ -0,0 +1,65 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring
+import struct
+
+from pytest import raises
+from pytest_mock import MockerFixture
+
+from src.classes.frame_classes import FrameJoiner, parse_timestamp
+
+
+def test_parse_timestamp():
+    assert parse_timestamp(b"1640995200") == 1640995200
+    assert parse_timestamp(b"1640995200.5") == 1640995200
+    assert parse_timestamp(struct.pack("i", 1640995200)) == 1640995200
+    with raises(ValueError):
+        parse_timestamp(b"\x00\x00")
+
+
+class TestFrameJoiner:
+    """Test class for Frame Joiner"""
+
+    def test_joins_in_either_order(self):
+        frame_joiner = FrameJoiner()
+        frame = b"\x00\x01"
+
+        assert (
+            frame_joiner.add_frame(device="fx-1", frame=frame, received_at=1.0) is None
+        )
+        assert (
+            frame_joiner.add_timestamp(
+                device="mx-1", msg_time=1640995200, received_at=1.5
+            )
+            is None
+        )
+        joined_fx = frame_joiner.add_timestamp(
+            device="fx-1", msg_time=1640995201, received_at=2.0
+        )
+        joined_mx = frame_joiner.add_frame(device="mx-1", frame=frame, received_at=2.5)
+
+        assert joined_fx == (1640995201, frame, 1.0)
+        assert joined_fx[1] is frame
+        assert joined_mx == (1640995200, frame, 1.5)
+        assert frame_joiner.stats.joined == 2
+        assert frame_joiner.stats.unpaired == 0
+
+    def test_drops_repeated_halves(self):
+        frame_joiner = FrameJoiner()
+
+        frame_joiner.add_frame(device="fx-1", frame=b"old")
+        frame_joiner.add_frame(device="fx-1", frame=b"new")
+        joined = frame_joiner.add_timestamp(device="fx-1", msg_time=1640995200)
+
+        assert joined == (1640995200, b"new", None)
+        assert frame_joiner.stats.unpaired == 1
+
+    def test_drops_halves_outside_pair_window(self, mocker: MockerFixture):
+        monotonic = mocker.patch("src.classes.frame_classes.time.monotonic")
+        frame_joiner = FrameJoiner(pair_window=5.0)
+
+        monotonic.return_value = 100.0
+        frame_joiner.add_frame(device="fx-1", frame=b"stale")
+        monotonic.return_value = 106.0
+        joined = frame_joiner.add_timestamp(device="fx-1", msg_time=1640995200)
+
+        assert joined is None
+        assert frame_joiner.stats.unpaired == 1
@@ -1,13 +1,26 @@
-# pylint: disable=missing-function-docstring, missing-module-docstring
+# pylint: disable=missing-function-docstring, missing-module-docstring, protected-access
 import logging
+import math
+import threading
+from datetime import datetime, timedelta
+from queue import Queue
 
 from influxdb_client import QueryApi, WriteApi
 from pytest import LogCaptureFixture, mark, raises
 from pytest_mock import MockerFixture
 
 from src.classes.common_classes import QueuePackage
-from src.classes.influx_classes import InfluxConnector
-from tests.config.consts import FAKE, TestSecretStore
+from src.classes.custom_exceptions import PartialWriteError
+from src.classes.influx_classes import (
+    BatchWriter,
+    DrainStats,
+    InfluxConnector,
+    WriterPool,
+)
+from src.classes.metrics_classes import MetricsRegistry
+from src.classes.retry_classes import RetryPolicy
+from src.classes.spool_classes import WriteSpool
+from tests.config.consts import FAKE, TEST_SOURCE_TAG_KEY, TestSecretStore
 
 
 class TestInfluxConnector:
@@ -48,6 +61,29 @@ class TestInfluxConnector:
 
         influx_connector.write_points(queue_package=queue_package)
 
+    def test_write_points_tags_source(self, mocker: MockerFixture):
+        write_api = mocker.patch("src.classes.influx_classes.InfluxDBClient.write_api")
+        influx_connector = InfluxConnector(secret_store=TestSecretStore)
+        queue_package = QueuePackage(
+            measurement=FAKE.pystr(),
+            time_field=FAKE.date_time(),
+            field={FAKE.pystr(): FAKE.pyfloat(4)},
+            source="north",
+        )
+
+        influx_connector.write_points(queue_package=queue_package)
+
+        write_api.return_value.write.assert_called_once_with(
+            bucket=TestSecretStore.influx_secrets["influx_bucket"],
+            org=TestSecretStore.influx_secrets["influx_org"],
+            record={
+                "measurement": queue_package.measurement,
+                "fields": queue_package.field,
+                "tags": {TEST_SOURCE_TAG_KEY: "north"},
+            },
+            time=queue_package.time_field,
+        )
+
     @mark.parametrize(
         "queue_package, error_message",
         [
@@ -66,7 +102,7 @@ class TestInfluxConnector:
                     time_field=None,  # Bad data
                     field={FAKE.pystr(): FAKE.pyfloat(4)},
                 ),
-                "The received queue_packed has malformed data: type of time_field not, datetime",
+                "The received queue_packed has malformed data: type of time_field not, datetime | int",
             ],
             [
                 QueuePackage(
@@ -94,6 +130,99 @@ class TestInfluxConnector:
             influx_connector.write_points(queue_package=queue_package)
         assert str(err.value) == error_message
 
+    def test_passes_write_batch(self, mocker: MockerFixture):
+        write_api = mocker.patch("src.classes.influx_classes.InfluxDBClient.write_api")
+        write_api.return_value = mocker.MagicMock(WriteApi, return_value=None)
+        influx_connector = InfluxConnector(secret_store=TestSecretStore)
+        queue_packages = [
+            QueuePackage(
+                measurement="fx-1",
+                time_field=datetime(2022, 1, 1, second=index),
+                field={"battery_voltage": 27.4},
+            )
+            for index in range(3)
+        ]
+
+        influx_connector.write_batch(queue_packages=queue_packages)
+
+        write_api.return_value.write.assert_called_once()
+        assert write_api.return_value.write.call_args.kwargs["record"] == (
+            b"fx-1 battery_voltage=27.4 1640995200000000000\n"
+            b"fx-1 battery_voltage=27.4 1640995201000000000\n"
+            b"fx-1 battery_voltage=27.4 1640995202000000000\n"
+        )
+
+    def test_serializer_per_thread(self):
+        influx_connector = InfluxConnector(secret_store=TestSecretStore)
+        serializers = []
+        thread = threading.Thread(
+            target=lambda: serializers.append(influx_connector._serializer)
+        )
+        thread.start()
+        thread.join()
+
+        serializer = influx_connector._serializer
+        assert influx_connector._serializer is serializer
+        assert serializers[0] is not serializer
+
+    def test_passes_connection_pool_maxsize(self, mocker: MockerFixture):
+        influx_client = mocker.patch("src.classes.influx_classes.InfluxDBClient")
+
+        _ = InfluxConnector(secret_store=TestSecretStore, connection_pool_maxsize=8)
+
+        assert influx_client.call_args.kwargs["connection_pool_maxsize"] == 8
+
+    def test_passes_write_precision(self, mocker: MockerFixture):
+        write_api = mocker.patch("src.classes.influx_classes.InfluxDBClient.write_api")
+        write_api.return_value = mocker.MagicMock(WriteApi, return_value=None)
+        influx_connector = InfluxConnector(
+            secret_store=TestSecretStore, write_precision="s"
+        )
+        queue_package = QueuePackage(
+            measurement="fx-1",
+            time_field=datetime(2022, 1, 1),
+            field={"battery_voltage": 27.4},
+        )
+
+        influx_connector.write_batch(queue_packages=[queue_package])
+        influx_connector.write_lines(lines=b"", precision="ns")
+
+        first_call, second_call = write_api.return_value.write.call_args_list
+        assert first_call.kwargs["record"] == b"fx-1 battery_voltage=27.4 1640995200\n"
+        assert first_call.kwargs["write_precision"] == "s"
+        assert second_call.kwargs["write_precision"] == "ns"
+
+    def test_passes_write_bucket(self, mocker: MockerFixture):
+        write_api = mocker.patch("src.classes.influx_classes.InfluxDBClient.write_api")
+        write_api.return_value = mocker.MagicMock(WriteApi, return_value=None)
+        influx_connector = InfluxConnector(secret_store=TestSecretStore)
+
+        influx_connector.write_lines(lines=b"")
+        influx_connector.write_lines(lines=b"", bucket="solar_rollups")
+
+        first_call, second_call = write_api.return_value.write.call_args_list
+        assert (
+            first_call.kwargs["bucket"]
+            == TestSecretStore.influx_secrets["influx_bucket"]
+        )
+        assert second_call.kwargs["bucket"] == "solar_rollups"
+
+    def test_passes_enable_gzip(self, mocker: MockerFixture):
+        influx_client = mocker.patch("src.classes.influx_classes.InfluxDBClient")
+
+        _ = InfluxConnector(secret_store=TestSecretStore, enable_gzip=True)
+
+        assert influx_client.call_args.kwargs["enable_gzip"] is True
+
+    def test_fails_write_batch_bad_data(self, mocker: MockerFixture):
+        write_api = mocker.patch("src.classes.influx_classes.InfluxDBClient.write_api")
+        write_api.return_value = mocker.MagicMock(WriteApi, return_value=None)
+        influx_connector = InfluxConnector(secret_store=TestSecretStore)
+
+        with raises(AssertionError):
+            influx_connector.write_batch(queue_packages=[None])
+        write_api.return_value.write.assert_not_called()
+
     @mark.parametrize("query_mode", ["csv", "flux", "stream"])
     def test_passes_query_database_modes_return(
         self, mocker: MockerFixture, query_mode: str, caplog: LogCaptureFixture
@@ -114,3 +243,541 @@ class TestInfluxConnector:
 
         assert result is queue_package
         assert "Query to Influx server was successful" in caplog.text
+
+
+def create_queue_package() -> QueuePackage:
+    return QueuePackage(
+        measurement=FAKE.pystr(),
+        time_field=FAKE.date_time(),
+        field={FAKE.pystr(): FAKE.pyfloat(4)},
+    )
+
+
+class TestBatchWriter:
+    """Test class for Batch Writer"""
+
+    def test_flushes_when_batch_full(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector, batch_size=3, flush_interval=60
+        )
+
+        for _ in range(2):
+            batch_writer.add(create_queue_package())
+        assert not batch_writer.is_due()
+        batch_writer.add(create_queue_package())
+
+        assert batch_writer.is_due()
+
+    def test_flushes_when_batch_old(self, mocker: MockerFixture):
+        monotonic = mocker.patch("src.classes.influx_classes.time.monotonic")
+        monotonic.return_value = 100.0
+        batch_writer = BatchWriter(
+            influx_connector=mocker.MagicMock(InfluxConnector),
+            batch_size=500,
+            flush_interval=1.0,
+        )
+
+        batch_writer.add(create_queue_package())
+        assert not batch_writer.is_due()
+        assert batch_writer.time_until_due() == 1.0
+        monotonic.return_value = 101.5
+
+        assert batch_writer.is_due()
+        assert batch_writer.time_until_due() == 0.0
+
+    def test_empty_batch_never_due(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector, batch_size=1, flush_interval=0
+        )
+
+        batch_writer.flush()
+
+        assert not batch_writer.is_due()
+        influx_connector.write_lines.assert_not_called()
+
+    def test_passes_flush(self, mocker: MockerFixture, caplog: LogCaptureFixture):
+        caplog.set_level(logging.INFO)
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector, batch_size=500, flush_interval=1.0
+        )
+        queue_packages = [create_queue_package() for _ in range(5)]
+        for queue_package in queue_packages:
+            batch_writer.add(queue_package)
+
+        batch_writer.flush()
+
+        influx_connector.serialize_batch.assert_called_once_with(
+            queue_packages=queue_packages
+        )
+        influx_connector.write_lines.assert_called_once_with(
+            lines=influx_connector.serialize_batch.return_value
+        )
+        assert len(batch_writer) == 0
+        assert batch_writer.batches_written == 1
+        assert batch_writer.points_written == 5
+        assert "Wrote batch of 5 points in" in caplog.text
+        assert "points/s" in caplog.text
+
+    def test_records_metrics(self, mocker: MockerFixture):
+        metrics = MetricsRegistry()
+        batch_writer = BatchWriter(
+            influx_connector=mocker.MagicMock(InfluxConnector),
+            batch_size=500,
+            flush_interval=1.0,
+            metrics=metrics,
+        )
+        queue_package = create_queue_package()
+        queue_package.received_at = 0.0
+        batch_writer.add(queue_package)
+        batch_writer.add(create_queue_package())
+
+        batch_writer.flush()
+
+        snapshot = metrics.snapshot()
+        assert snapshot.counters == {"points_written": 2}
+        assert snapshot.histograms["queue_wait_seconds"].count == 1
+        assert snapshot.histograms["write_seconds"].count == 1
+        assert snapshot.histograms["end_to_end_seconds"].count == 1
+
+    def test_clears_batch_on_failed_flush(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        influx_connector.write_lines.side_effect = ConnectionError
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector, batch_size=500, flush_interval=1.0
+        )
+        batch_writer.add(create_queue_package())
+
+        with raises(ConnectionError):
+            batch_writer.flush()
+
+        assert len(batch_writer) == 0
+        assert batch_writer.points_written == 0
+
+    def test_spools_failed_flush(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        influx_connector.serialize_batch.return_value = FAKE.binary(length=64)
+        influx_connector.write_lines.side_effect = ConnectionError
+        write_spool = mocker.MagicMock(WriteSpool)
+        write_spool.is_empty = True
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector,
+            batch_size=500,
+            flush_interval=1.0,
+            write_spool=write_spool,
+        )
+        batch_writer.add(create_queue_package())
+
+        batch_writer.flush()
+
+        write_spool.append.assert_called_once_with(
+            lines=influx_connector.serialize_batch.return_value,
+            precision=influx_connector.write_precision,
+        )
+        assert batch_writer.points_written == 0
+
+    def test_spools_unwritten_part_of_failed_flush(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        influx_connector.write_lines.side_effect = PartialWriteError(
+            lines=b"fx-1 a=1 1\n"
+        )
+        write_spool = mocker.MagicMock(WriteSpool)
+        write_spool.is_empty = True
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector,
+            batch_size=500,
+            flush_interval=1.0,
+            write_spool=write_spool,
+        )
+        batch_writer.add(create_queue_package())
+        batch_writer.add(create_queue_package())
+
+        batch_writer.flush()
+
+        write_spool.append.assert_called_once_with(
+            lines=b"fx-1 a=1 1\n", precision=influx_connector.write_precision
+        )
+        assert batch_writer.points_spooled == 1
+
+    def test_spools_while_spool_has_data(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        write_spool = mocker.MagicMock(WriteSpool)
+        write_spool.is_empty = False
+        write_spool.is_replaying = False
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector,
+            batch_size=500,
+            flush_interval=1.0,
+            write_spool=write_spool,
+        )
+        batch_writer.add(create_queue_package())
+
+        batch_writer.flush()
+
+        influx_connector.write_lines.assert_not_called()
+        write_spool.append.assert_called_once_with(
+            lines=influx_connector.serialize_batch.return_value,
+            precision=influx_connector.write_precision,
+        )
+
+    def test_replays_spool_when_healthy(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        write_spool = mocker.MagicMock(WriteSpool)
+        write_spool.is_empty = False
+        write_spool.is_replaying = False
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector,
+            batch_size=500,
+            flush_interval=1.0,
+            write_spool=write_spool,
+        )
+
+        batch_writer.replay_spool()
+
+        influx_connector.health_check.assert_called_once()
+        write_spool.replay.assert_called_once_with(
+            write_lines=batch_writer._write_lines, batch_size=500
+        )
+
+    def test_leaves_replay_to_writer_replaying(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        write_spool = mocker.MagicMock(WriteSpool)
+        write_spool.is_empty = False
+        write_spool.is_replaying = True
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector,
+            batch_size=500,
+            flush_interval=1.0,
+            write_spool=write_spool,
+        )
+
+        batch_writer.replay_spool()
+
+        influx_connector.health_check.assert_not_called()
+        write_spool.replay.assert_not_called()
+
+    def test_replays_at_spooled_precision(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        write_spool = mocker.MagicMock(WriteSpool)
+        write_spool.is_empty = False
+        write_spool.is_replaying = False
+        write_spool.replay.side_effect = lambda write_lines, batch_size: write_lines(
+            b"fx-1 battery_voltage=27.4 1640995200000000000\n", "ns"
+        )
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector,
+            batch_size=500,
+            flush_interval=1.0,
+            write_spool=write_spool,
+        )
+
+        batch_writer.replay_spool()
+
+        influx_connector.write_lines.assert_called_once_with(
+            lines=b"fx-1 battery_voltage=27.4 1640995200000000000\n", precision="ns"
+        )
+
+    def test_writes_and_replays_to_bucket(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        influx_connector.serialize_batch.return_value = b"fx-1_1m aux_on_count=60\n"
+        write_spool = mocker.MagicMock(WriteSpool)
+        write_spool.is_empty = True
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector,
+            batch_size=500,
+            flush_interval=1.0,
+            write_spool=write_spool,
+            bucket="solar_rollups",
+        )
+
+        batch_writer.add(create_queue_package())
+        batch_writer.flush()
+        batch_writer._write_lines(lines=b"fx-1_1m aux_on_count=60 0\n", precision="s")
+
+        first_call, second_call = influx_connector.write_lines.call_args_list
+        assert first_call.kwargs == {
+            "lines": b"fx-1_1m aux_on_count=60\n",
+            "bucket": "solar_rollups",
+        }
+        assert second_call.kwargs == {
+            "lines": b"fx-1_1m aux_on_count=60 0\n",
+            "precision": "s",
+            "bucket": "solar_rollups",
+        }
+
+    def test_retries_through_policy(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        retry_policy = mocker.MagicMock(RetryPolicy)
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector,
+            batch_size=500,
+            flush_interval=1.0,
+            retry_policy=retry_policy,
+        )
+        batch_writer.add(create_queue_package())
+
+        batch_writer.flush()
+
+        retry_policy.write.assert_called_once_with(
+            write_lines=influx_connector.write_lines,
+            lines=influx_connector.serialize_batch.return_value,
+        )
+        assert batch_writer.points_written == 1
+
+    def test_waits_to_replay_when_unhealthy(
+        self, mocker: MockerFixture, caplog: LogCaptureFixture
+    ):
+        monotonic = mocker.patch("src.classes.influx_classes.time.monotonic")
+        monotonic.return_value = 100.0
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        influx_connector.health_check.side_effect = ConnectionError
+        write_spool = mocker.MagicMock(WriteSpool)
+        write_spool.is_empty = False
+        write_spool.is_replaying = False
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector,
+            batch_size=500,
+            flush_interval=1.0,
+            write_spool=write_spool,
+            replay_interval=30.0,
+        )
+
+        assert batch_writer.time_until_replay() == 0.0
+        batch_writer.replay_spool()
+        monotonic.return_value = 110.0
+        batch_writer.replay_spool()
+
+        influx_connector.health_check.assert_called_once()
+        write_spool.replay.assert_not_called()
+        assert batch_writer.time_until_replay() == 20.0
+        write_spool.is_empty = True
+        assert batch_writer.time_until_replay() is None
+        assert "InfluxDB still unavailable" in caplog.text
+
+    def test_drain_leaves_final_batch(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector, batch_size=500, flush_interval=60
+        )
+        source_queue = Queue()
+        queue_packages = [create_queue_package() for _ in range(3)]
+        for queue_package in queue_packages:
+            source_queue.put(queue_package)
+        is_running = mocker.MagicMock(side_effect=[True, False])
+
+        batch_writer.drain(source_queue=source_queue, is_running=is_running)
+        influx_connector.serialize_batch.assert_not_called()
+        drain_stats = batch_writer.finish(source_queue=source_queue, deadline=math.inf)
+
+        influx_connector.serialize_batch.assert_called_once_with(
+            queue_packages=queue_packages
+        )
+        assert batch_writer.points_written == 3
+        assert drain_stats == DrainStats(flushed=3)
+
+    def test_finish_writes_queue_in_batches(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector, batch_size=3, flush_interval=60
+        )
+        source_queue = Queue()
+        for _ in range(7):
+            source_queue.put(create_queue_package())
+        source_queue.put(None)
+
+        drain_stats = batch_writer.finish(source_queue=source_queue, deadline=math.inf)
+
+        assert influx_connector.write_lines.call_count == 3
+        assert drain_stats == DrainStats(flushed=7)
+        assert source_queue.empty()
+
+    def test_finish_spools_after_deadline(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        write_spool = mocker.MagicMock(WriteSpool)
+        write_spool.is_empty = True
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector,
+            batch_size=500,
+            flush_interval=60,
+            write_spool=write_spool,
+        )
+        batch_writer.add(create_queue_package())
+        source_queue = Queue()
+        for _ in range(4):
+            source_queue.put(create_queue_package())
+
+        drain_stats = batch_writer.finish(source_queue=source_queue, deadline=0.0)
+
+        influx_connector.write_lines.assert_called_once()
+        write_spool.append.assert_called_once_with(
+            lines=influx_connector.serialize_batch.return_value,
+            precision=influx_connector.write_precision,
+        )
+        assert drain_stats == DrainStats(flushed=1, spooled=4)
+
+    def test_finish_drops_without_spool(
+        self, mocker: MockerFixture, caplog: LogCaptureFixture
+    ):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        influx_connector.write_lines.side_effect = ConnectionError
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector, batch_size=500, flush_interval=60
+        )
+        batch_writer.add(create_queue_package())
+        source_queue = Queue()
+        for _ in range(2):
+            source_queue.put(create_queue_package())
+
+        drain_stats = batch_writer.finish(source_queue=source_queue, deadline=0.0)
+
+        assert drain_stats == DrainStats(dropped=3)
+        assert "No write spool, dropped 2 points" in caplog.text
+
+    def test_finish_stops_retrying_at_deadline(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        influx_connector.write_lines.side_effect = ConnectionError
+        write_spool = mocker.MagicMock(WriteSpool)
+        write_spool.is_empty = True
+        sleep = mocker.MagicMock()
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector,
+            batch_size=500,
+            flush_interval=60,
+            write_spool=write_spool,
+            retry_policy=RetryPolicy(
+                max_retries=5, base_delay=0.5, max_delay=30.0, sleep=sleep
+            ),
+        )
+        batch_writer.add(create_queue_package())
+
+        drain_stats = batch_writer.finish(source_queue=Queue(), deadline=0.0)
+
+        influx_connector.write_lines.assert_called_once()
+        sleep.assert_not_called()
+        assert drain_stats == DrainStats(spooled=1)
+
+
+class TestWriterPool:
+    """Test class for Writer Pool"""
+
+    def test_shards_round_robin(self, mocker: MockerFixture):
+        writer_pool = WriterPool(
+            batch_writers=[mocker.MagicMock(BatchWriter) for _ in range(2)],
+            queue_length=10,
+        )
+
+        shards = [writer_pool.shard(name) for name in ["fx-1", "mx-1", "dc-1"]]
+
+        assert shards == [0, 1, 0]
+        assert writer_pool.shard("mx-1") == 1
+        assert len(writer_pool) == 2
+
+    def test_shards_sources_apart(self, mocker: MockerFixture):
+        writer_pool = WriterPool(
+            batch_writers=[mocker.MagicMock(BatchWriter) for _ in range(2)],
+            queue_length=10,
+        )
+
+        shards = [writer_pool.shard("fx-1", source) for source in ["north", "south"]]
+
+        assert shards == [0, 1]
+        assert writer_pool.shard("fx-1", "south") == 1
+
+    def test_keeps_measurement_order(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        batch_writers = [
+            BatchWriter(
+                influx_connector=influx_connector, batch_size=5, flush_interval=0.01
+            )
+            for _ in range(3)
+        ]
+        writer_pool = WriterPool(batch_writers=batch_writers, queue_length=10)
+        source_queue = Queue()
+        start_time = datetime(2022, 1, 1)
+        for index in range(20):
+            for measurement in ["fx-1", "mx-1", "dc-1", "fx-2"]:
+                source_queue.put(
+                    QueuePackage(
+                        measurement=measurement,
+                        time_field=start_time + timedelta(seconds=index),
+                        field={"battery_voltage": 27.4},
+                    )
+                )
+
+        writer_pool.run(
+            source_queue=source_queue,
+            is_running=lambda: sum(writer.points_written for writer in batch_writers)
+            < 80,
+            wait_time=0.01,
+        )
+
+        written = {}
+        for call in influx_connector.serialize_batch.call_args_list:
+            for queue_package in call.kwargs["queue_packages"]:
+                written.setdefault(queue_package.measurement, []).append(
+                    queue_package.time_field
+                )
+        assert len(written) == 4
+        for time_fields in written.values():
+            assert time_fields == sorted(time_fields)
+            assert len(time_fields) == 20
+
+    def test_drains_queue_after_stop(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        batch_writers = [
+            BatchWriter(
+                influx_connector=influx_connector, batch_size=5, flush_interval=60
+            )
+            for _ in range(2)
+        ]
+        writer_pool = WriterPool(batch_writers=batch_writers, queue_length=4)
+        source_queue = Queue()
+        for index in range(30):
+            source_queue.put(
+                QueuePackage(
+                    measurement=f"fx-{index % 3}",
+                    time_field=datetime(2022, 1, 1, second=index),
+                    field={"battery_voltage": 27.4},
+                )
+            )
+
+        drain_stats = writer_pool.run(
+            source_queue=source_queue,
+            is_running=lambda: False,
+            wait_time=0.01,
+            drain_deadline=5.0,
+        )
+
+        assert drain_stats == DrainStats(flushed=30)
+        assert sum(writer.points_written for writer in batch_writers) == 30
+        assert source_queue.empty()
+
+    def test_persists_what_misses_deadline(self, mocker: MockerFixture):
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        write_spool = mocker.MagicMock(WriteSpool)
+        write_spool.is_empty = True
+        batch_writers = [
+            BatchWriter(
+                influx_connector=influx_connector,
+                batch_size=5,
+                flush_interval=60,
+                write_spool=write_spool,
+            )
+        ]
+        writer_pool = WriterPool(batch_writers=batch_writers, queue_length=4)
+        source_queue = Queue()
+        for _ in range(10):
+            source_queue.put(create_queue_package())
+
+        drain_stats = writer_pool.run(
+            source_queue=source_queue,
+            is_running=lambda: False,
+            wait_time=0.01,
+            drain_deadline=0.0,
+        )
+
+        assert drain_stats.flushed + drain_stats.spooled == 10
+        assert drain_stats.dropped == 0
+        assert source_queue.empty()
@@ -0,0 +1,79 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring
+import threading
+
+from src.classes.dedup_classes import DedupStats
+from src.classes.metrics_classes import Histogram, HistogramSummary, MetricsRegistry
+
+
+class TestHistogram:
+    """Test class for Histogram"""
+
+    def test_summarises_observations(self):
+        histogram = Histogram()
+
+        for _ in range(98):
+            histogram.observe(0.001)
+        histogram.observe(0.5)
+        histogram.observe(3.0)
+
+        summary = histogram.summary()
+        assert summary.count == 100
+        assert summary.mean == (98 * 0.001 + 3.5) / 100
+        assert 0.001 <= summary.p50 <= 0.002
+        assert 0.001 <= summary.p90 <= 0.002
+        assert 0.5 <= summary.p99 <= 1.0
+        assert summary.max == 3.0
+
+    def test_empty_summary(self):
+        assert Histogram().summary() == HistogramSummary()
+
+
+class TestMetricsRegistry:
+    """Test class for Metrics Registry"""
+
+    def test_merges_thread_shards(self):
+        metrics = MetricsRegistry()
+
+        def record() -> None:
+            for _ in range(1000):
+                metrics.increment("messages_received")
+                metrics.observe("decode_seconds", 0.0001)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        metrics.increment("points_queued", 5)
+
+        snapshot = metrics.snapshot()
+        assert snapshot.counters == {"messages_received": 4000, "points_queued": 5}
+        assert snapshot.histograms["decode_seconds"].count == 4000
+
+    def test_reads_stats_and_gauges(self):
+        metrics = MetricsRegistry()
+        dedup_stats = DedupStats()
+        metrics.register_stats("packet_dedup", dedup_stats)
+        metrics.register_gauge("queue_depth", lambda: 12)
+
+        dedup_stats.hits += 3
+        snapshot = metrics.snapshot()
+
+        assert snapshot.stats == {
+            "packet_dedup": {"hits": 3, "misses": 0, "evictions": 0}
+        }
+        assert snapshot.gauges == {"queue_depth": 12}
+
+    def test_summary_line(self):
+        metrics = MetricsRegistry()
+        metrics.increment("points_written", 10)
+        metrics.observe("write_seconds", 0.004)
+        metrics.register_gauge("queue_depth", lambda: 0)
+        metrics.register_stats("packet_dedup", DedupStats(hits=2))
+
+        summary = metrics.summary()
+
+        assert "points_written=10" in summary
+        assert "queue_depth=0" in summary
+        assert "write_seconds(n=1 p50=4.00ms" in summary
+        assert "packet_dedup(hits=2)" in summary
@@ -1,5 +1,7 @@
-# pylint: disable=missing-function-docstring, missing-module-docstring, redefined-outer-name, protected-access, duplicate-code
+# pylint: disable=missing-function-docstring, missing-module-docstring, redefined-outer-name, protected-access, duplicate-code, too-many-public-methods
+import dataclasses
 import logging
+import struct
 from datetime import datetime
 
 from paho.mqtt.client import Client, MQTTMessage
@@ -7,8 +9,20 @@ from pymate.value import Value
 from pytest import LogCaptureFixture, fixture, mark, raises
 from pytest_mock import MockerFixture
 
+from src.classes.capture_classes import CaptureWriter, read_capture
 from src.classes.common_classes import QueuePackage
-from src.classes.mqtt_classes import MqttConnector, MqttTopics, PyMateDecoder
+from src.classes.deadband_classes import DeadbandFilter, present_fields
+from src.classes.dedup_classes import DedupIndex
+from src.classes.mqtt_classes import (
+    DEVICE_TOPICS,
+    MqttConnector,
+    MqttTopics,
+    PyMateDecoder,
+    ReaderSettings,
+    create_queue_packages,
+    decode_packets,
+)
+from src.classes.native_classes import NativeDecoder
 from src.helpers.consts import THREADED_QUEUE
 from tests.config.consts import (
     FAKE,
@@ -21,10 +35,6 @@ from tests.config.consts import (
 )
 
 
-class TestError(Exception):
-    """Custom exception for use in tests"""
-
-
 def dict_to_str(dictionary: dict):
     result = {}
     for key, value in dictionary.items():
@@ -45,6 +55,10 @@ def create_mqtt_message(mocker: MockerFixture, topic: str, payload: str) -> MQTT
     return mqtt_message
 
 
+def create_fx_packet(padding_at_end: int = 3) -> bytes:
+    return struct.pack("i", 1640995200) + TestFX.bytearray + bytes(padding_at_end)
+
+
 def setup_service_status(mqtt_fixture: MqttConnector, status: str) -> None:
     status_values = [
         TestMqttTopics.mate_status,
@@ -64,6 +78,15 @@ class TestPyMateDecoder:
         result = pymate_decoder.detach_time(msg=TestFX.bytearray, padding_at_end=2)
 
         assert result == (67108864, b"t\x00\x04\x00\x02\x01\x12")
+        assert isinstance(result[1], memoryview)
+
+    def test_detach_time_keeps_payload_without_padding(self):
+        msg_time, msg_payload = PyMateDecoder.detach_time(
+            msg=create_fx_packet(padding_at_end=0)
+        )
+
+        assert msg_time == 1640995200
+        assert msg_payload == TestFX.bytearray
 
     def test_passes_dc_decoder(self):
         pymate_decoder = PyMateDecoder()
@@ -92,6 +115,134 @@ class TestPyMateDecoder:
         assert isinstance(decoded_result["amp_hours"], Value)
         assert str_decoded_result == str_mx_array
 
+    def test_passes_decode_packet(self):
+        measurement, time_field, fields = PyMateDecoder.decode_packet(
+            topic=TestMqttTopics.fx_data, payload=create_fx_packet()
+        )
+
+        assert measurement == TestMqttTopics.fx_name
+        assert time_field == 1640995200
+        assert dict_to_str(fields) == dict_to_str(TestFX.array)
+
+    @mark.parametrize(
+        "decoder, native_decoder, fixture",
+        [
+            (PyMateDecoder.dc_decoder, NativeDecoder.dc_decoder, TestDC),
+            (PyMateDecoder.fx_decoder, NativeDecoder.fx_decoder, TestFX),
+            (PyMateDecoder.mx_decoder, NativeDecoder.mx_decoder, TestMX),
+        ],
+    )
+    def test_native_decoders_match_pymate(self, decoder, native_decoder, fixture):
+        expected = {
+            key: float(value).hex() for key, value in decoder(fixture.bytearray).items()
+        }
+        decoded = {
+            key: value.hex() for key, value in native_decoder(fixture.bytearray).items()
+        }
+
+        assert decoded == expected
+
+    def test_passes_decode_packet_native(self):
+        measurement, time_field, fields = PyMateDecoder.decode_packet(
+            topic=TestMqttTopics.fx_data,
+            payload=create_fx_packet(),
+            native_decoders=True,
+        )
+
+        assert measurement == TestMqttTopics.fx_name
+        assert time_field == 1640995200
+        assert fields == NativeDecoder.fx_decoder(TestFX.bytearray)
+
+
+def patch_decoder(mocker: MockerFixture, topic: str):
+    decoder = mocker.MagicMock()
+    mocker.patch.dict(
+        DEVICE_TOPICS,
+        {topic: dataclasses.replace(DEVICE_TOPICS[topic], decoder=decoder)},
+    )
+    return decoder
+
+
+def test_device_topics_cover_data_topics():
+    assert set(DEVICE_TOPICS) == {
+        TestMqttTopics.dc_data,
+        TestMqttTopics.fx_data,
+        TestMqttTopics.mx_data,
+    }
+    assert {device_topic.status_topic for device_topic in DEVICE_TOPICS.values()} == {
+        TestMqttTopics.dc_status,
+        TestMqttTopics.fx_status,
+        TestMqttTopics.mx_status,
+    }
+    assert [device_topic.measurement for device_topic in DEVICE_TOPICS.values()] == [
+        TestMqttTopics.dc_name,
+        TestMqttTopics.fx_name,
+        TestMqttTopics.mx_name,
+    ]
+
+
+def test_create_queue_packages_per_field():
+    time_field = datetime(2022, 1, 1)
+    payload = {"battery_voltage": 27.4, "is_230v": True}
+
+    packet_packages = create_queue_packages(
+        measurement="fx-1", time_field=time_field, payload=payload, queue_mode="packet"
+    )
+    field_packages = create_queue_packages(
+        measurement="fx-1", time_field=time_field, payload=payload, queue_mode="field"
+    )
+
+    assert packet_packages == [
+        QueuePackage(
+            measurement="fx-1",
+            time_field=time_field,
+            field={"battery_voltage": 27.4, "is_230v": 1.0},
+        )
+    ]
+    assert [queue_package.field for queue_package in field_packages] == [
+        {"battery_voltage": 27.4},
+        {"is_230v": 1.0},
+    ]
+
+
+def test_create_queue_packages_keeps_float_fields():
+    payload = {"battery_voltage": 27.4, "is_230v": 1.0}
+
+    queue_packages = create_queue_packages(
+        measurement="fx-1",
+        time_field=datetime(2022, 1, 1),
+        payload=payload,
+        queue_mode="packet",
+        float_fields=True,
+    )
+
+    assert queue_packages[0].field is payload
+
+
+def test_decode_packets_counts_failures():
+    packets = [
+        (TestMqttTopics.fx_data, create_fx_packet(), 1.0, None, None),
+        (TestMqttTopics.fx_data, b"\x00", 2.0, None, None),
+        (TestMqttTopics.fx_raw, TestFX.bytearray, 3.0, "north", 1640995200),
+    ]
+
+    queue_packages, failed = decode_packets(packets=packets, queue_mode="packet")
+
+    assert len(queue_packages) == 2
+    assert queue_packages[0].measurement == TestMqttTopics.fx_name
+    assert queue_packages[0].field["battery_voltage"] == 27.4
+    assert queue_packages[1].time_field == queue_packages[0].time_field
+    assert queue_packages[1].field == queue_packages[0].field
+    assert [queue_package.received_at for queue_package in queue_packages] == [
+        1.0,
+        3.0,
+    ]
+    assert [queue_package.source for queue_package in queue_packages] == [
+        None,
+        "north",
+    ]
+    assert failed == 1
+
 
 def test_mqtt_topics_consistent():
     def get_custom_attributes(cls):
@@ -293,9 +444,93 @@ class TestMqttConnector:
         ) == THREADED_QUEUE.get(timeout=5)
         assert "Pushed items onto queue, queue now has 1 items" in caplog.text
 
-    def test_waits_on_max_queue(
+    def test_load_queue_packs_all_fields(
+        self, mqtt_fixture: MqttConnector, caplog: LogCaptureFixture
+    ):
+        caplog.set_level(logging.INFO)
+        measurement = FAKE.pystr()
+        time_field = FAKE.date()
+        payload = {FAKE.pystr(): str(FAKE.pyfloat()) for _ in range(5)}
+
+        mqtt_fixture._load_queue(
+            measurement=measurement, time_field=time_field, payload=payload
+        )
+
+        assert QueuePackage(
+            measurement=measurement,
+            time_field=time_field,
+            field={key: float(value) for key, value in payload.items()},
+        ) == THREADED_QUEUE.get(timeout=5)
+        assert THREADED_QUEUE.empty()
+        assert "Pushed items onto queue, queue now has 1 items" in caplog.text
+
+    def test_load_queue_splits_fields_in_field_mode(self, caplog: LogCaptureFixture):
+        caplog.set_level(logging.INFO)
+        mqtt_connector = MqttConnector(
+            secret_store=TestSecretStore,
+            reader_settings=ReaderSettings(queue_mode="field"),
+        )
+        measurement = FAKE.pystr()
+        time_field = FAKE.date()
+        payload = {FAKE.pystr(): str(FAKE.pyfloat()) for _ in range(5)}
+
+        mqtt_connector._load_queue(
+            measurement=measurement, time_field=time_field, payload=payload
+        )
+
+        result_queue = [THREADED_QUEUE.get(timeout=5) for _ in payload]
+        assert THREADED_QUEUE.empty()
+        assert result_queue == [
+            QueuePackage(
+                measurement=measurement,
+                time_field=time_field,
+                field={key: float(value)},
+            )
+            for key, value in payload.items()
+        ]
+        queue_size = len(payload)
+        assert (
+            f"Pushed items onto queue, queue now has {queue_size} items" in caplog.text
+        )
+
+    def test_load_queue_drops_unchanged_fields(self):
+        mqtt_connector = MqttConnector(
+            secret_store=TestSecretStore, deadband_filter=DeadbandFilter()
+        )
+        payloads = [
+            {"battery_voltage": "27.4", "aux_on": "0"},
+            {"battery_voltage": "27.4", "aux_on": "0"},
+            {"battery_voltage": "27.5", "aux_on": "0"},
+        ]
+
+        for seconds, payload in enumerate(payloads):
+            mqtt_connector._load_queue(
+                measurement="fx-1", time_field=1640995200 + seconds, payload=payload
+            )
+
+        assert [
+            present_fields(THREADED_QUEUE.get(timeout=5).field) for _ in range(2)
+        ] == [
+            {"battery_voltage": 27.4, "aux_on": 0.0},
+            {"battery_voltage": 27.5},
+        ]
+        assert THREADED_QUEUE.empty()
+
+    def test_load_queue_tags_source(self, mocker: MockerFixture):
+        secret_store = mocker.MagicMock()
+        secret_store.mqtt_brokers = {"north": TestSecretStore.mqtt_secrets}
+        mqtt_connector = MqttConnector(secret_store=secret_store, source="north")
+        payload = {FAKE.pystr(): str(FAKE.pyfloat())}
+
+        mqtt_connector._load_queue(
+            measurement=FAKE.pystr(), time_field=FAKE.date(), payload=payload
+        )
+
+        assert THREADED_QUEUE.get(timeout=5).source == "north"
+        assert THREADED_QUEUE.empty()
+
+    def test_drops_oldest_on_max_queue(
         self,
-        mocker: MockerFixture,
         mqtt_fixture: MqttConnector,
         caplog: LogCaptureFixture,
     ):
@@ -303,36 +538,30 @@ class TestMqttConnector:
         measurement = FAKE.pystr()
         time_field = FAKE.date()
         payload_key = FAKE.pystr()
-        payload_value = FAKE.pyfloat()
 
         test_queue = []
-        mocker.patch("src.classes.mqtt_classes.time.sleep", side_effect=TestError)
-        with raises(TestError):
-            for _ in range(0, TEST_MAX_QUEUE_LENGTH + 1):
-                mqtt_fixture._load_queue(
+        for index in range(0, TEST_MAX_QUEUE_LENGTH + 1):
+            mqtt_fixture._load_queue(
+                measurement=measurement,
+                time_field=time_field,
+                payload={payload_key: str(index)},
+            )
+            test_queue.append(
+                QueuePackage(
                     measurement=measurement,
                     time_field=time_field,
-                    payload={
-                        payload_key: str(payload_value),
-                    },
-                )
-                test_queue.append(
-                    QueuePackage(
-                        measurement=measurement,
-                        time_field=time_field,
-                        field={payload_key: float(payload_value)},
-                    )
+                    field={payload_key: float(index)},
                 )
+            )
 
         result_queue = []
         while not THREADED_QUEUE.empty():
             result_queue.append(THREADED_QUEUE.get(timeout=1))
-        zipped_queues = zip(test_queue, result_queue)
 
-        for test_item, result_item in zipped_queues:
-            assert test_item == result_item
+        assert result_queue == test_queue[1:]
+        assert "Queue is full, applying drop_oldest overflow policy" in caplog.text
         assert (
-            f"Pushed items onto queue, queue now has {TEST_MAX_QUEUE_LENGTH - 1} items"
+            f"Pushed items onto queue, queue now has {TEST_MAX_QUEUE_LENGTH} items"
             in caplog.text
         )
 
@@ -366,12 +595,11 @@ class TestMqttConnector:
     ):
         caplog.set_level(logging.DEBUG)
         msg_time = FAKE.unix_time()
-        msg_timestamp = datetime.fromtimestamp(msg_time)
         payload = FAKE.pystr()
         detach_time = mocker.patch("src.classes.mqtt_classes.PyMateDecoder.detach_time")
         load_queue = mocker.patch("src.classes.mqtt_classes.MqttConnector._load_queue")
         detach_time.return_value = (msg_time, FAKE.pystr())
-        dc_decoder = mocker.patch("src.classes.mqtt_classes.PyMateDecoder.dc_decoder")
+        dc_decoder = patch_decoder(mocker=mocker, topic=TestMqttTopics.dc_data)
         dc_decoder.return_value = payload
         setup_service_status(mqtt_fixture=mqtt_fixture, status="online")
         mqtt_message = create_mqtt_message(
@@ -385,13 +613,14 @@ class TestMqttConnector:
         assert f"Received {TestMqttTopics.dc_name} data packet" in caplog.text
         assert f"{TestMqttTopics.dc_name} payload: {payload}" in caplog.text
         assert (
-            f"Decoded and split {TestMqttTopics.dc_name} payload: {payload} at {msg_timestamp}"
+            f"Decoded and split {TestMqttTopics.dc_name} payload: {payload} at {msg_time}"
             in caplog.text
         )
         load_queue.assert_called_with(
             measurement=TestMqttTopics.dc_name,
-            time_field=msg_timestamp,
+            time_field=msg_time,
             payload=payload,
+            received_at=None,
         )
 
     def test_passes_decode_message_fx(
@@ -403,12 +632,11 @@ class TestMqttConnector:
         caplog.set_level(logging.DEBUG)
 
         msg_time = FAKE.unix_time()
-        msg_timestamp = datetime.fromtimestamp(msg_time)
         payload = FAKE.pystr()
         detach_time = mocker.patch("src.classes.mqtt_classes.PyMateDecoder.detach_time")
         load_queue = mocker.patch("src.classes.mqtt_classes.MqttConnector._load_queue")
         detach_time.return_value = (msg_time, FAKE.pystr())
-        fx_decoder = mocker.patch("src.classes.mqtt_classes.PyMateDecoder.fx_decoder")
+        fx_decoder = patch_decoder(mocker=mocker, topic=TestMqttTopics.fx_data)
         fx_decoder.return_value = payload
         setup_service_status(mqtt_fixture=mqtt_fixture, status="online")
         mqtt_message = create_mqtt_message(
@@ -422,13 +650,14 @@ class TestMqttConnector:
         assert f"Received {TestMqttTopics.fx_name} data packet" in caplog.text
         assert f"{TestMqttTopics.fx_name} payload: {payload}" in caplog.text
         assert (
-            f"Decoded and split {TestMqttTopics.fx_name} payload: {payload} at {msg_timestamp}"
+            f"Decoded and split {TestMqttTopics.fx_name} payload: {payload} at {msg_time}"
             in caplog.text
         )
         load_queue.assert_called_with(
             measurement=TestMqttTopics.fx_name,
-            time_field=msg_timestamp,
+            time_field=msg_time,
             payload=payload,
+            received_at=None,
         )
 
     def test_passes_decode_message_mx(
@@ -440,12 +669,11 @@ class TestMqttConnector:
         caplog.set_level(logging.DEBUG)
 
         msg_time = FAKE.unix_time()
-        msg_timestamp = datetime.fromtimestamp(msg_time)
         payload = FAKE.pystr()
         detach_time = mocker.patch("src.classes.mqtt_classes.PyMateDecoder.detach_time")
         load_queue = mocker.patch("src.classes.mqtt_classes.MqttConnector._load_queue")
         detach_time.return_value = (msg_time, FAKE.pystr())
-        mx_decoder = mocker.patch("src.classes.mqtt_classes.PyMateDecoder.mx_decoder")
+        mx_decoder = patch_decoder(mocker=mocker, topic=TestMqttTopics.mx_data)
         mx_decoder.return_value = payload
         setup_service_status(mqtt_fixture=mqtt_fixture, status="online")
         mqtt_message = create_mqtt_message(
@@ -459,13 +687,14 @@ class TestMqttConnector:
         assert f"Received {TestMqttTopics.mx_name} data packet" in caplog.text
         assert f"{TestMqttTopics.mx_name} payload: {payload}" in caplog.text
         assert (
-            f"Decoded and split {TestMqttTopics.mx_name} payload: {payload} at {msg_timestamp}"
+            f"Decoded and split {TestMqttTopics.mx_name} payload: {payload} at {msg_time}"
             in caplog.text
         )
         load_queue.assert_called_with(
             measurement=TestMqttTopics.mx_name,
-            time_field=msg_timestamp,
+            time_field=msg_time,
             payload=payload,
+            received_at=None,
         )
 
     def test_on_message_calls_decode(
@@ -491,9 +720,197 @@ class TestMqttConnector:
         )
 
         check_status.assert_called_once_with(msg=mqtt_message)
-        decode_messages.assert_called_once_with(msg=mqtt_message)
+        decode_messages.assert_called_once_with(
+            msg=mqtt_message, received_at=mocker.ANY
+        )
         assert caplog.text == ""
 
+    def test_on_message_drops_duplicates(self, mocker: MockerFixture):
+        decode_messages = mocker.patch(
+            "src.classes.mqtt_classes.MqttConnector._decode_message"
+        )
+        dedup_index = DedupIndex(dedup_window=60.0, max_entries=10)
+        mqtt_connector = MqttConnector(
+            secret_store=TestSecretStore, dedup_index=dedup_index
+        )
+        setup_service_status(mqtt_fixture=mqtt_connector, status="online")
+        mqtt_message = create_mqtt_message(
+            mocker=mocker, topic=TestMqttTopics.fx_data, payload=FAKE.pystr()
+        )
+
+        for _ in range(3):
+            mqtt_connector._on_message(
+                _client=FAKE.pystr(), _userdata=FAKE.pystr(), msg=mqtt_message
+            )
+
+        decode_messages.assert_called_once_with(
+            msg=mqtt_message, received_at=mocker.ANY
+        )
+        assert dedup_index.stats.hits == 2
+
+    def test_on_message_captures_messages(self, mocker: MockerFixture, tmp_path):
+        mocker.patch("src.classes.mqtt_classes.MqttConnector._decode_message")
+        capture_writer = CaptureWriter(capture_file=str(tmp_path / "mqtt.capture"))
+        mqtt_connector = MqttConnector(
+            secret_store=TestSecretStore, capture_writer=capture_writer
+        )
+        setup_service_status(mqtt_fixture=mqtt_connector, status="online")
+        mqtt_messages = [
+            create_mqtt_message(mocker=mocker, topic=topic, payload=FAKE.pystr())
+            for topic in [TestMqttTopics.mate_status, TestMqttTopics.fx_data]
+        ]
+
+        for mqtt_message in mqtt_messages:
+            mqtt_connector._on_message(
+                _client=FAKE.pystr(), _userdata=FAKE.pystr(), msg=mqtt_message
+            )
+        capture_writer.close()
+
+        assert [
+            (topic, payload)
+            for _, topic, payload in read_capture(capture_writer.capture_file)
+        ] == [
+            (mqtt_message.topic, mqtt_message.payload) for mqtt_message in mqtt_messages
+        ]
+
+    def test_on_message_submits_to_decode_pool(self, mocker: MockerFixture):
+        decode_messages = mocker.patch(
+            "src.classes.mqtt_classes.MqttConnector._decode_message"
+        )
+        decode_pool = mocker.MagicMock()
+        mqtt_connector = MqttConnector(
+            secret_store=TestSecretStore, decode_pool=decode_pool
+        )
+        setup_service_status(mqtt_fixture=mqtt_connector, status="online")
+        mqtt_connector._status[TestMqttTopics.mx_status] = "offline"
+        fx_message = create_mqtt_message(
+            mocker=mocker, topic=TestMqttTopics.fx_data, payload=FAKE.pystr()
+        )
+        mx_message = create_mqtt_message(
+            mocker=mocker, topic=TestMqttTopics.mx_data, payload=FAKE.pystr()
+        )
+
+        for mqtt_message in [fx_message, mx_message]:
+            mqtt_connector._on_message(
+                _client=FAKE.pystr(), _userdata=FAKE.pystr(), msg=mqtt_message
+            )
+
+        decode_pool.submit.assert_called_once_with(
+            topic=TestMqttTopics.fx_data,
+            payload=fx_message.payload,
+            received_at=mocker.ANY,
+            source=None,
+        )
+        decode_messages.assert_not_called()
+
+    def test_on_message_joins_raw_frames(self, mocker: MockerFixture):
+        load_queue = mocker.patch("src.classes.mqtt_classes.MqttConnector._load_queue")
+        mqtt_connector = MqttConnector(
+            secret_store=TestSecretStore,
+            reader_settings=ReaderSettings(ingest_topics="raw", native_decoders=True),
+        )
+        setup_service_status(mqtt_fixture=mqtt_connector, status="online")
+        messages = [
+            create_mqtt_message(
+                mocker=mocker, topic=TestMqttTopics.fx_ts, payload="1640995200"
+            ),
+            create_mqtt_message(
+                mocker=mocker, topic=TestMqttTopics.fx_data, payload=FAKE.pystr()
+            ),
+            create_mqtt_message(mocker=mocker, topic=TestMqttTopics.fx_raw, payload=""),
+        ]
+        messages[2].payload = TestFX.bytearray
+
+        for mqtt_message in messages:
+            mqtt_connector._on_message(
+                _client=FAKE.pystr(), _userdata=FAKE.pystr(), msg=mqtt_message
+            )
+
+        load_queue.assert_called_once_with(
+            measurement=TestMqttTopics.fx_name,
+            time_field=1640995200,
+            payload=NativeDecoder.fx_decoder(TestFX.bytearray),
+            received_at=mocker.ANY,
+        )
+
+    def test_on_message_submits_raw_frames_to_decode_pool(self, mocker: MockerFixture):
+        decode_pool = mocker.MagicMock()
+        mqtt_connector = MqttConnector(
+            secret_store=TestSecretStore,
+            reader_settings=ReaderSettings(ingest_topics="raw"),
+            decode_pool=decode_pool,
+        )
+        setup_service_status(mqtt_fixture=mqtt_connector, status="online")
+        raw_message = create_mqtt_message(
+            mocker=mocker, topic=TestMqttTopics.dc_raw, payload=""
+        )
+        raw_message.payload = TestDC.bytearray
+        ts_message = create_mqtt_message(
+            mocker=mocker, topic=TestMqttTopics.dc_ts, payload="1640995200"
+        )
+
+        for mqtt_message in [raw_message, ts_message]:
+            mqtt_connector._on_message(
+                _client=FAKE.pystr(), _userdata=FAKE.pystr(), msg=mqtt_message
+            )
+
+        decode_pool.submit.assert_called_once_with(
+            topic=TestMqttTopics.dc_raw,
+            payload=TestDC.bytearray,
+            received_at=mocker.ANY,
+            source=None,
+            msg_time=1640995200,
+        )
+
+    def test_on_message_drops_duplicate_raw_frames(self, mocker: MockerFixture):
+        load_queue = mocker.patch("src.classes.mqtt_classes.MqttConnector._load_queue")
+        dedup_index = DedupIndex(dedup_window=60.0, max_entries=10)
+        mqtt_connector = MqttConnector(
+            secret_store=TestSecretStore,
+            reader_settings=ReaderSettings(ingest_topics="raw", native_decoders=True),
+            dedup_index=dedup_index,
+        )
+        setup_service_status(mqtt_fixture=mqtt_connector, status="online")
+        raw_message = create_mqtt_message(
+            mocker=mocker, topic=TestMqttTopics.fx_raw, payload=""
+        )
+        raw_message.payload = TestFX.bytearray
+        ts_message = create_mqtt_message(
+            mocker=mocker, topic=TestMqttTopics.fx_ts, payload="1640995200"
+        )
+
+        # The retained pair is delivered again after a reconnect
+        for mqtt_message in [raw_message, ts_message] * 2:
+            mqtt_connector._on_message(
+                _client=FAKE.pystr(), _userdata=FAKE.pystr(), msg=mqtt_message
+            )
+
+        load_queue.assert_called_once()
+        assert dedup_index.stats.hits == 1
+
+    def test_rejects_unknown_ingest_topics(self):
+        with raises(ValueError):
+            MqttConnector(
+                secret_store=TestSecretStore,
+                reader_settings=ReaderSettings(ingest_topics="status"),
+            )
+
+    def test_on_message_ignores_status_duplicates(self, mocker: MockerFixture):
+        dedup_index = DedupIndex(dedup_window=60.0, max_entries=10)
+        mqtt_connector = MqttConnector(
+            secret_store=TestSecretStore, dedup_index=dedup_index
+        )
+        mqtt_message = create_mqtt_message(
+            mocker=mocker, topic=TestMqttTopics.mate_status, payload="online"
+        )
+
+        for _ in range(2):
+            mqtt_connector._on_message(
+                _client=FAKE.pystr(), _userdata=FAKE.pystr(), msg=mqtt_message
+            )
+
+        assert len(dedup_index) == 0
+
     def test_on_message_warns_when_offline(
         self,
         mocker: MockerFixture,
@@ -547,7 +964,9 @@ class TestMqttConnector:
         )
 
         check_status.assert_called_once_with(msg=mqtt_message)
-        decode_messages.assert_called_once_with(msg=mqtt_message)
+        decode_messages.assert_called_once_with(
+            msg=mqtt_message, received_at=mocker.ANY
+        )
         assert "MQTT on_message raised an exception:" in caplog.text
         assert error_message in caplog.text
 
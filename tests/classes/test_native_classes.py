@@ -0,0 +1,93 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring
+import re
+import struct
+
+from pytest import mark, raises
+
+from src.classes.native_classes import NativeDecoder, StructDecoder
+from tests.config.consts import TestDC, TestFX, TestMX
+
+
+def expected_floats(array: dict) -> dict:
+    # The fixtures hold pymate's values as strings with their units
+    return {
+        key: (
+            float(re.match(r"-?[\d.]+", value).group())
+            if isinstance(value, str)
+            else float(value)
+        )
+        for key, value in array.items()
+    }
+
+
+class TestStructDecoder:
+    """Test class for Struct Decoder"""
+
+    def test_scales_fields(self):
+        decoder = StructDecoder(
+            layout=">hxB", fields=(("bat_voltage", 10), ("state_of_charge", 1))
+        )
+
+        decoded = decoder(b"\x01\x11\xff\x64")
+
+        assert decoded == {"bat_voltage": 27.3, "state_of_charge": 100.0}
+        assert all(isinstance(value, float) for value in decoded.values())
+        assert decoder.size == 4
+
+    def test_rejects_mismatched_fields(self):
+        with raises(ValueError):
+            StructDecoder(layout=">hh", fields=(("bat_voltage", 10),))
+
+    def test_rejects_wrong_size_packet(self):
+        decoder = StructDecoder(layout=">h", fields=(("bat_voltage", 10),))
+
+        with raises(struct.error):
+            decoder(b"\x00")
+
+
+class TestNativeDecoder:
+    """Test class for Native Decoder"""
+
+    @mark.parametrize(
+        "decoder, fixture",
+        [
+            (NativeDecoder.dc_decoder, TestDC),
+            (NativeDecoder.fx_decoder, TestFX),
+            (NativeDecoder.mx_decoder, TestMX),
+        ],
+    )
+    def test_matches_fixtures(self, decoder, fixture):
+        decoded = decoder(fixture.bytearray)
+
+        assert decoded == expected_floats(fixture.array)
+        assert all(isinstance(value, float) for value in decoded.values())
+
+    @mark.parametrize(
+        "decoder, fixture",
+        [
+            (NativeDecoder.dc_decoder, TestDC),
+            (NativeDecoder.fx_decoder, TestFX),
+            (NativeDecoder.mx_decoder, TestMX),
+        ],
+    )
+    def test_reads_frame_at_offset(self, decoder, fixture):
+        packet = struct.pack("i", 1640995200) + fixture.bytearray + bytes(3)
+
+        assert decoder(packet, 4) == decoder(fixture.bytearray)
+
+    def test_rejects_short_frame_at_offset(self):
+        with raises(struct.error):
+            NativeDecoder.fx_decoder(struct.pack("i", 1640995200) + b"\x00", 4)
+
+    def test_fx_decoder_110v(self):
+        packet = bytearray(TestFX.bytearray)
+        packet[0] = 9
+        packet[4] = 120
+        packet[11] = 0x80
+
+        decoded = NativeDecoder.fx_decoder(bytes(packet))
+
+        assert decoded["is_230v"] == 0.0
+        assert decoded["aux_on"] == 1.0
+        assert decoded["inverter_current"] == 9.0
+        assert decoded["output_voltage"] == 120.0
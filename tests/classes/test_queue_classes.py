@@ -0,0 +1,141 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from queue import Queue
+
+from pytest import LogCaptureFixture, raises
+from pytest_mock import MockerFixture
+
+from src.classes.common_classes import QueuePackage
+from src.classes.queue_classes import IngestQueue
+from src.classes.spool_classes import WriteSpool
+
+
+def create_queue_package(index: int) -> QueuePackage:
+    return QueuePackage(
+        measurement="fx-1",
+        time_field=datetime(2022, 1, 1, second=index % 60),
+        field={"battery_voltage": 27.4},
+    )
+
+
+def drain(target_queue: Queue) -> list:
+    items = []
+    while not target_queue.empty():
+        items.append(target_queue.get_nowait())
+    return items
+
+
+class TestIngestQueue:
+    """Test class for Ingest Queue"""
+
+    def test_puts_while_space(self):
+        target_queue = Queue(maxsize=3)
+        ingest_queue = IngestQueue(target_queue=target_queue)
+
+        for index in range(3):
+            ingest_queue.put(create_queue_package(index))
+
+        assert ingest_queue.qsize() == 3
+        assert ingest_queue.stats.dropped_oldest == 0
+
+    def test_drops_oldest(self, caplog: LogCaptureFixture):
+        caplog.set_level(logging.ERROR)
+        target_queue = Queue(maxsize=3)
+        ingest_queue = IngestQueue(
+            target_queue=target_queue, overflow_policy="drop_oldest"
+        )
+
+        for index in range(5):
+            ingest_queue.put(create_queue_package(index))
+
+        assert drain(target_queue) == [create_queue_package(i) for i in range(2, 5)]
+        assert ingest_queue.stats.dropped_oldest == 2
+        assert caplog.text.count("Queue is full, applying drop_oldest") == 1
+
+    def test_drops_newest(self):
+        target_queue = Queue(maxsize=3)
+        ingest_queue = IngestQueue(
+            target_queue=target_queue, overflow_policy="drop_newest"
+        )
+
+        for index in range(5):
+            ingest_queue.put(create_queue_package(index))
+
+        assert drain(target_queue) == [create_queue_package(i) for i in range(3)]
+        assert ingest_queue.stats.dropped_newest == 2
+
+    def test_blocks_until_deadline(self, mocker: MockerFixture):
+        target_queue = Queue(maxsize=1)
+        put = mocker.spy(target_queue, "put")
+        ingest_queue = IngestQueue(
+            target_queue=target_queue, overflow_policy="block", block_deadline=0.01
+        )
+
+        ingest_queue.put(create_queue_package(0))
+        ingest_queue.put(create_queue_package(1))
+
+        put.assert_called_with(create_queue_package(1), timeout=0.01)
+        assert drain(target_queue) == [create_queue_package(0)]
+        assert ingest_queue.stats.timed_out == 1
+
+    def test_spills_to_spool(self, mocker: MockerFixture):
+        target_queue = Queue(maxsize=1)
+        write_spool = mocker.MagicMock(WriteSpool)
+        ingest_queue = IngestQueue(
+            target_queue=target_queue,
+            overflow_policy="spill",
+            write_spool=write_spool,
+            write_precision="s",
+        )
+
+        ingest_queue.put(create_queue_package(0))
+        ingest_queue.put(create_queue_package(1))
+
+        write_spool.append.assert_called_once_with(
+            lines=b"fx-1 battery_voltage=27.4 1640995201\n", precision="s"
+        )
+        assert ingest_queue.stats.spilled == 1
+
+    def test_spills_from_many_threads(self, tmp_path):
+        write_spool = WriteSpool(
+            spool_location=str(tmp_path), max_spool_bytes=1048576, segment_bytes=65536
+        )
+        ingest_queue = IngestQueue(
+            target_queue=Queue(maxsize=1),
+            overflow_policy="spill",
+            write_spool=write_spool,
+            write_precision="s",
+        )
+        ingest_queue.put(create_queue_package(0))
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for _ in range(4):
+                executor.submit(
+                    lambda: [
+                        ingest_queue.put(create_queue_package(index))
+                        for index in range(600)
+                    ]
+                )
+
+        spilled = []
+        while not write_spool.is_empty:
+            write_spool.replay(
+                write_lines=lambda lines, _precision: spilled.extend(
+                    lines.splitlines()
+                ),
+                batch_size=500,
+            )
+
+        assert ingest_queue.stats.spilled == 2400
+        assert sorted(spilled) == sorted(
+            b"fx-1 battery_voltage=27.4 %d" % (1640995200 + index % 60)
+            for index in range(600)
+            for _ in range(4)
+        )
+
+    def test_fails_bad_policy(self):
+        with raises(ValueError):
+            IngestQueue(target_queue=Queue(), overflow_policy="sleep")
+        with raises(ValueError):
+            IngestQueue(target_queue=Queue(), overflow_policy="spill")
@@ -0,0 +1,231 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring, redefined-outer-name
+import logging
+import threading
+import time
+
+from influxdb_client.rest import ApiException
+from pytest import LogCaptureFixture, fixture, mark, raises
+from pytest_mock import MockerFixture
+from urllib3.exceptions import NewConnectionError, ReadTimeoutError
+
+from src.classes.custom_exceptions import PartialWriteError
+from src.classes.retry_classes import (
+    RetryPolicy,
+    get_retry_after,
+    is_rejected,
+    is_retryable,
+)
+
+
+def create_api_exception(status: int, headers: dict = None) -> ApiException:
+    api_exception = ApiException(status=status, reason="test")
+    api_exception.headers = headers
+    return api_exception
+
+
+def create_lines(count: int) -> bytes:
+    return b"".join(b"fx-1 a=%d %d\n" % (index, index) for index in range(count))
+
+
+@fixture
+def sleep_fixture(mocker: MockerFixture):
+    return mocker.MagicMock()
+
+
+@fixture
+def retry_fixture(sleep_fixture) -> RetryPolicy:
+    return RetryPolicy(
+        max_retries=3, base_delay=0.5, max_delay=10.0, sleep=sleep_fixture
+    )
+
+
+@mark.parametrize(
+    "error, retryable, rejected",
+    [
+        [create_api_exception(429), True, False],
+        [create_api_exception(500), True, False],
+        [create_api_exception(503), True, False],
+        [create_api_exception(400), False, True],
+        [create_api_exception(413), False, True],
+        [create_api_exception(422), False, True],
+        [create_api_exception(401), False, False],
+        [create_api_exception(404), False, False],
+        [ReadTimeoutError(None, None, "timed out"), True, False],
+        [NewConnectionError(None, "refused"), True, False],
+        [ConnectionResetError(), True, False],
+        [ValueError(), False, False],
+    ],
+)
+def test_classifies_errors(error: Exception, retryable: bool, rejected: bool):
+    assert is_retryable(error) is retryable
+    assert is_rejected(error) is rejected
+
+
+@mark.parametrize(
+    "headers, result",
+    [
+        [None, None],
+        [{}, None],
+        [{"Retry-After": "7"}, 7.0],
+        [{"Retry-After": "-3"}, 0.0],
+        [{"Retry-After": "Thu, 01 Jan 1970 00:00:00 GMT"}, 0.0],
+        [{"Retry-After": "soon"}, None],
+    ],
+)
+def test_reads_retry_after(headers: dict, result: float):
+    assert get_retry_after(create_api_exception(429, headers)) == result
+
+
+class TestRetryPolicy:
+    """Test class for Retry Policy"""
+
+    def test_backoff_is_jittered_and_capped(self, retry_fixture: RetryPolicy):
+        for attempt in range(10):
+            delay = retry_fixture.backoff_delay(attempt=attempt)
+            assert 0 <= delay <= min(10.0, 0.5 * 2**attempt)
+
+    def test_backoff_honours_retry_after(self, retry_fixture: RetryPolicy):
+        error = create_api_exception(429, {"Retry-After": "4"})
+
+        assert retry_fixture.backoff_delay(attempt=0, error=error) == 4.0
+
+    def test_retries_transient_errors(
+        self, mocker: MockerFixture, retry_fixture: RetryPolicy, sleep_fixture
+    ):
+        write_lines = mocker.MagicMock(
+            side_effect=[create_api_exception(503), TimeoutError(), None]
+        )
+
+        retry_fixture.write(write_lines=write_lines, lines=create_lines(4))
+
+        assert write_lines.call_count == 3
+        assert sleep_fixture.call_count == 2
+        assert retry_fixture.stats.retries == 2
+        assert retry_fixture.stats.retryable_errors == 2
+
+    def test_raises_when_retries_exhausted(
+        self, mocker: MockerFixture, retry_fixture: RetryPolicy
+    ):
+        write_lines = mocker.MagicMock(side_effect=create_api_exception(500))
+
+        with raises(ApiException):
+            retry_fixture.write(write_lines=write_lines, lines=create_lines(4))
+
+        assert write_lines.call_count == 4
+        assert retry_fixture.stats.exhausted_batches == 1
+
+    def test_raises_non_retryable_errors(
+        self, mocker: MockerFixture, retry_fixture: RetryPolicy, sleep_fixture
+    ):
+        write_lines = mocker.MagicMock(side_effect=create_api_exception(401))
+
+        with raises(ApiException):
+            retry_fixture.write(write_lines=write_lines, lines=create_lines(4))
+
+        write_lines.assert_called_once()
+        sleep_fixture.assert_not_called()
+        assert retry_fixture.stats.permanent_errors == 1
+
+    def test_splits_rejected_batches(
+        self,
+        mocker: MockerFixture,
+        retry_fixture: RetryPolicy,
+        caplog: LogCaptureFixture,
+    ):
+        caplog.set_level(logging.WARNING)
+        lines = create_lines(8)
+        bad_line = lines.splitlines(keepends=True)[5]
+        written = []
+
+        def write_lines(body: bytes) -> None:
+            if bad_line in body.splitlines(keepends=True):
+                raise create_api_exception(400)
+            written.extend(body.splitlines(keepends=True))
+
+        retry_fixture.write(
+            write_lines=mocker.MagicMock(wraps=write_lines), lines=lines
+        )
+
+        assert b"".join(sorted(written)) == b"".join(
+            sorted(line for line in lines.splitlines(keepends=True) if line != bad_line)
+        )
+        assert retry_fixture.stats.rejected_points == 1
+        assert retry_fixture.stats.split_batches == 3
+        assert "Influx server rejected 1 points, dropping them" in caplog.text
+
+    def test_raises_unwritten_part_of_split_batch(
+        self, retry_fixture: RetryPolicy, sleep_fixture
+    ):
+        lines = create_lines(8)
+        split_lines = lines.splitlines(keepends=True)
+        written = []
+
+        def write_lines(body: bytes) -> None:
+            if body == lines:
+                raise create_api_exception(400)
+            if split_lines[6] in body.splitlines(keepends=True):
+                raise create_api_exception(503)
+            written.extend(body.splitlines(keepends=True))
+
+        with raises(PartialWriteError) as error:
+            retry_fixture.write(write_lines=write_lines, lines=lines)
+
+        assert written == split_lines[:4]
+        assert error.value.lines == b"".join(split_lines[4:])
+        assert sleep_fixture.call_count == 3
+
+    def test_drops_whole_batch_without_splitting(
+        self, mocker: MockerFixture, sleep_fixture
+    ):
+        retry_policy = RetryPolicy(
+            max_retries=3,
+            base_delay=0.5,
+            max_delay=10.0,
+            split_batches=False,
+            sleep=sleep_fixture,
+        )
+        write_lines = mocker.MagicMock(side_effect=create_api_exception(422))
+
+        retry_policy.write(write_lines=write_lines, lines=create_lines(8))
+
+        write_lines.assert_called_once()
+        assert retry_policy.stats.rejected_points == 8
+
+    def test_gives_up_at_deadline(
+        self, mocker: MockerFixture, retry_fixture: RetryPolicy, sleep_fixture
+    ):
+        write_lines = mocker.MagicMock(side_effect=create_api_exception(503))
+        retry_fixture.set_deadline(time.monotonic())
+
+        with raises(ApiException):
+            retry_fixture.write(write_lines=write_lines, lines=create_lines(4))
+
+        write_lines.assert_called_once()
+        sleep_fixture.assert_not_called()
+        assert retry_fixture.stats.abandoned_batches == 1
+
+    def test_deadline_cuts_backoff_short(self, mocker: MockerFixture):
+        retry_policy = RetryPolicy(max_retries=3, base_delay=60.0, max_delay=60.0)
+        mocker.patch.object(retry_policy, "backoff_delay", return_value=60.0)
+        attempted = threading.Event()
+        errors = []
+
+        def write_lines(_lines: bytes) -> None:
+            attempted.set()
+            raise create_api_exception(503)
+
+        def write() -> None:
+            try:
+                retry_policy.write(write_lines=write_lines, lines=create_lines(4))
+            except ApiException as err:
+                errors.append(err)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        assert attempted.wait(timeout=5)
+        retry_policy.set_deadline(time.monotonic() + 1.0)
+        writer.join(timeout=5)
+
+        assert not writer.is_alive()
+        assert len(errors) == 1
+        assert retry_policy.stats.abandoned_batches == 1
@@ -0,0 +1,224 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring
+import os
+import time
+from datetime import datetime, timedelta
+
+from pytest import raises
+from pytest_mock import MockerFixture
+
+from src.classes.common_classes import QueuePackage
+from src.classes.influx_classes import BatchWriter, InfluxConnector
+from src.classes.rollup_classes import RollupAggregator, parse_rollup_windows
+from src.helpers.py_functions import wake_consumer
+
+START_TIME = 1640995200
+
+
+def create_queue_package(
+    seconds: int, field: dict, measurement: str = "fx-1", source: str = None
+) -> QueuePackage:
+    return QueuePackage(
+        measurement=measurement,
+        time_field=START_TIME + seconds,
+        field=field,
+        source=source,
+    )
+
+
+def rollup_fields(field: str, values: list[float]) -> dict:
+    return {
+        f"{field}_count": float(len(values)),
+        f"{field}_sum": sum(values),
+        f"{field}_min": min(values),
+        f"{field}_max": max(values),
+        f"{field}_mean": sum(values) / len(values),
+        f"{field}_last": values[-1],
+    }
+
+
+def test_parse_rollup_windows():
+    assert parse_rollup_windows(" 30s, 1m,15m , 1h,1d,") == {
+        "30s": 30,
+        "1m": 60,
+        "15m": 900,
+        "1h": 3600,
+        "1d": 86400,
+    }
+    for rollup_windows in ["1w", "m", "0m", "1.5h"]:
+        with raises(ValueError):
+            parse_rollup_windows(rollup_windows)
+
+
+class TestRollupAggregator:
+    """Test class for Rollup Aggregator"""
+
+    def test_closes_windows(self):
+        rollup_aggregator = RollupAggregator(rollup_windows="1m, 15m")
+        voltages = [27.4, 27.1, 27.9, 27.5]
+
+        for seconds, voltage in zip([0, 20, 40, 59], voltages):
+            rollup_aggregator.add(
+                create_queue_package(seconds, {"battery_voltage": voltage})
+            )
+        assert not rollup_aggregator.pop_closed()
+        rollup_aggregator.add(create_queue_package(60, {"battery_voltage": 26.0}))
+
+        assert rollup_aggregator.pop_closed() == [
+            QueuePackage(
+                measurement="fx-1_1m",
+                time_field=START_TIME,
+                field=rollup_fields("battery_voltage", voltages),
+            )
+        ]
+        rollup_aggregator.close_all()
+        assert rollup_aggregator.pop_closed() == [
+            QueuePackage(
+                measurement="fx-1_1m",
+                time_field=START_TIME + 60,
+                field=rollup_fields("battery_voltage", [26.0]),
+            ),
+            QueuePackage(
+                measurement="fx-1_15m",
+                time_field=START_TIME,
+                field=rollup_fields("battery_voltage", voltages + [26.0]),
+            ),
+        ]
+        assert rollup_aggregator.stats.samples == 5
+        assert rollup_aggregator.stats.windows_closed == 3
+
+    def test_aligns_datetimes(self):
+        rollup_aggregator = RollupAggregator(rollup_windows="1h")
+
+        for minutes in [30, 90]:
+            rollup_aggregator.add(
+                QueuePackage(
+                    measurement="mx-1",
+                    time_field=datetime(2022, 1, 1) + timedelta(minutes=minutes),
+                    field={"pv_voltage": float(minutes)},
+                )
+            )
+
+        assert rollup_aggregator.pop_closed()[0].time_field == START_TIME
+
+    def test_skips_late_samples(self):
+        rollup_aggregator = RollupAggregator(rollup_windows="1m")
+
+        rollup_aggregator.add(create_queue_package(60, {"aux_on": 0.0}))
+        rollup_aggregator.add(create_queue_package(59, {"aux_on": 1.0}))
+        rollup_aggregator.close_all()
+
+        assert rollup_aggregator.pop_closed()[0].field == rollup_fields("aux_on", [0.0])
+        assert rollup_aggregator.stats.late_samples == 1
+
+    def test_skips_nan(self):
+        rollup_aggregator = RollupAggregator(rollup_windows="1m")
+
+        rollup_aggregator.add_packages(
+            [
+                create_queue_package(0, {"a": float("nan"), "b": 1.0}),
+                create_queue_package(1, {"a": 2.0, "b": float("nan")}),
+                create_queue_package(2, {"c": float("nan")}, measurement="mx-1"),
+            ]
+        )
+        rollup_aggregator.close_all()
+
+        assert rollup_aggregator.pop_closed() == [
+            QueuePackage(
+                measurement="fx-1_1m",
+                time_field=START_TIME,
+                field=rollup_fields("a", [2.0]) | rollup_fields("b", [1.0]),
+            )
+        ]
+
+    def test_keeps_sources_apart(self):
+        rollup_aggregator = RollupAggregator(rollup_windows="1m")
+
+        rollup_aggregator.add_packages(
+            [
+                create_queue_package(0, {"aux_on": 0.0}, source="north"),
+                create_queue_package(0, {"aux_on": 1.0}, source="south"),
+                create_queue_package(60, {"aux_on": 0.0}, source="north"),
+            ]
+        )
+
+        assert rollup_aggregator.pop_closed() == [
+            QueuePackage(
+                measurement="fx-1_1m",
+                time_field=START_TIME,
+                field=rollup_fields("aux_on", [0.0]),
+                source="north",
+            )
+        ]
+
+    def test_carries_on_windows_after_restart(self, tmp_path):
+        state_file = str(tmp_path / "rollups" / "open_windows.json")
+        voltages = [float(seconds) for seconds in range(60)]
+        rollup_aggregator = RollupAggregator(rollup_windows="1m, 1h")
+        for seconds in range(30):
+            rollup_aggregator.add(
+                create_queue_package(seconds, {"voltage": voltages[seconds]})
+            )
+
+        rollup_aggregator.save_open(state_file=state_file)
+        assert not rollup_aggregator.pop_closed()
+        restarted = RollupAggregator(rollup_windows="1m, 1h")
+        restarted.load_open(state_file=state_file)
+        for seconds in range(30, 60):
+            restarted.add(create_queue_package(seconds, {"voltage": voltages[seconds]}))
+        restarted.add(create_queue_package(60, {"voltage": 0.0}))
+
+        # The window is written once, holding the samples from before the restart
+        assert restarted.pop_closed() == [
+            QueuePackage(
+                measurement="fx-1_1m",
+                time_field=START_TIME,
+                field=rollup_fields("voltage", voltages),
+            )
+        ]
+        assert restarted.stats.windows_loaded == 2
+        assert not os.path.exists(state_file)
+
+    def test_closes_loaded_windows_no_longer_configured(self, tmp_path):
+        state_file = str(tmp_path / "open_windows.json")
+        rollup_aggregator = RollupAggregator(rollup_windows="1m, 1h")
+        rollup_aggregator.add(create_queue_package(0, {"aux_on": 1.0}))
+        rollup_aggregator.save_open(state_file=state_file)
+
+        restarted = RollupAggregator(rollup_windows="1m")
+        restarted.load_open(state_file=state_file)
+
+        assert [
+            queue_package.measurement for queue_package in restarted.pop_closed()
+        ] == ["fx-1_1h"]
+
+
+class TestRollupWriter:
+    """Test class for writing rollups through a Batch Writer"""
+
+    def test_writes_closed_windows(self, mocker: MockerFixture):
+        rollup_aggregator = RollupAggregator(rollup_windows="1m")
+        influx_connector = mocker.MagicMock(InfluxConnector)
+        influx_connector.serialize_batch.side_effect = lambda queue_packages: b"\n" * (
+            len(queue_packages)
+        )
+        batch_writer = BatchWriter(
+            influx_connector=influx_connector,
+            batch_size=500,
+            flush_interval=60.0,
+            bucket="solar_rollups",
+        )
+
+        for seconds in [0, 60, 120]:
+            rollup_aggregator.add(create_queue_package(seconds, {"aux_on": 0.0}))
+        wake_consumer(target_queue=rollup_aggregator.closed_queue)
+        rollup_aggregator.close_all()
+        drain_stats = batch_writer.finish(
+            source_queue=rollup_aggregator.closed_queue,
+            deadline=time.monotonic() + 60,
+        )
+
+        influx_connector.write_lines.assert_called_once_with(
+            lines=b"\n\n\n", bucket="solar_rollups"
+        )
+        assert drain_stats.flushed == 3
+        assert rollup_aggregator.closed_queue.empty()
@@ -0,0 +1,144 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring
+from datetime import datetime, timedelta, timezone
+
+from influxdb_client import Point
+from pytest import mark, raises
+
+from src.classes.serializer_classes import LineProtocolSerializer
+from tests.config.consts import FAKE, TEST_SOURCE_TAG_KEY
+
+
+def point_line_protocol(measurement: str, fields: dict, time_field: datetime) -> bytes:
+    point = Point.from_dict(
+        {"measurement": measurement, "fields": fields, "time": time_field}
+    )
+    return point.to_line_protocol().encode("utf-8") + b"\n"
+
+
+class TestLineProtocolSerializer:
+    """Test class for Line Protocol Serializer"""
+
+    @mark.parametrize(
+        "measurement, fields",
+        [
+            ["fx-1", {"battery_voltage": 27.4, "output_voltage": 232.0}],
+            ["mx-1", {"pv_current": 5.0, "bat_current": -11.7, "status": 2.0}],
+            ["dc 1,a", {"in power": 0.29, "out=power": 1e-07, "soc,%": 1e21}],
+            ["dc-1", {"flags": 33, "aux_on": False, "name": 'a "b" \\c'}],
+        ],
+    )
+    def test_matches_point_line_protocol(self, measurement: str, fields: dict):
+        serializer = LineProtocolSerializer()
+        time_field = FAKE.date_time()
+
+        serializer.append(measurement=measurement, fields=fields, time_field=time_field)
+
+        assert serializer.getvalue() == point_line_protocol(
+            measurement=measurement, fields=fields, time_field=time_field
+        )
+
+    def test_matches_point_with_timezone(self):
+        serializer = LineProtocolSerializer()
+        time_field = datetime(
+            2022, 4, 3, 12, 30, 15, 123456, tzinfo=timezone(timedelta(hours=12))
+        )
+        fields = {"battery_voltage": 27.4}
+
+        serializer.append(measurement="fx-1", fields=fields, time_field=time_field)
+
+        assert serializer.getvalue() == point_line_protocol(
+            measurement="fx-1", fields=fields, time_field=time_field
+        )
+
+    @mark.parametrize("source", ["north", "site a,b=c"])
+    def test_matches_point_with_source_tag(self, source: str):
+        serializer = LineProtocolSerializer()
+        fields = {"battery_voltage": 27.4}
+        time_field = datetime(2022, 1, 1)
+        point = Point.from_dict(
+            {
+                "measurement": "fx-1",
+                "tags": {TEST_SOURCE_TAG_KEY: source},
+                "fields": fields,
+                "time": time_field,
+            }
+        )
+
+        serializer.append(
+            measurement="fx-1", fields=fields, time_field=time_field, source=source
+        )
+        serializer.append(measurement="fx-1", fields=fields, time_field=time_field)
+
+        assert serializer.getvalue() == (
+            point.to_line_protocol().encode("utf-8")
+            + b"\n"
+            + point_line_protocol(
+                measurement="fx-1", fields=fields, time_field=time_field
+            )
+        )
+
+    def test_skips_unwritable_fields(self):
+        serializer = LineProtocolSerializer()
+        time_field = datetime(2022, 1, 1)
+
+        serializer.append(
+            measurement="fx-1",
+            fields={"a": float("nan"), "b": 1.5, "c": None, "d": float("inf")},
+            time_field=time_field,
+        )
+        serializer.append(
+            measurement="fx-1", fields={"a": float("nan")}, time_field=time_field
+        )
+
+        assert serializer.getvalue() == b"fx-1 b=1.5 1640995200000000000\n"
+
+    def test_reuses_buffer(self):
+        serializer = LineProtocolSerializer()
+        time_field = datetime(2022, 1, 1)
+
+        for _ in range(3):
+            serializer.append(
+                measurement="fx-1", fields={"a": 1.0}, time_field=time_field
+            )
+        first_body = serializer.getvalue()
+        serializer.append(measurement="fx-1", fields={"a": 2.0}, time_field=time_field)
+
+        assert first_body.count(b"\n") == 3
+        assert serializer.getvalue() == b"fx-1 a=2 1640995200000000000\n"
+        assert len(serializer) == 0
+
+    def test_matches_epoch_seconds(self):
+        serializer = LineProtocolSerializer()
+
+        serializer.append(measurement="fx-1", fields={"a": 1.5}, time_field=1640995200)
+        serializer.append(
+            measurement="fx-1", fields={"a": 1.5}, time_field=datetime(2022, 1, 1)
+        )
+
+        assert serializer.getvalue() == b"fx-1 a=1.5 1640995200000000000\n" * 2
+
+    def test_fails_unsupported_type(self):
+        serializer = LineProtocolSerializer()
+
+        with raises(ValueError):
+            serializer.append(
+                measurement="fx-1", fields={"a": [1]}, time_field=datetime(2022, 1, 1)
+            )
+
+    @mark.parametrize("precision", ["s", "ms", "us", "ns"])
+    def test_matches_point_precision(self, precision: str):
+        serializer = LineProtocolSerializer(precision=precision)
+        fields = {"battery_voltage": 27.4}
+        time_field = datetime(2022, 1, 1, 12, 30, 15)
+        point = Point.from_dict(
+            {"measurement": "fx-1", "fields": fields, "time": time_field},
+            write_precision=precision,
+        )
+
+        serializer.append(measurement="fx-1", fields=fields, time_field=time_field)
+
+        assert serializer.getvalue() == point.to_line_protocol().encode() + b"\n"
+
+    def test_fails_unsupported_precision(self):
+        with raises(ValueError):
+            LineProtocolSerializer(precision="m")
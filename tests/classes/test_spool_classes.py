@@ -0,0 +1,251 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring, redefined-outer-name
+import os
+import threading
+
+from pytest import fixture, raises
+from pytest_mock import MockerFixture
+
+from src.classes.custom_exceptions import PartialWriteError
+from src.classes.spool_classes import WriteSpool
+from tests.config.consts import FAKE
+
+
+class FakeWriteError(Exception):
+    """Custom exception for use in tests"""
+
+
+@fixture
+def spool_fixture(tmp_path):
+    return WriteSpool(
+        spool_location=str(tmp_path),
+        max_spool_bytes=1024 * 1024,
+        segment_bytes=1024,
+        fsync_mode="always",
+    )
+
+
+def create_lines(count: int) -> list[bytes]:
+    return [
+        f"fx-1 battery_voltage={FAKE.pyfloat()} {index}\n".encode()
+        for index in range(count)
+    ]
+
+
+class TestWriteSpool:
+    """Test class for Write Spool"""
+
+    def test_starts_empty(self, spool_fixture: WriteSpool):
+        assert spool_fixture.is_empty
+        assert spool_fixture.size_bytes == 0
+
+    def test_replays_lines_in_order(self, mocker: MockerFixture, spool_fixture):
+        lines = create_lines(10)
+        write_lines = mocker.MagicMock()
+
+        spool_fixture.append(lines=b"".join(lines[:5]))
+        spool_fixture.append(lines=b"".join(lines[5:]))
+        replayed = spool_fixture.replay(write_lines=write_lines, batch_size=4)
+
+        assert replayed == 10
+        assert [call.args[0] for call in write_lines.call_args_list] == [
+            b"".join(lines[0:4]),
+            b"".join(lines[4:8]),
+            b"".join(lines[8:10]),
+        ]
+        assert spool_fixture.is_empty
+        assert spool_fixture.replayed_lines == 10
+
+    def test_rotates_segments(self, spool_fixture: WriteSpool, tmp_path):
+        for _ in range(5):
+            spool_fixture.append(lines=b"".join(create_lines(20)))
+
+        assert len(os.listdir(tmp_path)) > 1
+        assert spool_fixture.spooled_lines == 100
+
+    def test_keeps_unwritten_lines_on_failure(
+        self, mocker: MockerFixture, spool_fixture: WriteSpool
+    ):
+        lines = create_lines(6)
+        spool_fixture.append(lines=b"".join(lines))
+        write_lines = mocker.MagicMock(side_effect=[None, FakeWriteError])
+
+        with raises(FakeWriteError):
+            spool_fixture.replay(write_lines=write_lines, batch_size=2)
+        write_lines = mocker.MagicMock()
+        spool_fixture.replay(write_lines=write_lines, batch_size=10)
+
+        write_lines.assert_called_once_with(b"".join(lines[2:]), "ns")
+        assert spool_fixture.replayed_lines == 6
+
+    def test_keeps_only_unwritten_part_of_split_batch(
+        self, mocker: MockerFixture, spool_fixture: WriteSpool
+    ):
+        lines = create_lines(6)
+        spool_fixture.append(lines=b"".join(lines))
+        write_lines = mocker.MagicMock(
+            side_effect=PartialWriteError(lines=b"".join(lines[2:4]))
+        )
+
+        with raises(PartialWriteError):
+            spool_fixture.replay(write_lines=write_lines, batch_size=4)
+        write_lines = mocker.MagicMock()
+        spool_fixture.replay(write_lines=write_lines, batch_size=10)
+
+        write_lines.assert_called_once_with(b"".join(lines[2:]), "ns")
+        assert spool_fixture.replayed_lines == 6
+
+    def test_drops_oldest_segment_when_full(self, tmp_path):
+        write_spool = WriteSpool(
+            spool_location=str(tmp_path),
+            max_spool_bytes=2048,
+            segment_bytes=512,
+            fsync_mode="never",
+        )
+
+        for _ in range(20):
+            write_spool.append(lines=b"".join(create_lines(10)))
+
+        assert write_spool.size_bytes <= 2048 + 1024
+        assert write_spool.dropped_lines > 0
+
+    def test_reloads_segments_from_disk(self, mocker: MockerFixture, tmp_path):
+        lines = b"".join(create_lines(5))
+        WriteSpool(
+            spool_location=str(tmp_path), max_spool_bytes=4096, segment_bytes=1024
+        ).append(lines=lines)
+        write_lines = mocker.MagicMock()
+
+        write_spool = WriteSpool(
+            spool_location=str(tmp_path), max_spool_bytes=4096, segment_bytes=1024
+        )
+        write_spool.replay(write_lines=write_lines, batch_size=10)
+
+        write_lines.assert_called_once_with(lines, "ns")
+        assert write_spool.is_empty
+
+    def test_appends_from_many_threads(self, spool_fixture: WriteSpool):
+        lines = create_lines(50)
+        threads = [
+            threading.Thread(
+                target=lambda: [spool_fixture.append(lines=line) for line in lines]
+            )
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        replayed = []
+        while not spool_fixture.is_empty:
+            spool_fixture.replay(
+                write_lines=lambda lines, _precision: replayed.append(lines),
+                batch_size=500,
+            )
+
+        assert spool_fixture.spooled_lines == 200
+        assert sorted(b"".join(replayed).splitlines(keepends=True)) == sorted(lines * 4)
+
+    def test_replays_segments_at_their_precision(
+        self, mocker: MockerFixture, spool_fixture: WriteSpool
+    ):
+        write_lines = mocker.MagicMock()
+        spool_fixture.append(lines=b"fx-1 battery_voltage=27.4 1640995200000000000\n")
+        spool_fixture.append(
+            lines=b"fx-1 battery_voltage=27.4 1640995201\n", precision="s"
+        )
+
+        while not spool_fixture.is_empty:
+            spool_fixture.replay(write_lines=write_lines, batch_size=10)
+
+        assert [call.args[1] for call in write_lines.call_args_list] == ["ns", "s"]
+
+    def test_reads_legacy_segments_as_nanoseconds(
+        self, mocker: MockerFixture, tmp_path
+    ):
+        lines = b"fx-1 battery_voltage=27.4 1640995200000000000\n"
+        (tmp_path / "spool-000000000001.lp").write_bytes(lines)
+        write_spool = WriteSpool(
+            spool_location=str(tmp_path), max_spool_bytes=4096, segment_bytes=1024
+        )
+        write_lines = mocker.MagicMock()
+
+        write_spool.append(lines=lines, precision="s")
+        write_spool.replay(write_lines=write_lines, batch_size=10)
+
+        write_lines.assert_called_once_with(lines, "ns")
+        assert sorted(os.listdir(tmp_path)) == ["spool-000000000002.s.lp"]
+
+    def test_appends_while_replaying(self, spool_fixture: WriteSpool, tmp_path):
+        lines = create_lines(4)
+        spool_fixture.append(lines=b"".join(lines[:2]))
+        writing = threading.Event()
+        release = threading.Event()
+
+        def write_lines(_lines: bytes, _precision: str) -> None:
+            writing.set()
+            assert release.wait(timeout=5)
+
+        replayer = threading.Thread(
+            target=spool_fixture.replay,
+            kwargs={"write_lines": write_lines, "batch_size": 10},
+        )
+        replayer.start()
+        assert writing.wait(timeout=5)
+        spool_fixture.append(lines=b"".join(lines[2:]))
+        assert not spool_fixture.is_empty
+        release.set()
+        replayer.join(timeout=5)
+
+        assert sorted(os.listdir(tmp_path)) == ["spool-000000000002.ns.lp"]
+        assert spool_fixture.size_bytes == len(b"".join(lines[2:]))
+
+    def test_replays_one_thread_at_a_time(self, spool_fixture: WriteSpool):
+        lines = create_lines(4)
+        spool_fixture.append(lines=b"".join(lines[:2]))
+        spool_fixture.append(lines=b"".join(lines[2:]), precision="s")
+        writing = threading.Event()
+        release = threading.Event()
+        replayed = []
+
+        def write_lines(batch: bytes, _precision: str) -> None:
+            writing.set()
+            assert release.wait(timeout=5)
+            replayed.append(batch)
+
+        replayer = threading.Thread(
+            target=spool_fixture.replay,
+            kwargs={"write_lines": write_lines, "batch_size": 10},
+        )
+        replayer.start()
+        assert writing.wait(timeout=5)
+
+        assert spool_fixture.is_replaying
+        assert spool_fixture.replay(write_lines=write_lines, batch_size=10) == 0
+        release.set()
+        replayer.join(timeout=5)
+        spool_fixture.replay(write_lines=write_lines, batch_size=10)
+
+        assert replayed == [b"".join(lines[:2]), b"".join(lines[2:])]
+        assert not spool_fixture.is_replaying
+
+    def test_puts_failed_segment_back_first(
+        self, mocker: MockerFixture, spool_fixture: WriteSpool
+    ):
+        lines = create_lines(4)
+        spool_fixture.append(lines=b"".join(lines[:2]))
+        spool_fixture.append(lines=b"".join(lines[2:]), precision="s")
+
+        with raises(FakeWriteError):
+            spool_fixture.replay(
+                write_lines=mocker.MagicMock(side_effect=FakeWriteError), batch_size=10
+            )
+        write_lines = mocker.MagicMock()
+        while not spool_fixture.is_empty:
+            spool_fixture.replay(write_lines=write_lines, batch_size=10)
+
+        assert [call.args for call in write_lines.call_args_list] == [
+            (b"".join(lines[:2]), "ns"),
+            (b"".join(lines[2:]), "s"),
+        ]
+        assert spool_fixture.size_bytes == 0
@@ -0,0 +1,131 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring
+import threading
+import time
+
+from pytest import LogCaptureFixture
+
+from src.classes.supervisor_classes import SupervisedStage, Supervisor
+
+
+def crash(_stage: SupervisedStage) -> None:
+    raise RuntimeError("Temporary failure in name resolution")
+
+
+class TestSupervisedStage:
+    """Test class for Supervised Stage"""
+
+    def test_beating_check_beats(self):
+        stage = SupervisedStage(name="Thread-Test", target=crash)
+        is_running = stage.beating(lambda: True)
+
+        assert stage.is_stalled(now=time.monotonic(), stall_timeout=1.0)
+        assert is_running()
+        assert not stage.is_stalled(now=time.monotonic(), stall_timeout=1.0)
+
+    def test_beating_check_stops_once_retired(self):
+        stage = SupervisedStage(name="Thread-Test", target=crash)
+        is_running = stage.beating(lambda: True)
+
+        stage.retire()
+
+        assert not is_running()
+
+    def test_logs_crash(self, caplog: LogCaptureFixture):
+        stage = SupervisedStage(name="Thread-Test", target=crash)
+
+        stage.start()
+        stage.join()
+
+        assert not stage.is_alive()
+        assert "Thread-Test raised an exception" in caplog.text
+
+
+class TestSupervisor:
+    """Test class for Supervisor"""
+
+    def test_restarts_crashed_stage_with_backoff(self):
+        supervisor = Supervisor(
+            stop_event=threading.Event(), min_restart_delay=1.0, max_restart_delay=60.0
+        )
+        stage = supervisor.add_stage(name="Thread-Test", target=crash)
+        stage.start()
+        stage.join()
+        now = time.monotonic()
+
+        supervisor.check(now=now)
+        assert stage.restart_at == now + 1.0
+        supervisor.check(now=now + 0.5)
+        assert stage.stats.restarts == 0
+        supervisor.check(now=now + 1.0)
+        stage.join()
+        supervisor.check(now=now + 1.0)
+
+        assert stage.stats.restarts == 1
+        assert stage.stats.crashes == 2
+        assert stage.restart_at == now + 3.0
+
+    def test_backoff_doubles_up_to_max(self):
+        supervisor = Supervisor(
+            stop_event=threading.Event(), min_restart_delay=1.0, max_restart_delay=5.0
+        )
+
+        delays = [
+            supervisor.restart_delay(failures=failures) for failures in range(1, 6)
+        ]
+
+        assert delays == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+    def test_replaces_stalled_stage(self):
+        release = threading.Event()
+        supervisor = Supervisor(stop_event=threading.Event(), stall_timeout=10.0)
+        stage = supervisor.add_stage(
+            name="Thread-Test", target=lambda _stage: release.wait()
+        )
+        stage.start()
+
+        now = time.monotonic()
+        supervisor.check(now=now)
+        assert stage.stats.stalls == 0
+        supervisor.check(now=now + 11.0)
+        assert stage.is_retiring()
+        # The replacement waits for the stalled thread to exit
+        supervisor.check(now=now + 20.0)
+        assert stage.stats.restarts == 0
+        release.set()
+        stage.join()
+        supervisor.check(now=now + 20.0)
+        stage.join()
+
+        assert stage.stats.stalls == 1
+        assert stage.stats.restarts == 1
+        assert stage.restart_at is None
+        assert not stage.is_retiring()
+
+    def test_stops_when_restarts_disabled(self):
+        stop_event = threading.Event()
+        supervisor = Supervisor(stop_event=stop_event, supervisor_enabled=False)
+        stage = supervisor.add_stage(name="Thread-Test", target=crash)
+        stage.start()
+        stage.join()
+
+        supervisor.check(now=time.monotonic())
+
+        assert stop_event.is_set()
+        assert stage.restart_at is None
+
+    def test_run_returns_once_stopped(self):
+        stop_event = threading.Event()
+        supervisor = Supervisor(stop_event=stop_event, check_interval=0.01)
+
+        def run_stage(stage: SupervisedStage) -> None:
+            while not stop_event.wait(timeout=0.01):
+                stage.beat()
+
+        stage = supervisor.add_stage(name="Thread-Test", target=run_stage)
+        threading.Timer(0.1, stop_event.set).start()
+
+        supervisor.run()
+        stage.join()
+
+        assert stage.stats.crashes == 0
+        assert stage.stats.restarts == 0
@@ -18,6 +18,7 @@ class TestSecretStore:
         "mqtt_token": FAKE.pystr(),
         "mqtt_topic": FAKE.pystr(),
     }
+    mqtt_brokers = {None: mqtt_secrets}
     influx_secrets = {
         "influx_url": FAKE.url(),
         "influx_org": FAKE.pystr(),
@@ -170,13 +171,26 @@ TEST_CONFIG_FILENAME = "src/config/config.ini"  # Py Functions
 TEST_INFLUX_QUERY_CONFIG_TITLE = "query_settings"  # Influx Query
 TEST_INFLUX_DEBUG_CONFIG_TITLE = "influx_debugger"  # Influx Query
 TEST_SOLAR_DEBUG_CONFIG_TITLE = "solar_debugger"  # Solar Runtime
+TEST_MQTT_READER_CONFIG_TITLE = "mqtt_reader"  # Solar Runtime
+TEST_PACKET_DEDUP_CONFIG_TITLE = "packet_dedup"  # Solar Runtime
+TEST_INFLUX_WRITER_CONFIG_TITLE = "influx_writer"  # Solar Runtime
+TEST_WRITE_SPOOL_CONFIG_TITLE = "write_spool"  # Solar Runtime
+TEST_WRITE_RETRY_CONFIG_TITLE = "write_retry"  # Solar Runtime
+TEST_INGEST_QUEUE_CONFIG_TITLE = "ingest_queue"  # Solar Runtime
+TEST_DECODE_POOL_CONFIG_TITLE = "decode_pool"  # Solar Runtime
+TEST_METRICS_CONFIG_TITLE = "metrics"  # Solar Runtime
+TEST_SUPERVISOR_CONFIG_TITLE = "supervisor"  # Solar Runtime
 
 # Additional Consts
 TEST_MAX_PORT_RANGE = 65535
 TEST_TIME_PACKET_SIZE = 4  # Measured in bytes
+TEST_SOURCE_TAG_KEY = "source"  # Tag naming the MQTT broker a point came from
 
 # Multi-Threading Processing
-# Size of queue, needs to be quite large for the volume of data
+# Default size of queue, needs to be quite large for the volume of data
+# Set max_queue_length under ingest_queue in the config to change it
 TEST_MAX_QUEUE_LENGTH = 150
-# Time to wait when queue is full
+# Time to wait on the queue before checking if threads should stop
 TEST_QUEUE_WAIT_TIME = 1
+# Longest wait for an MQTT network thread to exit after disconnecting
+TEST_MQTT_LISTENER_JOIN_TIME = 5
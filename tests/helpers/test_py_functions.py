@@ -1,12 +1,38 @@
 # pylint: disable=missing-function-docstring, missing-module-docstring, redefined-outer-name
 import logging
+import threading
+import time
 from configparser import ConfigParser
+from dataclasses import dataclass
+from queue import Queue
 
 from pytest import LogCaptureFixture, fixture, raises
 from pytest_mock import MockerFixture
 
-from src.helpers.py_functions import read_query_settings, write_results_to_csv
-from tests.config.consts import APP_CONFIG, FAKE, TEST_CONFIG
+from src.classes.custom_exceptions import MissingConfigurationError
+from src.helpers.py_functions import (
+    get_many,
+    read_query_settings,
+    read_settings,
+    wake_consumer,
+    write_results_to_csv,
+)
+from tests.config.consts import (
+    APP_CONFIG,
+    FAKE,
+    TEST_CONFIG,
+    TEST_INFLUX_WRITER_CONFIG_TITLE,
+)
+
+
+@dataclass
+class FakeSettings:
+    """Settings dataclass for use in tests"""
+
+    write_mode: str = "single"
+    batch_size: int = 1
+    flush_interval: float = 0.0
+    file_logging: bool = False
 
 
 @fixture
@@ -28,7 +54,7 @@ def config_parser_fixture(mocker: MockerFixture):
 
 def test_writes_to_csv(config_parser_fixture, caplog: LogCaptureFixture):
     caplog.set_level(logging.INFO)
-    (file_path, file_exists, open_file, _makedirs) = config_parser_fixture
+    file_path, file_exists, open_file, _makedirs = config_parser_fixture
 
     write_results_to_csv(FAKE.pystr(), FAKE.pydict())
 
@@ -40,7 +66,7 @@ def test_writes_to_csv(config_parser_fixture, caplog: LogCaptureFixture):
 
 def test_makes_dir_when_not_existent(config_parser_fixture, caplog: LogCaptureFixture):
     caplog.set_level(logging.INFO)
-    (file_path, file_exists, open_file, makedirs) = config_parser_fixture
+    file_path, file_exists, open_file, makedirs = config_parser_fixture
     file_exists.return_value = False
 
     write_results_to_csv(FAKE.pystr(), FAKE.pydict())
@@ -55,7 +81,7 @@ def test_makes_dir_when_not_existent(config_parser_fixture, caplog: LogCaptureFi
 
 def test_fails_write_to_csv(config_parser_fixture, caplog: LogCaptureFixture):
     caplog.set_level(logging.INFO)
-    (_file_path, _file_exists, open_file, _makedirs) = config_parser_fixture
+    _file_path, _file_exists, open_file, _makedirs = config_parser_fixture
     open_file.side_effect = FileNotFoundError
 
     with raises(FileNotFoundError):
@@ -73,6 +99,54 @@ def test_read_query_settings(mocker: MockerFixture):
     assert result is not None
 
 
+def test_read_settings_from_config():
+    result = read_settings(
+        config_name=TEST_INFLUX_WRITER_CONFIG_TITLE,
+        settings_class=FakeSettings,
+        config_dir=TEST_CONFIG,
+    )
+
+    assert result == FakeSettings(
+        write_mode="batched", batch_size=500, flush_interval=1.0, file_logging=False
+    )
+
+
+def test_read_settings_casts_booleans():
+    result = read_settings(
+        config_name="solar_debugger",
+        settings_class=FakeSettings,
+        config_dir=TEST_CONFIG,
+    )
+
+    assert result.file_logging is True
+
+
+def test_read_settings_defaults_missing_section(caplog: LogCaptureFixture):
+    config_name = FAKE.pystr()
+
+    result = read_settings(
+        config_name=config_name,
+        settings_class=FakeSettings,
+        config_dir=TEST_CONFIG,
+    )
+
+    assert result == FakeSettings()
+    assert f"Missing config section {config_name}, using defaults" in caplog.text
+
+
+def test_read_settings_fails_bad_value(mocker: MockerFixture):
+    mocker.patch("configparser.ConfigParser.has_section", return_value=True)
+    mocker.patch("configparser.ConfigParser.has_option", return_value=True)
+    mocker.patch("configparser.ConfigParser.get", return_value=FAKE.pystr())
+
+    with raises(MissingConfigurationError):
+        read_settings(
+            config_name=TEST_INFLUX_WRITER_CONFIG_TITLE,
+            settings_class=FakeSettings,
+            config_dir=TEST_CONFIG,
+        )
+
+
 def test_config_files_are_consistent():
     app_config = None
     test_config = None
@@ -85,3 +159,36 @@ def test_config_files_are_consistent():
     assert (
         app_config == test_config
     ), "Configurations files are different between environments"
+
+
+def test_get_many_drains_waiting_items():
+    source_queue = Queue()
+    for index in range(5):
+        source_queue.put(index)
+
+    assert get_many(source_queue=source_queue, max_items=3, timeout=1.0) == [0, 1, 2]
+    assert get_many(source_queue=source_queue, max_items=10, timeout=1.0) == [3, 4]
+    assert get_many(source_queue=source_queue, max_items=10, timeout=0.01) == []
+
+
+def test_get_many_blocks_until_item_arrives():
+    source_queue = Queue()
+    timer = threading.Timer(0.05, source_queue.put, args=["packet"])
+    timer.start()
+
+    assert get_many(source_queue=source_queue, max_items=10, timeout=5.0) == ["packet"]
+    timer.join()
+
+
+def test_wake_consumer_unblocks_get_many():
+    source_queue = Queue(maxsize=1)
+    timer = threading.Timer(0.05, wake_consumer, kwargs={"target_queue": source_queue})
+    timer.start()
+    start_time = time.monotonic()
+
+    assert get_many(source_queue=source_queue, max_items=10, timeout=5.0) == []
+    assert time.monotonic() - start_time < 1.0
+    timer.join()
+    source_queue.put("packet")
+    wake_consumer(target_queue=source_queue)
+    assert source_queue.qsize() == 1
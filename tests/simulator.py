@@ -0,0 +1,842 @@
+"""
+Test harness, contains local stand-ins for the services the logger talks to and a
+generator of Outback device traffic, so the runners can be driven end to end on
+one machine by the tests and benchmarks. The broker speaks enough MQTT 3.1.1 for
+paho over a real socket, the Influx server answers the /ready and /api/v2/write
+requests of influxdb_client over real HTTP, and the simulator publishes valid DC,
+FX and MX packets
+"""
+
+import gzip
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import ssl
+import struct
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import BinaryIO, Callable
+from urllib.parse import urlsplit
+
+# MQTT control packet types, the high nibble of the first byte
+_CONNECT = 1
+_PUBLISH = 3
+_PUBACK = 4
+_SUBSCRIBE = 8
+_UNSUBSCRIBE = 10
+_PINGREQ = 12
+_DISCONNECT = 14
+# Accepted connection, no session present
+_CONNACK = b"\x20\x02\x00\x00"
+_PINGRESP = b"\xd0\x00"
+# Packed time at the start of each data packet, the same as the MQTT reader
+_TIME_STRUCT = struct.Struct("i")
+# Layouts the native decoders unpack, pad bytes are packed as zeros
+_DC_STRUCT = struct.Struct(">hhhhBhhhhhhhhhhhhhhhhh12xhhhhhhBhh6x")
+_FX_STRUCT = struct.Struct(">BBBBBBBBBhBB")
+_MX_STRUCT = struct.Struct(">BbbbBBBBBHH")
+# Range of the packed value of each DC field, in the order of the layout
+_DC_RANGES = (
+    (-300, 300),  # shunta_current
+    (-300, 300),  # shuntb_current
+    (-300, 300),  # shuntc_current
+    (240, 290),  # bat_voltage
+    (0, 100),  # state_of_charge
+    (-300, 300),  # shunta_power
+    (-300, 300),  # shuntb_power
+    (-300, 300),  # shuntc_power
+    (0, 63),  # flags
+    (0, 300),  # in_current
+    (0, 300),  # out_current
+    (-300, 300),  # bat_current
+    (0, 300),  # in_power
+    (0, 300),  # out_power
+    (-300, 300),  # bat_power
+    (0, 200),  # in_ah_today
+    (0, 200),  # out_ah_today
+    (0, 200),  # bat_ah_today
+    (0, 500),  # in_kwh_today
+    (0, 500),  # out_kwh_today
+    (0, 500),  # bat_kwh_today
+    (0, 100),  # days_since_full
+    (-100, 100),  # shunta_kwh_today
+    (-100, 100),  # shuntb_kwh_today
+    (-100, 100),  # shuntc_kwh_today
+    (-50, 50),  # shunta_ah_today
+    (-50, 50),  # shuntb_ah_today
+    (-50, 50),  # shuntc_ah_today
+    (0, 100),  # min_soc_today
+    (-50, 50),  # bat_net_ah
+    (-100, 100),  # bat_net_kwh
+)
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """
+    :param topic_filter: Subscribed filter, + matches one level and # the rest
+    :param topic: Topic a message was published on
+    :return: True when the filter matches the topic
+    """
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for index, filter_level in enumerate(filter_levels):
+        if filter_level == "#":
+            return True
+        if index >= len(topic_levels):
+            return False
+        if filter_level not in ("+", topic_levels[index]):
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+def _encode_length(remaining: int) -> bytes:
+    encoded = b""
+    while True:
+        byte, remaining = remaining & 0x7F, remaining >> 7
+        encoded += bytes([byte | (0x80 if remaining else 0)])
+        if not remaining:
+            return encoded
+
+
+def _publish_packet(topic: str, payload: bytes, retain: bool = False) -> bytes:
+    topic_bytes = topic.encode("utf-8")
+    body = struct.pack("!H", len(topic_bytes)) + topic_bytes + payload
+    return bytes([0x31 if retain else 0x30]) + _encode_length(len(body)) + body
+
+
+def _read_packet(reader: BinaryIO) -> tuple[int, bytes] | None:
+    """
+    :return: First byte and body of the next packet, or None once the client's gone
+    """
+    header = reader.read(1)
+    if not header:
+        return None
+    remaining, shift = 0, 0
+    while True:
+        byte = reader.read(1)
+        if not byte:
+            return None
+        remaining |= (byte[0] & 0x7F) << shift
+        shift += 7
+        if not byte[0] & 0x80:
+            break
+    body = reader.read(remaining)
+    if len(body) < remaining:
+        return None
+    return header[0], body
+
+
+def _read_string(body: bytes, offset: int) -> tuple[str, int]:
+    (length,) = struct.unpack_from("!H", body, offset)
+    offset += 2
+    return body[offset : offset + length].decode("utf-8"), offset + length
+
+
+@dataclass
+class BrokerStats:
+    """
+    Data class which counts the connections to the broker and messages routed
+    """
+
+    connections: int = 0
+    published: int = 0
+    delivered: int = 0
+
+
+class _BrokerSession:
+    """
+    One connected client, packets are sent from its own thread and from
+    whichever thread publishes so sends are serialized
+    """
+
+    def __init__(self, conn: socket.socket) -> None:
+        self.conn = conn
+        self.topic_filters: list[str] = []
+        self.send_lock = threading.Lock()
+
+    def matches(self, topic: str) -> bool:
+        """
+        :return: True when any of the session's subscriptions match the topic
+        """
+        return any(
+            topic_matches(topic_filter, topic) for topic_filter in self.topic_filters
+        )
+
+    def send(self, data: bytes) -> None:
+        """
+        Sends whole packets, other threads wait until they're written
+        """
+        with self.send_lock:
+            self.conn.sendall(data)
+
+
+def create_certificate(directory: str) -> tuple[str, str]:
+    """
+    Creates a self-signed localhost certificate with openssl, so no key is kept
+    in the repository
+    :param directory: Folder the certificate and its key are written to
+    :return: Paths of the PEM certificate and its private key
+    """
+    if shutil.which("openssl") is None:
+        raise FileNotFoundError("Openssl is needed to create the broker certificate.")
+    certfile = os.path.join(directory, "broker.crt")
+    keyfile = os.path.join(directory, "broker.key")
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "ec",
+            "-pkeyopt",
+            "ec_paramgen_curve:prime256v1",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=localhost",
+            "-keyout",
+            keyfile,
+            "-out",
+            certfile,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return certfile, keyfile
+
+
+class LocalBroker:
+    """
+    Class which runs an in-process MQTT broker on a local port for paho clients.
+    Messages are delivered at QoS 0 to every subscription matching their topic,
+    retained messages are sent to each new subscription first. Publishing blocks
+    while a subscriber's socket is full, so slow consumers push back on the sender.
+    Given a certificate the broker only accepts TLS connections
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        certfile: str = None,
+        keyfile: str = None,
+    ) -> None:
+        """
+        :param host: Address the broker listens on
+        :param port: Port the broker listens on, 0 picks a free port
+        :param certfile: Optional PEM certificate which enables TLS
+        :param keyfile: Private key of the certificate, when it's not in certfile
+        """
+        self._server = socket.create_server((host, port))
+        self.host = host
+        self.port = self._server.getsockname()[1]
+        self._ssl_context = None
+        if certfile is not None:
+            self._ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self._ssl_context.load_cert_chain(certfile=certfile, keyfile=keyfile)
+        self._sessions: list[_BrokerSession] = []
+        self._retained: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._subscribed = threading.Condition(self._lock)
+        self._accept_thread = None
+        self.stats = BrokerStats()
+
+    def start(self) -> None:
+        """
+        Starts accepting clients, each one is served from its own thread
+        """
+        self._accept_thread = threading.Thread(
+            name="Local-Broker", target=self._accept, daemon=True
+        )
+        self._accept_thread.start()
+        logging.info(f"Local MQTT broker listening on {self.host}:{self.port}")
+
+    def stop(self) -> None:
+        """
+        Stops accepting clients and closes every connection
+        """
+        # Shutting the sockets down wakes the threads blocked reading them
+        try:
+            self._server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._server.close()
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            self._close(session)
+        if self._accept_thread is not None:
+            self._accept_thread.join()
+
+    def wait_for_subscribers(self, count: int = 1, timeout: float = None) -> bool:
+        """
+        Waits until count clients have subscribed and been sent the retained messages
+        :return: False when the timeout passed first
+        """
+        with self._subscribed:
+            return self._subscribed.wait_for(
+                lambda: sum(bool(session.topic_filters) for session in self._sessions)
+                >= count,
+                timeout=timeout,
+            )
+
+    def publish(self, topic: str, payload: bytes, retain: bool = False) -> int:
+        """
+        Sends a message to every subscription matching its topic
+        :param topic: Topic the message is published on
+        :param payload: Payload of the message
+        :param retain: Keep the message for later subscriptions, an empty payload
+            clears the retained message
+        :return: Number of clients the message was delivered to
+        """
+        packet = _publish_packet(topic=topic, payload=payload)
+        with self._lock:
+            if retain and payload:
+                self._retained[topic] = payload
+            elif retain:
+                self._retained.pop(topic, None)
+            sessions = [session for session in self._sessions if session.matches(topic)]
+            self.stats.published += 1
+        delivered = 0
+        for session in sessions:
+            try:
+                session.send(packet)
+                delivered += 1
+            except OSError:
+                self._close(session)
+        with self._lock:
+            self.stats.delivered += delivered
+        return delivered
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(
+                name="Local-Broker-Session",
+                target=self._serve,
+                args=(conn,),
+                daemon=True,
+            ).start()
+
+    def _close(self, session: _BrokerSession) -> None:
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+        try:
+            session.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        session.conn.close()
+
+    def _serve(self, conn: socket.socket) -> None:
+        try:
+            if self._ssl_context is not None:
+                conn = self._ssl_context.wrap_socket(conn, server_side=True)
+        except (OSError, ssl.SSLError):
+            logging.exception("Local MQTT broker failed TLS handshake")
+            conn.close()
+            return
+        session = _BrokerSession(conn=conn)
+        with self._lock:
+            self._sessions.append(session)
+            self.stats.connections += 1
+        try:
+            with conn.makefile("rb") as reader:
+                while True:
+                    packet = _read_packet(reader)
+                    if packet is None or not self._handle(session, *packet):
+                        break
+        except OSError:
+            pass
+        finally:
+            self._close(session)
+
+    def _handle(self, session: _BrokerSession, header: int, body: bytes) -> bool:
+        """
+        :return: False once the client has disconnected
+        """
+        packet_type = header >> 4
+        if packet_type == _CONNECT:
+            session.send(_CONNACK)
+        elif packet_type == _PUBLISH:
+            return self._handle_publish(session, header, body)
+        elif packet_type == _SUBSCRIBE:
+            self._handle_subscribe(session, body)
+        elif packet_type == _UNSUBSCRIBE:
+            offset, topic_filters = 2, []
+            while offset < len(body):
+                topic_filter, offset = _read_string(body, offset)
+                topic_filters.append(topic_filter)
+            with self._lock:
+                session.topic_filters = [
+                    topic_filter
+                    for topic_filter in session.topic_filters
+                    if topic_filter not in topic_filters
+                ]
+            session.send(b"\xb0\x02" + body[:2])
+        elif packet_type == _PINGREQ:
+            session.send(_PINGRESP)
+        elif packet_type == _DISCONNECT:
+            return False
+        return True
+
+    def _handle_publish(
+        self, session: _BrokerSession, header: int, body: bytes
+    ) -> bool:
+        qos = (header >> 1) & 0x03
+        if qos > 1:
+            logging.error("Local MQTT broker doesn't support QoS 2, disconnecting")
+            return False
+        topic, offset = _read_string(body, 0)
+        if qos:
+            session.send(bytes([_PUBACK << 4, 2]) + body[offset : offset + 2])
+            offset += 2
+        self.publish(topic=topic, payload=body[offset:], retain=bool(header & 0x01))
+        return True
+
+    def _handle_subscribe(self, session: _BrokerSession, body: bytes) -> None:
+        offset, topic_filters = 2, []
+        while offset < len(body):
+            topic_filter, offset = _read_string(body, offset)
+            topic_filters.append(topic_filter)
+            offset += 1
+        # Messages published once the filters are added wait on the send lock,
+        # so they always follow the retained messages
+        with session.send_lock:
+            with self._lock:
+                session.topic_filters += topic_filters
+                retained = [
+                    _publish_packet(topic=topic, payload=payload, retain=True)
+                    for topic, payload in self._retained.items()
+                    if any(topic_matches(filter_, topic) for filter_ in topic_filters)
+                ]
+            granted = bytes(len(topic_filters))
+            session.conn.sendall(
+                bytes([0x90]) + _encode_length(2 + len(granted)) + body[:2] + granted
+            )
+            for packet in retained:
+                session.conn.sendall(packet)
+        with self._subscribed:
+            self._subscribed.notify_all()
+
+
+@dataclass
+class InfluxServerStats:
+    """
+    Data class which counts the write requests received and points accepted
+    """
+
+    requests: int = 0
+    failed_requests: int = 0
+    points: int = 0
+    body_bytes: int = 0
+    throttled_seconds: float = 0.0
+
+
+class _InfluxRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answers the requests influxdb_client makes, everything else is a 404
+    """
+
+    # Keeps connections open for the client's connection pool
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """
+        Answers the ready and health checks
+        """
+        path = urlsplit(self.path).path
+        if path == "/ready":
+            self._send_json(
+                200,
+                {
+                    "status": "ready",
+                    "started": self.server.influx_server.started,
+                    "up": "0s",
+                },
+            )
+        elif path == "/health":
+            self._send_json(
+                200,
+                {
+                    "name": "influxdb",
+                    "message": "ready for queries and writes",
+                    "status": "pass",
+                    "checks": [],
+                },
+            )
+        else:
+            self._send_json(404, {"code": "not found", "message": "path not found"})
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        """
+        Answers write requests with a 204 once the points are accepted
+        """
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if urlsplit(self.path).path != "/api/v2/write":
+            self._send_json(404, {"code": "not found", "message": "path not found"})
+            return
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        if not self.server.influx_server.write(body):
+            self._send_json(
+                503, {"code": "unavailable", "message": "simulated write failure"}
+            )
+            return
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args) -> None:  # pylint: disable=redefined-builtin
+        logging.debug(f"Fake InfluxDB: {format % args}")
+
+
+class FakeInfluxServer:
+    """
+    Class which runs a local HTTP server standing in for InfluxDB's write API.
+    Each write is held for the write latency, fails with a 503 at the error rate,
+    and is held longer when accepting it would go over the points per second cap
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        *,
+        write_latency: float = 0.0,
+        error_rate: float = 0.0,
+        max_points_per_second: float = 0.0,
+        keep_lines: bool = False,
+        seed: int = None,
+    ) -> None:
+        """
+        :param host: Address the server listens on
+        :param port: Port the server listens on, 0 picks a free port
+        :param write_latency: Seconds every write request is held before it's answered
+        :param error_rate: Fraction of write requests which fail, from 0 to 1
+        :param max_points_per_second: Most points accepted per second, 0 is no cap
+        :param keep_lines: Keep every line of protocol accepted in lines
+        :param seed: Seed of the failures, None fails at random
+        """
+        if not 0 <= error_rate <= 1:
+            raise ValueError(f'Error rate: "{error_rate}" is not supported.')
+        self._http_server = ThreadingHTTPServer((host, port), _InfluxRequestHandler)
+        self._http_server.daemon_threads = True
+        self._http_server.influx_server = self
+        self.host = host
+        self.port = self._http_server.server_address[1]
+        self.started = datetime.now(timezone.utc).isoformat()
+        self._write_latency = write_latency
+        self._error_rate = error_rate
+        self._max_points_per_second = max_points_per_second
+        self._keep_lines = keep_lines
+        self._random = random.Random(seed)
+        self._next_free = 0.0
+        self._lock = threading.Lock()
+        self._written = threading.Condition(self._lock)
+        self._serve_thread = None
+        self.lines: list[bytes] = []
+        self.stats = InfluxServerStats()
+
+    @property
+    def url(self) -> str:
+        """
+        Address to use as INFLUX_URL
+        """
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> None:
+        """
+        Starts answering requests, each one is answered from its own thread
+        """
+        self._serve_thread = threading.Thread(
+            name="Fake-Influx", target=self._http_server.serve_forever, daemon=True
+        )
+        self._serve_thread.start()
+        logging.info(f"Fake InfluxDB listening on {self.url}")
+
+    def stop(self) -> None:
+        """
+        Stops the server and closes its socket
+        """
+        self._http_server.shutdown()
+        self._http_server.server_close()
+        if self._serve_thread is not None:
+            self._serve_thread.join()
+
+    def wait_for_points(self, count: int, timeout: float = None) -> bool:
+        """
+        Waits until count points have been accepted
+        :return: False when the timeout passed first
+        """
+        with self._written:
+            return self._written.wait_for(
+                lambda: self.stats.points >= count, timeout=timeout
+            )
+
+    def write(self, body: bytes) -> bool:
+        """
+        Accepts a write request's line protocol, called from the request's thread
+        :param body: Uncompressed request body
+        :return: False when the write fails
+        """
+        if self._write_latency:
+            time.sleep(self._write_latency)
+        lines = [line for line in body.split(b"\n") if line]
+        with self._lock:
+            self.stats.requests += 1
+            if self._error_rate and self._random.random() < self._error_rate:
+                self.stats.failed_requests += 1
+                return False
+            delay = 0.0
+            if self._max_points_per_second:
+                now = time.monotonic()
+                self._next_free = max(self._next_free, now) + (
+                    len(lines) / self._max_points_per_second
+                )
+                delay = self._next_free - now
+                self.stats.throttled_seconds += delay
+        if delay > 0:
+            time.sleep(delay)
+        with self._written:
+            self.stats.points += len(lines)
+            self.stats.body_bytes += len(body)
+            if self._keep_lines:
+                self.lines += lines
+            self._written.notify_all()
+        return True
+
+
+@dataclass(frozen=True)
+class SimulatedDevice:
+    """
+    Data class which defines the topics a simulated device publishes on and how
+    its frames are packed
+    """
+
+    measurement: str
+    status_topic: str
+    data_topic: str
+    raw_topic: str
+    ts_topic: str
+    padding_at_end: int
+    pack_frame: Callable[[random.Random], bytes]
+
+
+def pack_dc_frame(rng: random.Random) -> bytes:
+    """
+    :return: FLEXnet DC status frame with random values in range
+    """
+    return _DC_STRUCT.pack(*(rng.randint(low, high) for low, high in _DC_RANGES))
+
+
+def pack_fx_frame(rng: random.Random) -> bytes:
+    """
+    :return: FX status frame with random values in range
+    """
+    return _FX_STRUCT.pack(
+        rng.randint(0, 30),  # inverter_current
+        rng.randint(0, 30),  # chg_current
+        rng.randint(0, 30),  # buy_current
+        rng.randint(0, 125),  # input_voltage
+        rng.randint(110, 125),  # output_voltage
+        rng.randint(0, 30),  # sell_current
+        rng.choice((0, 1, 2, 4)),  # operational_mode
+        0,  # error_mode
+        rng.randint(0, 2),  # ac_mode
+        rng.randint(240, 290),  # battery_voltage
+        rng.choice((0, 1, 0x80, 0x81)),  # misc
+        0,  # warnings
+    )
+
+
+def pack_mx_frame(rng: random.Random) -> bytes:
+    """
+    :return: MX status frame with random values in range, currents are packed
+        offset by 128 and the amp hours are split across two bytes
+    """
+    amp_hours = rng.randint(0, 2047)
+    kilowatt_hours = rng.randint(0, 999)
+    return _MX_STRUCT.pack(
+        ((amp_hours >> 8) << 4) | rng.randint(0, 9),  # packed
+        rng.randint(0, 60) - 128,  # pv_current
+        rng.randint(0, 60) - 128,  # bat_current
+        kilowatt_hours >> 8,  # kwh_high
+        amp_hours & 0xFF,  # amp_hours_low
+        rng.randint(0, 9) | rng.choice((0, 0x40)),  # aux
+        rng.randint(0, 4),  # status
+        0,  # errors
+        kilowatt_hours & 0xFF,  # kwh_low
+        rng.randint(240, 290),  # bat_voltage
+        rng.randint(0, 1500),  # pv_voltage
+    )
+
+
+MATE_STATUS_TOPIC = "mate/status"
+
+# Devices which can be simulated, the topics are the same as the reader's
+# MqttTopics. Padding is the random buffer at the end of each data packet
+SIMULATED_DEVICES = (
+    SimulatedDevice(
+        measurement="dc-1",
+        status_topic="mate/dc-1/status",
+        data_topic="mate/dc-1/dc-status",
+        raw_topic="mate/dc-1/stat/raw",
+        ts_topic="mate/dc-1/stat/ts",
+        padding_at_end=2,
+        pack_frame=pack_dc_frame,
+    ),
+    SimulatedDevice(
+        measurement="fx-1",
+        status_topic="mate/fx-1/status",
+        data_topic="mate/fx-1/fx-status",
+        raw_topic="mate/fx-1/stat/raw",
+        ts_topic="mate/fx-1/stat/ts",
+        padding_at_end=3,
+        pack_frame=pack_fx_frame,
+    ),
+    SimulatedDevice(
+        measurement="mx-1",
+        status_topic="mate/mx-1/status",
+        data_topic="mate/mx-1/mx-status",
+        raw_topic="mate/mx-1/stat/raw",
+        ts_topic="mate/mx-1/stat/ts",
+        padding_at_end=3,
+        pack_frame=pack_mx_frame,
+    ),
+)
+
+
+@dataclass
+class SimulatorStats:
+    """
+    Data class which counts the packets and messages the simulator published
+    """
+
+    packets: int = 0
+    messages: int = 0
+    payload_bytes: int = 0
+    seconds: float = 0.0
+
+
+class OutbackSimulator:
+    """
+    Class which generates the MQTT traffic of up to three Outback devices, the
+    DC, FX and MX devices the reader knows in that order. Each device publishes on
+    its own topics, so no two devices write the same points. Each round publishes
+    one packet per device, either as a data packet or as a raw frame followed by
+    its timestamp
+    """
+
+    def __init__(
+        self,
+        device_count: int = 3,
+        publish_rate: float = 1.0,
+        ingest_topics: str = "data",
+        seed: int = None,
+    ) -> None:
+        """
+        :param device_count: Number of simulated devices, at most three
+        :param publish_rate: Rounds published per second, 0 publishes as fast as
+            possible
+        :param ingest_topics: Either 'data' or 'raw', the topics the reader ingests
+        :param seed: Seed of the packet values, None packs random values
+        """
+        if not 1 <= device_count <= len(SIMULATED_DEVICES):
+            raise ValueError(f'Device count: "{device_count}" is not supported.')
+        if publish_rate < 0:
+            raise ValueError(f'Publish rate: "{publish_rate}" is not supported.')
+        if ingest_topics not in ("data", "raw"):
+            raise ValueError(f'Ingest topics: "{ingest_topics}" is not supported.')
+        self.devices = list(SIMULATED_DEVICES[:device_count])
+        self._publish_rate = publish_rate
+        self._ingest_topics = ingest_topics
+        self._random = random.Random(seed)
+
+    def status_messages(self) -> list[tuple[str, bytes]]:
+        """
+        :return: (topic, payload) of the messages marking the mate and every
+            simulated device online, best published as retained
+        """
+        status_topics = [MATE_STATUS_TOPIC] + [
+            device.status_topic for device in self.devices
+        ]
+        return [(status_topic, b"online") for status_topic in status_topics]
+
+    def device_messages(
+        self, device: SimulatedDevice, msg_time: int
+    ) -> list[tuple[str, bytes]]:
+        """
+        :param device: Device publishing the packet
+        :param msg_time: Epoch seconds of the packet
+        :return: (topic, payload) of the messages carrying one packet
+        """
+        frame = device.pack_frame(self._random)
+        if self._ingest_topics == "raw":
+            return [
+                (device.raw_topic, frame),
+                (device.ts_topic, str(msg_time).encode("ascii")),
+            ]
+        padding = bytes(
+            self._random.getrandbits(8) for _ in range(device.padding_at_end)
+        )
+        return [(device.data_topic, _TIME_STRUCT.pack(msg_time) + frame + padding)]
+
+    def run(
+        self,
+        publish: Callable[[str, bytes], object],
+        packet_count: int = None,
+        duration: float = None,
+        is_running: Callable[[], bool] = None,
+    ) -> SimulatorStats:
+        """
+        Publishes rounds at the publish rate until packet_count packets have been
+        published, duration seconds have passed or is_running returns False
+        :param publish: Function taking (topic, payload), such as LocalBroker.publish
+        :param packet_count: Most packets published
+        :param duration: Most seconds spent publishing
+        :param is_running: Function checked before each round
+        :return: Counts of the packets and messages published
+        """
+        stats = SimulatorStats()
+        start_time = time.monotonic()
+        rounds = 0
+        while is_running is None or is_running():
+            if packet_count is not None and stats.packets >= packet_count:
+                break
+            if self._publish_rate:
+                delay = start_time + rounds / self._publish_rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            if duration is not None and time.monotonic() - start_time >= duration:
+                break
+            msg_time = int(time.time())
+            for device in self.devices:
+                if packet_count is not None and stats.packets >= packet_count:
+                    break
+                for topic, payload in self.device_messages(device, msg_time):
+                    publish(topic, payload)
+                    stats.messages += 1
+                    stats.payload_bytes += len(payload)
+                stats.packets += 1
+            rounds += 1
+        stats.seconds = time.monotonic() - start_time
+        return stats
@@ -0,0 +1,295 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring, redefined-outer-name
+import gzip
+import json
+import shutil
+import ssl
+import struct
+import threading
+import urllib.request
+from queue import Queue
+from urllib.error import HTTPError
+
+from paho.mqtt.client import Client
+from pytest import fixture, mark, raises
+
+from src.classes.native_classes import NativeDecoder
+from tests.config.consts import TestMqttTopics
+from tests.simulator import (
+    MATE_STATUS_TOPIC,
+    FakeInfluxServer,
+    LocalBroker,
+    OutbackSimulator,
+    create_certificate,
+    topic_matches,
+)
+
+NATIVE_DECODERS = {
+    TestMqttTopics.dc_name: NativeDecoder.dc_decoder,
+    TestMqttTopics.fx_name: NativeDecoder.fx_decoder,
+    TestMqttTopics.mx_name: NativeDecoder.mx_decoder,
+}
+FRAME_SIZES = {
+    TestMqttTopics.dc_name: 78,
+    TestMqttTopics.fx_name: 13,
+    TestMqttTopics.mx_name: 13,
+}
+
+
+@fixture
+def broker_fixture():
+    broker = LocalBroker()
+    broker.start()
+    yield broker
+    broker.stop()
+
+
+@fixture
+def influx_fixture():
+    influx_server = FakeInfluxServer(keep_lines=True)
+    influx_server.start()
+    yield influx_server
+    influx_server.stop()
+
+
+def connect_client(broker: LocalBroker, topic: str, tls: bool = False):
+    received = Queue()
+    mqtt_client = Client()
+    mqtt_client.on_connect = lambda client, *_: client.subscribe(topic)
+    mqtt_client.on_message = lambda _client, _userdata, msg: received.put(
+        (msg.topic, msg.payload, msg.retain)
+    )
+    if tls:
+        mqtt_client.tls_set(cert_reqs=ssl.CERT_NONE)
+        mqtt_client.tls_insecure_set(True)
+    mqtt_client.connect(host=broker.host, port=broker.port)
+    listener = threading.Thread(target=mqtt_client.loop_forever, daemon=True)
+    listener.start()
+    assert broker.wait_for_subscribers(timeout=5)
+    return mqtt_client, listener, received
+
+
+def disconnect_client(
+    mqtt_client: Client, listener: threading.Thread, received: Queue, count: int
+) -> list[tuple[str, bytes, int]]:
+    messages = [received.get(timeout=5) for _ in range(count)]
+    mqtt_client.disconnect()
+    listener.join(timeout=5)
+    assert received.empty()
+    return messages
+
+
+def post_write(influx_server: FakeInfluxServer, body: bytes, gzipped: bool = False):
+    headers = {"Content-Encoding": "gzip"} if gzipped else {}
+    request = urllib.request.Request(
+        url=f"{influx_server.url}/api/v2/write?org=org&bucket=bucket&precision=s",
+        data=gzip.compress(body) if gzipped else body,
+        headers=headers,
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.status
+
+
+@mark.parametrize(
+    "topic_filter, topic, expected",
+    [
+        ("mate/#", "mate/fx-1/fx-status", True),
+        ("mate/#", "mate", True),
+        ("mate/+/status", "mate/fx-1/status", True),
+        ("mate/+/status", "mate/fx-1/fx-status", False),
+        ("mate/+", "mate/fx-1/status", False),
+        ("mate/status", "mate/status", True),
+    ],
+)
+def test_topic_matches(topic_filter: str, topic: str, expected: bool):
+    assert topic_matches(topic_filter, topic) is expected
+
+
+class TestOutbackSimulator:
+    """Test class for Outback Simulator"""
+
+    def test_spreads_devices_across_types(self):
+        simulator = OutbackSimulator(device_count=3)
+
+        assert [device.measurement for device in simulator.devices] == [
+            TestMqttTopics.dc_name,
+            TestMqttTopics.fx_name,
+            TestMqttTopics.mx_name,
+        ]
+        assert simulator.status_messages() == [
+            (MATE_STATUS_TOPIC, b"online"),
+            (TestMqttTopics.dc_status, b"online"),
+            (TestMqttTopics.fx_status, b"online"),
+            (TestMqttTopics.mx_status, b"online"),
+        ]
+
+    def test_packs_decodable_data_packets(self):
+        simulator = OutbackSimulator(device_count=3, seed=1)
+
+        for device in simulator.devices:
+            [(topic, payload)] = simulator.device_messages(device, msg_time=1640995200)
+
+            assert topic == device.data_topic
+            assert struct.unpack_from("i", payload)[0] == 1640995200
+            fields = NATIVE_DECODERS[device.measurement](payload, 4)
+            assert len(payload) == 4 + FRAME_SIZES[device.measurement] + (
+                device.padding_at_end
+            )
+            assert all(isinstance(value, float) for value in fields.values())
+
+    def test_packs_raw_frames_and_timestamps(self):
+        simulator = OutbackSimulator(device_count=1, ingest_topics="raw", seed=1)
+        device = simulator.devices[0]
+
+        (raw_topic, frame), (ts_topic, timestamp) = simulator.device_messages(
+            device, msg_time=1640995200
+        )
+
+        assert (raw_topic, ts_topic) == (TestMqttTopics.dc_raw, TestMqttTopics.dc_ts)
+        assert timestamp == b"1640995200"
+        assert NATIVE_DECODERS[device.measurement](frame)["bat_voltage"] >= 24.0
+
+    def test_seed_repeats_packets(self):
+        packets = [
+            OutbackSimulator(device_count=3, seed=7).device_messages(
+                device, msg_time=1640995200
+            )
+            for device in OutbackSimulator(device_count=3).devices
+        ]
+        repeated = [
+            OutbackSimulator(device_count=3, seed=7).device_messages(
+                device, msg_time=1640995200
+            )
+            for device in OutbackSimulator(device_count=3).devices
+        ]
+        assert packets == repeated
+
+    def test_stops_at_packet_count(self):
+        published = []
+
+        simulator_stats = OutbackSimulator(device_count=3, publish_rate=0).run(
+            publish=lambda topic, payload: published.append(topic), packet_count=7
+        )
+
+        assert simulator_stats.packets == simulator_stats.messages == 7
+        assert published.count(TestMqttTopics.dc_data) == 3
+
+    def test_paces_rounds(self):
+        simulator_stats = OutbackSimulator(device_count=2, publish_rate=20).run(
+            publish=lambda topic, payload: None, duration=0.12
+        )
+
+        assert simulator_stats.packets == 6
+        assert simulator_stats.seconds >= 0.12
+
+    @mark.parametrize(
+        "kwargs",
+        [
+            {"device_count": 0},
+            {"device_count": 4},
+            {"publish_rate": -1},
+            {"ingest_topics": "other"},
+        ],
+    )
+    def test_rejects_settings(self, kwargs: dict):
+        with raises(ValueError):
+            OutbackSimulator(**kwargs)
+
+
+class TestLocalBroker:
+    """Test class for Local Broker"""
+
+    def test_delivers_to_matching_subscriptions(self, broker_fixture: LocalBroker):
+        mqtt_client, listener, received = connect_client(
+            broker_fixture, "mate/+/status"
+        )
+
+        assert broker_fixture.publish(TestMqttTopics.fx_data, b"\x00") == 0
+        assert broker_fixture.publish(TestMqttTopics.fx_status, b"online") == 1
+
+        assert disconnect_client(mqtt_client, listener, received, count=1) == [
+            (TestMqttTopics.fx_status, b"online", 0)
+        ]
+        assert broker_fixture.stats.delivered == 1
+
+    def test_sends_retained_messages_first(self, broker_fixture: LocalBroker):
+        broker_fixture.publish(MATE_STATUS_TOPIC, b"online", retain=True)
+        broker_fixture.publish(TestMqttTopics.dc_status, b"online", retain=True)
+        broker_fixture.publish(TestMqttTopics.dc_status, b"", retain=True)
+        mqtt_client, listener, received = connect_client(broker_fixture, "mate/#")
+
+        broker_fixture.publish(TestMqttTopics.dc_data, b"\x01")
+
+        assert disconnect_client(mqtt_client, listener, received, count=2) == [
+            (MATE_STATUS_TOPIC, b"online", 1),
+            (TestMqttTopics.dc_data, b"\x01", 0),
+        ]
+
+    def test_routes_client_publishes(self, broker_fixture: LocalBroker):
+        mqtt_client, listener, received = connect_client(broker_fixture, "mate/#")
+
+        mqtt_client.publish(MATE_STATUS_TOPIC, b"online", qos=1)
+
+        assert disconnect_client(mqtt_client, listener, received, count=1) == [
+            (MATE_STATUS_TOPIC, b"online", 0)
+        ]
+
+    @mark.skipif(
+        shutil.which("openssl") is None,
+        reason="Openssl is needed to create the broker certificate",
+    )
+    def test_accepts_tls_clients(self, tmp_path):
+        certfile, keyfile = create_certificate(directory=str(tmp_path))
+        broker = LocalBroker(certfile=certfile, keyfile=keyfile)
+        broker.start()
+        mqtt_client, listener, received = connect_client(broker, "mate/#", tls=True)
+
+        broker.publish(MATE_STATUS_TOPIC, b"online")
+        messages = disconnect_client(mqtt_client, listener, received, count=1)
+        broker.stop()
+
+        assert messages == [(MATE_STATUS_TOPIC, b"online", 0)]
+
+
+class TestFakeInfluxServer:
+    """Test class for Fake Influx Server"""
+
+    def test_answers_ready(self, influx_fixture: FakeInfluxServer):
+        with urllib.request.urlopen(f"{influx_fixture.url}/ready") as response:
+            assert json.loads(response.read())["status"] == "ready"
+
+    def test_accepts_gzipped_writes(self, influx_fixture: FakeInfluxServer):
+        body = (
+            b"fx-1 battery_voltage=27.4 1640995200\nmx-1 pv_voltage=67.6 1640995200\n"
+        )
+
+        assert post_write(influx_fixture, body, gzipped=True) == 204
+        assert influx_fixture.wait_for_points(2, timeout=1)
+        assert influx_fixture.lines == body.splitlines()
+        assert influx_fixture.stats.body_bytes == len(body)
+
+    def test_fails_at_error_rate(self):
+        influx_server = FakeInfluxServer(error_rate=1.0)
+        influx_server.start()
+
+        with raises(HTTPError) as error:
+            post_write(influx_server, b"fx-1 battery_voltage=27.4 1640995200")
+        influx_server.stop()
+
+        assert error.value.code == 503
+        assert influx_server.stats.failed_requests == 1
+        assert influx_server.stats.points == 0
+
+    def test_caps_points_per_second(self):
+        influx_server = FakeInfluxServer(max_points_per_second=100)
+        influx_server.start()
+
+        for _ in range(2):
+            post_write(influx_server, b"fx-1 battery_voltage=27.4 1640995200\n" * 10)
+        influx_server.stop()
+
+        assert influx_server.stats.throttled_seconds >= 0.2 - 1e-6
+
+    def test_rejects_error_rate(self):
+        with raises(ValueError):
+            FakeInfluxServer(error_rate=2.0)